@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Confere o modo AC do voltímetro (voltmeter_node/ac_meter.py)
+Sinais sintéticos a taxa fixa entram no ACMeter amostra a amostra e cada
+janela publicada é decodificada e comparada com o cálculo em float64 sobre
+as mesmas amostras:
+
+    senoide     1,65 V DC + 1 V de pico a 50 Hz, com ruído
+    rede        60 Hz com 3ª e 5ª harmônicas (RMS verdadeiro != pico/√2)
+    quadrada    ±2,5 V a 123,4 Hz
+    triangular  0,5 V de pico a 7,3 Hz (poucos ciclos por janela)
+    DC          só ruído: RMS do ruído e frequência 0
+    grande      ±5 V a 400 Hz (desvios de 24 bits nos acumuladores)
+
+DC, RMS e pico batem com a referência (arredondamento de 1 µV); a
+frequência por cruzamentos por zero fica dentro de 0,1 %. Depois monta o
+ADCReader com aquisição contínua e o servidor BLE no ble_sim: o comando
+"AC:..." liga o modo, cada janela vira uma notificação na característica AC
+(inteira com MTU que a comporte, aviso curto com o MTU padrão) e o frame de
+tensões leva o RMS; um bloco perdido (overrun) recomeça a
+janela. Com o thread de amostragem ativo o comando AC: fica pendente até o
+loop principal parar o worker. Código de saída 1 se algo não conferir.
+
+    python3 ac_sim.py
+    python3 ac_sim.py --rate 4000 --window 4000
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import random
+import sys
+import time
+from array import array
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+
+from adc_backends import SimulatedBackend, WAVE_SINE, WAVE_SQUARE  # noqa: E402
+from adc_reader import ADCReader  # noqa: E402
+from ac_meter import ACMeter, decode_ac, isqrt  # noqa: E402
+
+FREQ_TOLERANCE = 0.001
+
+
+def _signals(rate, seed):
+    """Gerador de varreduras (µV): (rótulo, frequência) e amostras por canal"""
+    rng = random.Random(seed)
+    waves = (
+        ('senoide', 50.0, lambda t: 1650000 + 1000000 * math.sin(2 * math.pi * 50 * t)
+         + rng.randint(-3000, 3000)),
+        ('rede', 60.0, lambda t: 311000 * math.sin(2 * math.pi * 60 * t)
+         + 60000 * math.sin(2 * math.pi * 180 * t) + 30000 * math.sin(2 * math.pi * 300 * t)),
+        ('quadrada', 123.4, lambda t: 2500000 if (t * 123.4) % 1 < 0.5 else -2500000),
+        ('triangular', 7.3, lambda t: 1000000 + 500000 * (4 * abs((t * 7.3) % 1 - 0.5) - 1)),
+        ('DC', 0.0, lambda t: 2000000 + rng.randint(-5000, 5000)),
+        ('grande', 400.0, lambda t: 5000000 * math.sin(2 * math.pi * 400 * t + 0.3)),
+    )
+    labels = [(label, freq) for label, freq, _ in waves]
+    functions = [function for _, _, function in waves]
+
+    def generate():
+        k = 0
+        while True:
+            t = k / rate
+            yield tuple(int(round(function(t))) for function in functions)
+            k += 1
+    return labels, generate()
+
+
+def _reference(values):
+    n = len(values)
+    dc = sum(values) / n
+    rms = math.sqrt(sum((v - dc) ** 2 for v in values) / n)
+    peak = max(max(values) - dc, dc - min(values))
+    return dc, rms, peak
+
+
+def check_windows(rate, window, windows, seed, problems):
+    """ACMeter contra float64; retorna {rótulo: (RMS, freq) da última janela}"""
+    labels, signals = _signals(rate, seed)
+    channels = len(labels)
+    meter = ACMeter(channels, rate, window)
+    history = []
+    last = {}
+    for _ in range(window * windows):
+        sample = next(signals)
+        sequence = meter.sequence
+        for channel in range(channels):
+            meter.add(channel, sample[channel])
+        history.append(sample)
+        if meter.sequence == sequence:
+            continue
+        decoded = decode_ac(meter.latest())
+        if decoded['samples'] != window or decoded['rate_hz'] != rate:
+            problems.append(f"cabeçalho: {decoded}")
+        for channel, (label, freq) in enumerate(labels):
+            got = decoded['channels'][channel]
+            dc, rms, peak = _reference([s[channel] for s in history])
+            for key, expected in (('dc_uv', dc), ('rms_uv', rms), ('peak_uv', peak)):
+                if abs(got[key] - expected) > 1:
+                    problems.append(f"{label} janela {meter.sequence}: {key} {got[key]}, esperado {expected:.1f}")
+            if decoded['settled']:
+                if freq and abs(got['freq_hz'] - freq) > freq * FREQ_TOLERANCE:
+                    problems.append(f"{label} janela {meter.sequence}: {got['freq_hz']} Hz, esperado {freq}")
+                if not freq and got['freq_hz']:
+                    problems.append(f"{label}: frequência {got['freq_hz']} Hz num sinal DC")
+            last[label] = (got['rms_uv'], got['freq_hz'])
+        history = []
+        if len(problems) > 10:
+            break
+    if meter.sequence != windows:
+        problems.append(f"{meter.sequence} janelas publicadas, esperado {windows}")
+    return last
+
+
+def check_isqrt(seed, problems):
+    rng = random.Random(seed)
+    values = [0, 1, 2, 3, 4, 15, 16, 17, (1 << 30) - 1, 1 << 30, (1 << 80) + 12345]
+    values += [rng.randint(0, 1 << rng.randint(1, 100)) for _ in range(2000)]
+    for n in values:
+        if isqrt(n) != math.isqrt(n):
+            problems.append(f"isqrt({n}) = {isqrt(n)}, esperado {math.isqrt(n)}")
+            break
+    return len(values)
+
+
+def check_reader(problems):
+    """Aquisição contínua -> modo AC -> característica AC e frame com o RMS"""
+    rate, window = 2000, 1000
+    backend = SimulatedBackend(2, waves=((WAVE_SINE, 1650000, 1000000, 50, 0),
+                                         (WAVE_SQUARE, 0, 2000000, 20, 0)), sample_rate_hz=rate)
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader = ADCReader(backend=backend)
+        from ble_voltmeter_server import BLEVoltmeterServer
+        server = BLEVoltmeterServer(reader)
+    # Central 1 negociou MTU 247; a 2 ficou no padrão (23) e recebe só o aviso
+    server.connections.update((1, 2))
+    server.ble.irq_event(ble_sim.IRQ_MTU_EXCHANGED, (1, 247))
+    server.ble.values[server.command_handle] = f"AC:{rate},{window}".encode()
+    with contextlib.redirect_stdout(io.StringIO()):
+        server._handle_command_data(0)
+    if server.ble.gatts_read(server.command_handle) != f"AC:{rate},{window}".encode() or not reader.acquisition:
+        problems.append(f"comando AC: resposta {server.ble.gatts_read(server.command_handle)!r}")
+        return 0
+    acquisition = reader.acquisition
+    out = array('i', [0, 0])
+    notifications = 0
+    results = []
+    for block in range(4 * window // acquisition.block_samples + 1):
+        for _ in range(acquisition.block_samples):
+            acquisition.tick()
+        reader.read_block_uv(out)
+        if server.publish_ac():
+            notifications += 1
+            blob = server.ble.gatts_read(server.ac_handle)
+            sent = {conn_handle: payload for conn_handle, handle, payload in server.ble.notifications[-2:]
+                    if handle == server.ac_handle}
+            if sent.get(1) != blob or sent.get(2) != blob[:4]:
+                problems.append(f"notificação AC: {len(sent.get(1, b''))} / {len(sent.get(2, b''))} bytes "
+                                f"(resultado de {len(blob)})")
+            results.append(decode_ac(blob))
+            server.update_voltage_uv(reader.ac.rms_uv, force=True)
+    if notifications != 4:
+        problems.append(f"leitor: {notifications} resultados AC em 4 janelas")
+        return notifications
+    sine, square = results[-1]['channels']
+    # Tabela de 256 pontos do SimulatedBackend e códigos de 125 µV
+    if abs(sine['rms_uv'] - 1000000 / math.sqrt(2)) > 3000 or abs(sine['dc_uv'] - 1650000) > 1000:
+        problems.append(f"leitor: senoide {sine}")
+    if abs(sine['freq_hz'] - 50) > 0.05 or abs(square['freq_hz'] - 20) > 0.05:
+        problems.append(f"leitor: frequências {sine['freq_hz']} / {square['freq_hz']} Hz")
+    if abs(square['rms_uv'] - 2000000) > 1000:
+        problems.append(f"leitor: quadrada {square}")
+    frame = [payload for _, handle, payload in server.ble.notifications if handle == server.voltage_handle][-1]
+    if int.from_bytes(frame[3:7], 'little', signed=True) != reader.ac.rms_uv[0]:
+        problems.append("frame de tensões não leva o RMS do canal 1")
+
+    # Bloco perdido: a janela em andamento recomeça
+    restarts = reader.ac.restarts
+    for _ in range(3 * acquisition.block_samples):
+        acquisition.tick()
+    reader.read_block_uv(out)
+    if reader.ac.restarts != restarts + 1 or reader.ac.count[0] != acquisition.block_samples:
+        problems.append(f"overrun: restarts {reader.ac.restarts}, {reader.ac.count[0]} amostras na janela")
+
+    # AC:0 desliga e volta à leitura sob demanda
+    server.ble.values[server.command_handle] = b"AC:0"
+    with contextlib.redirect_stdout(io.StringIO()):
+        server._handle_command_data(0)
+    if reader.ac is not None or reader.acquisition is not None:
+        problems.append("comando AC:0 não desligou o modo AC")
+
+    # Thread de amostragem ativo: AC: espera o loop principal parar o worker
+    from sampler_thread import SamplerThread
+    sampler = SamplerThread(reader, 5)
+    sampler.start()
+    server.ble.values[server.command_handle] = b"AC:1000,500"
+    with contextlib.redirect_stdout(io.StringIO()):
+        server._handle_command_data(0)
+    pending = server.ac_request
+    if reader.ac is not None or reader.acquisition is not None or pending != (1000, 500):
+        problems.append(f"AC: com o worker ativo aplicado na IRQ (pendente {pending})")
+    sampler.stop()
+    with contextlib.redirect_stdout(io.StringIO()):
+        applied = server.apply_ac_request()
+    if not applied or not reader.ac or reader.acquisition.rate_hz != 1000 or server.ac_request:
+        problems.append("AC: pendente não aplicado depois de parar o worker")
+    server.ble.values[server.command_handle] = b"AC:0"
+    with contextlib.redirect_stdout(io.StringIO()):
+        server._handle_command_data(0)
+    return notifications
+
+
+def throughput(samples):
+    meter = ACMeter(3, 2000, 2000)
+    start = time.perf_counter()
+    for k in range(samples):
+        uv = 1650000 + ((k * 37) & 0xFFFFF) - 524288
+        meter.add(0, uv)
+        meter.add(1, uv)
+        meter.add(2, uv)
+    return (time.perf_counter() - start) * 1000000 / (samples * 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modo AC do voltímetro (RMS, pico e frequência)")
+    parser.add_argument('--rate', type=int, default=2000, help="amostras/s por canal")
+    parser.add_argument('--window', type=int, default=2000, help="amostras por janela")
+    parser.add_argument('--windows', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    problems = []
+    last = check_windows(args.rate, args.window, args.windows, args.seed, problems)
+    print(f"{args.windows} janelas de {args.window} amostras a {args.rate} Hz (última):")
+    for label, (rms, freq) in last.items():
+        print(f"  {label:10s} RMS {rms / 1000:10.3f} mV   {freq:9.3f} Hz")
+    print(f"isqrt conferida em {check_isqrt(args.seed, problems)} valores")
+    notifications = check_reader(problems)
+    channels = 3
+    blob = 12 + 16 * channels
+    print(f"BLE: {notifications} notificações de {blob} bytes no lugar de "
+          f"{args.window * channels * 4} bytes de amostras por janela ({channels} canais)")
+    print(f"Custo por amostra no computador: {throughput(20000):.2f} µs")
+
+    for problem in problems[:20]:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✓ Modo AC conferido")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
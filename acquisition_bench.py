@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Mede a aquisição do voltímetro: caminho float antigo x caminho inteiro (µV)
+Os dois leem os mesmos canais do ADCReader, filtram pela média móvel de
+10 amostras e codificam o frame de notificação:
+
+    antigo:  read_voltage em float (cópia abaixo) + struct.pack_into('<fff')
+    inteiro: ADCReader.read_all_uv + BLEUtils.pack_voltage_uv
+
+    python3 acquisition_bench.py            # no computador (ble_sim)
+    python3 acquisition_bench.py -n 50000
+    mpremote run acquisition_bench.py       # na placa (com o firmware do voltímetro)
+
+Leituras/s são medidas nos dois ambientes. Bytes alocados por leitura só
+na placa (gc.mem_alloc com o GC desligado): no CPython todo número é um
+objeto e a contagem não diz nada sobre o ESP32.
+
+A comparação é com o mesmo trabalho: estatísticas desligadas no caminho
+inteiro (o antigo não tinha), e o custo delas numa linha à parte. No
+CPython o caminho float costuma sair na frente e o número não vale para a
+placa: ler um array('i') cria um objeto int a cada índice (~3x mais lento
+que uma lista, ver a linha "indexação"), enquanto um float novo sai da
+freelist do CPython. No MicroPython é o contrário: o índice de um array
+de inteiros pequenos não aloca e cada float intermediário (divisão,
+multiplicação, sum(), append) vai para o heap e cobra depois em coletas.
+Vale o que a placa mede: leituras/s e B/leitura de `mpremote run`.
+"""
+
+import gc
+import struct
+import sys
+import time
+from array import array
+
+MICROPYTHON = sys.implementation.name == 'micropython'
+if not MICROPYTHON:
+    import ble_sim
+    ble_sim.install('voltmeter')
+    ble_sim.ADC.raw_values.update({36: 2048, 39: 4000, 34: 620})
+
+from adc_reader import ADCReader  # noqa: E402
+from ble_utils import BLEUtils  # noqa: E402
+from metrics import metrics, C_SAMPLES  # noqa: E402
+
+
+class LegacyFloatReader:
+    """read_voltage/read_all_voltages anteriores ao caminho inteiro"""
+
+    def __init__(self, adc_reader):
+        self.adc_reader = adc_reader
+        self.calibration_factors = [1.0, 1.0, 1.0]
+        self.filter_samples = 10
+        self.sample_history = [[] for _ in range(3)]
+        self.voltage_readings = [0.0, 0.0, 0.0]
+
+    def read_voltage(self, channel, filtered=True):
+        raw_value = self.adc_reader.read_raw_value(channel)
+        voltage = (raw_value / 4095.0) * 3.3
+        voltage *= self.calibration_factors[channel]
+        if filtered and channel < len(self.sample_history):
+            self.sample_history[channel].append(voltage)
+            if len(self.sample_history[channel]) > self.filter_samples:
+                self.sample_history[channel].pop(0)
+            if self.sample_history[channel]:
+                voltage = sum(self.sample_history[channel]) / len(self.sample_history[channel])
+        return voltage
+
+    def read_all_voltages(self, filtered=True):
+        voltages = []
+        for i in range(3):
+            voltage = self.read_voltage(i, filtered)
+            voltages.append(voltage)
+            self.voltage_readings[i] = voltage
+        metrics.inc(C_SAMPLES)
+        return voltages
+
+
+def _clock_us():
+    if MICROPYTHON:
+        return time.ticks_us()
+    return int(time.perf_counter() * 1000000)
+
+
+def _elapsed_us(start):
+    if MICROPYTHON:
+        return time.ticks_diff(time.ticks_us(), start)
+    return _clock_us() - start
+
+
+def run(label, step, reads):
+    """Executa step() reads vezes; retorna (rótulo, leituras/s, bytes/leitura)"""
+    for _ in range(20):
+        step()  # aquece os filtros
+    allocated = None
+    if MICROPYTHON:
+        gc.collect()
+        gc.disable()
+        before = gc.mem_alloc()
+    start = _clock_us()
+    for _ in range(reads):
+        step()
+    elapsed = _elapsed_us(start)
+    if MICROPYTHON:
+        allocated = (gc.mem_alloc() - before) / reads
+        gc.enable()
+        gc.collect()
+    rate = reads * 1000000 / elapsed if elapsed else 0
+    return label, rate, allocated
+
+
+def main():
+    reads = 2000 if MICROPYTHON else 100000
+    if not MICROPYTHON:
+        import argparse
+        parser = argparse.ArgumentParser(description="Mede a aquisição float x inteiro do voltímetro")
+        parser.add_argument('-n', '--reads', type=int, default=reads)
+        reads = parser.parse_args().reads
+
+    reader = ADCReader()
+    legacy = LegacyFloatReader(reader)
+    float_frame = bytearray(12)
+    uv_frame = bytearray(BLEUtils.voltage_frame_size(3))
+    microvolts = array('i', [0, 0, 0])
+
+    def legacy_step():
+        voltages = legacy.read_all_voltages()
+        struct.pack_into('<fff', float_frame, 0, voltages[0], voltages[1], voltages[2])
+
+    def integer_step():
+        BLEUtils.pack_voltage_uv(uv_frame, reader.read_all_uv(microvolts))
+
+    codes = array('i', [2048, 4000, 620])
+    code_list = [2048, 4000, 620]
+
+    def array_index():
+        for i in range(3):
+            codes[i] = codes[i]
+
+    def list_index():
+        for i in range(3):
+            code_list[i] = code_list[i]
+
+    # Mesmo trabalho nos dois caminhos: leitura, escala, média móvel e frame
+    stats = reader.stats
+    reader.stats = None
+    results = [run('float (antigo)', legacy_step, reads),
+               run('inteiro µV', integer_step, reads)]
+    if stats:
+        reader.stats = stats
+        results.append(run('inteiro + stats', integer_step, reads))
+    base = results[0][1]
+    print(f"{reads} leituras de 3 canais + frame ({'placa' if MICROPYTHON else 'ble_sim'})")
+    for label, rate, allocated in results:
+        alloc = f"{allocated:8.1f} B/leitura" if allocated is not None else "       - B/leitura"
+        print(f"  {label:16s} {rate:10.0f} leituras/s {alloc} {rate / base if base else 0:6.2f}x")
+    indexed = run('array', array_index, reads)[1]
+    listed = run('lista', list_index, reads)[1]
+    print(f"  indexação array('i') / lista: {indexed / listed if listed else 0:.2f}x"
+          f"{'' if MICROPYTHON else ' (no CPython o array cria um int por índice)'}")
+
+    # Os dois caminhos devem concordar bem abaixo de 1 código do ADC (~806 µV):
+    # a escala em ponto fixo tem ~5 ppm de erro, ~16 µV no fundo de escala
+    worst = max(abs(legacy.voltage_readings[i] * 1000000 - microvolts[i]) for i in range(3))
+    ok = worst <= 20
+    print(f"{'✓' if ok else '❌'} Diferença máxima entre os caminhos: {worst:.1f} µV")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
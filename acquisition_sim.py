@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Exercita a troca de buffers da aquisição contínua (voltmeter_node/acquisition.py)
+O Timer do ble_sim não dispara sozinho: aqui os ticks da IRQ são chamados
+diretamente, intercalados com o consumidor em ordens aleatórias. Um backend
+contador grava em cada amostra o seu número de sequência, então dá para
+conferir, bloco a bloco:
+
+    - cada bloco entregue tem amostras consecutivas, na ordem dos canais
+    - um bloco não muda enquanto o consumidor o segura (entre take e release)
+    - blocos só faltam quando há overrun, e cada overrun some com um bloco
+    - ADCReader.read_block_uv devolve a média de cada canal do bloco
+
+    python3 acquisition_sim.py
+    python3 acquisition_sim.py --ticks 500000 --seed 7
+
+Também mede ticks/s e blocos/s no computador (custo do driver em Python).
+Código de saída 1 se algo não conferir.
+"""
+
+import argparse
+import random
+import sys
+import time
+from array import array
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+
+from acquisition import ContinuousAcquisition  # noqa: E402
+from adc_backends import SimulatedBackend, WAVE_DC  # noqa: E402
+from adc_reader import ADCReader  # noqa: E402
+
+
+class CountingBackend:
+    """Backend falso: canal c da amostra k vale k * 16 + c"""
+
+    name = 'contador'
+    max_code = 1 << 23
+    full_scale_uv = 5000000
+
+    def __init__(self, channels):
+        self.channel_count = channels
+        self.sequence = 0
+
+    def active(self, channel):
+        return True
+
+    def read(self, channel):
+        return self.sequence * 16 + channel
+
+    def read_block(self, mask, out):
+        channel = 0
+        while mask:
+            if mask & 1:
+                out[channel] = self.sequence * 16 + channel
+            mask >>= 1
+            channel += 1
+        self.sequence = (self.sequence + 1) % (1 << 19)
+        return out
+
+
+def _check_block(view, channels, samples, problems, label):
+    """Confere amostras consecutivas; retorna a sequência da primeira"""
+    first = view[0] // 16
+    for k in range(samples):
+        for channel in range(channels):
+            expected = ((first + k) % (1 << 19)) * 16 + channel
+            if view[k * channels + channel] != expected:
+                problems.append(f"{label}: amostra {k} canal {channel} = {view[k * channels + channel]}, "
+                                f"esperado {expected}")
+                return first
+    return first
+
+
+def stress(ticks, channels, samples, seed, problems):
+    """IRQ e consumidor intercalados ao acaso; retorna (blocos, overruns)"""
+    rng = random.Random(seed)
+    backend = CountingBackend(channels)
+    acquisition = ContinuousAcquisition(backend, 1000, samples)
+    held = None         # (view, cópia) do bloco segurado pelo consumidor
+    expected_next = 0   # sequência esperada na primeira amostra do próximo bloco
+    delivered = 0
+    lost = 0
+    overruns_before = 0     # overruns anteriores ao bloco pronto agora
+    overruns_checked = 0    # ... e ao último bloco conferido
+    label = f"{channels} canais x {samples}"
+    for _ in range(ticks):
+        ready = acquisition.ready
+        acquisition.tick()
+        if ready < 0 <= acquisition.ready:
+            overruns_before = acquisition.overruns
+        # Consumidor às vezes rápido, às vezes atrasado por vários blocos
+        if held is None and rng.random() < 0.02:
+            view = acquisition.take()
+            if view is not None:
+                held = (view, bytes(view))
+        elif held is not None and rng.random() < 0.1:
+            view, copy = held
+            if bytes(view) != copy:
+                problems.append(f"{label}: bloco alterado enquanto segurado")
+            first = _check_block(view, channels, samples, problems, label)
+            gap = (first - expected_next) % (1 << 19)
+            if gap % samples:
+                problems.append(f"{label}: bloco começa em {first}, fora do alinhamento")
+            lost += gap // samples
+            expected_next = (first + samples) % (1 << 19)
+            overruns_checked = overruns_before
+            delivered += 1
+            acquisition.release()
+            held = None
+        if len(problems) > 10:
+            break
+    # Overruns depois do último bloco conferido ainda não aparecem como falta
+    if lost != overruns_checked:
+        problems.append(f"{label}: {lost} blocos faltando, {overruns_checked} overruns contados")
+    if not acquisition.overruns:
+        problems.append(f"{label}: consumidor lento sem nenhum overrun (teste sem efeito)")
+    return delivered, acquisition.overruns
+
+
+def check_average(problems):
+    """read_block_uv: média por canal de um bloco de sinal constante"""
+    levels = (250000, 1650000, 3000000)
+    backend = SimulatedBackend(3, waves=tuple((WAVE_DC, uv, 0, 0, 0) for uv in levels), sample_rate_hz=1000)
+    reader = ADCReader(backend=backend)
+    reader.start_continuous(1000, 16)
+    out = array('i', [0, 0, 0])
+    if reader.read_all_uv(out)[0] != 0:
+        problems.append("read_all_uv sem bloco pronto não devolveu o último valor")
+    for _ in range(16):
+        reader.acquisition.tick()
+    if reader.read_block_uv(out) != 16:
+        problems.append("read_block_uv não encontrou o bloco cheio")
+    for channel, uv in enumerate(levels):
+        if abs(out[channel] - uv) > 125:
+            problems.append(f"média do canal {channel + 1}: {out[channel]} µV, esperado {uv} µV")
+    if reader.read_block_uv(out):
+        problems.append("read_block_uv devolveu o mesmo bloco duas vezes")
+    reader.stop_continuous()
+
+
+def throughput(ticks, channels, samples):
+    acquisition = ContinuousAcquisition(SimulatedBackend(channels), 1000, samples)
+    sink = [0]
+
+    def handler(view, count):
+        sink[0] += view[0]
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        acquisition.tick()
+        acquisition.poll(handler)
+    elapsed = time.perf_counter() - start
+    return ticks / elapsed, acquisition.blocks / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Troca de buffers da aquisição contínua")
+    parser.add_argument('--ticks', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    problems = []
+    for channels, samples in ((1, 64), (3, 64), (8, 16), (16, 8)):
+        delivered, overruns = stress(args.ticks, channels, samples, args.seed, problems)
+        print(f"{channels:2d} canais x {samples:2d} amostras: {delivered:6d} blocos conferidos, "
+              f"{overruns:6d} overruns")
+    check_average(problems)
+    ticks_s, blocks_s = throughput(min(args.ticks, 100000), 3, 64)
+    print(f"Vazão no computador (3 canais, SimulatedBackend): {ticks_s:.0f} ticks/s, {blocks_s:.0f} blocos/s")
+
+    for problem in problems[:20]:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✓ Troca de buffers conferida")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Confere os backends do ADC (voltmeter_node/adc_backends.py) sem hardware
+ADS1115 e ADS1256 falam com conversores falsos que implementam o mapa de
+registradores e os comandos de cada datasheet sobre um barramento I2C/SPI
+falso (mesma API de machine.I2C/machine.SPI). Cada entrada AINx tem uma
+tensão conhecida; o ADCReader tem de devolver essa tensão em µV, canal a
+canal, nos modos de varredura e contínuo.
+
+    python3 adc_backend_sim.py
+    python3 adc_backend_sim.py -n 2000     # mais leituras na medição de vazão
+
+Também confere o SimulatedBackend (formas de onda determinísticas) e mede
+leituras/s de cada backend pelo ADCReader. Os tempos dos falsos medem o
+custo do driver em Python, não o do conversor (o ADS1115 em modo contínuo
+fica limitado às 860 conversões/s reais). Código de saída 1 se algo não
+conferir.
+"""
+
+import argparse
+import sys
+import time
+from array import array
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+
+from adc_backends import (ADS1115Backend, ADS1256Backend, SimulatedBackend,  # noqa: E402
+                          WAVE_DC, WAVE_SINE, WAVE_SQUARE)
+from adc_reader import ADCReader  # noqa: E402
+
+ADS1115_ADDRESS = 0x48
+ADS1115_LSB_UV = 125                # ±4,096 V / 32768
+ADS1256_LSB_UV = 5000000 / (1 << 23)
+
+# Tensão (µV) em cada entrada AINx dos conversores falsos
+INPUT_UV = (250000, 1234567, 3300000, 4000000, -1500000, 777777, 0, 2500000)
+
+
+def _code(uv, lsb_uv, max_code):
+    return max(-max_code, min(max_code - 1, int(round(uv / lsb_uv))))
+
+
+class FakePin:
+    """Pino de entrada/saída; value_fn, se dado, responde às leituras"""
+
+    def __init__(self, value_fn=None):
+        self.value_fn = value_fn
+        self.level = 1
+        self.history = []
+
+    def value(self, level=None):
+        if level is None:
+            return self.value_fn() if self.value_fn else self.level
+        self.level = level
+        self.history.append(level)
+
+
+class FakeADS1115:
+    """machine.I2C com um ADS1115 no endereço 0x48
+
+    Conversões single-shot ficam ocupadas por busy_polls leituras do config
+    (bit OS = 0) ou do pino ALERT/RDY antes de terminar.
+    """
+
+    def __init__(self, inputs_uv=INPUT_UV, busy_polls=2):
+        self.inputs_uv = inputs_uv
+        self.busy_polls = busy_polls
+        self.registers = [0, 0x8583, 0x8000, 0x7FFF]
+        self.busy = 0
+        self.transactions = 0
+        self.config_writes = []
+        self.rdy = FakePin(self._rdy)
+
+    def _check(self, address):
+        self.transactions += 1
+        if address != ADS1115_ADDRESS:
+            raise OSError(19)   # ENODEV, como machine.I2C
+
+    def _mux_input(self):
+        return ((self.registers[1] >> 12) & 7) - 4
+
+    def _convert(self):
+        code = _code(self.inputs_uv[self._mux_input()], ADS1115_LSB_UV, 32768)
+        self.registers[0] = code & 0xFFFF
+
+    def _rdy(self):
+        if self.busy:
+            self.busy -= 1
+            if not self.busy:
+                self._convert()
+            return 1
+        return 0
+
+    def writeto_mem(self, address, register, buffer):
+        self._check(address)
+        value = (buffer[0] << 8) | buffer[1]
+        if register == 1:
+            self.config_writes.append(value)
+            self.registers[1] = value & 0x7FFF
+            if value & 0x0100 and value & 0x8000:
+                self.busy = self.busy_polls
+            if not value & 0x0100:
+                self._convert()
+        else:
+            self.registers[register] = value
+
+    def readfrom_mem_into(self, address, register, buffer):
+        self._check(address)
+        if register == 1:
+            self._rdy()
+            value = self.registers[1] | (0 if self.busy else 0x8000)
+        else:
+            if register == 0 and not self.registers[1] & 0x0100:
+                self._convert()     # modo contínuo: sempre a conversão mais recente
+            value = self.registers[register]
+        buffer[0] = value >> 8
+        buffer[1] = value & 0xFF
+
+
+class FakeADS1256:
+    """machine.SPI com um ADS1256 (comandos, registradores e DRDY)
+
+    WAKEUP inicia uma conversão com o MUX atual; ela só termina quando o
+    DRDY é consultado. RDATA devolve a última conversão terminada, então um
+    driver que lê sem esperar o DRDY recebe o canal errado.
+    """
+
+    def __init__(self, inputs_uv=INPUT_UV):
+        self.inputs_uv = inputs_uv
+        self.registers = bytearray(11)
+        self.registers[1] = 0x01
+        self.latest = 0
+        self.pending = None
+        self.continuous = False
+        self.output = b''
+        self.commands = []
+        self.register_writes = []
+        self.reads = 0
+        self.drdy = FakePin(self._drdy)
+        self.cs = FakePin()
+
+    def _sample(self, mux):
+        positive = mux >> 4
+        if mux & 0x0F != 0x08:
+            raise ValueError('MUX 0x%02x: esperado AINx contra AINCOM' % mux)
+        return _code(self.inputs_uv[positive], ADS1256_LSB_UV, 1 << 23)
+
+    def _drdy(self):
+        if self.pending is not None:
+            if self.pending >= 0:
+                self.latest = self._sample(self.pending)
+            self.pending = None
+        elif self.continuous:
+            self.latest = self._sample(self.registers[1])
+        return 0
+
+    def write(self, data):
+        data = bytes(data)
+        i = 0
+        while i < len(data):
+            command = data[i]
+            if command & 0xF0 == 0x50:
+                register, count = command & 0x0F, data[i + 1] + 1
+                for k in range(count):
+                    self.registers[register + k] = data[i + 2 + k]
+                    self.register_writes.append((register + k, data[i + 2 + k]))
+                i += 2 + count
+                continue
+            self.commands.append(command)
+            if command == 0x00:
+                self.pending = self.registers[1]
+            elif command == 0x01:
+                self.output = (self.latest & 0xFFFFFF).to_bytes(3, 'big')
+            elif command == 0x03:
+                self.continuous = True
+            elif command == 0x0F:
+                self.continuous = False
+            elif command in (0xF0, 0xFE):
+                self.pending = -1   # reset/calibração: DRDY sem dado novo
+            i += 1
+
+    def readinto(self, buffer):
+        self.reads += 1
+        if self.continuous:
+            self.output = (self.latest & 0xFFFFFF).to_bytes(3, 'big')
+        buffer[:] = self.output
+
+
+def _within(label, got_uv, expected_uv, tolerance_uv, problems):
+    for channel, (got, expected) in enumerate(zip(got_uv, expected_uv)):
+        if abs(got - expected) > tolerance_uv:
+            problems.append(f"{label} canal {channel + 1}: {got} µV, esperado {expected} µV")
+
+
+def _expected(inputs, lsb_uv, max_code):
+    return [int(_code(INPUT_UV[i], lsb_uv, max_code) * lsb_uv) for i in inputs]
+
+
+def _rate(reader, reads):
+    out = array('i', [0] * reader.channel_count)
+    start = time.perf_counter()
+    for _ in range(reads):
+        reader.read_all_uv(out, filtered=False)
+    elapsed = time.perf_counter() - start
+    return reads / elapsed if elapsed else 0
+
+
+def check_ads1115(problems, reads):
+    rates = []
+    for drdy in (False, True):
+        bus = FakeADS1115()
+        inputs = (0, 1, 2, 3)
+        backend = ADS1115Backend(bus, inputs=inputs, address=ADS1115_ADDRESS,
+                                 drdy=bus.rdy if drdy else None)
+        label = 'ADS1115 ' + ('ALERT/RDY' if drdy else 'bit OS')
+        if bus.registers[2] != 0x0000 or bus.registers[3] != 0x8000:
+            problems.append(f"{label}: limiares {bus.registers[2]:#06x}/{bus.registers[3]:#06x}, "
+                            "esperado 0x0000/0x8000 (conversion-ready)")
+        reader = ADCReader(backend=backend)
+        out = array('i', [0] * len(inputs))
+        reader.read_all_uv(out, filtered=False)
+        _within(label, out, _expected(inputs, ADS1115_LSB_UV, 32768), 1, problems)
+        if bus.config_writes[-1] != 0x8000 | (4 + inputs[-1]) << 12 | 0x0200 | 0x0100 | 0x00E0:
+            problems.append(f"{label}: config {bus.config_writes[-1]:#06x} no último canal")
+        rates.append((label, _rate(reader, reads)))
+
+    # Um canal: modo contínuo, uma transação I2C por amostra
+    bus = FakeADS1115()
+    reader = ADCReader(backend=ADS1115Backend(bus, inputs=(2,)))
+    out = array('i', [0])
+    reader.read_all_uv(out, filtered=False)
+    before, writes = bus.transactions, len(bus.config_writes)
+    samples = 20
+    start = time.perf_counter()
+    for _ in range(samples):
+        reader.read_all_uv(out, filtered=False)
+    elapsed = time.perf_counter() - start
+    _within('ADS1115 contínuo', out, _expected((2,), ADS1115_LSB_UV, 32768), 1, problems)
+    if bus.config_writes[writes - 1] & 0x0100:
+        problems.append("ADS1115 contínuo: config em single-shot")
+    if len(bus.config_writes) != writes or bus.transactions - before != samples:
+        problems.append(f"ADS1115 contínuo: {bus.transactions - before} transações em {samples} amostras")
+    rates.append(('ADS1115 contínuo', samples / elapsed))
+    return rates
+
+
+def check_ads1256(problems, reads):
+    rates = []
+    chip = FakeADS1256()
+    inputs = (0, 1, 4, 7)
+    backend = ADS1256Backend(chip, chip.cs, chip.drdy, inputs=inputs)
+    for register, value in ((0, 0x06), (2, 0x00), (3, 0xF0)):
+        if (register, value) not in chip.register_writes:
+            problems.append(f"ADS1256: registrador {register} não configurado com {value:#04x}")
+    if 0xFE not in chip.commands or 0xF0 not in chip.commands:
+        problems.append("ADS1256: sem RESET/SELFCAL na inicialização")
+    reader = ADCReader(backend=backend)
+    out = array('i', [0] * len(inputs))
+    for _ in range(2):
+        reader.read_all_uv(out, filtered=False)
+        _within('ADS1256 ciclo', out, _expected(inputs, ADS1256_LSB_UV, 1 << 23), 2, problems)
+    rates.append(('ADS1256 ciclo', _rate(reader, reads)))
+
+    # Um canal: RDATAC, só a leitura dos 3 bytes por amostra
+    chip = FakeADS1256()
+    reader = ADCReader(backend=ADS1256Backend(chip, chip.cs, chip.drdy, inputs=(4,)))
+    out = array('i', [0])
+    reader.read_all_uv(out, filtered=False)
+    commands = len(chip.commands)
+    reader.read_all_uv(out, filtered=False)
+    if len(chip.commands) != commands or not chip.continuous:
+        problems.append("ADS1256 RDATAC: comandos enviados durante a leitura contínua")
+    _within('ADS1256 RDATAC', out, _expected((4,), ADS1256_LSB_UV, 1 << 23), 2, problems)
+    rates.append(('ADS1256 RDATAC', _rate(reader, reads)))
+
+    # Volta à varredura: SDATAC antes dos comandos
+    backend = reader.backend
+    value = backend.read(0)
+    if chip.continuous or chip.commands[commands] != 0x0F:
+        problems.append("ADS1256: saída do RDATAC sem SDATAC")
+    if abs(value * ADS1256_LSB_UV - INPUT_UV[4]) > 2:
+        problems.append(f"ADS1256 read(0) depois do RDATAC: {value}")
+    return rates
+
+
+def check_simulated(problems, reads):
+    rate_hz = 1000
+    backend = SimulatedBackend(3, waves=((WAVE_DC, 1650000, 0, 0, 2000),
+                                         (WAVE_SINE, 0, 1000000, 50, 0),
+                                         (WAVE_SQUARE, 1000000, 500000, 10, 0)),
+                               sample_rate_hz=rate_hz)
+    reader = ADCReader(backend=backend)
+    out = array('i', [0] * 3)
+    series = [[], [], []]
+    for _ in range(rate_hz // 10):   # 100 ms: 5 ciclos de 50 Hz, 1 de 10 Hz
+        reader.read_all_uv(out, filtered=False)
+        for channel in range(3):
+            series[channel].append(out[channel])
+    dc, sine, square = series
+    if max(abs(v - 1650000) for v in dc) > 2000 + ADS1115_LSB_UV:
+        problems.append(f"sim DC: desvio {max(abs(v - 1650000) for v in dc)} µV acima do ruído")
+    if abs(max(sine) - 1000000) > 30000 or abs(min(sine) + 1000000) > 30000:
+        problems.append(f"sim seno: pico {min(sine)}..{max(sine)} µV")
+    if abs(sum(sine) / len(sine)) > 5000:
+        problems.append(f"sim seno: média {sum(sine) / len(sine):.0f} µV")
+    if sorted(set(square)) != [500000, 1500000]:
+        problems.append(f"sim quadrada: níveis {sorted(set(square))[:4]}")
+    return [('sim 3 canais', _rate(ADCReader(backend=SimulatedBackend(3)), reads))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere os backends do ADC com barramentos falsos")
+    parser.add_argument('-n', '--reads', type=int, default=500)
+    args = parser.parse_args()
+
+    problems = []
+    rates = []
+    for check in (check_ads1115, check_ads1256, check_simulated):
+        rates.extend(check(problems, args.reads))
+
+    print("Leituras/s pelo ADCReader (sem filtro):")
+    for label, rate in rates:
+        print(f"  {label:20s} {rate:10.0f}")
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✓ Backends conferidos contra os conversores falsos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
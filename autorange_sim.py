@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Confere o auto-ranging de atenuação do ADCReader (ADC interno) no ble_sim
+O ADC simulado converte ADC.input_uv com o fundo de escala da atenuação
+atual, satura e entrega a 1ª conversão depois de atten() ainda na
+atenuação anterior. Cenários:
+
+    rampa       0 -> 3,3 V -> 0 em passos de 2 mV: nenhuma amostra sai
+                saturada ou com a conversão da troca, e o erro fica dentro de
+                um código da faixa usada; no fim a faixa volta à mais sensível
+    degrau      200 mV -> 3,0 V -> 200 mV: a amostra do degrau de subida já
+                sai certa (troca e nova conversão na mesma varredura)
+    limiar      950 mV ± 30 mV de ruído: trocas com e sem histerese
+    precisão    erro médio de 100 a 900 mV com 11 dB fixo x auto-ranging
+
+Para cada cenário mostra trocas por 1000 amostras e o custo da troca
+(descarte + nova conversão, H_RANGE_SETTLE; no computador é o custo do
+Python, no ESP32 cada conversão leva ~40 µs). Código de saída 1 se algo não
+conferir.
+
+    python3 autorange_sim.py
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+from array import array
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+
+import adc_reader as adc_reader_module  # noqa: E402
+from adc_reader import ADCReader  # noqa: E402
+from metrics import metrics, C_RANGE_SWITCHES, H_RANGE_SETTLE  # noqa: E402
+
+PIN = 300
+LSB_UV = tuple(full_scale // 4095 + 1 for full_scale in ble_sim.ADC.FULL_SCALE_UV)
+SCALE_SLACK_UV = 20     # arredondamento da escala em ponto fixo
+
+
+def _reader(auto_range=True):
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader = ADCReader((PIN,))
+        reader.set_auto_range(auto_range)
+    return reader
+
+
+def _sample(reader, out, uv):
+    ble_sim.ADC.input_uv[PIN] = uv
+    return reader.read_all_uv(out, filtered=False)[0]
+
+
+def _switches():
+    return metrics.counters[C_RANGE_SWITCHES]
+
+
+def ramp(problems):
+    reader = _reader()
+    out = array('i', [0])
+    levels = list(range(0, 3300001, 2000))
+    levels += levels[::-1]
+    start = _switches()
+    for uv in levels:
+        measured = _sample(reader, out, uv)
+        index = reader.range_index[0]
+        if not -SCALE_SLACK_UV <= uv - measured <= LSB_UV[index]:
+            problems.append(f"rampa: {uv} µV lido como {measured} µV (faixa {index})")
+            break
+    for _ in range(adc_reader_module.AUTO_RANGE_HOLD):
+        _sample(reader, out, 0)
+    if reader.range_index[0] != 0:
+        problems.append(f"rampa: terminou na faixa {reader.range_index[0]}, esperada 0")
+    return len(levels), _switches() - start
+
+
+def step(problems):
+    reader = _reader()
+    out = array('i', [0])
+    start = _switches()
+    samples = 0
+    for uv, count in ((200000, 50), (3000000, 50), (200000, 50)):
+        for k in range(count):
+            measured = _sample(reader, out, uv)
+            index = reader.range_index[0]
+            if not -SCALE_SLACK_UV <= uv - measured <= LSB_UV[index]:
+                problems.append(f"degrau: amostra {k} de {uv} µV lida como {measured} µV (faixa {index})")
+            samples += 1
+    return samples, _switches() - start
+
+
+def threshold(samples, seed, hysteresis, problems):
+    saved = adc_reader_module.AUTO_RANGE_DOWN_PERCENT, adc_reader_module.AUTO_RANGE_HOLD
+    if not hysteresis:
+        adc_reader_module.AUTO_RANGE_DOWN_PERCENT, adc_reader_module.AUTO_RANGE_HOLD = 100, 1
+    try:
+        reader = _reader()
+        rng = random.Random(seed)
+        out = array('i', [0])
+        for _ in range(20):
+            _sample(reader, out, 900000)
+        start = _switches()
+        for _ in range(samples):
+            uv = 950000 + rng.randint(-30000, 30000)
+            measured = _sample(reader, out, uv)
+            if not -SCALE_SLACK_UV <= uv - measured <= LSB_UV[reader.range_index[0]]:
+                problems.append(f"limiar: {uv} µV lido como {measured} µV")
+                break
+    finally:
+        adc_reader_module.AUTO_RANGE_DOWN_PERCENT, adc_reader_module.AUTO_RANGE_HOLD = saved
+    return samples, _switches() - start
+
+
+def precision(problems):
+    """Erro médio (µV) de 100 a 900 mV: (11 dB fixo, auto-ranging)"""
+    errors = []
+    for auto_range in (False, True):
+        reader = _reader(auto_range)
+        out = array('i', [0])
+        total = 0
+        count = 0
+        for uv in range(100000, 900001, 997):
+            for _ in range(2):      # a 1ª leitura num nível novo pode trocar de faixa
+                measured = _sample(reader, out, uv)
+            total += abs(uv - measured)
+            count += 1
+        errors.append(total / count)
+    if errors[1] >= errors[0]:
+        problems.append(f"precisão: auto-ranging ({errors[1]:.0f} µV) não melhorou 11 dB fixo ({errors[0]:.0f} µV)")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auto-ranging de atenuação do ADC interno (ble_sim)")
+    parser.add_argument('--samples', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    problems = []
+    rows = (('rampa', ramp(problems)),
+            ('degrau', step(problems)),
+            ('limiar com histerese', threshold(args.samples, args.seed, True, problems)),
+            ('limiar sem histerese', threshold(args.samples, args.seed, False, problems)))
+    for label, (samples, switches) in rows:
+        print(f"{label:22s} {samples:6d} amostras {switches:5d} trocas ({1000 * switches / samples:6.1f} por 1000)")
+    if rows[2][1][1] > 2 or rows[2][1][1] * 10 > rows[3][1][1]:
+        problems.append(f"limiar: histerese não conteve as trocas ({rows[2][1][1]} x {rows[3][1][1]} sem)")
+
+    fixed, auto = precision(problems)
+    print(f"Erro médio de 100 a 900 mV: 11 dB fixo {fixed:.0f} µV, auto-ranging {auto:.0f} µV")
+    settle = metrics.histograms[H_RANGE_SETTLE * 10:H_RANGE_SETTLE * 10 + 10]
+    print(f"Custo das trocas (range_settle_us): {sum(settle)} trocas, máximo {metrics.hist_max[H_RANGE_SETTLE]} µs")
+
+    for problem in problems[:20]:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✓ Auto-ranging conferido")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Captura e reprodução de tráfego BLE para testes de carga dos nós display
+
+    python3 ble_replay.py capture ble AA:BB:CC:DD:EE:FF trafego.cap --duration 60
+    python3 ble_replay.py capture synth trafego.cap --rate 100 --duration 60
+    python3 ble_replay.py info trafego.cap
+    python3 ble_replay.py replay trafego.cap sim --nodes 4 --speed 10
+    python3 ble_replay.py replay trafego.cap ble AA:BB:CC:DD:EE:01 AA:BB:CC:DD:EE:02 --speed max
+
+A captura ble assina a característica de tensão de um voltímetro (o mesmo
+frame que o voltímetro escreve no display). A captura synth gera frames
+sintéticos. Em replay sim, o BLEDisplayServer real roda sobre a pilha
+simulada (ble_sim.py); com --record, todo write/notify trocado com os
+servidores simulados é gravado num novo arquivo de captura.
+
+O relatório conta quantas escritas de tensão (_handle_voltage_data) e de
+comando (_handle_command_data) foram confirmadas pela notificação da
+característica do display, e com qual latência.
+
+Formato do arquivo (little-endian):
+    'BLECAP\\x01\\x00' | nº de UUIDs u16 | (handle u16, uuid 16 bytes) x N
+    registros: delta_us u32 | tipo u8 | handle u16 | tamanho u16 | payload
+"""
+
+import argparse
+import asyncio
+import math
+import struct
+import sys
+import time
+import uuid as uuid_module
+
+import ble_sim
+
+MAGIC = b'BLECAP\x01\x00'
+RECORD_HEADER = '<IBHH'
+RECORD_HEADER_SIZE = struct.calcsize(RECORD_HEADER)
+KIND_WRITE = ble_sim.TAP_WRITE
+KIND_NOTIFY = ble_sim.TAP_NOTIFY
+KIND_NAMES = {KIND_WRITE: 'write', KIND_NOTIFY: 'notify'}
+
+VOLTAGE_CHAR_UUID = "87654321-4321-4321-4321-cba987654322"
+COMMAND_CHAR_UUID = "11111111-1111-1111-1111-111111111111"
+DISPLAY_CHAR_UUID = "12345678-1234-1234-1234-123456789abd"
+
+# Comandos que terminam em _notify_display_update no BLEDisplayServer
+ACKED_COMMANDS = (b'TEXT:', b'CLEAR', b'VOLT:', b'NUM:')
+ACK_TIMEOUT = 2.0
+
+
+class CaptureWriter:
+    """Grava registros (tempo, tipo, handle, payload) no formato compacto"""
+
+    def __init__(self, path, handles):
+        """handles: {handle: uuid em texto}"""
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.file.write(struct.pack('<H', len(handles)))
+        for handle, uuid in sorted(handles.items()):
+            self.file.write(struct.pack('<H16s', handle, uuid_module.UUID(uuid).bytes))
+        self.last_us = None
+        self.count = 0
+
+    def write(self, kind, handle, payload, t_us=None):
+        if t_us is None:
+            t_us = time.monotonic_ns() // 1000
+        delta = 0 if self.last_us is None else max(0, min(0xFFFFFFFF, t_us - self.last_us))
+        self.last_us = t_us
+        self.file.write(struct.pack(RECORD_HEADER, delta, kind, handle, len(payload)))
+        self.file.write(payload)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+
+class Record:
+    __slots__ = ('t_us', 'kind', 'handle', 'uuid', 'payload')
+
+    def __init__(self, t_us, kind, handle, uuid, payload):
+        self.t_us = t_us
+        self.kind = kind
+        self.handle = handle
+        self.uuid = uuid
+        self.payload = payload
+
+
+def read_capture(path):
+    """Lê uma captura; retorna a lista de Record com tempo relativo em us"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} não é uma captura BLE")
+    position = len(MAGIC)
+    (count,) = struct.unpack_from('<H', data, position)
+    position += 2
+    uuids = {}
+    for _ in range(count):
+        handle, raw = struct.unpack_from('<H16s', data, position)
+        uuids[handle] = str(uuid_module.UUID(bytes=raw))
+        position += 18
+    records = []
+    t_us = 0
+    while position + RECORD_HEADER_SIZE <= len(data):
+        delta, kind, handle, length = struct.unpack_from(RECORD_HEADER, data, position)
+        position += RECORD_HEADER_SIZE
+        payload = data[position:position + length]
+        if len(payload) < length:
+            break  # registro truncado no fim do arquivo
+        position += length
+        t_us += delta
+        records.append(Record(t_us, kind, handle, uuids.get(handle), payload))
+    return records
+
+
+def replayable(records):
+    """Escritas a reproduzir no display: writes e notificações de tensão
+
+    A notificação de tensão do voltímetro tem o mesmo UUID e payload da
+    escrita que o voltímetro faz no display.
+    """
+    result = []
+    for record in records:
+        if record.uuid == COMMAND_CHAR_UUID and record.kind == KIND_WRITE:
+            result.append(record)
+        elif record.uuid == VOLTAGE_CHAR_UUID:
+            result.append(record)
+    return result
+
+
+def expects_ack(record):
+    if record.uuid == VOLTAGE_CHAR_UUID:
+        return True
+    return record.payload.startswith(ACKED_COMMANDS)
+
+
+# --- captura -------------------------------------------------------------------
+
+async def capture_ble(address, path, duration):
+    from bleak import BleakClient
+
+    async with BleakClient(address, timeout=20.0) as client:
+        characteristic = client.services.get_characteristic(VOLTAGE_CHAR_UUID)
+        writer = CaptureWriter(path, {characteristic.handle: VOLTAGE_CHAR_UUID})
+
+        def handler(sender, data):
+            writer.write(KIND_NOTIFY, characteristic.handle, bytes(data))
+
+        await client.start_notify(VOLTAGE_CHAR_UUID, handler)
+        print(f"Capturando {address} por {duration:.0f}s...")
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            await client.stop_notify(VOLTAGE_CHAR_UUID)
+            writer.close()
+    print(f"✓ {writer.count} registros gravados em {path}")
+
+
+def capture_synth(path, rate, duration, command_every):
+    """Tráfego sintético: frames de tensão a rate Hz e um TEXT a cada command_every s"""
+    handles = {1: VOLTAGE_CHAR_UUID, 4: COMMAND_CHAR_UUID}
+    writer = CaptureWriter(path, handles)
+    total = int(rate * duration)
+    period_us = 1000000 / rate
+    next_command = command_every * 1000000 if command_every else None
+    for i in range(total):
+        t_us = int(i * period_us)
+        if next_command is not None and t_us >= next_command:
+            writer.write(KIND_WRITE, 4, b'TEXT:%04d,%04d,%04d' % ((i % 10000,) * 3), t_us)
+            next_command += command_every * 1000000
+        phase = 2 * math.pi * i / max(1, rate)
+        frame = struct.pack('<fff', 1.65 + math.sin(phase), 3.3 * (i % 100) / 100, 2.5)
+        writer.write(KIND_WRITE, 1, frame, t_us)
+    writer.close()
+    print(f"✓ {writer.count} registros sintéticos gravados em {path}")
+
+
+def info(path):
+    import frame_decoder
+
+    records = read_capture(path)
+    if not records:
+        print("Captura vazia")
+        return
+    span = records[-1].t_us / 1e6
+    print(f"{len(records)} registros em {span:.1f}s ({len(records) / max(span, 1e-6):.1f}/s)")
+    by_kind = {}
+    for record in records:
+        key = (KIND_NAMES.get(record.kind, record.kind), record.uuid)
+        by_kind[key] = by_kind.get(key, 0) + 1
+    for (kind, uuid), count in sorted(by_kind.items(), key=str):
+        print(f"  {kind:6s} {uuid}: {count}")
+
+    voltage = [r for r in records if r.uuid == VOLTAGE_CHAR_UUID]
+    offsets = []
+    position = 0
+    for record in voltage:
+        offsets.append(position)
+        position += len(record.payload)
+    groups = frame_decoder.decode_by_bitmap(b''.join(r.payload for r in voltage), offsets)
+    corrupt = set()
+    for bitmap, decoded in groups.items():
+        if len(decoded):
+            channels = [c + 1 for c in range(16) if bitmap >> c & 1]
+            print(f"Frames de tensão (canais {channels}): {len(decoded)} válidos")
+        corrupt.update(int(i) for i in decoded.corrupt)
+    print(f"Frames de tensão corrompidos: {len(corrupt)}")
+
+
+# --- reprodução ----------------------------------------------------------------
+
+class AckTracker:
+    """Casa escritas com as notificações do display (FIFO) e mede latência"""
+
+    def __init__(self):
+        self.pending = []          # (instante do envio, categoria)
+        self.sent = {'voltage': 0, 'command': 0}
+        self.acked = {'voltage': 0, 'command': 0}
+        self.latencies = {'voltage': [], 'command': []}
+        self.late = 0
+        self.max_lag = 0.0
+
+    def sent_write(self, record, lag):
+        category = 'voltage' if record.uuid == VOLTAGE_CHAR_UUID else 'command'
+        self.sent[category] += 1
+        if lag > 0.005:
+            self.late += 1
+        self.max_lag = max(self.max_lag, lag)
+        if expects_ack(record):
+            self.pending.append((time.perf_counter(), category))
+
+    def notified(self):
+        now = time.perf_counter()
+        # Escritas sem confirmação dentro do prazo foram perdidas
+        while self.pending and now - self.pending[0][0] > ACK_TIMEOUT:
+            self.pending.pop(0)
+        if self.pending:
+            sent_at, category = self.pending.pop(0)
+            self.acked[category] += 1
+            self.latencies[category].append(now - sent_at)
+
+    def report(self, label):
+        lines = [f"{label}: {self.late} envios atrasados (atraso máx {self.max_lag * 1000:.1f} ms)"]
+        handlers = (('voltage', '_handle_voltage_data'), ('command', '_handle_command_data'))
+        for category, handler in handlers:
+            if not self.sent[category]:
+                continue
+            latencies = sorted(self.latencies[category])
+            line = f"  {handler}: {self.acked[category]}/{self.sent[category]} confirmadas"
+            if latencies:
+                p50 = latencies[len(latencies) // 2] * 1000
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+                line += f", latência p50 {p50:.2f} ms, p95 {p95:.2f} ms, máx {latencies[-1] * 1000:.2f} ms"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+async def schedule(records, speed, send):
+    """Envia cada registro no instante original dividido por speed (0 = máximo)"""
+    start = time.perf_counter()
+    for record in records:
+        lag = 0.0
+        if speed:
+            target = start + record.t_us / 1e6 / speed
+            delay = target - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag = max(0.0, time.perf_counter() - target)
+        await send(record, lag)
+    return time.perf_counter() - start
+
+
+class SimTarget:
+    """BLEDisplayServer real sobre a pilha simulada"""
+
+    def __init__(self, index):
+        from display_controller import DisplayController
+        from ble_server import BLEDisplayServer
+
+        self.label = f"sim-{index}"
+        self.tracker = AckTracker()
+        self.server = BLEDisplayServer(DisplayController())
+        self.display_handle = self.server.display_handle
+        self.server.ble.tap = self._tap
+        self.recorder = None
+        self.central = ble_sim.Central(self.server.ble)
+        self.central.connect()
+
+    def _tap(self, kind, handle, payload):
+        if self.recorder:
+            self.recorder.write(kind, handle, payload)
+        if kind == KIND_NOTIFY and handle == self.display_handle:
+            self.tracker.notified()
+
+    async def send(self, record, lag):
+        self.tracker.sent_write(record, lag)
+        self.central.write(record.uuid, record.payload)
+
+    async def close(self):
+        pass
+
+
+class BleakTarget:
+    """Nó display real via bleak"""
+
+    def __init__(self, address):
+        from bleak import BleakClient
+
+        self.label = address
+        self.tracker = AckTracker()
+        self.client = BleakClient(address, timeout=20.0)
+
+    async def open(self):
+        await self.client.connect()
+        await self.client.start_notify(DISPLAY_CHAR_UUID, lambda sender, data: self.tracker.notified())
+
+    async def send(self, record, lag):
+        self.tracker.sent_write(record, lag)
+        await self.client.write_gatt_char(record.uuid, record.payload, response=True)
+
+    async def close(self):
+        await asyncio.sleep(ACK_TIMEOUT)  # últimas notificações
+        await self.client.disconnect()
+
+
+async def replay(path, target, addresses, nodes, speed, record_path):
+    records = replayable(read_capture(path))
+    print(f"Reproduzindo {len(records)} escritas em {len(addresses) if target == 'ble' else nodes} nó(s), "
+          f"velocidade {'máxima' if not speed else f'{speed:g}x'}")
+
+    recorder = None
+    if target == 'sim':
+        ble_sim.install('display')
+        targets = [SimTarget(i) for i in range(nodes)]
+        if record_path:
+            # Todos os nós simulados registram o mesmo serviço, com os mesmos handles
+            recorder = CaptureWriter(record_path, targets[0].server.ble.uuids)
+            for t in targets:
+                t.recorder = recorder
+    else:
+        targets = [BleakTarget(address) for address in addresses]
+        await asyncio.gather(*(t.open() for t in targets))
+
+    try:
+        elapsed = await asyncio.gather(*(schedule(records, speed, t.send) for t in targets))
+    finally:
+        await asyncio.gather(*(t.close() for t in targets))
+        if recorder:
+            recorder.close()
+
+    for t, seconds in zip(targets, elapsed):
+        rate = len(records) / seconds if seconds else 0
+        print(t.tracker.report(f"{t.label} ({seconds:.2f}s, {rate:.0f} escritas/s)"))
+    if target == 'sim':
+        print("(latências da simulação medem a CPU do computador, não do ESP32)")
+    if recorder:
+        print(f"✓ {recorder.count} registros do tráfego simulado gravados em {record_path}")
+
+
+def parse_speed(text):
+    return 0.0 if text == 'max' else float(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Captura e reprodução de tráfego BLE")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_capture = sub.add_parser('capture', help="Grava tráfego")
+    capture_sub = p_capture.add_subparsers(dest='source', required=True)
+    p_ble = capture_sub.add_parser('ble', help="Notificações de tensão de um voltímetro")
+    p_ble.add_argument('address')
+    p_ble.add_argument('output')
+    p_ble.add_argument('--duration', type=float, default=60.0)
+    p_synth = capture_sub.add_parser('synth', help="Tráfego sintético")
+    p_synth.add_argument('output')
+    p_synth.add_argument('--rate', type=float, default=100.0, help="Frames de tensão por segundo")
+    p_synth.add_argument('--duration', type=float, default=60.0)
+    p_synth.add_argument('--command-every', type=float, default=5.0, help="Segundos entre comandos TEXT (0 = nenhum)")
+
+    p_info = sub.add_parser('info', help="Resumo de uma captura")
+    p_info.add_argument('capture')
+
+    p_replay = sub.add_parser('replay', help="Reproduz as escritas de uma captura")
+    p_replay.add_argument('capture')
+    p_replay.add_argument('target', choices=('sim', 'ble'))
+    p_replay.add_argument('addresses', nargs='*', help="Endereços dos displays (alvo ble)")
+    p_replay.add_argument('--nodes', type=int, default=1, help="Displays simulados (alvo sim)")
+    p_replay.add_argument('--speed', type=parse_speed, default=1.0, help="1, N ou max")
+    p_replay.add_argument('--record', help="Grava o tráfego trocado com os nós simulados")
+
+    args = parser.parse_args()
+    if args.command == 'capture':
+        if args.source == 'ble':
+            asyncio.run(capture_ble(args.address, args.output, args.duration))
+        else:
+            capture_synth(args.output, args.rate, args.duration, args.command_every)
+    elif args.command == 'info':
+        info(args.capture)
+    else:
+        if args.target == 'ble' and not args.addresses:
+            parser.error("replay ble requer ao menos um endereço")
+        asyncio.run(replay(args.capture, args.target, args.addresses, args.nodes,
+                           args.speed, args.record))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
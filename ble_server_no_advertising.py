@@ -8,8 +8,12 @@ import time
 import gc
 import sys
 sys.path.append('/common')
-from constants import *
-from ble_utils import BLEUtils, print_debug, _IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_GATTS_WRITE
+from micropython import const
+from ble_utils import BLEUtils, print_debug
+
+_IRQ_CENTRAL_CONNECT = const(1)
+_IRQ_CENTRAL_DISCONNECT = const(2)
+_IRQ_GATTS_WRITE = const(3)
 
 class NoAdvertisingBLEServer:
     """Servidor BLE que funciona sem advertising para contornar erro -18"""
@@ -0,0 +1,343 @@
+"""
+Pilha BLE simulada para rodar o firmware dos nós no computador
+Instala módulos falsos de bluetooth, machine, micropython e ubinascii, e as
+funções time.ticks_* do MicroPython, para que os módulos de display_node/ e
+voltmeter_node/ importem sem alteração no CPython:
+
+    import ble_sim
+    ble_sim.install()
+    from ble_server import BLEDisplayServer   # display_node/ já no sys.path
+    server = BLEDisplayServer(DisplayController())
+    central = ble_sim.Central(server.ble)
+    central.connect()
+    central.write(ble_sim.uuid_key(VOLTAGE_CHAR_UUID), frame)
+
+Cada bluetooth.BLE() devolve uma instância nova (um nó por instância), e todo
+tráfego GATT passa por BLE.tap, se definido: tap(tipo, handle, payload).
+"""
+
+import binascii
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FIRMWARE_PATHS = {
+    'common': os.path.join(ROOT, 'common'),
+    'display': os.path.join(ROOT, 'display_node'),
+    'voltmeter': os.path.join(ROOT, 'voltmeter_node'),
+}
+
+# Códigos IRQ e flags do módulo bluetooth do MicroPython
+IRQ_CENTRAL_CONNECT = 1
+IRQ_CENTRAL_DISCONNECT = 2
+IRQ_GATTS_WRITE = 3
+IRQ_MTU_EXCHANGED = 21
+
+FLAG_BROADCAST = 0x0001
+FLAG_READ = 0x0002
+FLAG_WRITE_NO_RESPONSE = 0x0004
+FLAG_WRITE = 0x0008
+FLAG_NOTIFY = 0x0010
+FLAG_INDICATE = 0x0020
+
+TAP_WRITE = 1     # central escreveu numa característica do servidor
+TAP_NOTIFY = 2    # servidor notificou uma central
+
+_start = time.monotonic()
+_real_sleep = time.sleep
+
+
+def uuid_key(uuid):
+    """Forma canônica (texto minúsculo) de um UUID simulado ou string"""
+    return str(uuid).lower()
+
+
+class UUID:
+    def __init__(self, value):
+        self.value = value.lower() if isinstance(value, str) else value
+
+    def __eq__(self, other):
+        return isinstance(other, UUID) and self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __bytes__(self):
+        # Como no MicroPython: bytes little-endian do UUID
+        if isinstance(self.value, int):
+            return self.value.to_bytes(2, 'little')
+        return bytes(reversed(bytes.fromhex(self.value.replace('-', ''))))
+
+    def __str__(self):
+        return str(self.value)
+
+    __repr__ = __str__
+
+
+class BLE:
+    """Um rádio BLE simulado (servidor GATT e, parcialmente, central)"""
+
+    instances = []
+
+    def __init__(self):
+        self._active = False
+        self._handler = None
+        self.values = {}
+        self.uuids = {}          # handle -> uuid_key
+        self.handles = {}        # uuid_key -> handle
+        self.advertising = None
+        self.tap = None
+        self.notifications = []
+        self._next_handle = 1
+        BLE.instances.append(self)
+
+    def active(self, state=None):
+        if state is not None:
+            self._active = bool(state)
+        return self._active
+
+    def config(self, *args, **kwargs):
+        if args and args[0] == 'mac':
+            return (0, bytes([0x02, 0, 0, 0, 0, len(BLE.instances)]))
+        return None
+
+    def irq(self, handler):
+        self._handler = handler
+
+    def gatts_register_services(self, services):
+        result = []
+        for service_uuid, characteristics in services:
+            handles = []
+            for characteristic in characteristics:
+                uuid = uuid_key(characteristic[0])
+                handle = self._next_handle
+                # Deixa espaço para declaração e CCCD, como na pilha real
+                self._next_handle += 3
+                self.values[handle] = b''
+                self.uuids[handle] = uuid
+                self.handles.setdefault(uuid, handle)
+                handles.append(handle)
+            result.append(tuple(handles))
+        return tuple(result)
+
+    def gatts_read(self, handle):
+        return self.values.get(handle, b'')
+
+    def gatts_write(self, handle, data, send_update=False):
+        self.values[handle] = bytes(data)
+
+    def gatts_set_buffer(self, handle, size, append=False):
+        pass
+
+    def gatts_notify(self, conn_handle, handle, data=None):
+        payload = bytes(data) if data is not None else self.values.get(handle, b'')
+        self.notifications.append((conn_handle, handle, payload))
+        if self.tap:
+            self.tap(TAP_NOTIFY, handle, payload)
+
+    def gap_advertise(self, interval_us, adv_data=None, resp_data=None, connectable=True):
+        self.advertising = None if interval_us is None else adv_data
+
+    def gap_scan(self, *args, **kwargs):
+        pass
+
+    def gap_connect(self, *args, **kwargs):
+        pass
+
+    def gap_disconnect(self, conn_handle):
+        self.irq_event(IRQ_CENTRAL_DISCONNECT, (conn_handle, 0, bytes(6)))
+
+    def gattc_write(self, *args, **kwargs):
+        pass
+
+    def irq_event(self, event, data):
+        """Entrega um evento ao handler registrado pelo firmware"""
+        if self._handler:
+            return self._handler(event, data)
+        return None
+
+
+class Central:
+    """Central simulada conectada a um servidor BLE simulado"""
+
+    _next_conn = 0
+
+    def __init__(self, ble):
+        self.ble = ble
+        self.conn_handle = None
+
+    def connect(self, addr=b'\x00\x00\x00\x00\x00\x01'):
+        Central._next_conn += 1
+        self.conn_handle = Central._next_conn
+        self.ble.irq_event(IRQ_CENTRAL_CONNECT, (self.conn_handle, 0, addr))
+        return self.conn_handle
+
+    def exchange_mtu(self, mtu):
+        """Troca de MTU iniciada pela central (evento no servidor)"""
+        self.ble.irq_event(IRQ_MTU_EXCHANGED, (self.conn_handle, mtu))
+
+    def disconnect(self):
+        self.ble.irq_event(IRQ_CENTRAL_DISCONNECT, (self.conn_handle, 0, bytes(6)))
+        self.conn_handle = None
+
+    def write(self, uuid, data):
+        """Escreve numa característica (por UUID) como faria um cliente GATT"""
+        handle = self.ble.handles[uuid_key(uuid)]
+        self.ble.values[handle] = bytes(data)
+        if self.ble.tap:
+            self.ble.tap(TAP_WRITE, handle, bytes(data))
+        self.ble.irq_event(IRQ_GATTS_WRITE, (self.conn_handle, handle))
+
+
+# --- machine -----------------------------------------------------------------
+
+class Pin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, number, mode=None, pull=None, value=None):
+        self.number = number
+        self._value = value or 0
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = 1 if value else 0
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+
+class Timer:
+    PERIODIC = 1
+    ONE_SHOT = 0
+
+    def __init__(self, timer_id=0):
+        self.callback = None
+
+    def init(self, period=None, freq=None, mode=PERIODIC, callback=None):
+        # Não dispara sozinho: a simulação chama fire() quando quiser
+        self.callback = callback
+
+    def fire(self):
+        if self.callback:
+            self.callback(self)
+
+    def deinit(self):
+        self.callback = None
+
+
+class ADC:
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    WIDTH_9BIT = 0
+    WIDTH_10BIT = 1
+    WIDTH_11BIT = 2
+    WIDTH_12BIT = 3
+
+    # Valor bruto (0-4095) de cada pino; a simulação pode alterar
+    raw_values = {}
+    # Tensão de entrada (µV) de cada pino: a leitura segue a atenuação,
+    # satura no fundo de escala e a 1ª conversão depois de atten() ainda
+    # sai na atenuação anterior (tem precedência sobre raw_values)
+    input_uv = {}
+    FULL_SCALE_UV = (1100000, 1500000, 2200000, 3300000)
+
+    def __init__(self, pin, atten=None):
+        self.pin = pin.number if isinstance(pin, Pin) else pin
+        self._atten = ADC.ATTN_11DB if atten is None else atten
+        self._stale = None
+
+    def atten(self, value):
+        if value != self._atten and self._stale is None:
+            self._stale = self._atten
+        self._atten = value
+
+    def width(self, value):
+        pass
+
+    def read(self):
+        if self.pin in ADC.input_uv:
+            atten = self._atten if self._stale is None else self._stale
+            self._stale = None
+            code = max(0, ADC.input_uv[self.pin]) * 4095 // ADC.FULL_SCALE_UV[atten]
+            return min(4095, code)
+        return ADC.raw_values.get(self.pin, 0)
+
+    def read_u16(self):
+        return self.read() << 4
+
+    def read_uv(self):
+        return self.read() * 3300000 // 4095
+
+
+# --- time / micropython ------------------------------------------------------
+
+def ticks_ms():
+    return int((time.monotonic() - _start) * 1000) & 0x3FFFFFFF
+
+
+def ticks_us():
+    return int((time.monotonic() - _start) * 1000000) & 0x3FFFFFFF
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & 0x3FFFFFFF
+
+
+def ticks_diff(end, start):
+    diff = (end - start) & 0x3FFFFFFF
+    return diff - 0x40000000 if diff & 0x20000000 else diff
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def install(node=None):
+    """Instala os módulos falsos e coloca o firmware no sys.path
+
+    node: 'display', 'voltmeter' ou None (só common/).
+    """
+    _module('bluetooth', BLE=BLE, UUID=UUID,
+            FLAG_BROADCAST=FLAG_BROADCAST, FLAG_READ=FLAG_READ,
+            FLAG_WRITE_NO_RESPONSE=FLAG_WRITE_NO_RESPONSE, FLAG_WRITE=FLAG_WRITE,
+            FLAG_NOTIFY=FLAG_NOTIFY, FLAG_INDICATE=FLAG_INDICATE)
+    _module('machine', Pin=Pin, Timer=Timer, ADC=ADC,
+            freq=lambda *args: 240000000, unique_id=lambda: b'\x02\x00\x00\x00\x00\x01',
+            lightsleep=lambda ms=0: _real_sleep(ms / 1000), reset=lambda: None)
+    _module('micropython', const=lambda value: value, schedule=lambda f, arg: f(arg),
+            alloc_emergency_exception_buf=lambda size: None, mem_info=lambda *args: None)
+    _module('ubinascii', hexlify=binascii.hexlify, unhexlify=binascii.unhexlify)
+
+    time.ticks_ms = ticks_ms
+    time.ticks_us = ticks_us
+    time.ticks_add = ticks_add
+    time.ticks_diff = ticks_diff
+    time.sleep_ms = lambda ms: _real_sleep(ms / 1000)
+    time.sleep_us = lambda us: _real_sleep(us / 1000000)
+
+    import gc
+    if not hasattr(gc, 'mem_free'):
+        gc.mem_free = lambda: 100000
+        gc.mem_alloc = lambda: 20000
+        gc.threshold = lambda *args: -1
+
+    paths = [FIRMWARE_PATHS['common']]
+    if node:
+        paths.append(FIRMWARE_PATHS[node])
+    for path in paths:
+        if path not in sys.path:
+            sys.path.insert(0, path)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Compila os módulos dos nós para bytecode .mpy com mpy-cross
+Gera um pacote por nó (display/voltmeter) em build/<nó>/ e, opcionalmente,
+mede no ESP32 o tempo de import e o heap consumido (fonte .py vs .mpy)
+
+Uso:
+    python3 build_mpy.py [display|voltmeter|all]
+    python3 build_mpy.py voltmeter --measure /dev/ttyUSB1
+    python3 build_mpy.py voltmeter --measure /dev/ttyUSB1 --compare antes.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(ROOT, 'build')
+
+# Arquitetura do ESP32 (Xtensa LX6 com suporte a código nativo)
+MPY_ARCH = 'xtensawin'
+
+# Módulos compartilhados, instalados em /common no ESP32
+COMMON_MODULES = [
+    'common/constants.py',
+    'common/logger.py',
+    'common/metrics.py',
+    'common/memory.py',
+    'common/ble_utils.py',
+]
+
+# Módulos de cada nó, em ordem de dependência (usada na medição de import).
+# Os pontos de entrada (main*.py) continuam como fonte: o MicroPython só
+# executa main.py e os scripts *_fixed são carregados com exec(open(...))
+ROLES = {
+    'display': {
+        'modules': [
+            'display_node/display_constants.py',
+            'display_node/display_controller.py',
+            'display_node/presentation.py',
+            'display_node/ble_server.py',
+            'display_node/ble_server_fixed.py',
+        ],
+        'entry': [
+            'display_node/main.py',
+            'display_node/main_fixed.py',
+        ],
+    },
+    'voltmeter': {
+        'modules': [
+            'voltmeter_node/voltmeter_constants.py',
+            'voltmeter_node/adc_backends.py',
+            'voltmeter_node/adc_reader.py',
+            'voltmeter_node/acquisition.py',
+            'voltmeter_node/sampler_thread.py',
+            'voltmeter_node/square_sums.py',
+            'voltmeter_node/stats.py',
+            'voltmeter_node/trigger.py',
+            'voltmeter_node/ac_meter.py',
+            'voltmeter_node/sampling.py',
+            'voltmeter_node/deadband.py',
+            'voltmeter_node/ble_client.py',
+            'voltmeter_node/ble_voltmeter_server.py',
+            'voltmeter_node/ble_voltmeter_server_fixed.py',
+        ],
+        'entry': [
+            'voltmeter_node/main.py',
+            'voltmeter_node/main_fixed.py',
+        ],
+    },
+}
+
+
+def find_mpy_cross():
+    """Localiza o executável mpy-cross (PATH ou pacote pip mpy-cross)"""
+    exe = shutil.which('mpy-cross')
+    if exe:
+        return [exe]
+    try:
+        import mpy_cross  # noqa: F401
+        return [sys.executable, '-m', 'mpy_cross']
+    except ImportError:
+        return None
+
+
+def device_path(source, compiled):
+    """Caminho do módulo no ESP32 (common/ vai para /common, nós para /)"""
+    name = os.path.basename(source)
+    if compiled:
+        name = name[:-3] + '.mpy'
+    if source.startswith('common/'):
+        return '/common/' + name
+    return '/' + name
+
+
+def role_sources(role):
+    """Lista de módulos compiláveis do nó, em ordem de dependência"""
+    return COMMON_MODULES + ROLES[role]['modules']
+
+
+def compile_module(mpy_cross, source, output):
+    """Compila um módulo e retorna o tempo gasto em ms"""
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    start = time.perf_counter()
+    subprocess.run(
+        mpy_cross + ['-march=' + MPY_ARCH, '-s', os.path.basename(source),
+                     '-o', output, os.path.join(ROOT, source)],
+        check=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def write_manifest(role, out_dir):
+    """Gera manifest.py para congelar os módulos num firmware customizado"""
+    lines = [
+        '# Manifest gerado por build_mpy.py - congela os módulos do nó ' + role,
+        '# Uso: make BOARD=ESP32_GENERIC FROZEN_MANIFEST=' + os.path.join(out_dir, 'manifest.py'),
+        'include("$(PORT_DIR)/boards/manifest.py")',
+    ]
+    for source in role_sources(role):
+        lines.append('module("%s", base_path="%s")' % (
+            os.path.basename(source), os.path.join(ROOT, os.path.dirname(source))))
+    with open(os.path.join(out_dir, 'manifest.py'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def build_role(role, mpy_cross):
+    """Compila todos os módulos de um nó para build/<nó>/"""
+    out_dir = os.path.join(BUILD_DIR, role)
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+
+    print(f"=== Compilando nó {role} ({MPY_ARCH}) ===")
+    report = []
+    for source in role_sources(role):
+        output = os.path.join(out_dir, device_path(source, True).lstrip('/'))
+        try:
+            compile_ms = compile_module(mpy_cross, source, output)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Erro ao compilar {source}: {e}")
+            return None
+        src_size = os.path.getsize(os.path.join(ROOT, source))
+        mpy_size = os.path.getsize(output)
+        report.append({
+            'module': source,
+            'device_path': device_path(source, True),
+            'source_bytes': src_size,
+            'mpy_bytes': mpy_size,
+            'host_compile_ms': round(compile_ms, 1),
+        })
+        print(f"✓ {source:45s} {src_size:6d} B -> {mpy_size:6d} B ({compile_ms:.0f} ms)")
+
+    # Pontos de entrada continuam como fonte
+    for entry in ROLES[role]['entry']:
+        shutil.copy(os.path.join(ROOT, entry), os.path.join(out_dir, os.path.basename(entry)))
+
+    write_manifest(role, out_dir)
+
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    total_src = sum(r['source_bytes'] for r in report)
+    total_mpy = sum(r['mpy_bytes'] for r in report)
+    print(f"Total: {total_src} B de fonte -> {total_mpy} B de bytecode")
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Medição no dispositivo
+# ---------------------------------------------------------------------------
+
+# Executado no ESP32: importa cada módulo em ordem e mede tempo e heap.
+# Os módulos dependentes já encontram as dependências carregadas, então a
+# medida de cada um é incremental (o que aquele módulo acrescenta ao boot).
+PROFILE_CODE = """
+import sys, gc, time
+sys.path.append('/common')
+for name in %r:
+    gc.collect()
+    free = gc.mem_free()
+    t0 = time.ticks_us()
+    __import__(name)
+    dt = time.ticks_diff(time.ticks_us(), t0)
+    gc.collect()
+    print('PROFILE', name, dt, free - gc.mem_free())
+"""
+
+
+def ampy(port, *args):
+    """Executa um comando ampy, ignorando erros de arquivos inexistentes"""
+    return subprocess.run(['ampy', '--port', port] + list(args),
+                          capture_output=True, text=True)
+
+
+def upload_role(port, role, compiled):
+    """Carrega o nó no ESP32 como fonte (.py) ou bytecode (.mpy)"""
+    out_dir = os.path.join(BUILD_DIR, role)
+    ampy(port, 'mkdir', '/common')
+    for source in role_sources(role):
+        # O import do MicroPython prefere .py a .mpy: remove a outra variante
+        ampy(port, 'rm', device_path(source, not compiled))
+        if compiled:
+            local = os.path.join(out_dir, device_path(source, True).lstrip('/'))
+        else:
+            local = os.path.join(ROOT, source)
+        result = ampy(port, 'put', local, device_path(source, compiled))
+        if result.returncode != 0:
+            raise RuntimeError(f"Falha ao carregar {local}: {result.stderr.strip()}")
+
+
+def run_profile(port, modules):
+    """Executa PROFILE_CODE no REPL bruto após soft reset e coleta resultados"""
+    import serial
+
+    ser = serial.Serial(port, 115200, timeout=1)
+    try:
+        ser.write(b'\x03\x03')       # interrompe main.py
+        time.sleep(0.2)
+        ser.write(b'\x01')           # raw REPL
+        time.sleep(0.2)
+        ser.write(b'\x04')           # soft reset dentro do raw REPL
+        time.sleep(1.5)
+        ser.reset_input_buffer()
+        ser.write(b'\x03\x03\x01')   # interrompe um eventual main.py e volta ao raw REPL
+        time.sleep(0.2)
+        ser.reset_input_buffer()
+
+        ser.write((PROFILE_CODE % (modules,)).encode())
+        ser.write(b'\x04')
+
+        results = {}
+        deadline = time.time() + 30
+        buffer = b''
+        while time.time() < deadline:
+            buffer += ser.read(ser.in_waiting or 1)
+            if buffer.count(b'\x04') >= 2:
+                break
+        for line in buffer.decode('utf-8', errors='replace').splitlines():
+            parts = line.strip().split()
+            if len(parts) == 4 and parts[0].endswith('PROFILE'):
+                results[parts[1]] = (int(parts[2]), int(parts[3]))
+        if len(results) != len(modules):
+            print(buffer.decode('utf-8', errors='replace'))
+            raise RuntimeError("Medição incompleta no ESP32")
+        return results
+    finally:
+        ser.write(b'\x02')           # volta ao REPL normal
+        ser.close()
+
+
+def measure_role(port, role):
+    """Compara import de fonte vs .mpy no ESP32 e grava no report.json"""
+    modules = [os.path.basename(s)[:-3] for s in role_sources(role)]
+
+    print(f"\n=== Medindo nó {role} em {port} ===")
+    print("1. Fonte (.py)...")
+    upload_role(port, role, compiled=False)
+    source = run_profile(port, modules)
+    print("2. Bytecode (.mpy)...")
+    upload_role(port, role, compiled=True)
+    compiled = run_profile(port, modules)
+
+    report_path = os.path.join(BUILD_DIR, role, 'report.json')
+    with open(report_path) as f:
+        report = json.load(f)
+
+    print(f"\n{'Módulo':28s} {'py us':>8s} {'mpy us':>8s} {'py B':>7s} {'mpy B':>7s} {'RAM economizada':>16s}")
+    for entry, name in zip(report, modules):
+        py_us, py_ram = source[name]
+        mpy_us, mpy_ram = compiled[name]
+        entry.update({
+            'py_import_us': py_us, 'mpy_import_us': mpy_us,
+            'py_heap_bytes': py_ram, 'mpy_heap_bytes': mpy_ram,
+        })
+        print(f"{name:28s} {py_us:8d} {mpy_us:8d} {py_ram:7d} {mpy_ram:7d} {py_ram - mpy_ram:16d}")
+
+    total_py = sum(e['py_import_us'] for e in report)
+    total_mpy = sum(e['mpy_import_us'] for e in report)
+    ram_py = sum(e['py_heap_bytes'] for e in report)
+    ram_mpy = sum(e['mpy_heap_bytes'] for e in report)
+    print(f"{'TOTAL':28s} {total_py:8d} {total_mpy:8d} {ram_py:7d} {ram_mpy:7d} {ram_py - ram_mpy:16d}")
+
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Relatório salvo em {report_path}")
+    return report
+
+
+def compare_reports(report, baseline_path):
+    """Mostra a variação de tempo de import e heap em relação a um relatório anterior"""
+    with open(baseline_path) as f:
+        baseline = {e['module']: e for e in json.load(f)}
+
+    print(f"\n=== Comparação com {baseline_path} (negativo = melhor) ===")
+    print(f"{'Módulo':45s} {'Δ py us':>9s} {'Δ py B':>8s} {'Δ mpy us':>9s} {'Δ mpy B':>8s}")
+    for entry in report:
+        old = baseline.get(entry['module'])
+        if not old or 'py_import_us' not in old:
+            print(f"{entry['module']:45s} {'(novo)':>9s}")
+            continue
+        print(f"{entry['module']:45s} "
+              f"{entry['py_import_us'] - old['py_import_us']:9d} "
+              f"{entry['py_heap_bytes'] - old['py_heap_bytes']:8d} "
+              f"{entry['mpy_import_us'] - old['mpy_import_us']:9d} "
+              f"{entry['mpy_heap_bytes'] - old['mpy_heap_bytes']:8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila os nós ESP32 para .mpy")
+    parser.add_argument('role', nargs='?', default='all', choices=['all'] + list(ROLES))
+    parser.add_argument('--measure', metavar='PORTA',
+                        help="mede import .py vs .mpy no ESP32 conectado nesta porta")
+    parser.add_argument('--compare', metavar='REPORT',
+                        help="report.json de uma medição anterior para comparar (requer --measure)")
+    args = parser.parse_args()
+
+    mpy_cross = find_mpy_cross()
+    if not mpy_cross:
+        print("❌ mpy-cross não encontrado. Instale com: pip install mpy-cross")
+        print("   (a versão deve corresponder ao firmware MicroPython do ESP32)")
+        return 1
+
+    roles = list(ROLES) if args.role == 'all' else [args.role]
+    for role in roles:
+        if build_role(role, mpy_cross) is None:
+            return 1
+
+    if args.measure:
+        if len(roles) != 1:
+            print("❌ --measure requer um único nó (display ou voltmeter)")
+            return 1
+        report = measure_role(args.measure, roles[0])
+        if args.compare:
+            compare_reports(report, args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Captura com pré-disparo do voltímetro pelo BLE (voltmeter_node/trigger.py)
+Configura as condições de disparo, arma o nó, espera a captura congelar e
+recebe os blocos da característica CAPTURE; blocos perdidos são pedidos de
+novo com CAPTURE_SEND:<bloco>. Grava um CSV com o tempo em relação ao
+disparo e a tensão de cada canal:
+
+    python3 capture_client.py AA:BB:CC:DD:EE:FF --trigger 1,falling,3000
+    python3 capture_client.py AA:BB:CC:DD:EE:FF --trigger 2,outside,1600,1700 --pre 256 --post 768
+    python3 capture_client.py AA:BB:CC:DD:EE:FF --trigger 1,rising,1000,5 --out borda.csv
+
+--trigger <canal>,<tipo>[,<mV>[,<mV>]] pode se repetir (OU entre os canais);
+tipos: above, below, rising, falling (2º valor: histerese), outside, inside
+(janela). Para a taxa cheia o nó precisa de ADC_CONTINUOUS_HZ. Os blocos
+seguem o MTU negociado pela conexão (o bleak negocia sozinho); com menos de
+CAPTURE_MIN_MTU o nó não envia a captura.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'common'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'voltmeter_node'))
+from trigger import decode_capture, CAPTURE_MIN_MTU  # noqa: E402
+
+COMMAND_CHAR_UUID = "11111111-1111-1111-1111-111111111111"
+CAPTURE_CHAR_UUID = "11111111-1111-1111-1111-111111111115"
+
+
+def chunk_header(data):
+    """(captura, bloco, blocos) do cabeçalho de um bloco"""
+    return data[1], int.from_bytes(data[2:4], 'little'), int.from_bytes(data[4:6], 'little')
+
+
+def write_csv(path, capture):
+    period_ms = capture['period_us'] / 1000
+    with open(path, 'w') as f:
+        f.write("t_ms," + ",".join(f"canal{c + 1}_mV" for c in range(capture['channels'])) + "\n")
+        for k, sample in enumerate(capture['samples']):
+            t = (k - capture['pre']) * period_ms
+            f.write(f"{t:.3f}," + ",".join(f"{uv / 1000:.3f}" for uv in sample) + "\n")
+
+
+async def capture(address, triggers, pre, post, timeout):
+    from bleak import BleakClient
+
+    chunks = {}
+    done = asyncio.Event()
+    state = {'capture': None, 'count': None}
+
+    def on_chunk(_, data):
+        sequence, index, count = chunk_header(data)
+        if state['capture'] != sequence:
+            # Primeira captura (ou uma nova depois de TRIGGER_REARM): recomeça
+            chunks.clear()
+            state['capture'], state['count'] = sequence, count
+        chunks[index] = bytes(data)
+        if len(chunks) == count:
+            done.set()
+
+    async def command(text):
+        await client.write_gatt_char(COMMAND_CHAR_UUID, text.encode(), response=True)
+        return (await client.read_gatt_char(COMMAND_CHAR_UUID)).decode(errors='replace')
+
+    async with BleakClient(address, timeout=20.0) as client:
+        if client.mtu_size < CAPTURE_MIN_MTU:
+            raise RuntimeError(f"MTU {client.mtu_size} não comporta os blocos da captura "
+                               f"(mínimo {CAPTURE_MIN_MTU})")
+        await client.start_notify(CAPTURE_CHAR_UUID, on_chunk)
+        for trigger in triggers:
+            print(await command(f"TRIG:{trigger}"))
+        reply = await command(f"ARM:{pre},{post}")
+        print(reply)
+        if not reply.startswith("TRIG:ARMED"):
+            raise RuntimeError(f"nó não armou: {reply}")
+        print(f"Armado; esperando o disparo (até {timeout:.0f} s)...")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not done.is_set():
+            try:
+                await asyncio.wait_for(done.wait(), timeout=2.0)
+            except asyncio.TimeoutError:
+                if loop.time() > deadline:
+                    raise RuntimeError(f"sem captura completa em {timeout:.0f} s "
+                                       f"({len(chunks)}/{state['count'] or '?'} blocos)")
+                if state['count'] is not None:
+                    # Transferência parada com blocos faltando: pede a partir do 1º
+                    missing = min(index for index in range(state['count']) if index not in chunks)
+                    print(f"⚠️  {state['count'] - len(chunks)} blocos faltando; reenviando a partir do {missing}")
+                    await command(f"CAPTURE_SEND:{missing}")
+        await client.stop_notify(CAPTURE_CHAR_UUID)
+    return decode_capture(chunks.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Captura com pré-disparo do voltímetro via BLE")
+    parser.add_argument('address', help="Endereço BLE do voltímetro")
+    parser.add_argument('--trigger', action='append', required=True,
+                        help="<canal>,<tipo>[,<mV>[,<mV>]] (pode repetir)")
+    parser.add_argument('--pre', type=int, default=64, help="varreduras antes do disparo")
+    parser.add_argument('--post', type=int, default=192, help="varreduras a partir do disparo")
+    parser.add_argument('--timeout', type=float, default=60.0, help="espera máxima pelo disparo (s)")
+    parser.add_argument('--out', default='captura.csv', help="arquivo CSV de saída")
+    args = parser.parse_args()
+
+    try:
+        result = asyncio.run(capture(args.address, args.trigger, args.pre, args.post, args.timeout))
+    except KeyboardInterrupt:
+        print("\nCaptura cancelada.")
+        return 1
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+    write_csv(args.out, result)
+    print(f"✓ Captura {result['capture']}: {result['trigger']} no canal {result['trigger_channel'] + 1} "
+          f"({result['trigger_uv'] / 1000:.3f} mV), {result['pre']} + {result['post']} varreduras a "
+          f"{result['period_us']} µs -> {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Simula os nós com N canais/displays (N = 1, 3, 8, 16 por padrão)
+Para cada N monta o voltímetro (ADCReader com N pinos) e o display
+(DisplayController com N displays + VoltagePresenter) sobre o ble_sim e
+mede:
+
+    varredura   read_all_uv + pack_voltage_uv por amostra (µs) e tamanho do
+                frame; acima de 20 bytes o frame pede MTU maior que o padrão
+    display     tick do timer de multiplexação, vezes/s que cada dígito
+                acende, ciclo ativo de cada dígito e o callback medido contra
+                o orçamento (período do tick)
+    frame       unpack_voltage_uv + receive_uv + refresh por frame recebido
+
+Também confere o caminho do bitmap: os N canais chegam aos N displays e um
+frame parcial (CHANNEL_BASE > 0, como de um segundo voltímetro) só muda os
+seus canais. Código de saída 1 se algo não conferir.
+
+    python3 channels_sim.py
+    python3 channels_sim.py --channels 2 4 6 -n 20000
+
+Os tempos são do CPython: servem para comparar os N entre si, não para
+prever o ESP32 (lá o callback leva dezenas de µs).
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from array import array
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+sys.path.insert(0, ble_sim.FIRMWARE_PATHS['display'])
+
+from adc_reader import ADCReader  # noqa: E402
+from ble_utils import BLEUtils  # noqa: E402
+from constants import MAX_CHANNELS  # noqa: E402
+from display_controller import DisplayController  # noqa: E402
+from presentation import VoltagePresenter  # noqa: E402
+
+DEFAULT_MTU_PAYLOAD = 20    # ATT_MTU 23 - 3 bytes de cabeçalho
+FIRST_ADC_PIN = 100         # pinos fictícios: o ble_sim aceita qualquer número
+FIRST_DIGIT_PIN = 200
+
+
+def _per_call_us(step, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        step()
+    return (time.perf_counter() - start) * 1000000 / calls
+
+
+def _quiet(factory, *args, **kwargs):
+    """Constrói sem os prints de inicialização de cada canal/display"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return factory(*args, **kwargs)
+
+
+def scan(channels, calls):
+    """Varredura do voltímetro: (µs por amostra, bytes do frame)"""
+    pins = tuple(range(FIRST_ADC_PIN, FIRST_ADC_PIN + channels))
+    for i, pin in enumerate(pins):
+        ble_sim.ADC.raw_values[pin] = (i * 523 + 100) % 4096
+    reader = _quiet(ADCReader, pins)
+    microvolts = array('i', [0] * channels)
+    frame = bytearray(BLEUtils.voltage_frame_size(channels))
+
+    def step():
+        BLEUtils.pack_voltage_uv(frame, reader.read_all_uv(microvolts), channels)
+
+    return _per_call_us(step, calls), len(frame)
+
+
+def display(channels, calls):
+    """Display: (controlador, apresentador, µs do callback, µs por frame)"""
+    digit_pins = tuple(tuple(range(FIRST_DIGIT_PIN + 4 * i, FIRST_DIGIT_PIN + 4 * i + 4))
+                       for i in range(channels))
+    controller = _quiet(DisplayController, digit_pins)
+    presenter = VoltagePresenter(controller, refresh_ms=0)
+    controller.display_voltages([1.234] * channels)
+    callback_us = _per_call_us(controller.multiplex_timer.fire, calls)
+
+    microvolts = array('i', [0] * channels)
+    frames = []
+    for k in range(16):
+        for i in range(channels):
+            microvolts[i] = (i + 1) * 100000 + k * 7000
+        frames.append(bytes(BLEUtils.pack_voltage_uv(bytearray(BLEUtils.voltage_frame_size(channels)),
+                                                     microvolts, channels)))
+    rx = array('i', [0] * max(3, channels))
+    state = {'k': 0, 'now': 0}
+
+    def step():
+        state['k'] = (state['k'] + 1) & 15
+        state['now'] += 1
+        presenter.receive_uv(rx, BLEUtils.unpack_voltage_uv(frames[state['k']], rx))
+        presenter.refresh(state['now'])
+
+    frame_us = _per_call_us(step, max(1, calls // 4))
+    return controller, presenter, callback_us, frame_us
+
+
+def check(controller, presenter, channels):
+    """Confere o bitmap de ponta a ponta; retorna a lista de problemas"""
+    problems = []
+    presenter.reset()
+    microvolts = array('i', [(i + 1) * 250000 for i in range(channels)])
+    frame = BLEUtils.pack_voltage_uv(bytearray(BLEUtils.voltage_frame_size(channels)), microvolts, channels)
+    rx = array('i', [0] * max(3, channels))
+    presenter.receive_uv(rx, BLEUtils.unpack_voltage_uv(frame, rx))
+    presenter.refresh(10 ** 6)
+    shown = controller.get_current_values()
+    for i in range(channels):
+        expected = (i + 1) * 250
+        if abs(float(shown[i]) * 1000 - expected) > 1:
+            problems.append(f"canal {i + 1}: exibe {shown[i]!r}, esperado {expected} mV")
+
+    if channels >= 3:
+        # Frame de um canal com CHANNEL_BASE = 2: só o display 3 muda
+        before = controller.get_current_values()
+        partial = BLEUtils.pack_voltage_uv(bytearray(BLEUtils.voltage_frame_size(1)),
+                                           array('i', [4321000]), 1, 2)
+        bitmap = BLEUtils.unpack_voltage_uv(partial, rx)
+        if bitmap != 1 << 2:
+            problems.append(f"bitmap do frame parcial: {bitmap:#06x}")
+        presenter.receive_uv(rx, bitmap)
+        presenter.refresh(2 * 10 ** 6)
+        after = controller.get_current_values()
+        changed = [i for i in range(channels) if after[i] != before[i]]
+        if changed != [2] or after[2] != '4.321':
+            problems.append(f"frame parcial mudou os displays {changed} ({after[2]!r})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura e multiplexação com N canais (ble_sim)")
+    parser.add_argument('--channels', type=int, nargs='+', default=[1, 3, 8, 16])
+    parser.add_argument('-n', '--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    problems = []
+    print(f"{'N':>3} {'varredura':>11} {'frame':>6} {'MTU':>8} {'tick':>8} {'dígito':>8} "
+          f"{'ciclo':>6} {'callback':>14} {'frame rx':>9}")
+    for channels in args.channels:
+        if not 1 <= channels <= MAX_CHANNELS:
+            problems.append(f"N={channels}: fora de 1..{MAX_CHANNELS}")
+            continue
+        scan_us, frame_bytes = scan(channels, args.calls)
+        controller, presenter, callback_us, frame_us = display(channels, args.calls)
+        mtu = 'padrão' if frame_bytes <= DEFAULT_MTU_PAYLOAD else f"mtu={frame_bytes + 3}"
+        digit_hz = controller.multiplex_tick_hz / (4 * channels)
+        budget_us = controller.multiplex_period_us
+        print(f"{channels:3d} {scan_us:8.1f} µs {frame_bytes:4d} B {mtu:>8} "
+              f"{controller.multiplex_tick_hz:5d} Hz {digit_hz:5.0f} Hz {100 / (4 * channels):5.1f}% "
+              f"{callback_us:5.1f}/{budget_us:4d} µs {frame_us:6.1f} µs")
+        problems.extend(f"N={channels}: {problem}" for problem in check(controller, presenter, channels))
+        controller.stop_multiplexing()
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✓ Bitmap de canais conferido de ponta a ponta")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
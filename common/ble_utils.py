@@ -1,31 +1,10 @@
-try:
-    import bluetooth
-except ImportError:
-    # Para ambiente de desenvolvimento
-    pass
-
 import time
 import struct
+from constants import VOLTAGE_FRAME_UV, VOLTAGE_FRAME_HEADER
 
-# Constantes IRQ para BLE - valores do MicroPython
-_IRQ_CENTRAL_CONNECT = 1
-_IRQ_CENTRAL_DISCONNECT = 2
-_IRQ_GATTS_WRITE = 3
-_IRQ_GATTS_READ_REQUEST = 4
-_IRQ_SCAN_RESULT = 5
-_IRQ_SCAN_DONE = 6
-_IRQ_PERIPHERAL_CONNECT = 7
-_IRQ_PERIPHERAL_DISCONNECT = 8
-_IRQ_GATTC_SERVICE_RESULT = 9
-_IRQ_GATTC_SERVICE_DONE = 10
-_IRQ_GATTC_CHARACTERISTIC_RESULT = 11
-_IRQ_GATTC_CHARACTERISTIC_DONE = 12
-_IRQ_GATTC_DESCRIPTOR_RESULT = 13
-_IRQ_GATTC_DESCRIPTOR_DONE = 14
-_IRQ_GATTC_READ_RESULT = 15
-_IRQ_GATTC_READ_DONE = 16
-_IRQ_GATTC_WRITE_DONE = 17
-_IRQ_GATTC_NOTIFY = 18
+# As constantes de eventos IRQ do BLE (_IRQ_CENTRAL_CONNECT = const(1), ...)
+# são declaradas com const() em cada módulo que as usa: assim o compilador
+# embute o valor no bytecode, sem ocupar o dicionário global do módulo.
 
 class BLEUtils:
     @staticmethod
@@ -34,10 +13,74 @@ class BLEUtils:
         # Formato: 3 floats de 32 bits cada
         return struct.pack('<fff', voltages[0], voltages[1], voltages[2])
     
+    @staticmethod
+    def pack_voltage_data(buffer, voltages):
+        """Codifica dados de tensão num buffer pré-alocado de 12 bytes"""
+        struct.pack_into('<fff', buffer, 0, voltages[0], voltages[1], voltages[2])
+        return buffer
+    
+    @staticmethod
+    def voltage_frame_size(count):
+        """Tamanho (bytes) do frame inteiro com count canais"""
+        return VOLTAGE_FRAME_HEADER + 4 * count
+    
+    @staticmethod
+    def pack_voltage_uv(buffer, microvolts, count=3, base=0):
+        """Frame inteiro dos canais base..base+count-1 do painel; não aloca
+        
+        buffer tem voltage_frame_size(count) bytes; microvolts[i] é o canal
+        base + i.
+        """
+        struct.pack_into('<BH', buffer, 0, VOLTAGE_FRAME_UV, ((1 << count) - 1) << base)
+        offset = VOLTAGE_FRAME_HEADER
+        for i in range(count):
+            struct.pack_into('<i', buffer, offset, microvolts[i])
+            offset += 4
+        return buffer
+    
+    @staticmethod
+    def unpack_voltage_uv(data, out):
+        """Lê um frame inteiro em out (array('i'), índice = canal do painel)
+        
+        Retorna o bitmap de canais do frame, ou 0 se não for um frame inteiro
+        válido; canais além de len(out) são ignorados. Monta cada int32 byte
+        a byte, sem struct: o byte alto com sinal mantém o valor como
+        inteiro pequeno (não aloca na IRQ).
+        """
+        size = len(data)
+        if size < VOLTAGE_FRAME_HEADER or data[0] != VOLTAGE_FRAME_UV:
+            return 0
+        bitmap = data[1] | (data[2] << 8)
+        count = 0
+        mask = bitmap
+        while mask:
+            count += mask & 1
+            mask >>= 1
+        if size != VOLTAGE_FRAME_HEADER + 4 * count:
+            return 0
+        limit = len(out)
+        offset = VOLTAGE_FRAME_HEADER
+        channel = 0
+        mask = bitmap
+        while mask:
+            if mask & 1:
+                if channel < limit:
+                    high = data[offset + 3]
+                    if high & 0x80:
+                        high -= 256
+                    out[channel] = (high << 24) | (data[offset + 2] << 16) | (data[offset + 1] << 8) | data[offset]
+                offset += 4
+            mask >>= 1
+            channel += 1
+        return bitmap
+    
     @staticmethod
     def decode_voltage_data(data):
-        """Decodifica dados de tensão recebidos via BLE"""
+        """Decodifica dados de tensão recebidos via BLE (V, na ordem dos canais do frame)"""
         try:
+            if len(data) != 12 and data[0] == VOLTAGE_FRAME_UV:
+                count = (len(data) - VOLTAGE_FRAME_HEADER) // 4
+                return tuple(v / 1000000 for v in struct.unpack_from('<%di' % count, data, VOLTAGE_FRAME_HEADER))
             return struct.unpack('<fff', data)
         except:
             return (0.0, 0.0, 0.0)
@@ -91,9 +134,41 @@ class BLEUtils:
         
         if appearance:
             _append(0x19, struct.pack("<h", appearance))
-        
+
         return payload
 
+    @staticmethod
+    def adv_match(adv_data, ad_types, pattern):
+        """Procura pattern nos campos AD brutos sem alocar (seguro na IRQ)
+
+        ad_types: tupla com os tipos aceitos. O campo casa se o conteúdo for
+        igual a pattern ou, em listas de UUIDs, se algum item for igual.
+        Compara byte a byte: nenhum slice, decode ou objeto temporário.
+        """
+        n = len(adv_data)
+        size = len(pattern)
+        i = 0
+        while i + 1 < n:
+            length = adv_data[i]
+            if length == 0 or i + 1 + length > n:
+                break
+            field = length - 1
+            if field and field % size == 0 and adv_data[i + 1] in ad_types:
+                start = i + 2
+                while start < i + 1 + length:
+                    j = 0
+                    while j < size and adv_data[start + j] == pattern[j]:
+                        j += 1
+                    if j == size:
+                        return True
+                    start += size
+            i += 1 + length
+        return False
+
 def print_debug(message):
-    """Função para debug com timestamp"""
-    print(f"[{time.time()}] {message}")
+    """Mensagem de texto com timestamp (inicialização e erros)
+    
+    Eventos frequentes (notificações, frames recebidos, IRQs) usam
+    logger.log.log(), que grava registros binários sem formatar texto.
+    """
+    print("[%d] %s" % (time.ticks_ms(), message))
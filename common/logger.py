@@ -0,0 +1,144 @@
+"""
+Log estruturado dos nós ESP32
+Cada evento vira um registro binário de 20 bytes num anel pré-alocado:
+nada de f-strings nem print() no caminho quente. O texto de cada mensagem
+fica no host (log_decoder.py), que decodifica o anel drenado pela serial
+(logger.log.dump()) ou pela característica BLE de log.
+
+Formato do registro (little-endian, 20 bytes = uma notificação BLE com MTU padrão):
+    ticks_ms u32 | nível u8 | msg_id u8 | seq u16 | a i32 | b i32 | c i32
+"""
+
+import time
+import struct
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+# Níveis de log
+DEBUG = const(10)
+INFO = const(20)
+WARNING = const(30)
+ERROR = const(40)
+
+# Identificadores de mensagem (texto correspondente em log_decoder.MESSAGES)
+MSG_VOLTAGE_RX = const(1)       # display: tensões recebidas (mV, mV, mV)
+MSG_VOLTAGE_SHOWN = const(2)    # display: tensões exibidas (mV, mV, mV)
+MSG_VOLTAGE_ERROR = const(3)    # display: falha ao exibir/decodificar (tamanho do frame)
+MSG_NOTIFY_SENT = const(4)      # voltímetro: notificação enviada (mV, mV, mV)
+MSG_NOTIFY_FAIL = const(5)      # notificação falhou (conn_handle)
+MSG_CONNECT = const(6)          # central conectou (conn_handle, total)
+MSG_DISCONNECT = const(7)       # central desconectou (conn_handle, total)
+MSG_IRQ = const(8)              # evento IRQ BLE (evento, total desse evento)
+MSG_COMMAND = const(9)          # comando recebido (tamanho)
+MSG_COMMAND_UNKNOWN = const(10) # comando desconhecido (tamanho)
+MSG_WRITE_DONE = const(11)      # cliente: escrita GATT concluída (status)
+MSG_SCAN_MATCH = const(12)      # cliente: display encontrado no scan (rssi)
+MSG_SEND_FAIL = const(13)       # cliente: falha ao enviar tensões
+MSG_RECONNECT = const(14)       # cliente: conexão restaurada (ms, cache usado, tentativas)
+MSG_COUNT = const(32)
+
+RECORD_SIZE = const(20)
+RECORD_FORMAT = '<IBBHiii'
+LOG_CAPACITY = const(128)       # registros no anel (2560 bytes)
+
+
+class RingLogger:
+    """Anel de registros binários com nível e limitação de taxa por mensagem"""
+
+    def __init__(self, capacity=LOG_CAPACITY):
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * RECORD_SIZE)
+        self.head = 0          # total de registros escritos
+        self.tail = 0          # total de registros já drenados
+        self.overwritten = 0   # registros perdidos por anel cheio
+        self.level = DEBUG     # nível mínimo gravado no anel
+        self.console_level = INFO  # nível mínimo ecoado na serial
+
+        # Limitação de taxa por ponto de chamada (um msg_id por ponto)
+        self.min_interval_ms = array('H', [0] * MSG_COUNT)
+        self.last_ticks = array('I', [0] * MSG_COUNT)
+        self.suppressed = array('H', [0] * MSG_COUNT)
+
+    def set_rate_limit(self, msg_id, interval_ms):
+        """Grava no máximo um registro de msg_id a cada interval_ms"""
+        self.min_interval_ms[msg_id] = interval_ms
+
+    def log(self, level, msg_id, a=0, b=0, c=0):
+        """Grava um evento no anel (sem alocação no caminho normal)"""
+        if level < self.level:
+            return
+        now = time.ticks_ms()
+        interval = self.min_interval_ms[msg_id]
+        if interval and time.ticks_diff(now, self.last_ticks[msg_id]) < interval:
+            if self.suppressed[msg_id] < 0xFFFF:
+                self.suppressed[msg_id] += 1
+            return
+        self.last_ticks[msg_id] = now
+
+        offset = (self.head % self.capacity) * RECORD_SIZE
+        struct.pack_into(RECORD_FORMAT, self.buffer, offset,
+                         now, level, msg_id, self.head & 0xFFFF, a, b, c)
+        self.head += 1
+        if self.head - self.tail > self.capacity:
+            self.overwritten += self.head - self.tail - self.capacity
+            self.tail = self.head - self.capacity
+
+        if level >= self.console_level:
+            # Eco compacto; o texto é reconstruído pelo log_decoder.py
+            print('LOG', now, level, msg_id, a, b, c)
+
+    def pending(self):
+        """Número de registros ainda não drenados"""
+        return self.head - self.tail
+
+    def peek_record(self):
+        """Retorna o próximo registro não drenado (memoryview) sem consumi-lo"""
+        if self.head == self.tail:
+            return None
+        offset = (self.tail % self.capacity) * RECORD_SIZE
+        return memoryview(self.buffer)[offset:offset + RECORD_SIZE]
+
+    def read_record(self):
+        """Retorna e consome o próximo registro não drenado, ou None"""
+        record = self.peek_record()
+        if record is not None:
+            self.tail += 1
+        return record
+
+    def drain(self, send):
+        """Entrega os registros pendentes a send(record) até esvaziar o anel
+        
+        Se send levantar exceção (ex: fila de notificações BLE cheia), o
+        registro continua pendente para a próxima drenagem.
+        """
+        sent = 0
+        record = self.peek_record()
+        while record is not None:
+            try:
+                send(record)
+            except Exception:
+                break
+            self.tail += 1
+            sent += 1
+            record = self.peek_record()
+        return sent
+
+    def dump(self):
+        """Drena o anel na serial como linhas 'LOG:<hex>' para o log_decoder.py"""
+        import ubinascii
+        print('LOGDUMP', self.pending(), self.overwritten)
+        record = self.read_record()
+        while record is not None:
+            print('LOG:' + ubinascii.hexlify(record).decode())
+            record = self.read_record()
+        print('LOGEND')
+
+
+# Instância única compartilhada pelos módulos do nó
+log = RingLogger()
@@ -0,0 +1,106 @@
+"""
+Gerência de memória dos nós ESP32
+Substitui os gc.collect() periódicos por coletas em janelas ociosas conhecidas:
+logo após uma rajada de notificações ou no loop principal sem atividade BLE
+recente, nunca dentro de um evento IRQ. gc.threshold() fica como rede de
+segurança para o caso de o loop não abrir janela a tempo.
+
+Buffers de vida longa são pré-alocados em init(), logo após uma coleta
+completa, para ficarem juntos no início do heap e não fragmentá-lo.
+Cada pausa de coleta entra no histograma gc_pause_us (common/metrics.py),
+e o heap livre logo após a coleta no gauge heap_after_gc.
+"""
+
+import gc
+import time
+from metrics import metrics
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+QUIET_MS = const(20)               # silêncio BLE mínimo antes de coletar
+MAX_INTERVAL_MS = const(30000)     # coleta ao menos a cada 30 s
+SOFT_LIMIT_DIVISOR = const(8)      # coleta em janela após free/8 bytes alocados
+HARD_LIMIT_DIVISOR = const(4)      # gc.threshold: coleta forçada após free/4
+
+
+class MemoryManager:
+    """Coletas agendadas em janelas ociosas e buffers pré-alocados"""
+
+    def __init__(self):
+        self.buffers = {}
+        self.pending_sizes = {}
+        self.soft_limit = 0
+        self.alloc_after_gc = 0
+        self.last_collect = time.ticks_ms()
+        self.last_activity = self.last_collect
+        self.initialized = False
+
+    def reserve(self, name, size):
+        """Registra um buffer de vida longa (alocado em init())"""
+        if self.initialized:
+            return self.buffer(name, size)
+        self.pending_sizes[name] = size
+        return None
+
+    def buffer(self, name, size=0):
+        """Retorna o buffer pré-alocado name (aloca na hora se não existir)"""
+        buf = self.buffers.get(name)
+        if buf is None:
+            buf = bytearray(size or self.pending_sizes.get(name, 0))
+            self.buffers[name] = buf
+        return buf
+
+    def init(self):
+        """Coleta completa, pré-alocação dos buffers e ajuste do gc.threshold"""
+        gc.collect()
+        for name, size in self.pending_sizes.items():
+            self.buffers[name] = bytearray(size)
+        self.pending_sizes = {}
+        self.collect()
+
+        free = gc.mem_free()
+        self.soft_limit = free // SOFT_LIMIT_DIVISOR
+        gc.threshold(free // HARD_LIMIT_DIVISOR)
+        self.initialized = True
+
+    def activity(self):
+        """Marca atividade BLE (chamado pelos handlers IRQ); adia a coleta"""
+        self.last_activity = time.ticks_ms()
+
+    def collect(self):
+        """Coleta imediata, registrada no histograma de pausas"""
+        metrics.collect()
+        self.alloc_after_gc = gc.mem_alloc()
+        self.last_collect = time.ticks_ms()
+
+    def due(self, now):
+        """Há coleta pendente (alocação acumulada ou intervalo máximo)?"""
+        if gc.mem_alloc() - self.alloc_after_gc >= self.soft_limit:
+            return True
+        return time.ticks_diff(now, self.last_collect) >= MAX_INTERVAL_MS
+
+    def idle_window(self):
+        """Janela ociosa: coleta se houver coleta pendente e o BLE estiver quieto"""
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.last_activity) < QUIET_MS:
+            return False
+        if not self.due(now):
+            return False
+        self.collect()
+        return True
+
+    def after_burst(self):
+        """Chamado logo após uma rajada de notificações: o rádio acabou de esvaziar"""
+        if self.initialized and self.due(time.ticks_ms()):
+            self.collect()
+            return True
+        return False
+
+
+# Instância única compartilhada pelos módulos do nó
+memory = MemoryManager()
@@ -0,0 +1,201 @@
+"""
+Registro de métricas dos nós ESP32
+Contadores, gauges e histogramas em arrays pré-alocados; snapshot() empacota
+tudo num único blob binário publicado na característica BLE de diagnóstico
+e decodificado no host por metrics_dashboard.py.
+
+Formato do blob (little-endian):
+    versão u8 | nº contadores u8 | nº gauges u8 | nº histogramas u8 | uptime_ms u32
+    contadores u32 x N | gauges i32 x N | eventos IRQ u32 x IRQ_SLOTS
+    por histograma: buckets u32 x HIST_BUCKETS | máximo u32
+"""
+
+import time
+import struct
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+BLOB_VERSION = const(1)
+
+# Contadores (u32, só crescem)
+C_SAMPLES = const(0)        # leituras de todos os canais ADC
+C_NOTIFY_SENT = const(1)    # notificações/escritas BLE enviadas
+C_NOTIFY_FAIL = const(2)    # notificações/escritas BLE com erro
+C_FRAMES_RX = const(3)      # frames de tensão recebidos (display)
+C_MUX_TICKS = const(4)      # execuções do callback de multiplexação
+C_MUX_OVERRUNS = const(5)   # callbacks que excederam o período
+C_CONNECTS = const(6)       # conexões BLE estabelecidas
+C_RECONNECTS = const(7)     # conexões após uma desconexão
+C_GC_RUNS = const(8)        # coletas de lixo executadas
+C_NOTIFY_SUPPRESSED = const(9)  # amostras não enviadas (dentro da faixa morta)
+C_SLEEP_MS = const(10)      # milissegundos em machine.lightsleep
+C_FRAMES_SENT = const(11)   # frames de tensão que passaram a faixa morta
+C_REDRAWS = const(12)       # redesenhos do pipeline de apresentação (display)
+C_ACQ_BLOCKS = const(13)    # blocos entregues pela aquisição contínua
+C_ACQ_OVERRUNS = const(14)  # blocos descartados (consumidor atrasado)
+C_RING_DROPS = const(15)    # amostras do thread de amostragem descartadas (anel cheio)
+C_RANGE_SWITCHES = const(16)  # trocas de faixa (atenuação) do auto-ranging
+C_TRIGGERS = const(17)      # capturas com pré-disparo concluídas
+COUNTER_COUNT = const(18)
+COUNTER_NAMES = ('samples', 'notify_sent', 'notify_fail', 'frames_rx',
+                 'mux_ticks', 'mux_overruns', 'connects', 'reconnects', 'gc_runs',
+                 'notify_suppressed', 'sleep_ms', 'frames_sent', 'redraws',
+                 'acq_blocks', 'acq_overruns', 'ring_drops', 'range_switches',
+                 'triggers')
+
+# Gauges (i32, último valor)
+G_HEAP_FREE = const(0)      # gc.mem_free()
+G_HEAP_AFTER_GC = const(1)  # gc.mem_free() logo após a última coleta (teto do maior bloco)
+G_CONNECTIONS = const(2)    # conexões ativas
+G_SAMPLE_INTERVAL = const(3)  # intervalo atual de amostragem (ms)
+GAUGE_COUNT = const(4)
+GAUGE_NAMES = ('heap_free', 'heap_after_gc', 'connections', 'sample_interval_ms')
+
+# Histogramas de durações em microssegundos
+H_GC_PAUSE = const(0)       # pausa de gc.collect()
+H_MUX_CALLBACK = const(1)   # duração do callback de multiplexação
+H_ACQ_LATE = const(2)       # atraso de cada tick da aquisição contínua além do período
+H_SAMPLER_LATE = const(3)   # atraso de cada amostra do thread de amostragem além do prazo
+H_RANGE_SETTLE = const(4)   # custo de cada troca de faixa (descarte + nova conversão)
+HIST_COUNT = const(5)
+HIST_NAMES = ('gc_pause_us', 'mux_callback_us', 'acq_late_us', 'sampler_late_us',
+              'range_settle_us')
+# Limite superior (exclusivo) de cada bucket; o último bucket é aberto
+HIST_BOUNDS_US = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+HIST_BUCKETS = const(10)
+
+# Eventos IRQ BLE por código (_IRQ_CENTRAL_CONNECT=1 ... _IRQ_GATTC_NOTIFY=18)
+IRQ_SLOTS = const(20)
+
+HEADER_FORMAT = '<BBBBI'
+BLOB_SIZE = (8 + 4 * (COUNTER_COUNT + GAUGE_COUNT + IRQ_SLOTS)
+             + 4 * (HIST_BUCKETS + 1) * HIST_COUNT)
+
+
+class Metrics:
+    """Métricas de tamanho fixo; nenhuma operação de registro aloca memória"""
+
+    def __init__(self):
+        self.counters = array('I', [0] * COUNTER_COUNT)
+        self.gauges = array('i', [0] * GAUGE_COUNT)
+        self.irq_events = array('I', [0] * IRQ_SLOTS)
+        self.histograms = array('I', [0] * (HIST_BUCKETS * HIST_COUNT))
+        self.hist_max = array('I', [0] * HIST_COUNT)
+        self.blob = bytearray(BLOB_SIZE)
+        # No host (metrics_dashboard.py) só decode_blob é usado: não há ticks_ms
+        self.start_ticks = time.ticks_ms() if hasattr(time, 'ticks_ms') else 0
+
+    def inc(self, counter, amount=1):
+        """Incrementa um contador"""
+        self.counters[counter] = (self.counters[counter] + amount) & 0xFFFFFFFF
+
+    def set_gauge(self, gauge, value):
+        """Atualiza um gauge"""
+        self.gauges[gauge] = value
+
+    def irq(self, event):
+        """Conta um evento IRQ BLE pelo código"""
+        if 0 <= event < IRQ_SLOTS:
+            self.irq_events[event] += 1
+
+    def observe(self, hist, value_us):
+        """Registra uma duração (us) num histograma"""
+        bucket = 0
+        for bound in HIST_BOUNDS_US:
+            if value_us < bound:
+                break
+            bucket += 1
+        self.histograms[hist * HIST_BUCKETS + bucket] += 1
+        if value_us > self.hist_max[hist]:
+            self.hist_max[hist] = value_us
+
+    def connected(self):
+        """Registra uma conexão BLE (reconexão se já houve desconexão antes)"""
+        # irq_events[2]/[8]: _IRQ_CENTRAL_DISCONNECT / _IRQ_PERIPHERAL_DISCONNECT
+        if self.counters[C_CONNECTS] and self.irq_events[2] + self.irq_events[8]:
+            self.inc(C_RECONNECTS)
+        self.inc(C_CONNECTS)
+
+    def collect(self):
+        """gc.collect() cronometrado no histograma de pausas de GC
+
+        O heap livre logo depois vai para heap_after_gc. O MicroPython não
+        informa o maior bloco livre, e sondá-lo alocando força uma coleta a
+        cada alocação que falha; o heap livre após a coleta é o teto dele,
+        sem custo.
+        """
+        import gc
+        start = time.ticks_us()
+        gc.collect()
+        self.observe(H_GC_PAUSE, time.ticks_diff(time.ticks_us(), start))
+        self.inc(C_GC_RUNS)
+        self.gauges[G_HEAP_AFTER_GC] = gc.mem_free()
+
+    def update_heap(self):
+        """Atualiza o gauge de heap livre (barato)"""
+        import gc
+        self.gauges[G_HEAP_FREE] = gc.mem_free()
+
+    def snapshot(self):
+        """Empacota todas as métricas no blob pré-alocado e o retorna"""
+        blob = self.blob
+        uptime = time.ticks_diff(time.ticks_ms(), self.start_ticks)
+        struct.pack_into(HEADER_FORMAT, blob, 0, BLOB_VERSION,
+                         COUNTER_COUNT, GAUGE_COUNT, HIST_COUNT, uptime)
+        offset = 8
+        for value in self.counters:
+            struct.pack_into('<I', blob, offset, value)
+            offset += 4
+        for value in self.gauges:
+            struct.pack_into('<i', blob, offset, value)
+            offset += 4
+        for value in self.irq_events:
+            struct.pack_into('<I', blob, offset, value)
+            offset += 4
+        for hist in range(HIST_COUNT):
+            base = hist * HIST_BUCKETS
+            for bucket in range(HIST_BUCKETS):
+                struct.pack_into('<I', blob, offset, self.histograms[base + bucket])
+                offset += 4
+            struct.pack_into('<I', blob, offset, self.hist_max[hist])
+            offset += 4
+        return blob
+
+
+def decode_blob(data):
+    """Decodifica o blob de métricas (usado no host)"""
+    version, n_counters, n_gauges, n_hist, uptime = struct.unpack_from(HEADER_FORMAT, data, 0)
+    if version != BLOB_VERSION:
+        raise ValueError("Versão de métricas desconhecida: %d" % version)
+    offset = 8
+    counters = struct.unpack_from('<%dI' % n_counters, data, offset)
+    offset += 4 * n_counters
+    gauges = struct.unpack_from('<%di' % n_gauges, data, offset)
+    offset += 4 * n_gauges
+    irq_events = struct.unpack_from('<%dI' % IRQ_SLOTS, data, offset)
+    offset += 4 * IRQ_SLOTS
+    histograms = {}
+    for hist in range(n_hist):
+        values = struct.unpack_from('<%dI' % (HIST_BUCKETS + 1), data, offset)
+        offset += 4 * (HIST_BUCKETS + 1)
+        name = HIST_NAMES[hist] if hist < len(HIST_NAMES) else 'hist_%d' % hist
+        histograms[name] = {'buckets': values[:HIST_BUCKETS], 'max': values[HIST_BUCKETS]}
+    return {
+        'uptime_ms': uptime,
+        'counters': {(COUNTER_NAMES[i] if i < len(COUNTER_NAMES) else 'counter_%d' % i): v
+                     for i, v in enumerate(counters)},
+        'gauges': {(GAUGE_NAMES[i] if i < len(GAUGE_NAMES) else 'gauge_%d' % i): v
+                   for i, v in enumerate(gauges)},
+        'irq_events': {i: v for i, v in enumerate(irq_events) if v},
+        'histograms': histograms,
+    }
+
+
+# Instância única compartilhada pelos módulos do nó
+metrics = Metrics()
@@ -33,10 +33,14 @@ echo "📂 Fazendo upload dos arquivos corrigidos..."
 echo "1. Uploading common files..."
 ampy -p $PORT put common/constants.py /constants.py
 ampy -p $PORT put common/ble_utils.py /ble_utils.py
+ampy -p $PORT put common/logger.py /logger.py
+ampy -p $PORT put common/metrics.py /metrics.py
+ampy -p $PORT put common/memory.py /memory.py
 
 # Upload dos arquivos do display node (versões corrigidas)
 echo "2. Uploading display node files (FIXED versions)..."
 ampy -p $PORT put display_node/ble_server_fixed.py /ble_server_fixed.py
+ampy -p $PORT put display_node/display_constants.py /display_constants.py
 ampy -p $PORT put display_node/display_controller.py /display_controller.py
 ampy -p $PORT put display_node/main_fixed.py /main_fixed.py
 
@@ -51,9 +51,13 @@ if check_port $DISPLAY_PORT; then
     upload_with_retry $DISPLAY_PORT display_node/main_no_advertising.py /display_node/main_no_advertising.py
     
     # Upload de arquivos base necessários
+    upload_with_retry $DISPLAY_PORT display_node/display_constants.py /display_node/display_constants.py
     upload_with_retry $DISPLAY_PORT display_node/display_controller.py /display_node/display_controller.py
     upload_with_retry $DISPLAY_PORT common/constants.py /common/constants.py
     upload_with_retry $DISPLAY_PORT common/ble_utils.py /common/ble_utils.py
+    upload_with_retry $DISPLAY_PORT common/logger.py /common/logger.py
+    upload_with_retry $DISPLAY_PORT common/metrics.py /common/metrics.py
+    upload_with_retry $DISPLAY_PORT common/memory.py /common/memory.py
     
     echo ""
     echo "Testando Display Node (No Advertising)..."
@@ -89,10 +93,14 @@ if check_port $VOLTMETER_PORT; then
     upload_with_retry $VOLTMETER_PORT voltmeter_node/main_no_advertising.py /voltmeter_node/main_no_advertising.py
     
     # Upload de arquivos base necessários
+    upload_with_retry $VOLTMETER_PORT voltmeter_node/voltmeter_constants.py /voltmeter_node/voltmeter_constants.py
     upload_with_retry $VOLTMETER_PORT voltmeter_node/adc_reader.py /voltmeter_node/adc_reader.py
     upload_with_retry $VOLTMETER_PORT voltmeter_node/ble_client.py /voltmeter_node/ble_client.py
     upload_with_retry $VOLTMETER_PORT common/constants.py /common/constants.py
     upload_with_retry $VOLTMETER_PORT common/ble_utils.py /common/ble_utils.py
+    upload_with_retry $VOLTMETER_PORT common/logger.py /common/logger.py
+    upload_with_retry $VOLTMETER_PORT common/metrics.py /common/metrics.py
+    upload_with_retry $VOLTMETER_PORT common/memory.py /common/memory.py
     
     echo ""
     echo "Testando Voltmeter Node (No Advertising)..."
@@ -1,12 +1,15 @@
 #!/bin/bash
 
 if [ $# -eq 0 ]; then
-    echo "Uso: $0 <porta_serial>"
+    echo "Uso: $0 <porta_serial> [mpy|py]"
     echo "Exemplo: $0 /dev/ttyUSB0"
+    echo "  mpy (padrão): compila os módulos com mpy-cross e carrega o bytecode"
+    echo "  py: carrega os arquivos fonte"
     exit 1
 fi
 
 PORT=$1
+MODE=${2:-mpy}
 
 echo "Carregando código do Voltmeter Node via $PORT..."
 
@@ -16,17 +19,56 @@ if ! command -v ampy &> /dev/null; then
     pip3 install adafruit-ampy
 fi
 
+if [ "$MODE" = "mpy" ]; then
+    echo "0. Compilando módulos para .mpy..."
+    if ! python3 build_mpy.py voltmeter; then
+        echo "⚠ Compilação .mpy falhou - carregando arquivos fonte"
+        MODE=py
+    fi
+fi
+
 echo "1. Criando diretório /common..."
 ampy --port $PORT mkdir /common 2>/dev/null || true
 
-echo "2. Copiando arquivos comuns..."
-ampy --port $PORT put common/constants.py /common/constants.py
-ampy --port $PORT put common/ble_utils.py /common/ble_utils.py
+if [ "$MODE" = "mpy" ]; then
+    # O import do MicroPython prefere .py a .mpy: remove as fontes antigas
+    echo "2. Copiando bytecode comum..."
+    for f in build/voltmeter/common/*.mpy; do
+        name=$(basename "$f" .mpy)
+        ampy --port $PORT rm /common/$name.py 2>/dev/null || true
+        ampy --port $PORT put "$f" /common/$name.mpy
+    done
+
+    echo "3. Copiando bytecode do voltímetro..."
+    for f in build/voltmeter/*.mpy; do
+        name=$(basename "$f" .mpy)
+        ampy --port $PORT rm /$name.py 2>/dev/null || true
+        ampy --port $PORT put "$f" /$name.mpy
+    done
+else
+    echo "2. Copiando arquivos comuns..."
+    ampy --port $PORT put common/constants.py /common/constants.py
+    ampy --port $PORT put common/ble_utils.py /common/ble_utils.py
+    ampy --port $PORT put common/logger.py /common/logger.py
+    ampy --port $PORT put common/metrics.py /common/metrics.py
+    ampy --port $PORT put common/memory.py /common/memory.py
+
+    echo "3. Copiando arquivos do voltímetro..."
+    ampy --port $PORT put voltmeter_node/voltmeter_constants.py /voltmeter_constants.py
+    ampy --port $PORT put voltmeter_node/adc_backends.py /adc_backends.py
+    ampy --port $PORT put voltmeter_node/adc_reader.py /adc_reader.py
+    ampy --port $PORT put voltmeter_node/acquisition.py /acquisition.py
+    ampy --port $PORT put voltmeter_node/sampler_thread.py /sampler_thread.py
+    ampy --port $PORT put voltmeter_node/square_sums.py /square_sums.py
+    ampy --port $PORT put voltmeter_node/stats.py /stats.py
+    ampy --port $PORT put voltmeter_node/trigger.py /trigger.py
+    ampy --port $PORT put voltmeter_node/ac_meter.py /ac_meter.py
+    ampy --port $PORT put voltmeter_node/sampling.py /sampling.py
+    ampy --port $PORT put voltmeter_node/deadband.py /deadband.py
+    ampy --port $PORT put voltmeter_node/ble_client.py /ble_client.py
+    ampy --port $PORT put voltmeter_node/ble_voltmeter_server.py /ble_voltmeter_server.py
+fi
 
-echo "3. Copiando arquivos do voltímetro..."
-ampy --port $PORT put voltmeter_node/adc_reader.py /adc_reader.py
-ampy --port $PORT put voltmeter_node/ble_client.py /ble_client.py
 ampy --port $PORT put voltmeter_node/main.py /main.py
-ampy --port $PORT put voltmeter_node/ble_voltmeter_server.py /ble_voltmeter_server.py
 
 echo "✓ Código do Voltímetro carregado! Reinicie o ESP32."
@@ -33,10 +33,14 @@ echo "📂 Fazendo upload dos arquivos corrigidos..."
 echo "1. Uploading common files..."
 ampy -p $PORT put common/constants.py /constants.py
 ampy -p $PORT put common/ble_utils.py /ble_utils.py
+ampy -p $PORT put common/logger.py /logger.py
+ampy -p $PORT put common/metrics.py /metrics.py
+ampy -p $PORT put common/memory.py /memory.py
 
 # Upload dos arquivos do voltmeter node (versões corrigidas)
 echo "2. Uploading voltmeter node files (FIXED versions)..."
 ampy -p $PORT put voltmeter_node/ble_voltmeter_server_fixed.py /ble_voltmeter_server_fixed.py
+ampy -p $PORT put voltmeter_node/voltmeter_constants.py /voltmeter_constants.py
 ampy -p $PORT put voltmeter_node/adc_reader.py /adc_reader.py
 ampy -p $PORT put voltmeter_node/main_fixed.py /main_fixed.py
 
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Confere e mede o formatador de tensão do display (display_controller.py)
+Compara MultiplexedDisplay.set_millivolts com a formatação antiga por
+f-strings (copiada abaixo) numa varredura de tensões e mede chamadas/s dos
+dois caminhos.
+
+    python3 display_format_bench.py                 # varredura + benchmark
+    python3 display_format_bench.py --step 1 -n 200000
+    mpremote run display_format_bench.py            # na placa (com display_controller)
+
+Na varredura, toda tensão tem de aparecer a no máximo meio dígito do valor
+real e nunca com menos casas que a formatação antiga; o código de saída é 1
+se alguma não aparecer. Na placa também confere que set_millivolts não
+aloca (micropython.heap_lock).
+"""
+
+import sys
+import time
+
+MICROPYTHON = sys.implementation.name == 'micropython'
+if not MICROPYTHON:
+    import ble_sim
+    ble_sim.install('display')
+
+from display_controller import MultiplexedDisplay, voltage_decimals, VOLTAGE_STEPS  # noqa: E402
+
+
+def legacy_set_voltage(buffer, voltage):
+    """set_voltage + set_text anteriores: o ponto ocupa uma posição"""
+    voltage_str = f"{voltage:.2f}"
+    if len(voltage_str) > 4:
+        if voltage >= 100:
+            voltage_str = f"{voltage:.1f}"
+        if len(voltage_str) > 4:
+            voltage_str = f"{voltage:.0f}"
+        if len(voltage_str) > 4:
+            voltage_str = "----"
+    text = str(voltage_str)[:4]
+    if '.' in text and len(text) <= 4:
+        pass
+    elif text.replace('.', '').replace('-', '').isdigit():
+        text = text.rjust(4)
+    else:
+        text = text.ljust(4)
+    for i in range(4):
+        if i < len(text):
+            buffer[i] = text[i]
+        else:
+            buffer[i] = ' '
+    return buffer
+
+
+def _decimals(text):
+    point = text.find('.')
+    return len(text) - point - 1 if point >= 0 else 0
+
+
+def compare(display, start_mv, stop_mv, step_mv):
+    """Varre [start, stop) e classifica a saída nova contra a antiga"""
+    buffer = [' '] * 4
+    counts = {'igual': 0, 'mais casas': 0, 'estouro': 0}
+    failures = []
+    for mv in range(start_mv, stop_mv, step_mv):
+        display.set_millivolts(mv)
+        new = display.get_current_text().strip()
+        old = ''.join(legacy_set_voltage(buffer, mv / 1000)).strip()
+        decimals = voltage_decimals(mv)
+        if decimals < 0:
+            ok = new == '----'
+            counts['estouro'] += ok
+        else:
+            # Meio dígito do valor real (o arredondamento é em mV inteiros)
+            ok = abs(float(new) * 1000 - mv) <= VOLTAGE_STEPS[decimals] / 2 + 1e-6
+            if ok and old != '----' and _decimals(new) < _decimals(old):
+                ok = False
+            if ok:
+                counts['igual' if new == old else 'mais casas'] += 1
+        if not ok:
+            failures.append((mv, old, new))
+    return counts, failures
+
+
+def _clock():
+    if MICROPYTHON:
+        return time.ticks_us()
+    return int(time.perf_counter() * 1000000)
+
+
+def _elapsed_us(start):
+    if MICROPYTHON:
+        return time.ticks_diff(time.ticks_us(), start)
+    return _clock() - start
+
+
+def bench(calls):
+    """Chamadas/s do formatador antigo e do novo, com as mesmas tensões"""
+    display = MultiplexedDisplay(0)
+    buffer = [' '] * 4
+    values_mv = [(i * 7919) % 120000 - 10000 for i in range(64)]
+    values_v = [mv / 1000 for mv in values_mv]
+    results = []
+
+    start = _clock()
+    for i in range(calls):
+        legacy_set_voltage(buffer, values_v[i & 63])
+    results.append(('f-strings (antigo)', _elapsed_us(start)))
+
+    start = _clock()
+    for i in range(calls):
+        display.set_voltage(values_v[i & 63])
+    results.append(('set_voltage (V)', _elapsed_us(start)))
+
+    start = _clock()
+    for i in range(calls):
+        display.set_millivolts(values_mv[i & 63])
+    results.append(('set_millivolts (mV)', _elapsed_us(start)))
+
+    base = results[0][1]
+    for label, us in results:
+        rate = calls * 1000000 / us if us else 0
+        print(f"{label:22s} {rate:12.0f} chamadas/s {us / calls:8.2f} us/chamada "
+              f"{base / us if us else 0:6.1f}x")
+
+
+def check_no_alloc():
+    """Na placa: set_millivolts com o heap travado (MemoryError se alocar)"""
+    import micropython
+    display = MultiplexedDisplay(0)
+    micropython.heap_lock()
+    try:
+        for mv in (0, 1234, -500, 99996, 10000000):
+            display.set_millivolts(mv)
+    except MemoryError:
+        micropython.heap_unlock()
+        print("❌ set_millivolts alocou memória")
+        return False
+    micropython.heap_unlock()
+    print("✓ set_millivolts não aloca")
+    return True
+
+
+def main():
+    start_mv, stop_mv, step_mv, calls = -1000000, 10001000, 7, 100000
+    if not MICROPYTHON:
+        import argparse
+        parser = argparse.ArgumentParser(description="Confere e mede o formatador do display")
+        parser.add_argument('--start', type=int, default=start_mv, help="mV")
+        parser.add_argument('--stop', type=int, default=stop_mv, help="mV")
+        parser.add_argument('--step', type=int, default=step_mv, help="mV")
+        parser.add_argument('-n', '--calls', type=int, default=calls)
+        args = parser.parse_args()
+        start_mv, stop_mv, step_mv, calls = args.start, args.stop, args.step, args.calls
+    else:
+        # Varredura menor: a placa leva ~ms por ponto com o legado
+        step_mv, calls = 997, 5000
+
+    counts, failures = compare(MultiplexedDisplay(0), start_mv, stop_mv, step_mv)
+    total = sum(counts.values()) + len(failures)
+    print(f"Varredura {start_mv}..{stop_mv} mV, passo {step_mv}: {total} tensões")
+    for label, count in counts.items():
+        print(f"  {label:12s} {count:9d}")
+    for mv, old, new in failures[:10]:
+        print(f"❌ {mv} mV: antigo {old!r}, novo {new!r}")
+    ok = not failures
+    if ok:
+        print("✓ Formatador novo consistente com o antigo")
+    if MICROPYTHON:
+        ok = check_no_alloc() and ok
+    print()
+    bench(calls)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
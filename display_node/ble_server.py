@@ -1,18 +1,44 @@
 import bluetooth
 import time
 import sys
+from array import array
 sys.path.append('/common')
-from constants import *
-from ble_utils import BLEUtils, print_debug, _IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_GATTS_WRITE
+from micropython import const
+from constants import DISPLAY_SERVICE_UUID, DISPLAY_CHAR_UUID, VOLTAGE_CHAR_UUID, COMMAND_CHAR_UUID, LOG_CHAR_UUID, DIAG_CHAR_UUID, BLE_NAME_DISPLAY, MAX_CONNECTIONS, MAX_CHANNELS
+from ble_utils import BLEUtils, print_debug
+from logger import log, DEBUG, INFO, WARNING, MSG_VOLTAGE_RX, MSG_VOLTAGE_SHOWN, MSG_VOLTAGE_ERROR, MSG_CONNECT, MSG_DISCONNECT, MSG_IRQ, MSG_COMMAND, MSG_COMMAND_UNKNOWN, MSG_NOTIFY_FAIL
+from metrics import metrics, IRQ_SLOTS, BLOB_SIZE, C_NOTIFY_SENT, C_NOTIFY_FAIL, C_FRAMES_RX, C_REDRAWS, G_CONNECTIONS
+from memory import memory
+
+_IRQ_CENTRAL_CONNECT = const(1)
+_IRQ_CENTRAL_DISCONNECT = const(2)
+_IRQ_GATTS_WRITE = const(3)
 
 class BLEDisplayServer:
-    def __init__(self, display_controller):
-        """Inicializa o servidor BLE para o nó display"""
+    def __init__(self, display_controller, presenter=None):
+        """Inicializa o servidor BLE para o nó display
+        
+        Com presenter (presentation.VoltagePresenter) os frames de tensão só
+        são registrados na IRQ e o redesenho fica com refresh_display();
+        sem ele cada frame é exibido e notificado assim que chega.
+        """
         self.display_controller = display_controller
+        self.presenter = presenter
+        # Um canal por display (índice = posição no bitmap do frame); o log lê os 3 primeiros
+        self.rx_uv = array('i', [0] * max(3, len(display_controller.displays)))
         self.connections = set()
         self.voltage_handle = None
         self.command_handle = None
         self.display_handle = None
+        self.log_handle = None
+        self.diag_handle = None
+        
+        # Erros repetidos no caminho de dados são gravados no máximo 1x/s
+        log.set_rate_limit(MSG_VOLTAGE_ERROR, 1000)
+        log.set_rate_limit(MSG_NOTIFY_FAIL, 1000)
+        # Eventos IRQ e comandos chegam em rajadas: no máximo 1 registro a cada 100 ms
+        log.set_rate_limit(MSG_IRQ, 100)
+        log.set_rate_limit(MSG_COMMAND, 100)
         
         try:
             # Inicializa BLE com tentativas múltiplas
@@ -64,11 +90,28 @@ class BLEDisplayServer:
                 (COMMAND_CHAR_UUID, bluetooth.FLAG_WRITE | bluetooth.FLAG_READ),
                 # Característica para ler valores atuais do display
                 (DISPLAY_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
+                # Característica para drenar o log binário (comando "LOG")
+                (LOG_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
+                # Característica de diagnóstico: blob de métricas (common/metrics.py); só leitura:
+                # o blob passa do MTU, e a leitura longa o devolve inteiro
+                (DIAG_CHAR_UUID, bluetooth.FLAG_READ),
             ),
         )
         
         # Registra os serviços
-        ((self.voltage_handle, self.command_handle, self.display_handle),) = self.ble.gatts_register_services((DISPLAY_SERVICE,))
+        ((self.voltage_handle, self.command_handle, self.display_handle, self.log_handle, self.diag_handle),) = self.ble.gatts_register_services((DISPLAY_SERVICE,))
+        
+        # O buffer padrão de uma característica tem 20 bytes; o blob de métricas é maior
+        self.ble.gatts_set_buffer(self.diag_handle, BLOB_SIZE)
+        # Respostas dos comandos de apresentação são escritas na própria característica
+        self.ble.gatts_set_buffer(self.command_handle, 96)
+        # Frame de tensões com até MAX_CHANNELS canais (>20 bytes pede MTU maior)
+        frame_size = BLEUtils.voltage_frame_size(MAX_CHANNELS)
+        self.ble.gatts_set_buffer(self.voltage_handle, frame_size)
+        try:
+            self.ble.config(mtu=frame_size + 3)
+        except Exception:
+            pass
         
         print_debug("Serviços BLE registrados")
     
@@ -84,10 +127,15 @@ class BLEDisplayServer:
     
     def _irq_handler(self, event, data):
         """Manipula eventos BLE"""
+        metrics.irq(event)
+        memory.activity()
+        # Registro binário no anel (sem print no IRQ): evento e total desse evento
+        log.log(DEBUG, MSG_IRQ, event, metrics.irq_events[event] if 0 <= event < IRQ_SLOTS else 0)
         if event == _IRQ_CENTRAL_CONNECT:
             conn_handle, addr_type, addr = data
             self.connections.add(conn_handle)
-            print_debug(f"Cliente conectado: {conn_handle}, Total conexões: {len(self.connections)}")
+            metrics.connected()
+            log.log(INFO, MSG_CONNECT, conn_handle, len(self.connections))
             
             # Se ainda há espaço para mais conexões, continua advertising
             if len(self.connections) < MAX_CONNECTIONS:
@@ -96,7 +144,7 @@ class BLEDisplayServer:
         elif event == _IRQ_CENTRAL_DISCONNECT:
             conn_handle, addr_type, addr = data
             self.connections.discard(conn_handle)
-            print_debug(f"Cliente desconectado: {conn_handle}, Total conexões: {len(self.connections)}")
+            log.log(INFO, MSG_DISCONNECT, conn_handle, len(self.connections))
             
             # Reinicia advertising se há espaço
             if len(self.connections) < MAX_CONNECTIONS:
@@ -114,22 +162,49 @@ class BLEDisplayServer:
         """Processa dados de tensão recebidos"""
         try:
             data = self.ble.gatts_read(self.voltage_handle)
-            voltages = BLEUtils.decode_voltage_data(data)
-            
-            print_debug(f"Tensões recebidas: {voltages}")
+            metrics.inc(C_FRAMES_RX)
             
-            # Exibe as tensões nos displays (agora com 4 dígitos cada)
-            success = self.display_controller.display_voltages(voltages)
+            uv = self.rx_uv
+            bitmap = BLEUtils.unpack_voltage_uv(data, uv)
+            if bitmap:
+                # Frame inteiro (µV): sem floats até o display
+                first, second, third = uv[0] // 1000, uv[1] // 1000, uv[2] // 1000
+                log.log(DEBUG, MSG_VOLTAGE_RX, first, second, third)
+                if self.presenter:
+                    # Redesenho no ritmo do pipeline de apresentação (loop principal)
+                    self.presenter.receive_uv(uv, bitmap)
+                    return
+                # Só os canais presentes no bitmap (e com display) mudam, em mV
+                # arredondado como no pipeline de apresentação
+                controller = self.display_controller
+                success = True
+                channel = 0
+                while bitmap and channel < len(controller.displays):
+                    if bitmap & 1 and not controller.display_millivolts(channel, (uv[channel] + 500) // 1000):
+                        success = False
+                    bitmap >>= 1
+                    channel += 1
+            else:
+                voltages = BLEUtils.decode_voltage_data(data)
+                first, second, third = int(voltages[0] * 1000), int(voltages[1] * 1000), int(voltages[2] * 1000)
+                log.log(DEBUG, MSG_VOLTAGE_RX, first, second, third)
+                
+                if self.presenter:
+                    self.presenter.receive(voltages)
+                    return
+                
+                # Exibe as tensões nos displays (agora com 4 dígitos cada)
+                success = self.display_controller.display_voltages(voltages)
             
             if success:
-                print_debug("Tensões exibidas com sucesso nos displays multiplexados")
+                log.log(DEBUG, MSG_VOLTAGE_SHOWN, first, second, third)
                 # Notifica clientes sobre a atualização
                 self._notify_display_update()
             else:
-                print_debug("Erro ao exibir tensões")
+                log.log(WARNING, MSG_VOLTAGE_ERROR, len(data))
                 
         except Exception as e:
-            print_debug(f"Erro ao processar dados de tensão: {e}")
+            log.log(WARNING, MSG_VOLTAGE_ERROR, -1)
     
     def _handle_command_data(self, conn_handle):
         """Processa comandos recebidos"""
@@ -137,7 +212,7 @@ class BLEDisplayServer:
             data = self.ble.gatts_read(self.command_handle)
             command = data.decode('utf-8').strip()
             
-            print_debug(f"Comando recebido: '{command}'")
+            log.log(DEBUG, MSG_COMMAND, len(data))
             
             if command.startswith("TEXT:"):
                 # Comando para exibir texto: "TEXT:1234,5678,9012"
@@ -152,12 +227,14 @@ class BLEDisplayServer:
                 success = self.display_controller.display_texts(adjusted_texts)
                 if success:
                     print_debug(f"Textos exibidos nos displays 4-dígitos: {adjusted_texts}")
+                    self._manual_display_shown()
                     self._notify_display_update()
             
             elif command == "CLEAR":
                 # Comando para limpar displays
                 self.display_controller.clear_all()
                 print_debug("Displays multiplexados limpos")
+                self._manual_display_shown()
                 self._notify_display_update()
             
             elif command == "TEST":
@@ -169,7 +246,7 @@ class BLEDisplayServer:
                 # Comando para testar display específico: "TEST_DISP:1"
                 try:
                     disp_num = int(command[10:]) - 1  # Remove "TEST_DISP:" e converte para índice
-                    if 0 <= disp_num <= 2:
+                    if 0 <= disp_num < len(self.display_controller.displays):
                         self.display_controller.test_individual_display(disp_num)
                         print_debug(f"Teste do display {disp_num + 1} executado")
                 except ValueError:
@@ -183,6 +260,7 @@ class BLEDisplayServer:
                     success = self.display_controller.display_voltages(voltages)
                     if success:
                         print_debug(f"Tensões manuais exibidas: {voltages}")
+                        self._manual_display_shown()
                         self._notify_display_update()
                 except ValueError:
                     print_debug("Formato de tensão inválido")
@@ -203,16 +281,51 @@ class BLEDisplayServer:
                     success = self.display_controller.display_texts(formatted_nums)
                     if success:
                         print_debug(f"Números formatados exibidos: {formatted_nums}")
+                        self._manual_display_shown()
                         self._notify_display_update()
                 except ValueError:
                     print_debug("Formato de número inválido")
             
+            elif self.presenter and (command.startswith("SMOOTH:") or command.startswith("HYST:")
+                                     or command.startswith("REFRESH:") or command == "PRESENT?"):
+                # Pipeline de apresentação: "SMOOTH:200", "HYST:250", "REFRESH:250"
+                try:
+                    self.presenter.command(command)
+                except ValueError:
+                    print_debug("Parâmetro de apresentação inválido")
+                self.ble.gatts_write(self.command_handle, self.presenter.describe().encode())
+            
+            elif command == "LOG":
+                # Drena o anel de log pela característica de log
+                self._drain_log(conn_handle)
+            
+            elif command.startswith("LOG_LEVEL:"):
+                # Nível mínimo gravado no anel: "LOG_LEVEL:10" (DEBUG) ... "LOG_LEVEL:40" (ERROR)
+                try:
+                    log.level = int(command[10:])
+                    print_debug(f"Nível de log: {log.level}")
+                except ValueError:
+                    print_debug("Nível de log inválido")
+            
             else:
-                print_debug(f"Comando desconhecido: {command}")
+                log.log(WARNING, MSG_COMMAND_UNKNOWN, len(command))
                 
         except Exception as e:
             print_debug(f"Erro ao processar comando: {e}")
     
+    def _manual_display_shown(self):
+        """Comando manual sobrescreveu os displays: o próximo frame redesenha tudo"""
+        if self.presenter:
+            self.presenter.reset()
+    
+    def refresh_display(self, now):
+        """Redesenha pelo pipeline de apresentação e notifica se algo mudou"""
+        if self.presenter and self.presenter.refresh(now):
+            log.log(DEBUG, MSG_VOLTAGE_SHOWN, self.presenter.filtered_mv[0],
+                    self.presenter.filtered_mv[1], self.presenter.filtered_mv[2])
+            metrics.inc(C_REDRAWS)
+            self._notify_display_update()
+    
     def _notify_display_update(self):
         """Notifica clientes sobre atualização do display"""
         try:
@@ -226,13 +339,32 @@ class BLEDisplayServer:
             for conn_handle in list(self.connections):
                 try:
                     self.ble.gatts_notify(conn_handle, self.display_handle)
+                    metrics.inc(C_NOTIFY_SENT)
                 except:
                     # Remove conexões inválidas
+                    metrics.inc(C_NOTIFY_FAIL)
+                    log.log(WARNING, MSG_NOTIFY_FAIL, conn_handle)
                     self.connections.discard(conn_handle)
                     
         except Exception as e:
             print_debug(f"Erro ao notificar atualização: {e}")
     
+    def _drain_log(self, conn_handle):
+        """Envia os registros pendentes do log, um por notificação"""
+        sent = log.drain(lambda record: self.ble.gatts_notify(conn_handle, self.log_handle, record))
+        print_debug(f"Log drenado: {sent} registros, {log.pending()} pendentes")
+    
+    def publish_metrics(self):
+        """Atualiza a característica de diagnóstico com o snapshot das métricas
+        
+        Chamado periodicamente pelo loop principal (fora de IRQ). A
+        característica é só de leitura: o blob passa do MTU e o painel
+        (metrics_dashboard.py) o lê inteiro periodicamente.
+        """
+        metrics.set_gauge(G_CONNECTIONS, len(self.connections))
+        metrics.update_heap()
+        self.ble.gatts_write(self.diag_handle, metrics.snapshot())
+    
     def send_display_data(self, texts):
         """Envia dados para exibição (chamada externa)"""
         try:
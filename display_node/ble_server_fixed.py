@@ -8,8 +8,16 @@ import time
 import gc
 import sys
 sys.path.append('/common')
-from constants import *
-from ble_utils import BLEUtils, print_debug, _IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_GATTS_WRITE
+from micropython import const
+from constants import DISPLAY_SERVICE_UUID, DISPLAY_CHAR_UUID, VOLTAGE_CHAR_UUID, COMMAND_CHAR_UUID, LOG_CHAR_UUID, DIAG_CHAR_UUID, BLE_NAME_DISPLAY, MAX_CONNECTIONS
+from ble_utils import BLEUtils, print_debug
+from metrics import metrics, BLOB_SIZE, C_FRAMES_RX, G_CONNECTIONS
+from memory import memory
+from logger import log, DEBUG, INFO, WARNING, MSG_VOLTAGE_RX, MSG_VOLTAGE_ERROR, MSG_CONNECT, MSG_DISCONNECT
+
+_IRQ_CENTRAL_CONNECT = const(1)
+_IRQ_CENTRAL_DISCONNECT = const(2)
+_IRQ_GATTS_WRITE = const(3)
 
 class FixedBLEDisplayServer:
     def __init__(self, display_controller):
@@ -19,8 +27,13 @@ class FixedBLEDisplayServer:
         self.voltage_handle = None
         self.command_handle = None
         self.display_handle = None
+        self.log_handle = None
+        self.diag_handle = None
         self.ble = None
         
+        # Erros repetidos no caminho de dados são gravados no máximo 1x/s
+        log.set_rate_limit(MSG_VOLTAGE_ERROR, 1000)
+        
         # Inicializa BLE com estratégias múltiplas
         if self._initialize_ble_robust():
             print_debug("Servidor BLE do Display inicializado com sucesso")
@@ -244,11 +257,17 @@ class FixedBLEDisplayServer:
                     (COMMAND_CHAR_UUID, bluetooth.FLAG_WRITE | bluetooth.FLAG_READ),
                     # Característica para ler valores atuais do display
                     (DISPLAY_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
+                    # Característica para drenar o log binário (comando "LOG")
+                    (LOG_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
+                    # Característica de diagnóstico: blob de métricas (common/metrics.py); só leitura:
+                    # o blob passa do MTU, e a leitura longa o devolve inteiro
+                    (DIAG_CHAR_UUID, bluetooth.FLAG_READ),
                 ),
             )
             
             # Registra os serviços
-            ((self.voltage_handle, self.command_handle, self.display_handle),) = self.ble.gatts_register_services((DISPLAY_SERVICE,))
+            ((self.voltage_handle, self.command_handle, self.display_handle, self.log_handle, self.diag_handle),) = self.ble.gatts_register_services((DISPLAY_SERVICE,))
+            self.ble.gatts_set_buffer(self.diag_handle, BLOB_SIZE)
             
             print_debug("Serviços BLE registrados com sucesso")
             
@@ -273,11 +292,14 @@ class FixedBLEDisplayServer:
     
     def _irq_handler(self, event, data):
         """Manipula eventos BLE"""
+        metrics.irq(event)
+        memory.activity()
         try:
             if event == _IRQ_CENTRAL_CONNECT:
                 conn_handle, addr_type, addr = data
                 self.connections.add(conn_handle)
-                print_debug(f"Cliente conectado: {conn_handle}, Total conexões: {len(self.connections)}")
+                metrics.connected()
+                log.log(INFO, MSG_CONNECT, conn_handle, len(self.connections))
                 
                 # Se ainda há espaço para mais conexões, continua advertising
                 if len(self.connections) < MAX_CONNECTIONS:
@@ -286,7 +308,7 @@ class FixedBLEDisplayServer:
             elif event == _IRQ_CENTRAL_DISCONNECT:
                 conn_handle, addr_type, addr = data
                 self.connections.discard(conn_handle)
-                print_debug(f"Cliente desconectado: {conn_handle}, Total conexões: {len(self.connections)}")
+                log.log(INFO, MSG_DISCONNECT, conn_handle, len(self.connections))
                 
                 # Reinicia advertising se há espaço
                 if len(self.connections) < MAX_CONNECTIONS:
@@ -309,7 +331,6 @@ class FixedBLEDisplayServer:
         try:
             # Decodifica os dados (formato: "V1:12.34,V2:5.67,V3:9.10")
             voltage_str = data.decode('utf-8')
-            print_debug(f"Dados de tensão recebidos: {voltage_str}")
             
             # Parse dos dados
             voltages = {}
@@ -323,10 +344,12 @@ class FixedBLEDisplayServer:
                 v1 = voltages.get('V1', 0)
                 v2 = voltages.get('V2', 0)
                 v3 = voltages.get('V3', 0)
+                metrics.inc(C_FRAMES_RX)
+                log.log(DEBUG, MSG_VOLTAGE_RX, int(v1 * 1000), int(v2 * 1000), int(v3 * 1000))
                 self.display_controller.update_voltages(v1, v2, v3)
                 
         except Exception as e:
-            print_debug(f"Erro ao processar dados de tensão: {e}")
+            log.log(WARNING, MSG_VOLTAGE_ERROR, len(data))
     
     def _handle_command_data(self, data):
         """Processa comandos recebidos"""
@@ -341,10 +364,19 @@ class FixedBLEDisplayServer:
                 self.display_controller.clear_all()
             elif command == "STATUS":
                 self._send_status()
+            elif command == "LOG":
+                self._drain_log()
                 
         except Exception as e:
             print_debug(f"Erro ao processar comando: {e}")
     
+    def _drain_log(self):
+        """Envia os registros pendentes do log pela característica de log"""
+        if self.connections and self.log_handle:
+            conn_handle = list(self.connections)[0]
+            sent = log.drain(lambda record: self.ble.gatts_notify(conn_handle, self.log_handle, record))
+            print_debug(f"Log drenado: {sent} registros, {log.pending()} pendentes")
+    
     def _send_status(self):
         """Envia status atual do display"""
         try:
@@ -355,6 +387,16 @@ class FixedBLEDisplayServer:
         except Exception as e:
             print_debug(f"Erro ao enviar status: {e}")
     
+    def publish_metrics(self):
+        """Atualiza a característica de diagnóstico com o snapshot das métricas"""
+        try:
+            if self.ble and self.diag_handle:
+                metrics.set_gauge(G_CONNECTIONS, len(self.connections))
+                metrics.update_heap()
+                self.ble.gatts_write(self.diag_handle, metrics.snapshot())
+        except Exception as e:
+            print_debug(f"Erro ao publicar métricas: {e}")
+    
     def stop(self):
         """Para o servidor BLE"""
         try:
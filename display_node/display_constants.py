@@ -0,0 +1,32 @@
+# Constantes do nó display (pinos, segmentos e multiplexação); as
+# compartilhadas ficam em constants.py
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+# Configurações dos displays de 7 segmentos multiplexados
+# Pinos dos segmentos (compartilhados por todos os displays)
+SEGMENT_PINS = (13, 12, 14, 27, 26, 25, 33, 32)  # A, B, C, D, E, F, G, DP
+
+# Pinos de controle dos dígitos para cada display (4 dígitos por display)
+# O número de displays do nó é o número de linhas desta tupla
+DIGIT_PINS = (
+    (4, 16, 17, 5),     # Display 1 - 4 dígitos
+    (18, 19, 21, 22),   # Display 2 - 4 dígitos
+    (23, 2, 15, 0),     # Display 3 - 4 dígitos
+)
+DISPLAY_COUNT = len(DIGIT_PINS)
+
+# Mapeamento de caracteres para segmentos (cátodo comum, 1 = aceso)
+# Bit 0 = segmento A ... bit 6 = G, bit 7 = DP
+SEGMENT_CHARS = '0123456789. -Er'
+SEGMENT_PATTERNS = b'\x3f\x06\x5b\x4f\x66\x6d\x7d\x07\x7f\x6f\x80\x00\x40\x79\x50'
+SEGMENT_DP = const(0x80)
+
+# Configurações de multiplexação
+MULTIPLEX_FREQUENCY = const(200)  # Hz - frequência de multiplexação
+MULTIPLEX_MAX_TICK_HZ = const(4000)  # teto do timer: com muitos displays cada dígito acende menos vezes
+DIGIT_ON_TIME = 1.25  # ms - tempo que cada dígito fica ligado (1000/200/4 = 1.25ms)
@@ -2,16 +2,55 @@ from machine import Pin, Timer
 import time
 import sys
 sys.path.append('/common')
-from constants import SEGMENT_PINS, DIGIT_PINS, DIGIT_PATTERNS, MULTIPLEX_FREQUENCY
+from display_constants import SEGMENT_PINS, DIGIT_PINS, SEGMENT_CHARS, SEGMENT_PATTERNS, SEGMENT_DP, MULTIPLEX_FREQUENCY, MULTIPLEX_MAX_TICK_HZ
+from metrics import metrics, C_MUX_TICKS, C_MUX_OVERRUNS, H_MUX_CALLBACK
+
+# Passo do último dígito (mV) para 0, 1, 2 e 3 casas decimais
+VOLTAGE_STEPS = (1000, 100, 10, 1)
+_MINUS_MASK = SEGMENT_PATTERNS[SEGMENT_CHARS.find('-')]
+
+def voltage_decimals(millivolts, max_decimals=3):
+    """Casas decimais que cabem nos 4 dígitos (o ponto não ocupa dígito)
+
+    Positivo: 9.999, 99.99, 999.9, 9999; negativo perde um dígito para o
+    sinal (-9.99 ... -999). Considera o arredondamento no último dígito
+    (9999.6 V não cabe). Retorna -1 se nem sem casas decimais couber.
+    """
+    if millivolts < 0:
+        magnitude = -millivolts
+        limit = 1000
+        decimals = 2
+    else:
+        magnitude = millivolts
+        limit = 10000
+        decimals = 3
+    if max_decimals < decimals:
+        decimals = max_decimals
+    while decimals >= 0:
+        step = VOLTAGE_STEPS[decimals]
+        if (magnitude + step // 2) // step < limit:
+            return decimals
+        decimals -= 1
+    return -1
+
+def _mask_char(mask):
+    """Caractere de uma máscara de segmentos (sem o ponto); '?' se desconhecida"""
+    for i in range(len(SEGMENT_PATTERNS)):
+        if SEGMENT_PATTERNS[i] == mask:
+            return SEGMENT_CHARS[i]
+    return '?'
 
 class MultiplexedDisplay:
-    def __init__(self, display_index):
-        """Inicializa um display multiplexado de 4 dígitos"""
+    def __init__(self, display_index, digit_pins=DIGIT_PINS):
+        """Inicializa um display multiplexado de 4 dígitos (pinos em digit_pins[display_index])"""
         self.display_index = display_index
-        self.digit_pins = [Pin(pin_num, Pin.OUT) for pin_num in DIGIT_PINS[display_index]]
+        self.digit_pins = [Pin(pin_num, Pin.OUT) for pin_num in digit_pins[display_index]]
+        
+        # Máscara de segmentos de cada um dos 4 dígitos (bit 7 = ponto decimal)
+        self.segments = bytearray(4)
         
-        # Buffer para os 4 dígitos deste display
-        self.digit_buffer = [' ', ' ', ' ', ' ']
+        # Casas decimais máximas de set_millivolts (3 usa os 4 dígitos abaixo de 10 V)
+        self.max_decimals = 3
         
         # Estado da multiplexação
         self.current_digit = 0
@@ -46,35 +85,69 @@ class MultiplexedDisplay:
             # Texto normal - alinha à esquerda
             text = text.ljust(4)
         
-        # Atualiza buffer
+        # Atualiza as máscaras (no texto livre o ponto ocupa uma posição)
         for i in range(4):
-            if i < len(text):
-                self.digit_buffer[i] = text[i]
+            index = SEGMENT_CHARS.find(text[i]) if i < len(text) else -1
+            self.segments[i] = SEGMENT_PATTERNS[index] if index >= 0 else 0
+    
+    def set_millivolts(self, millivolts):
+        """Exibe uma tensão em mV (inteiro) direto nas máscaras; não aloca
+        
+        O ponto decimal acende no dígito das unidades, sem gastar uma posição,
+        e a precisão se ajusta aos 4 dígitos (ver voltage_decimals).
+        """
+        decimals = voltage_decimals(millivolts, self.max_decimals)
+        if decimals < 0:
+            for i in range(4):
+                self.segments[i] = _MINUS_MASK  # Overflow: "----"
+            return
+        negative = millivolts < 0
+        step = VOLTAGE_STEPS[decimals]
+        value = ((-millivolts if negative else millivolts) + step // 2) // step
+        units = 3 - decimals
+        position = 3
+        while position >= 0:
+            if value or position >= units:
+                mask = SEGMENT_PATTERNS[value % 10]
+                if position == units and decimals:
+                    mask |= SEGMENT_DP
+                value //= 10
+            elif negative:
+                mask = _MINUS_MASK
+                negative = False
             else:
-                self.digit_buffer[i] = ' '
+                mask = 0
+            self.segments[position] = mask
+            position -= 1
     
     def set_voltage(self, voltage):
-        """Exibe uma tensão formatada (ex: 12.34)"""
-        voltage_str = f"{voltage:.2f}"
-        
-        # Se tem mais de 4 caracteres, reduz precisão
-        if len(voltage_str) > 4:
-            if voltage >= 100:
-                voltage_str = f"{voltage:.1f}"
-            if len(voltage_str) > 4:
-                voltage_str = f"{voltage:.0f}"
-            if len(voltage_str) > 4:
-                voltage_str = "----"  # Overflow
-        
-        self.set_text(voltage_str)
+        """Exibe uma tensão em volts (ex: 12.34)"""
+        if -10000.0 < voltage < 10000.0:
+            self.set_millivolts(int(round(voltage * 1000)))
+        else:
+            # Fora da faixa, infinito ou NaN
+            self.set_millivolts(10000000)
+    
+    def resolution_mv(self, millivolts):
+        """Valor (mV) do último dígito que set_millivolts exibe para esta tensão"""
+        decimals = voltage_decimals(millivolts, self.max_decimals)
+        return VOLTAGE_STEPS[decimals] if decimals >= 0 else VOLTAGE_STEPS[0]
     
     def get_current_text(self):
-        """Retorna o texto atualmente no buffer"""
-        return ''.join(self.digit_buffer).rstrip()
+        """Retorna o texto exibido, com o ponto após o dígito que o acende"""
+        text = ''
+        for mask in self.segments:
+            if mask == SEGMENT_DP:
+                text += '.'
+            elif mask & SEGMENT_DP:
+                text += _mask_char(mask & ~SEGMENT_DP) + '.'
+            else:
+                text += _mask_char(mask)
+        return text.rstrip()
 
 class DisplayController:
-    def __init__(self):
-        """Inicializa o controlador dos 3 displays multiplexados"""
+    def __init__(self, digit_pins=DIGIT_PINS):
+        """Inicializa o controlador dos displays multiplexados, um por entrada de digit_pins"""
         # Configura pinos dos segmentos (compartilhados)
         self.segment_pins = {}
         segment_names = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'dp']
@@ -84,11 +157,14 @@ class DisplayController:
             self.segment_pins[segment_name] = Pin(pin_num, Pin.OUT)
             self.segment_pins[segment_name].value(0)  # Inicia apagado (cátodo comum)
         
-        # Inicializa os 3 displays
+        # Mesmos pinos em ordem de bit (A=bit 0 ... DP=bit 7) para o callback
+        self.segment_list = [self.segment_pins[name] for name in segment_names]
+        
+        # Inicializa os displays (padrão: DIGIT_PINS)
         self.displays = []
-        for i in range(3):
+        for i in range(len(digit_pins)):
             try:
-                display = MultiplexedDisplay(i)
+                display = MultiplexedDisplay(i, digit_pins)
                 self.displays.append(display)
                 print(f"Display {i+1} inicializado")
             except Exception as e:
@@ -107,9 +183,14 @@ class DisplayController:
     
     def start_multiplexing(self):
         """Inicia o timer de multiplexação"""
-        # Frequência: 200Hz total = ~16.7Hz por dígito por display (200Hz / 3 displays / 4 dígitos)
-        period_us = int(1000000 / (MULTIPLEX_FREQUENCY * 3 * 4))  # Período em microssegundos
-        self.multiplex_timer.init(period=period_us, mode=Timer.PERIODIC, callback=self._multiplex_callback)
+        # Um tick por dígito: cada dígito acende MULTIPLEX_FREQUENCY vezes/s,
+        # limitado a MULTIPLEX_MAX_TICK_HZ no total (com muitos displays a
+        # taxa por dígito cai para MULTIPLEX_MAX_TICK_HZ / (4 * displays)).
+        # Timer.init recebe freq em Hz: period seria interpretado em ms.
+        tick_hz = min(MULTIPLEX_FREQUENCY * 4 * max(1, len(self.displays)), MULTIPLEX_MAX_TICK_HZ)
+        self.multiplex_tick_hz = tick_hz
+        self.multiplex_period_us = 1000000 // tick_hz  # Orçamento do callback (métrica de overrun)
+        self.multiplex_timer.init(freq=tick_hz, mode=Timer.PERIODIC, callback=self._multiplex_callback)
     
     def stop_multiplexing(self):
         """Para a multiplexação"""
@@ -121,6 +202,7 @@ class DisplayController:
     
     def _multiplex_callback(self, timer):
         """Callback do timer de multiplexação"""
+        start = time.ticks_us()
         try:
             # Apaga tudo primeiro
             self.clear_all_segments()
@@ -132,36 +214,44 @@ class DisplayController:
                 # Liga o dígito atual
                 display.turn_on_digit(self.current_digit)
                 
-                # Exibe o caractere correspondente
-                char = display.digit_buffer[self.current_digit]
-                self.set_segments_for_char(char)
+                # Acende os segmentos do dígito (ponto decimal incluído)
+                self.set_segment_mask(display.segments[self.current_digit])
             
             # Avança para próximo dígito/display
             self.current_digit += 1
             if self.current_digit >= 4:
                 self.current_digit = 0
                 self.current_display += 1
-                if self.current_display >= 3:
+                if self.current_display >= len(self.displays):
                     self.current_display = 0
                     
         except Exception as e:
             # Ignora erros no timer para não travar o sistema
             pass
+        
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        metrics.inc(C_MUX_TICKS)
+        metrics.observe(H_MUX_CALLBACK, elapsed)
+        if elapsed > self.multiplex_period_us:
+            metrics.inc(C_MUX_OVERRUNS)
     
     def clear_all_segments(self):
         """Apaga todos os segmentos"""
         for pin in self.segment_pins.values():
             pin.value(0)  # Cátodo comum - 0 = apagado
     
+    def set_segment_mask(self, mask):
+        """Acende os segmentos de uma máscara (bit 0 = A ... bit 7 = DP)"""
+        # Máscara já na lógica de cátodo comum: bit 1 = segmento aceso
+        for pin in self.segment_list:
+            pin.value(mask & 1)
+            mask >>= 1
+    
     def set_segments_for_char(self, char):
         """Define os segmentos para exibir um caractere"""
-        if char in DIGIT_PATTERNS:
-            pattern = DIGIT_PATTERNS[char]
-            for segment, value in pattern.items():
-                if segment in self.segment_pins:
-                    # Inverte a lógica para cátodo comum: 0 vira 1, 1 vira 0
-                    inverted_value = 1 - value
-                    self.segment_pins[segment].value(inverted_value)
+        index = SEGMENT_CHARS.find(char)
+        if index >= 0:
+            self.set_segment_mask(SEGMENT_PATTERNS[index])
         else:
             # Caractere desconhecido - apaga tudo
             self.clear_all_segments()
@@ -173,6 +263,13 @@ class DisplayController:
             return True
         return False
     
+    def display_millivolts(self, display_index, millivolts):
+        """Exibe uma tensão em mV (inteiro) em um display específico; não aloca"""
+        if 0 <= display_index < len(self.displays) and self.displays[display_index]:
+            self.displays[display_index].set_millivolts(millivolts)
+            return True
+        return False
+    
     def display_text(self, display_index, text):
         """Exibe texto em um display específico"""
         if 0 <= display_index < len(self.displays) and self.displays[display_index]:
@@ -181,17 +278,17 @@ class DisplayController:
         return False
     
     def display_voltages(self, voltages):
-        """Exibe as 3 tensões nos 3 displays"""
+        """Exibe as tensões nos displays (uma por display, na ordem)"""
         success = True
-        for i, voltage in enumerate(voltages[:3]):
+        for i, voltage in enumerate(voltages[:len(self.displays)]):
             if not self.display_voltage(i, voltage):
                 success = False
         return success
     
     def display_texts(self, texts):
-        """Exibe textos nos 3 displays"""
+        """Exibe textos nos displays (um por display, na ordem)"""
         success = True
-        for i, text in enumerate(texts[:3]):
+        for i, text in enumerate(texts[:len(self.displays)]):
             if not self.display_text(i, text):
                 success = False
         return success
@@ -250,8 +347,7 @@ class DisplayController:
                         if display:
                             for digit in range(4):
                                 display.turn_on_digit(digit)
-                                char = display.digit_buffer[digit]
-                                self.set_segments_for_char(char)
+                                self.set_segment_mask(display.segments[digit])
                                 time.sleep_ms(2)  # 2ms por dígito
                                 display.turn_off_all_digits()
                 
@@ -270,8 +366,7 @@ class DisplayController:
                     if display:
                         for digit in range(4):
                             display.turn_on_digit(digit)
-                            char = display.digit_buffer[digit]
-                            self.set_segments_for_char(char)
+                            self.set_segment_mask(display.segments[digit])
                             time.sleep_ms(2)
                             display.turn_off_all_digits()
             
@@ -5,7 +5,6 @@ Recebe dados via BLE e exibe nos displays
 
 import time
 import sys
-import gc
 from machine import Pin
 
 # Adiciona o diretório comum ao path
@@ -14,18 +13,24 @@ sys.path.append('/common')
 # Importações locais
 from display_controller import DisplayController
 from ble_server import BLEDisplayServer
+from presentation import VoltagePresenter
 from ble_utils import print_debug
+from memory import memory
 
 class DisplayNode:
     def __init__(self):
         """Inicializa o nó display"""
         print_debug("Inicializando nó Display com displays multiplexados...")
         
+        # Pré-aloca buffers de vida longa e agenda o GC antes de criar os objetos do nó
+        memory.init()
+        
         # Estado do nó (inicializar antes de tudo)
         self.running = False
         self.last_heartbeat = time.time()
         self.ble_server = None
         self.display_controller = None
+        self.presenter = None
         
         # LED indicador de status
         self.status_led = Pin(2, Pin.OUT)
@@ -44,7 +49,10 @@ class DisplayNode:
         # Inicializa o servidor BLE
         try:
             print_debug("Tentando inicializar servidor BLE...")
-            self.ble_server = BLEDisplayServer(self.display_controller)
+            # Frames recebidos passam pelo pipeline de apresentação (suavização,
+            # histerese e taxa de redesenho própria)
+            self.presenter = VoltagePresenter(self.display_controller)
+            self.ble_server = BLEDisplayServer(self.display_controller, self.presenter)
             print_debug("Servidor BLE inicializado com sucesso")
             self.running = True  # Só marca como funcionando se BLE OK
         except Exception as e:
@@ -112,24 +120,36 @@ class DisplayNode:
         print_debug("Iniciando loop principal...")
         
         last_status_time = time.time()
+        last_metrics_time = time.time()
         
         try:
             while self.running:
                 # Heartbeat
                 self.heartbeat()
                 
+                # Redesenha as tensões recebidas no ritmo do pipeline de apresentação
+                if self.ble_server:
+                    self.ble_server.refresh_display(time.ticks_ms())
+                
                 # Status info a cada 15 segundos
                 current_time = time.time()
                 if current_time - last_status_time >= 15:
                     self.status_info()
                     last_status_time = current_time
                 
-                # Limpa memória periodicamente
-                if current_time % 30 < 0.1:  # A cada 30 segundos
-                    gc.collect()
+                # Publica métricas na característica de diagnóstico
+                if self.ble_server and current_time - last_metrics_time >= 5:
+                    self.ble_server.publish_metrics()
+                    last_metrics_time = current_time
                 
-                # Small delay para não sobrecarregar o CPU
-                time.sleep(0.1)
+                # Coleta de lixo só em janela ociosa (sem atividade BLE recente)
+                memory.idle_window()
+                
+                # Small delay para não sobrecarregar o CPU (menor se o redesenho pede)
+                if self.presenter:
+                    time.sleep_ms(min(100, max(10, self.presenter.until_next(time.ticks_ms()))))
+                else:
+                    time.sleep(0.1)
                 
         except KeyboardInterrupt:
             print_debug("Interrupção pelo usuário")
@@ -8,9 +8,9 @@ import sys
 import gc
 sys.path.append('/common')
 
-from constants import *
 from display_controller import DisplayController
 from ble_server_fixed import FixedBLEDisplayServer
+from memory import memory
 
 def main():
     """Função principal do nó display com tratamento robusto de erros"""
@@ -20,8 +20,8 @@ def main():
     ble_server = None
     
     try:
-        # Força limpeza inicial de memória
-        gc.collect()
+        # Limpeza inicial, buffers pré-alocados e gc.threshold
+        memory.init()
         
         # Inicializa controlador do display
         print("Inicializando controlador do display...")
@@ -45,8 +45,8 @@ def main():
         print("✓ Nó Display pronto para receber conexões")
         
         # Loop principal
-        loop_count = 0
         last_status_time = 0
+        last_metrics_time = 0
         status_interval = 30  # Status a cada 30 segundos
         
         while True:
@@ -62,11 +62,13 @@ def main():
                     print(f"Status: {num_connections} conexões ativas")
                     last_status_time = current_time
                 
-                # Garbage collection periódico
-                loop_count += 1
-                if loop_count % 1000 == 0:
-                    gc.collect()
-                    loop_count = 0
+                # Métricas na característica de diagnóstico
+                if ble_server and current_time - last_metrics_time >= 5:
+                    ble_server.publish_metrics()
+                    last_metrics_time = current_time
+                
+                # Coleta de lixo só em janela ociosa (sem atividade BLE recente)
+                memory.idle_window()
                 
                 # Delay pequeno para não sobrecarregar
                 time.sleep(0.001)
@@ -8,7 +8,6 @@ import sys
 import gc
 sys.path.append('/common')
 
-from constants import *
 from display_controller import DisplayController
 from ble_server_no_advertising import NoAdvertisingDisplayServer
 
@@ -0,0 +1,151 @@
+"""
+Pipeline de apresentação das tensões recebidas pelo display
+Fica entre a decodificação do frame BLE e display_voltages: a IRQ só
+registra o frame (com suavização EMA opcional) e o loop principal redesenha
+os displays num ritmo próprio, legível para uma pessoa, independente da
+taxa de recepção BLE.
+
+O último dígito tem histerese: um canal só é redesenhado quando o valor
+sai da faixa do dígito exibido mais uma margem, o que evita o "pisca"
+entre dois valores vizinhos com a tensão parada na fronteira.
+
+Configurável em tempo de execução pela característica de comandos:
+    SMOOTH:<‰>     peso da amostra nova na EMA (1000 desliga a suavização)
+    HYST:<‰>       margem além de meio dígito, em milésimos do dígito
+    REFRESH:<ms>   intervalo mínimo entre redesenhos
+"""
+
+import time
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+REFRESH_MS = const(250)         # ~4 atualizações/s: legível sem parecer travado
+REFRESH_MIN_MS = const(50)
+EMA_OFF = const(1000)           # amostra nova com peso total: sem suavização
+HYSTERESIS_PERMILLE = const(250)  # redesenha a 0,75 dígito do valor exibido
+
+
+class VoltagePresenter:
+    """Suaviza, aplica histerese e limita a taxa de redesenho; não aloca por frame"""
+
+    def __init__(self, display_controller, refresh_ms=REFRESH_MS, alpha_permille=EMA_OFF,
+                 hysteresis_permille=HYSTERESIS_PERMILLE):
+        self.display_controller = display_controller
+        self.refresh_ms = refresh_ms
+        self.alpha_permille = alpha_permille
+        self.hysteresis_permille = hysteresis_permille
+        # Um canal por display; o log do display lê os 3 primeiros
+        self.channels = len(display_controller.displays)
+        size = max(3, self.channels)
+        self.filtered_mv = array('i', [0] * size)
+        self.shown_mv = array('i', [0] * size)   # centro do dígito exibido
+        self.shown = bytearray(size)             # canal já desenhado pelo pipeline
+        self.primed = bytearray(size)            # canal já recebeu um valor (base da EMA)
+        self.fresh = False
+        self.last_refresh = None
+        self.frames = 0
+        self.refreshes = 0
+        self.redraws = 0
+
+    def receive(self, voltages):
+        """Registra um frame decodificado (V), um valor por canal; seguro na IRQ"""
+        for i in range(min(self.channels, len(voltages))):
+            self._filter(i, int(voltages[i] * 1000))
+        self._received()
+
+    def receive_uv(self, microvolts, bitmap):
+        """Registra um frame inteiro (µV); só os canais do bitmap mudam; não aloca"""
+        channel = 0
+        while bitmap and channel < self.channels:
+            if bitmap & 1:
+                self._filter(channel, (microvolts[channel] + 500) // 1000)
+            bitmap >>= 1
+            channel += 1
+        self._received()
+
+    def _filter(self, channel, mv):
+        if self.primed[channel] and self.alpha_permille < EMA_OFF:
+            mv = self.filtered_mv[channel] + (mv - self.filtered_mv[channel]) * self.alpha_permille // 1000
+        self.filtered_mv[channel] = mv
+        self.primed[channel] = 1
+
+    def _received(self):
+        self.fresh = True
+        self.frames += 1
+
+    def reset(self):
+        """Esquece o histórico: o próximo frame é exibido como chegou"""
+        for i in range(len(self.shown)):
+            self.primed[i] = 0
+            self.shown[i] = 0
+        self.last_refresh = None
+
+    def until_next(self, now):
+        """Milissegundos até o próximo redesenho possível (sem frame novo: refresh_ms)"""
+        if not self.fresh:
+            return self.refresh_ms
+        if self.last_refresh is None:
+            return 0
+        return max(0, self.refresh_ms - time.ticks_diff(now, self.last_refresh))
+
+    def refresh(self, now):
+        """Redesenha os canais que saíram da histerese; True se algo mudou
+
+        Chamado pelo loop principal. Sem frame novo desde o último redesenho
+        não faz nada, então comandos manuais (VOLT:, TEXT:) não são apagados.
+        """
+        if not self.fresh:
+            return False
+        if self.last_refresh is not None and \
+                time.ticks_diff(now, self.last_refresh) < self.refresh_ms:
+            return False
+        self.last_refresh = now
+        self.fresh = False
+        self.refreshes += 1
+        changed = False
+        for i in range(self.channels):
+            display = self.display_controller.displays[i]
+            if not display or not self.primed[i]:
+                continue
+            mv = self.filtered_mv[i]
+            if self.shown[i]:
+                shown = self.shown_mv[i]
+                step = display.resolution_mv(shown)
+                if abs(mv - shown) * 1000 <= step * (500 + self.hysteresis_permille):
+                    continue
+            step = display.resolution_mv(mv)
+            # Centro do dígito que set_millivolts vai exibir (arredondado)
+            self.shown_mv[i] = (mv + step // 2) // step * step
+            self.shown[i] = 1
+            display.set_millivolts(mv)
+            changed = True
+        if changed:
+            self.redraws += 1
+        return changed
+
+    def describe(self):
+        """Configuração atual em texto (resposta aos comandos)"""
+        return 'SMOOTH:%d;HYST:%d;REFRESH:%d;FRAMES:%d;REDRAWS:%d' % (
+            self.alpha_permille, self.hysteresis_permille, self.refresh_ms,
+            self.frames, self.redraws)
+
+    def command(self, text):
+        """Aplica um comando SMOOTH:/HYST:/REFRESH:; retorna False se não reconhecido"""
+        if text.startswith('SMOOTH:'):
+            self.alpha_permille = min(EMA_OFF, max(1, int(text[7:])))
+            for i in range(len(self.primed)):
+                self.primed[i] = 0
+            return True
+        if text.startswith('HYST:'):
+            self.hysteresis_permille = max(0, int(text[5:]))
+            return True
+        if text.startswith('REFRESH:'):
+            self.refresh_ms = max(REFRESH_MIN_MS, int(text[8:]))
+            return True
+        return False
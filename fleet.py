@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Ferramenta de frota: varredura contínua e provisionamento em paralelo
+Acompanha todos os nós ESP32_Display/ESP32_Voltmeter anunciando por perto
+(histórico de RSSI por endereço) e carrega o firmware em várias placas ao
+mesmo tempo, uma tarefa por porta serial num pool de tamanho limitado:
+
+    python3 fleet.py scan                          # tabela ao vivo (Ctrl+C sai)
+    python3 fleet.py scan --duration 30
+    python3 fleet.py provision display /dev/ttyUSB0 /dev/ttyUSB1 /dev/ttyUSB2
+    python3 fleet.py provision voltmeter /dev/ttyUSB* --workers 8 --mode py
+
+Com --mock N a varredura e as portas seriais são simuladas (N nós falsos),
+para testar a ferramenta sem hardware:
+
+    python3 fleet.py scan --mock 40 --duration 5
+    python3 fleet.py provision display --mock 24 --workers 6
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import build_mpy
+
+BLE_NAME_DISPLAY = "ESP32_Display"
+BLE_NAME_VOLTMETER = "ESP32_Voltmeter"
+ROLE_NAMES = {BLE_NAME_DISPLAY: 'display', BLE_NAME_VOLTMETER: 'voltmeter'}
+
+RSSI_HISTORY = 32        # leituras de RSSI guardadas por nó
+STALE_SECONDS = 10.0     # sem anúncios há mais tempo: nó marcado como ausente
+
+
+# ---------------------------------------------------------------------------
+# Varredura
+# ---------------------------------------------------------------------------
+
+def node_role(name):
+    """Papel do nó a partir do nome anunciado, ou None se não for da frota"""
+    if not name:
+        return None
+    for prefix, role in ROLE_NAMES.items():
+        if name.startswith(prefix):
+            return role
+    return None
+
+
+class NodeRecord:
+    """Estado de um nó visto na varredura"""
+
+    __slots__ = ('address', 'name', 'role', 'rssi', 'first_seen', 'last_seen', 'adverts')
+
+    def __init__(self, address, name, role, now):
+        self.address = address
+        self.name = name
+        self.role = role
+        self.rssi = deque(maxlen=RSSI_HISTORY)
+        self.first_seen = now
+        self.last_seen = now
+        self.adverts = 0
+
+    def mean_rssi(self):
+        return sum(self.rssi) / len(self.rssi) if self.rssi else None
+
+
+class NodeTable:
+    """Nós da frota indexados por endereço, alimentados pelo callback do scanner"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.nodes = {}
+
+    def observe(self, address, name, rssi):
+        """Registra um anúncio; ignora dispositivos que não são da frota"""
+        record = self.nodes.get(address)
+        if record is None:
+            role = node_role(name)
+            if role is None:
+                return None
+            record = self.nodes[address] = NodeRecord(address, name, role, self.clock())
+        elif name and name != record.name:
+            # Resposta de scan pode trazer o nome completo depois
+            record.name = name
+        record.last_seen = self.clock()
+        record.adverts += 1
+        if rssi is not None:
+            record.rssi.append(rssi)
+        return record
+
+    def active(self, stale=STALE_SECONDS):
+        now = self.clock()
+        return [r for r in self.nodes.values() if now - r.last_seen <= stale]
+
+    def format(self, stale=STALE_SECONDS):
+        now = self.clock()
+        lines = [f"{'Endereço':17s} {'Nome':20s} {'Papel':9s} {'RSSI':>5s} "
+                 f"{'média':>6s} {'mín':>5s} {'máx':>5s} {'anúncios':>8s} {'visto':>7s}"]
+        records = sorted(self.nodes.values(), key=lambda r: (r.role, r.address))
+        for r in records:
+            age = now - r.last_seen
+            last = r.rssi[-1] if r.rssi else 0
+            mean = r.mean_rssi() or 0
+            low = min(r.rssi) if r.rssi else 0
+            high = max(r.rssi) if r.rssi else 0
+            seen = f"{age:5.1f}s" if age <= stale else "ausente"
+            lines.append(f"{r.address:17s} {(r.name or '')[:20]:20s} {r.role:9s} {last:5d} "
+                         f"{mean:6.1f} {low:5d} {high:5d} {r.adverts:8d} {seen:>7s}")
+        active = len(self.active(stale))
+        roles = {}
+        for r in self.nodes.values():
+            roles[r.role] = roles.get(r.role, 0) + 1
+        summary = ', '.join(f"{count} {role}" for role, count in sorted(roles.items()))
+        lines.append(f"{len(self.nodes)} nós ({summary or 'nenhum'}), {active} ativos")
+        return '\n'.join(lines)
+
+
+class BleakSource:
+    """Varredura contínua com BleakScanner e callback de detecção"""
+
+    def __init__(self, table):
+        self.table = table
+        self.scanner = None
+
+    def _detected(self, device, advertisement):
+        name = advertisement.local_name or device.name
+        self.table.observe(device.address, name, advertisement.rssi)
+
+    async def start(self):
+        from bleak import BleakScanner
+        self.scanner = BleakScanner(detection_callback=self._detected)
+        await self.scanner.start()
+
+    async def stop(self):
+        if self.scanner:
+            await self.scanner.stop()
+
+
+class MockSource:
+    """Anúncios simulados de uma frota falsa (RSSI com ruído e anúncios perdidos)"""
+
+    def __init__(self, table, count, seed=1):
+        self.table = table
+        self.random = random.Random(seed)
+        self.nodes = []
+        for i in range(count):
+            name = BLE_NAME_DISPLAY if i % 2 else BLE_NAME_VOLTMETER
+            address = "02:00:00:00:%02X:%02X" % (i >> 8, i & 0xFF)
+            self.nodes.append((address, name, self.random.randint(-90, -45)))
+        self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(0.02)
+            address, name, base = self.random.choice(self.nodes)
+            if self.random.random() < 0.02:
+                continue                     # anúncio perdido
+            self.table.observe(address, name, base + self.random.randint(-6, 6))
+            if self.random.random() < 0.05:
+                # Dispositivo estranho à frota, deve ser ignorado
+                self.table.observe("02:FF:FF:FF:FF:%02X" % self.random.randint(0, 255),
+                                   "Headphones", -70)
+
+    async def start(self):
+        self.task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+
+
+async def scan(source, table, duration=None, refresh=2.0):
+    """Varre até duration segundos (ou Ctrl+C), redesenhando a tabela"""
+    await source.start()
+    began = time.monotonic()
+    try:
+        while duration is None or time.monotonic() - began < duration:
+            wait = refresh if duration is None else min(refresh, duration - (time.monotonic() - began))
+            await asyncio.sleep(max(0.0, wait))
+            print(f"\n--- {time.strftime('%H:%M:%S')} ---")
+            print(table.format())
+    finally:
+        await source.stop()
+
+
+# ---------------------------------------------------------------------------
+# Provisionamento
+# ---------------------------------------------------------------------------
+
+def upload_plan(role, compiled):
+    """Lista (arquivo local, destino no ESP32, variante a remover) de um nó"""
+    out_dir = os.path.join(build_mpy.BUILD_DIR, role)
+    plan = []
+    for source in build_mpy.role_sources(role):
+        if compiled:
+            local = os.path.join(out_dir, build_mpy.device_path(source, True).lstrip('/'))
+        else:
+            local = os.path.join(build_mpy.ROOT, source)
+        plan.append((local, build_mpy.device_path(source, compiled),
+                     build_mpy.device_path(source, not compiled)))
+    # main.py do nó por último: a placa só passa a executar o código novo no fim
+    main = os.path.join(build_mpy.ROOT, role + '_node', 'main.py')
+    plan.append((main, '/main.py', None))
+    return plan
+
+
+class AmpyTransport:
+    """Acesso ao sistema de arquivos do ESP32 por uma porta serial (ampy)"""
+
+    def __init__(self, port):
+        self.port = port
+
+    def mkdir(self, path):
+        build_mpy.ampy(self.port, 'mkdir', path)
+
+    def remove(self, path):
+        build_mpy.ampy(self.port, 'rm', path)
+
+    def put(self, local, remote):
+        result = build_mpy.ampy(self.port, 'put', local, remote)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip() or f"ampy put {remote} falhou")
+
+
+class MockTransport:
+    """Porta serial simulada: latência proporcional ao tamanho e falhas raras"""
+
+    BYTES_PER_SECOND = 11000      # ~ampy a 115200 baud com overhead do REPL bruto
+
+    def __init__(self, port, fail_rate=0.0, seed=None):
+        self.port = port
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed if seed is not None else port)
+        self.files = {}
+
+    def _delay(self, size=0):
+        time.sleep(0.02 + size / self.BYTES_PER_SECOND * self.random.uniform(0.8, 1.2))
+
+    def mkdir(self, path):
+        self._delay()
+
+    def remove(self, path):
+        self._delay()
+        self.files.pop(path, None)
+
+    def put(self, local, remote):
+        size = os.path.getsize(local)
+        self._delay(size)
+        if self.random.random() < self.fail_rate:
+            raise RuntimeError("timeout no REPL bruto (simulado)")
+        self.files[remote] = size
+
+
+class Progress:
+    """Relato de progresso por nó, seguro entre threads"""
+
+    def __init__(self, total_nodes):
+        self.lock = threading.Lock()
+        self.total_nodes = total_nodes
+        self.done = 0
+
+    def step(self, port, index, total, remote, elapsed_ms):
+        with self.lock:
+            print(f"[{port}] {index}/{total} {remote} ({elapsed_ms:.0f} ms)")
+
+    def finished(self, result):
+        with self.lock:
+            self.done += 1
+            mark = '✓' if result['ok'] else '❌'
+            detail = f"{result['seconds']:.1f}s" if result['ok'] else result['error']
+            print(f"{mark} [{result['port']}] {detail}  ({self.done}/{self.total_nodes} nós)")
+
+
+def provision_node(transport, plan, progress=None, retries=1):
+    """Carrega o plano numa placa; retorna o resultado com tempos por arquivo"""
+    result = {'port': transport.port, 'ok': False, 'error': None, 'files': [], 'bytes': 0}
+    began = time.perf_counter()
+    try:
+        transport.mkdir('/common')
+        for index, (local, remote, stale) in enumerate(plan, 1):
+            step_began = time.perf_counter()
+            if stale:
+                # O import do MicroPython prefere .py a .mpy: remove a outra variante
+                transport.remove(stale)
+            for attempt in range(retries + 1):
+                try:
+                    transport.put(local, remote)
+                    break
+                except RuntimeError:
+                    if attempt == retries:
+                        raise
+            elapsed_ms = (time.perf_counter() - step_began) * 1000
+            result['files'].append((remote, round(elapsed_ms, 1)))
+            result['bytes'] += os.path.getsize(local)
+            if progress:
+                progress.step(transport.port, index, len(plan), remote, elapsed_ms)
+        result['ok'] = True
+    except (RuntimeError, OSError) as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - began
+    if progress:
+        progress.finished(result)
+    return result
+
+
+def provision(transports, plan, workers=4, retries=1, verbose=False):
+    """Provisiona várias placas em paralelo com no máximo workers simultâneas"""
+    progress = Progress(len(transports))
+    step_progress = progress if verbose else None
+    results = []
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(provision_node, t, plan, step_progress, retries) for t in transports]
+        for future in as_completed(futures):
+            result = future.result()
+            if not verbose:
+                progress.finished(result)
+            results.append(result)
+    wall = time.perf_counter() - began
+    return sorted(results, key=lambda r: r['port']), wall
+
+
+def format_report(results, wall):
+    lines = [f"\n{'Porta':16s} {'Estado':8s} {'Tempo':>7s} {'Arquivos':>8s} {'KB':>6s} {'Mais lento':30s}"]
+    for r in results:
+        slowest = max(r['files'], key=lambda f: f[1]) if r['files'] else ('-', 0)
+        state = 'ok' if r['ok'] else 'FALHA'
+        lines.append(f"{r['port']:16s} {state:8s} {r['seconds']:6.1f}s {len(r['files']):8d} "
+                     f"{r['bytes'] / 1024:6.1f} {slowest[0]} ({slowest[1]:.0f} ms)")
+    ok = sum(1 for r in results if r['ok'])
+    serial_time = sum(r['seconds'] for r in results)
+    lines.append(f"{ok}/{len(results)} nós provisionados em {wall:.1f}s "
+                 f"(sequencial seria ~{serial_time:.1f}s, {serial_time / wall if wall else 0:.1f}x)")
+    for r in results:
+        if not r['ok']:
+            lines.append(f"❌ {r['port']}: {r['error']}")
+    return '\n'.join(lines)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def cmd_scan(args):
+    table = NodeTable()
+    source = MockSource(table, args.mock) if args.mock else BleakSource(table)
+    try:
+        asyncio.run(scan(source, table, args.duration, args.refresh))
+    except KeyboardInterrupt:
+        print("\nVarredura interrompida")
+        print(table.format())
+    return 0
+
+
+def cmd_provision(args):
+    compiled = args.mode == 'mpy'
+    if compiled:
+        mpy_cross = build_mpy.find_mpy_cross()
+        if not mpy_cross:
+            print("⚠️ mpy-cross não encontrado - carregando arquivos fonte")
+            compiled = False
+        elif build_mpy.build_role(args.role, mpy_cross) is None:
+            return 1
+
+    plan = upload_plan(args.role, compiled)
+    if args.mock:
+        ports = [f"mock{i:02d}" for i in range(args.mock)]
+        transports = [MockTransport(p, args.mock_fail_rate) for p in ports]
+    else:
+        if not args.ports:
+            print("❌ Informe as portas seriais (ou --mock N)")
+            return 1
+        transports = [AmpyTransport(p) for p in args.ports]
+
+    total = sum(os.path.getsize(local) for local, _, _ in plan)
+    print(f"Provisionando {len(transports)} placas ({args.role}, "
+          f"{'mpy' if compiled else 'py'}, {len(plan)} arquivos, {total / 1024:.1f} KB) "
+          f"com {args.workers} em paralelo")
+    results, wall = provision(transports, plan, args.workers, args.retries, args.verbose)
+    print(format_report(results, wall))
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura e provisionamento da frota de ESP32")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('scan', help="varredura contínua dos nós")
+    p.add_argument('--duration', type=float, help="segundos de varredura (padrão: até Ctrl+C)")
+    p.add_argument('--refresh', type=float, default=2.0, help="intervalo da tabela (s)")
+    p.add_argument('--mock', type=int, metavar='N', help="simula N nós")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser('provision', help="carrega o firmware em várias placas")
+    p.add_argument('role', choices=list(build_mpy.ROLES))
+    p.add_argument('ports', nargs='*')
+    p.add_argument('--workers', type=int, default=4, help="placas simultâneas (padrão: 4)")
+    p.add_argument('--mode', choices=['mpy', 'py'], default='mpy')
+    p.add_argument('--retries', type=int, default=1, help="novas tentativas por arquivo")
+    p.add_argument('--verbose', action='store_true', help="mostra cada arquivo carregado")
+    p.add_argument('--mock', type=int, metavar='N', help="simula N placas")
+    p.add_argument('--mock-fail-rate', type=float, default=0.0,
+                   help="probabilidade de falha por arquivo nas placas simuladas")
+    p.set_defaults(func=cmd_provision)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
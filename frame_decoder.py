@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Decodificação em lote de capturas de notificações de tensão
+Uma captura é um buffer com os frames concatenados mais um índice de offsets
+(início de cada frame; o frame vai até o offset seguinte). Cada frame válido
+tem 12 bytes '<fff' (BLEUtils.encode_voltage_data, canais 1 a 3) ou o
+formato inteiro: tipo 0xB5 + bitmap u16 + um int32 em µV por bit do bitmap
+(BLEUtils.pack_voltage_uv; valores na ordem dos bits). O número de colunas
+vem do bitmap: decode_bulk devolve os frames de um bitmap e
+decode_by_bitmap separa uma captura com vários. Frames com tamanho que não
+bate com o bitmap ou valores não finitos são reportados pelo índice, nunca
+zerados.
+
+    python3 frame_decoder.py bench            # compara com o laço frame a frame
+    python3 frame_decoder.py bench 2000000
+
+Usa NumPy quando disponível; sem NumPy devolve array.array('f').
+"""
+
+import math
+import struct
+import sys
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+FRAME_SIZE = 12
+VOLTAGE_FRAME_UV = 0xB5     # common/constants.py
+VOLTAGE_FRAME_HEADER = 3    # tipo + bitmap de canais (u16)
+LEGACY_BITMAP = 0b111       # frames '<fff': canais 1 a 3
+
+
+class DecodedFrames:
+    """Resultado do decodificador em lote para um bitmap de canais
+
+    bitmap:   canais decodificados (bit 0 = canal 1)
+    channels: um array por bit do bitmap (volts), só com os frames válidos
+    frames:   índice na captura de cada linha de channels
+    corrupt:  índices dos frames rejeitados
+    other:    índices dos frames bem formados de outro bitmap
+    """
+
+    __slots__ = ('bitmap', 'channels', 'frames', 'corrupt', 'other')
+
+    def __init__(self, bitmap, channels, frames, corrupt, other):
+        self.bitmap = bitmap
+        self.channels = channels
+        self.frames = frames
+        self.corrupt = corrupt
+        self.other = other
+
+    def __len__(self):
+        return len(self.frames)
+
+
+def frame_lengths(offsets, total):
+    """Tamanho de cada frame a partir dos offsets e do tamanho do buffer"""
+    if np is not None:
+        offsets = np.asarray(offsets, dtype=np.int64)
+        return np.diff(np.append(offsets, total))
+    return [end - start for start, end in zip(offsets, list(offsets[1:]) + [total])]
+
+
+def frame_bitmap(buffer, start, size):
+    """Bitmap de um frame bem formado ('<fff': LEGACY_BITMAP)"""
+    if size == FRAME_SIZE:
+        return LEGACY_BITMAP
+    return buffer[start + 1] | (buffer[start + 2] << 8)
+
+
+def decode_bulk(buffer, offsets, bitmap=None):
+    """Decodifica numa única passada os frames de um bitmap de canais
+
+    bitmap None: o do primeiro frame bem formado da captura.
+    """
+    if bitmap is not None and not 0 < bitmap <= 0xFFFF:
+        raise ValueError(f"bitmap inválido: {bitmap}")
+    if np is not None:
+        return _decode_numpy(buffer, offsets, bitmap)
+    return _decode_python(buffer, offsets, bitmap)
+
+
+def decode_by_bitmap(buffer, offsets):
+    """Um DecodedFrames por bitmap presente na captura, na ordem em que aparecem"""
+    groups = {}
+    result = decode_bulk(buffer, offsets)
+    groups[result.bitmap] = result
+    pending = [int(i) for i in result.other]
+    while pending:
+        i = pending[0]
+        start = int(offsets[i])
+        end = int(offsets[i + 1]) if i + 1 < len(offsets) else len(buffer)
+        result = decode_bulk(buffer, offsets, frame_bitmap(buffer, start, end - start))
+        groups[result.bitmap] = result
+        done = set(int(i) for i in result.frames) | set(int(i) for i in result.corrupt)
+        pending = [i for i in pending if i not in done]
+    return groups
+
+
+def _popcount16(values):
+    values = np.ascontiguousarray(values, dtype='<u2')
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 2), axis=1).sum(axis=1)
+
+
+def _decode_numpy(buffer, offsets, bitmap):
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    count = len(offsets)
+    if bitmap in (None, LEGACY_BITMAP) and count and offsets[0] == 0 and len(data) == count * FRAME_SIZE and \
+            np.array_equal(offsets, np.arange(count, dtype=np.int64) * FRAME_SIZE):
+        # Caso comum: todos os frames com 12 bytes, contíguos - visão sem cópia
+        bitmap = LEGACY_BITMAP
+        values = data.view('<f4').reshape(count, 3)
+        formed = selected = np.ones(count, dtype=bool)
+    else:
+        lengths = frame_lengths(offsets, len(data))
+        heads = np.zeros((count, VOLTAGE_FRAME_HEADER), dtype=np.uint8)
+        header = lengths > VOLTAGE_FRAME_HEADER
+        heads[header] = data[offsets[header][:, None] + np.arange(VOLTAGE_FRAME_HEADER)]
+        bitmaps = heads[:, 1].astype(np.int64) | (heads[:, 2].astype(np.int64) << 8)
+        legacy = lengths == FRAME_SIZE
+        uv = (heads[:, 0] == VOLTAGE_FRAME_UV) & (bitmaps != 0) & \
+            (lengths == VOLTAGE_FRAME_HEADER + 4 * _popcount16(bitmaps))
+        bitmaps[legacy] = LEGACY_BITMAP
+        formed = legacy | uv
+        if bitmap is None:
+            first = np.flatnonzero(formed)
+            bitmap = int(bitmaps[first[0]]) if len(first) else LEGACY_BITMAP
+        width = bin(bitmap).count('1')
+        selected = formed & (bitmaps == bitmap)
+        values = np.zeros((count, width), dtype='<f4')
+        rows = selected & legacy
+        if rows.any():
+            values[rows] = data[offsets[rows][:, None] + np.arange(FRAME_SIZE)].view('<f4')
+        rows = selected & uv
+        if rows.any():
+            gathered = data[offsets[rows][:, None] + VOLTAGE_FRAME_HEADER + np.arange(4 * width)]
+            values[rows] = gathered.view('<i4') / 1e6
+    finite = np.isfinite(values).all(axis=1)
+    valid = selected & finite
+    if valid.all():
+        # Sem frames corrompidos: evita a indexação booleana
+        good = values
+        frames = np.arange(count)
+    else:
+        good = values[valid]
+        frames = np.flatnonzero(valid)
+    channels = tuple(np.ascontiguousarray(good[:, c]) for c in range(good.shape[1]))
+    corrupt = np.flatnonzero(~formed | (selected & ~finite))
+    return DecodedFrames(bitmap, channels, frames, corrupt, np.flatnonzero(formed & ~selected))
+
+
+def _decode_python(buffer, offsets, bitmap):
+    channels = None
+    frames = array('I')
+    corrupt = array('I')
+    other = array('I')
+    unpack_from = struct.Struct('<fff').unpack_from
+    unpack_uv = None
+    isfinite = math.isfinite
+    total = len(buffer)
+    count = len(offsets)
+    for i in range(count):
+        start = offsets[i]
+        size = (offsets[i + 1] if i + 1 < count else total) - start
+        if size == FRAME_SIZE:
+            found = LEGACY_BITMAP
+        elif size > VOLTAGE_FRAME_HEADER and buffer[start] == VOLTAGE_FRAME_UV:
+            found = frame_bitmap(buffer, start, size)
+            if not found or size != VOLTAGE_FRAME_HEADER + 4 * bin(found).count('1'):
+                corrupt.append(i)
+                continue
+        else:
+            corrupt.append(i)
+            continue
+        if bitmap is None:
+            bitmap = found
+        if found != bitmap:
+            other.append(i)
+            continue
+        if channels is None:
+            channels = tuple(array('f') for _ in range(bin(bitmap).count('1')))
+            unpack_uv = struct.Struct('<%di' % len(channels)).unpack_from
+        if size == FRAME_SIZE:
+            values = unpack_from(buffer, start)
+        else:
+            values = [uv / 1e6 for uv in unpack_uv(buffer, start + VOLTAGE_FRAME_HEADER)]
+        if not all(isfinite(value) for value in values):
+            corrupt.append(i)
+            continue
+        for channel, value in zip(channels, values):
+            channel.append(value)
+        frames.append(i)
+    if bitmap is None:
+        bitmap = LEGACY_BITMAP
+    if channels is None:
+        channels = tuple(array('f') for _ in range(bin(bitmap).count('1')))
+    return DecodedFrames(bitmap, channels, frames, corrupt, other)
+
+
+def decode_per_frame(buffer, offsets):
+    """Laço frame a frame dos scripts atuais (referência do benchmark)"""
+    total = len(buffer)
+    result = []
+    for i, start in enumerate(offsets):
+        end = offsets[i + 1] if i + 1 < len(offsets) else total
+        try:
+            result.append(struct.unpack('<fff', buffer[start:end][:12]))
+        except struct.error:
+            result.append((0.0, 0.0, 0.0))
+    return result
+
+
+def synthetic_capture(count, corrupt_every=0):
+    """Captura sintética; a cada corrupt_every frames um frame curto ou NaN"""
+    parts = []
+    offsets = array('q')
+    position = 0
+    for i in range(count):
+        if corrupt_every and i % corrupt_every == corrupt_every - 1:
+            frame = b'\x00' * 7 if i % 2 else struct.pack('<fff', float('nan'), 1.0, 2.0)
+        else:
+            frame = struct.pack('<fff', (i % 3300) / 1000, 1.65, 3.3 - (i % 3300) / 1000)
+        offsets.append(position)
+        parts.append(frame)
+        position += len(frame)
+    return b''.join(parts), offsets
+
+
+def bench(count):
+    print(f"Benchmark com {count} frames (NumPy: {'sim' if np is not None else 'não'})")
+    for label, corrupt_every in (("contíguos", 0), ("com corrompidos", 1000)):
+        buffer, offsets = synthetic_capture(count, corrupt_every)
+        began = time.perf_counter()
+        decode_per_frame(buffer, offsets)
+        per_frame = time.perf_counter() - began
+
+        began = time.perf_counter()
+        result = decode_bulk(buffer, offsets)
+        bulk = time.perf_counter() - began
+
+        print(f"  {label}: frame a frame {count / per_frame / 1e6:.2f} Mframes/s, "
+              f"lote {count / bulk / 1e6:.2f} Mframes/s ({per_frame / bulk:.1f}x), "
+              f"{len(result.corrupt)} corrompidos")
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != 'bench':
+        print(__doc__)
+        return 1
+    bench(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Decodificador do log binário dos nós ESP32 (common/logger.py)
+Reconstrói o texto das mensagens no host a partir dos registros drenados:
+
+    python3 log_decoder.py serial /dev/ttyUSB0   # saída serial (LOG:<hex> e eco LOG ...)
+    python3 log_decoder.py file captura.txt      # captura da serial salva em arquivo
+    python3 log_decoder.py ble AA:BB:CC:DD:EE:FF # drena pela característica BLE de log
+
+Na serial, interrompa o nó (Ctrl+C) e execute no REPL:
+    >>> import logger; logger.log.dump()
+"""
+
+import asyncio
+import binascii
+import os
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'common'))
+import logger  # noqa: E402
+
+COMMAND_CHAR_UUID = "11111111-1111-1111-1111-111111111111"
+LOG_CHAR_UUID = "11111111-1111-1111-1111-111111111112"
+
+LEVEL_NAMES = {
+    logger.DEBUG: 'DEBUG',
+    logger.INFO: 'INFO',
+    logger.WARNING: 'WARN',
+    logger.ERROR: 'ERRO',
+}
+
+# Texto de cada msg_id; {a}, {b} e {c} são os argumentos inteiros do registro
+MESSAGES = {
+    logger.MSG_VOLTAGE_RX: "Tensões recebidas: {a}mV, {b}mV, {c}mV",
+    logger.MSG_VOLTAGE_SHOWN: "Tensões exibidas: {a}mV, {b}mV, {c}mV",
+    logger.MSG_VOLTAGE_ERROR: "Erro ao processar dados de tensão (frame de {a} bytes)",
+    logger.MSG_NOTIFY_SENT: "Notificação enviada: {a}mV, {b}mV, {c}mV",
+    logger.MSG_NOTIFY_FAIL: "Falha ao notificar conexão {a}",
+    logger.MSG_CONNECT: "Cliente conectado: {a}, Total conexões: {b}",
+    logger.MSG_DISCONNECT: "Cliente desconectado: {a}, Total conexões: {b}",
+    logger.MSG_IRQ: "Evento IRQ BLE {a} ({b} até agora)",
+    logger.MSG_COMMAND: "Comando recebido ({a} bytes)",
+    logger.MSG_COMMAND_UNKNOWN: "Comando desconhecido ({a} bytes)",
+    logger.MSG_WRITE_DONE: "Escrita GATT concluída, status={a}",
+    logger.MSG_SCAN_MATCH: "Display encontrado! RSSI: {a}",
+    logger.MSG_SEND_FAIL: "Falha ao enviar tensões",
+    logger.MSG_RECONNECT: "Conexão restaurada em {a} ms (cache={b}, tentativas={c})",
+}
+
+
+def decode_record(data):
+    """Decodifica um registro binário de 20 bytes em dicionário"""
+    ticks, level, msg_id, seq, a, b, c = struct.unpack(logger.RECORD_FORMAT, bytes(data))
+    return {'ticks_ms': ticks, 'level': level, 'msg_id': msg_id, 'seq': seq,
+            'a': a, 'b': b, 'c': c}
+
+
+def decode_records(data):
+    """Decodifica uma sequência concatenada de registros"""
+    size = logger.RECORD_SIZE
+    return [decode_record(data[i:i + size]) for i in range(0, len(data) - size + 1, size)]
+
+
+def format_record(record):
+    """Formata um registro como linha de texto"""
+    template = MESSAGES.get(record['msg_id'], "Mensagem {msg_id}: {a} {b} {c}")
+    level = LEVEL_NAMES.get(record['level'], str(record['level']))
+    return f"[{record['ticks_ms']}] {level:5s} {template.format(**record)}"
+
+
+class SequenceTracker:
+    """Detecta registros perdidos (anel sobrescrito) pelos saltos de seq"""
+
+    def __init__(self):
+        self.last_seq = None
+        self.lost = 0
+
+    def check(self, record):
+        gap = 0
+        if self.last_seq is not None:
+            gap = (record['seq'] - self.last_seq - 1) & 0xFFFF
+            self.lost += gap
+        self.last_seq = record['seq']
+        return gap
+
+
+def decode_line(line, tracker=None):
+    """Decodifica uma linha da serial; retorna texto ou None se não for de log"""
+    line = line.strip()
+    if line.startswith('LOG:'):
+        record = decode_record(binascii.unhexlify(line[4:]))
+        text = format_record(record)
+        if tracker:
+            gap = tracker.check(record)
+            if gap:
+                text = f"... {gap} registros perdidos ...\n" + text
+        return text
+    parts = line.split()
+    if len(parts) == 7 and parts[0] == 'LOG':
+        # Eco em tempo real: LOG <ticks> <nível> <msg_id> <a> <b> <c>
+        ticks, level, msg_id, a, b, c = (int(p) for p in parts[1:])
+        return format_record({'ticks_ms': ticks, 'level': level, 'msg_id': msg_id,
+                              'seq': 0, 'a': a, 'b': b, 'c': c})
+    return None
+
+
+def decode_stream(lines):
+    """Decodifica linhas de log; demais linhas da serial passam inalteradas"""
+    tracker = SequenceTracker()
+    for line in lines:
+        text = decode_line(line, tracker)
+        print(text if text is not None else line.rstrip())
+    if tracker.lost:
+        print(f"⚠️  {tracker.lost} registros perdidos (anel sobrescrito antes da drenagem)")
+
+
+def read_serial(port):
+    """Decodifica a saída serial do nó em tempo real"""
+    import serial
+
+    print(f"Lendo log de {port} (Ctrl+C para sair)...")
+    ser = serial.Serial(port, 115200, timeout=1)
+
+    def lines():
+        while True:
+            raw = ser.readline()
+            if raw:
+                yield raw.decode('utf-8', errors='replace')
+
+    try:
+        decode_stream(lines())
+    except KeyboardInterrupt:
+        print("\nLeitura interrompida.")
+    finally:
+        ser.close()
+
+
+async def read_ble(address, wait=3.0):
+    """Drena o anel de log do nó pela característica BLE de log"""
+    from bleak import BleakClient
+
+    tracker = SequenceTracker()
+
+    def handler(sender, data):
+        record = decode_record(data)
+        gap = tracker.check(record)
+        if gap:
+            print(f"... {gap} registros perdidos ...")
+        print(format_record(record))
+
+    async with BleakClient(address, timeout=20.0) as client:
+        await client.start_notify(LOG_CHAR_UUID, handler)
+        await client.write_gatt_char(COMMAND_CHAR_UUID, b"LOG")
+        await asyncio.sleep(wait)
+        await client.stop_notify(LOG_CHAR_UUID)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ('serial', 'file', 'ble'):
+        print(__doc__)
+        return 1
+
+    mode, target = sys.argv[1], sys.argv[2]
+    if mode == 'serial':
+        read_serial(target)
+    elif mode == 'file':
+        with open(target, encoding='utf-8', errors='replace') as f:
+            decode_stream(f)
+    else:
+        asyncio.run(read_ble(target))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Painel de métricas dos nós ESP32 (common/metrics.py)
+Lê periodicamente a característica BLE de diagnóstico de um ou mais nós e
+mostra contadores, taxas, heap e histogramas de duração:
+
+    python3 metrics_dashboard.py AA:BB:CC:DD:EE:FF                    # um nó
+    python3 metrics_dashboard.py AA:BB:CC:DD:EE:01 AA:BB:CC:DD:EE:02  # vários nós
+    python3 metrics_dashboard.py AA:BB:CC:DD:EE:FF --once             # um snapshot
+    python3 metrics_dashboard.py AA:BB:CC:DD:EE:FF --interval 10
+    python3 metrics_dashboard.py AA:BB:CC:DD:EE:FF --stats           # + estatísticas por canal
+    python3 metrics_dashboard.py AA:BB:CC:DD:EE:FF --ac              # + resultado do modo AC
+
+Os nós atualizam o blob a cada 5 segundos (publish_metrics no loop principal);
+a característica é só de leitura, e o painel a lê a cada --interval segundos.
+Com --stats também lê a característica STATS do voltímetro: min/max/média/
+desvio/RMS de cada canal na última janela (voltmeter_node/stats.py). Com
+--ac lê a característica AC: DC, RMS verdadeiro, pico e frequência de cada
+canal na última janela do modo AC (voltmeter_node/ac_meter.py).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'common'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'voltmeter_node'))
+import metrics  # noqa: E402
+from stats import decode_stats  # noqa: E402
+from ac_meter import decode_ac  # noqa: E402
+
+DIAG_CHAR_UUID = "11111111-1111-1111-1111-111111111113"
+STATS_CHAR_UUID = "11111111-1111-1111-1111-111111111114"
+AC_CHAR_UUID = "11111111-1111-1111-1111-111111111116"
+
+# Nomes dos eventos IRQ do módulo bluetooth do MicroPython
+IRQ_NAMES = {
+    1: 'central_connect', 2: 'central_disconnect', 3: 'gatts_write',
+    4: 'gatts_read_request', 5: 'scan_result', 6: 'scan_done',
+    7: 'peripheral_connect', 8: 'peripheral_disconnect',
+    9: 'gattc_service_result', 10: 'gattc_service_done',
+    11: 'gattc_characteristic_result', 12: 'gattc_characteristic_done',
+    13: 'gattc_descriptor_result', 14: 'gattc_descriptor_done',
+    15: 'gattc_read_result', 16: 'gattc_read_done', 17: 'gattc_write_done',
+    18: 'gattc_notify', 19: 'gattc_indicate',
+}
+
+
+def bucket_labels():
+    """Rótulos dos buckets dos histogramas ('<50us' ... '>=25000us')"""
+    labels = [f"<{bound}" for bound in metrics.HIST_BOUNDS_US]
+    labels.append(f">={metrics.HIST_BOUNDS_US[-1]}")
+    return labels
+
+
+def rates(current, previous):
+    """Taxa por segundo de cada contador entre dois snapshots"""
+    if previous is None:
+        return {}
+    elapsed = (current['uptime_ms'] - previous['uptime_ms']) / 1000.0
+    if elapsed <= 0:
+        # Nó reiniciado (uptime voltou) ou snapshot repetido
+        return {}
+    return {name: (value - previous['counters'].get(name, 0)) / elapsed
+            for name, value in current['counters'].items()}
+
+
+def format_snapshot(address, snapshot, previous=None):
+    """Formata um snapshot decodificado como bloco de texto"""
+    lines = [f"=== {address}  uptime {snapshot['uptime_ms'] / 1000:.1f}s ==="]
+
+    per_second = rates(snapshot, previous)
+    lines.append("Contadores:")
+    for name, value in snapshot['counters'].items():
+        rate = per_second.get(name)
+        suffix = f"  ({rate:.1f}/s)" if rate else ""
+        lines.append(f"  {name:18s} {value:10d}{suffix}")
+
+    lines.append("Gauges:")
+    for name, value in snapshot['gauges'].items():
+        lines.append(f"  {name:18s} {value:10d}")
+
+    if snapshot['irq_events']:
+        lines.append("Eventos IRQ:")
+        for event, count in snapshot['irq_events'].items():
+            lines.append(f"  {IRQ_NAMES.get(event, str(event)):28s} {count:8d}")
+
+    labels = bucket_labels()
+    for name, hist in snapshot['histograms'].items():
+        total = sum(hist['buckets'])
+        if not total:
+            continue
+        lines.append(f"{name} (n={total}, máx={hist['max']}us):")
+        for label, count in zip(labels, hist['buckets']):
+            if count:
+                bar = '#' * max(1, int(40 * count / total))
+                lines.append(f"  {label:>8s} {count:8d} {bar}")
+    return "\n".join(lines)
+
+
+def format_stats(stats):
+    """Formata o blob de estatísticas decodificado (uma linha por canal)"""
+    mode = 'deslizante' if stats['sliding'] else 'fixa'
+    lines = [f"Estatísticas (janela {mode} de {stats['window_ms']} ms):",
+             f"  {'canal':>5s} {'amostras':>9s} {'mín':>9s} {'máx':>9s} {'média':>9s} {'desvio':>9s} {'RMS':>9s}"]
+    for index, channel in enumerate(stats['channels']):
+        values = [channel[key] / 1000 for key in ('min_uv', 'max_uv', 'mean_uv', 'stddev_uv', 'rms_uv')]
+        lines.append(f"  {index + 1:5d} {channel['samples']:9d} " + " ".join(f"{v:9.3f}" for v in values))
+    lines.append("  (mV)")
+    return "\n".join(lines)
+
+
+def format_ac(result):
+    """Formata o resultado do modo AC decodificado (uma linha por canal)"""
+    note = "" if result['settled'] else " (1ª janela: nível de cruzamento ainda não assentado)"
+    lines = [f"Modo AC ({result['samples']} amostras a {result['rate_hz']} Hz){note}:",
+             f"  {'canal':>5s} {'DC':>9s} {'RMS':>9s} {'pico':>9s} {'freq. Hz':>9s}"]
+    for index, channel in enumerate(result['channels']):
+        values = [channel[key] / 1000 for key in ('dc_uv', 'rms_uv', 'peak_uv')]
+        lines.append(f"  {index + 1:5d} " + " ".join(f"{v:9.3f}" for v in values) + f" {channel['freq_hz']:9.3f}")
+    lines.append("  (mV)")
+    return "\n".join(lines)
+
+
+async def poll_node(address, interval, once, snapshots, stats=None, ac=None):
+    """Lê o blob de diagnóstico (e os de estatísticas e AC) de um nó a cada interval segundos"""
+    from bleak import BleakClient
+
+    async with BleakClient(address, timeout=20.0) as client:
+        while True:
+            data = await client.read_gatt_char(DIAG_CHAR_UUID)
+            if len(data) < metrics.BLOB_SIZE:
+                print(f"⚠️  {address}: blob truncado ({len(data)} bytes)")
+            else:
+                previous = snapshots.get(address, (None, None))[0]
+                snapshots[address] = (metrics.decode_blob(data), previous)
+            if stats is not None:
+                data = await client.read_gatt_char(STATS_CHAR_UUID)
+                try:
+                    stats[address] = decode_stats(data)
+                except Exception:
+                    # Nenhuma janela fechada ainda (característica vazia) ou nó sem STATS
+                    stats.pop(address, None)
+            if ac is not None:
+                data = await client.read_gatt_char(AC_CHAR_UUID)
+                try:
+                    ac[address] = decode_ac(data)
+                except Exception:
+                    # Modo AC desligado ou nenhuma janela fechada ainda
+                    ac.pop(address, None)
+            if once:
+                return
+            await asyncio.sleep(interval)
+
+
+def format_node(address, snapshots, stats, ac=None):
+    current, previous = snapshots[address]
+    block = format_snapshot(address, current, previous)
+    if stats and address in stats:
+        block += "\n" + format_stats(stats[address])
+    if ac and address in ac:
+        block += "\n" + format_ac(ac[address])
+    return block
+
+
+async def render(snapshots, interval, stats=None, ac=None):
+    """Redesenha o painel com o último snapshot de cada nó"""
+    while True:
+        blocks = [format_node(address, snapshots, stats, ac) for address in sorted(snapshots)]
+        # Limpa a tela e volta o cursor ao topo
+        print("\033[2J\033[H" + "\n\n".join(blocks), flush=True)
+        await asyncio.sleep(interval)
+
+
+async def run(addresses, interval, once, with_stats=False, with_ac=False):
+    snapshots = {}
+    stats = {} if with_stats else None
+    ac = {} if with_ac else None
+    pollers = [asyncio.create_task(poll_node(address, interval, once, snapshots, stats, ac))
+               for address in addresses]
+    if once:
+        results = await asyncio.gather(*pollers, return_exceptions=True)
+        for address, result in zip(addresses, results):
+            if isinstance(result, Exception):
+                print(f"❌ {address}: {result}")
+        for address in sorted(snapshots):
+            print(format_node(address, snapshots, stats, ac))
+        return
+
+    renderer = asyncio.create_task(render(snapshots, interval, stats, ac))
+    try:
+        await asyncio.gather(*pollers)
+    finally:
+        renderer.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Painel de métricas dos nós ESP32 via BLE")
+    parser.add_argument('addresses', nargs='+', help="Endereços BLE dos nós")
+    parser.add_argument('--interval', type=float, default=5.0, help="Intervalo de leitura em segundos")
+    parser.add_argument('--once', action='store_true', help="Lê um snapshot de cada nó e sai")
+    parser.add_argument('--stats', action='store_true', help="Também lê as estatísticas por canal (STATS)")
+    parser.add_argument('--ac', action='store_true', help="Também lê o resultado do modo AC (AC)")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run(args.addresses, args.interval, args.once, args.stats, args.ac))
+    except KeyboardInterrupt:
+        print("\nPainel encerrado.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
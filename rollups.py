@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Agregados multirresolução das séries gravadas pelo voltage_recorder.py
+Mantém camadas de 1 s, 1 min e 1 h com min/max/média/último de cada canal
+(os canais do layout do nó em timeseries_store.py, em milivolts),
+calculadas incrementalmente a cada chunk gravado. As consultas escolhem a
+camada mais grossa que ainda atende à resolução pedida:
+
+    python3 rollups.py query dados/ AA:BB:CC:DD:EE:FF 2024-05-01 2024-05-08 --points 2000
+    python3 rollups.py rebuild dados/ AA:BB:CC:DD:EE:FF   # recalcula a partir dos dados brutos
+
+Usa NumPy quando disponível; sem NumPy cai para Python puro com o mesmo resultado.
+"""
+
+import argparse
+import functools
+import mmap
+import os
+import struct
+import sys
+
+import timeseries_store as store
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+TIERS_MS = (1000, 60000, 3600000)
+
+
+@functools.lru_cache(maxsize=None)
+def record_format(channels):
+    """início do bucket (ms), amostras, e por canal min, max, último, soma (mV)"""
+    return '<qI' + 'hhhq' * channels
+
+
+def record_size(channels):
+    return struct.calcsize(record_format(channels))
+
+
+@functools.lru_cache(maxsize=None)
+def field_names(channels):
+    fields = ('t', 'count')
+    for c in range(channels):
+        fields += ('min%d' % c, 'max%d' % c, 'last%d' % c, 'sum%d' % c)
+    return fields
+
+
+@functools.lru_cache(maxsize=None)
+def record_dtype(channels):
+    dtype = np.dtype([('t', '<i8'), ('count', '<u4')] + [
+        (name, '<i8' if name.startswith('sum') else '<i2') for name in field_names(channels)[2:]])
+    assert dtype.itemsize == record_size(channels)
+    return dtype
+
+
+def batch_channels(batch):
+    """Número de canais de um lote colunar"""
+    return (len(batch) - 2) // 4
+
+
+def empty_batch(channels):
+    return {name: [] for name in field_names(channels)}
+
+
+def tier_path(directory, width_ms):
+    return os.path.join(directory, 'rollup_%ds.bin' % (width_ms // 1000))
+
+
+def batch_from_samples(samples, channels):
+    """Lote colunar a partir de amostras (t_ms, mv1, mv2, ...): cada uma é um bucket de 1"""
+    batch = {'t': [s[0] for s in samples], 'count': [1] * len(samples)}
+    for c in range(channels):
+        column = [s[c + 1] for s in samples]
+        batch['min%d' % c] = column
+        batch['max%d' % c] = column
+        batch['last%d' % c] = column
+        batch['sum%d' % c] = column
+    if np is not None:
+        dtype = record_dtype(channels)
+        batch = {name: np.asarray(values, dtype=dtype[name]) for name, values in batch.items()}
+    return batch
+
+
+def batch_length(batch):
+    return len(batch['t'])
+
+
+def concat(first, second):
+    """Concatena dois lotes colunares"""
+    if np is not None:
+        return {name: np.concatenate((first[name], second[name])) for name in first}
+    return {name: list(first[name]) + list(second[name]) for name in first}
+
+
+def slice_batch(batch, start, end=None):
+    return {name: batch[name][start:end] for name in batch}
+
+
+def reduce_batch(batch, width_ms):
+    """Agrupa um lote ordenado por tempo em buckets de width_ms"""
+    channels = batch_channels(batch)
+    if np is not None:
+        keys = batch['t'] // width_ms * width_ms
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        ends = np.append(starts[1:], len(keys))
+        out = {'t': keys[starts], 'count': np.add.reduceat(batch['count'], starts)}
+        for c in range(channels):
+            out['min%d' % c] = np.minimum.reduceat(batch['min%d' % c], starts)
+            out['max%d' % c] = np.maximum.reduceat(batch['max%d' % c], starts)
+            out['last%d' % c] = batch['last%d' % c][ends - 1]
+            out['sum%d' % c] = np.add.reduceat(batch['sum%d' % c], starts)
+        return out
+
+    out = empty_batch(channels)
+    current = None
+    for i in range(batch_length(batch)):
+        key = batch['t'][i] // width_ms * width_ms
+        if key != current:
+            current = key
+            out['t'].append(key)
+            out['count'].append(batch['count'][i])
+            for c in range(channels):
+                for prefix in ('min', 'max', 'last', 'sum'):
+                    name = '%s%d' % (prefix, c)
+                    out[name].append(batch[name][i])
+            continue
+        out['count'][-1] += batch['count'][i]
+        for c in range(channels):
+            out['min%d' % c][-1] = min(out['min%d' % c][-1], batch['min%d' % c][i])
+            out['max%d' % c][-1] = max(out['max%d' % c][-1], batch['max%d' % c][i])
+            out['last%d' % c][-1] = batch['last%d' % c][i]
+            out['sum%d' % c][-1] += batch['sum%d' % c][i]
+    return out
+
+
+def pack_batch(batch):
+    """Serializa um lote no formato dos arquivos de camada"""
+    channels = batch_channels(batch)
+    fields = field_names(channels)
+    if np is not None:
+        records = np.empty(batch_length(batch), dtype=record_dtype(channels))
+        for name in fields:
+            records[name] = batch[name]
+        return records.tobytes()
+    rows = zip(*(batch[name] for name in fields))
+    return b''.join(struct.pack(record_format(channels), *row) for row in rows)
+
+
+def unpack_records(buffer, first, count, channels):
+    """Lê count registros a partir do índice first como lote colunar"""
+    fields = field_names(channels)
+    size = record_size(channels)
+    if np is not None:
+        records = np.frombuffer(buffer, dtype=record_dtype(channels), count=count, offset=first * size)
+        return {name: records[name] for name in fields}
+    batch = empty_batch(channels)
+    end = (first + count) * size
+    for row in struct.iter_unpack(record_format(channels), buffer[first * size:end]):
+        for name, value in zip(fields, row):
+            batch[name].append(value)
+    return batch
+
+
+def means(batch, channel):
+    """Média por bucket de um canal (mV)"""
+    if np is not None:
+        return batch['sum%d' % channel] / batch['count']
+    return [s / n for s, n in zip(batch['sum%d' % channel], batch['count'])]
+
+
+class RollupWriter:
+    """Atualiza as camadas de um nó a cada lote de amostras
+
+    O último bucket de cada camada fica aberto em memória até chegar uma
+    amostra do bucket seguinte; close() o grava e a próxima abertura o
+    retoma (e o remove do arquivo) para continuar acumulando. channels:
+    canais do layout do nó (padrão: o layout.bin do diretório).
+    """
+
+    def __init__(self, directory, channels=None, tiers=TIERS_MS):
+        os.makedirs(directory, exist_ok=True)
+        if channels is None:
+            channels = len(store.bitmap_channels(store.read_layout(directory)))
+        self.channels = channels
+        size = record_size(channels)
+        self.tiers = tiers
+        self.files = {}
+        self.open_buckets = {}
+        for width in tiers:
+            path = tier_path(directory, width)
+            f = open(path, 'a+b')
+            end = f.tell()
+            end -= end % size
+            last = None
+            if end:
+                f.seek(end - size)
+                last = f.read(size)
+                end -= size
+            f.truncate(end)
+            self.files[width] = f
+            self.open_buckets[width] = unpack_records(last, 0, 1, channels) if last else None
+
+    def add(self, samples):
+        """Incorpora amostras (t_ms, mv1, mv2, ...) ordenadas por tempo"""
+        if not samples:
+            return
+        batch = batch_from_samples(samples, self.channels)
+        for width in self.tiers:
+            pending = batch
+            if self.open_buckets[width] is not None:
+                pending = concat(self.open_buckets[width], batch)
+            reduced = reduce_batch(pending, width)
+            closed = batch_length(reduced) - 1
+            if closed:
+                self.files[width].write(pack_batch(slice_batch(reduced, 0, closed)))
+            self.open_buckets[width] = slice_batch(reduced, closed)
+
+    def flush(self):
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        """Grava os buckets abertos e fecha os arquivos"""
+        for width, f in self.files.items():
+            if self.open_buckets[width] is not None:
+                f.write(pack_batch(self.open_buckets[width]))
+            f.close()
+
+
+class RollupReader:
+    """Consultas sobre as camadas de um nó, com seleção automática da resolução"""
+
+    def __init__(self, directory, tiers=TIERS_MS):
+        self.directory = directory
+        self.channels = len(store.bitmap_channels(store.read_layout(directory)))
+        self.tiers = tiers
+
+    def pick_tier(self, resolution_ms):
+        """Camada mais grossa com largura <= resolução (None = dados brutos)"""
+        chosen = None
+        for width in self.tiers:
+            if width <= resolution_ms:
+                chosen = width
+        return chosen
+
+    def _read_tier(self, width, start_ms, end_ms):
+        path = tier_path(self.directory, width)
+        size = record_size(self.channels)
+        if not os.path.exists(path) or os.path.getsize(path) < size:
+            return empty_batch(self.channels)
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                total = len(buffer) // size
+
+                def first_at_or_after(t_ms):
+                    low, high = 0, total
+                    while low < high:
+                        middle = (low + high) // 2
+                        if struct.unpack_from('<q', buffer, middle * size)[0] < t_ms:
+                            low = middle + 1
+                        else:
+                            high = middle
+                    return low
+
+                # Inclui o bucket que contém start_ms
+                first = first_at_or_after(start_ms // width * width)
+                last = first_at_or_after(end_ms + 1)
+                batch = unpack_records(buffer, first, last - first, self.channels)
+                if np is not None:
+                    # Copia para poder fechar o mmap
+                    batch = {name: values.copy() for name, values in batch.items()}
+                return batch
+            finally:
+                buffer.close()
+
+    def query(self, start_ms, end_ms, resolution_ms):
+        """Buckets cobrindo [start_ms, end_ms] na camada escolhida
+
+        Retorna (largura_ms, lote); largura 0 indica amostras brutas.
+        """
+        width = self.pick_tier(resolution_ms)
+        if width is not None:
+            return width, self._read_tier(width, start_ms, end_ms)
+        reader = store.SeriesReader(self.directory)
+        try:
+            return 0, batch_from_samples(list(reader.query(start_ms, end_ms)), self.channels)
+        finally:
+            reader.close()
+
+    def query_points(self, start_ms, end_ms, max_points):
+        """Consulta com no máximo ~max_points buckets (ex: pontos de um gráfico)"""
+        resolution = max(1, (end_ms - start_ms) // max(1, max_points))
+        return self.query(start_ms, end_ms, resolution)
+
+
+def rebuild(directory):
+    """Recalcula todas as camadas a partir dos chunks brutos"""
+    for width in TIERS_MS:
+        path = tier_path(directory, width)
+        if os.path.exists(path):
+            os.remove(path)
+    reader = store.SeriesReader(directory)
+    writer = RollupWriter(directory, reader.channels)
+    try:
+        for i in range(reader.chunks):
+            writer.add(reader.decode(reader.entry(i)))
+    finally:
+        writer.close()
+        reader.close()
+
+
+def main():
+    from voltage_recorder import parse_time, format_time
+
+    parser = argparse.ArgumentParser(description="Agregados multirresolução das séries de tensão")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_rebuild = sub.add_parser('rebuild', help="Recalcula as camadas a partir dos dados brutos")
+    p_rebuild.add_argument('root')
+    p_rebuild.add_argument('address')
+    p_query = sub.add_parser('query', help="Consulta agregados de um intervalo")
+    p_query.add_argument('root')
+    p_query.add_argument('address')
+    p_query.add_argument('start', help="Início (ISO 8601 ou epoch em segundos)")
+    p_query.add_argument('end', help="Fim (ISO 8601 ou epoch em segundos)")
+    p_query.add_argument('--points', type=int, default=1000, help="Número máximo de pontos")
+    args = parser.parse_args()
+
+    directory = store.node_directory(args.root, args.address)
+    if args.command == 'rebuild':
+        rebuild(directory)
+        print("✓ Camadas recalculadas")
+        return 0
+
+    reader = RollupReader(directory)
+    width, batch = reader.query_points(parse_time(args.start), parse_time(args.end), args.points)
+    print(f"Resolução: {width / 1000:g}s" if width else "Resolução: amostras brutas")
+    channel_means = [means(batch, c) for c in range(reader.channels)]
+    for i in range(batch_length(batch)):
+        cells = []
+        for c in range(reader.channels):
+            cells.append(f"{batch['min%d' % c][i] / 1000:.3f}/{channel_means[c][i] / 1000:.3f}/"
+                         f"{batch['max%d' % c][i] / 1000:.3f}")
+        print(f"{format_time(int(batch['t'][i]))}  n={int(batch['count'][i]):6d}  " + "  ".join(cells))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
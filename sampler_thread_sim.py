@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Estresse do thread de amostragem (voltmeter_node/sampler_thread.py) com
+threads de verdade do CPython. O anel SPSC não tem lock: aqui o produtor
+roda num threading.Thread com o intervalo de troca do GIL no mínimo
+(sys.setswitchinterval), para que a troca de thread caia em qualquer ponto
+do push/pop. Confere:
+
+    anel        cada varredura chega inteira (canal c da amostra k vale
+                k * 16 + c), em ordem, e cada amostra que falta foi contada
+                em dropped; os contadores de sequência dão a volta em 2**30
+    worker      SamplerThread de ponta a ponta sobre o ADCReader: só o
+                worker toca o backend, read_all_uv/read_all_voltages no
+                thread principal devolvem a última varredura consumida, e o
+                espaçamento das amostras não depende de um consumidor lento
+                (comparado com amostrar no próprio loop)
+    parada      stop() devolve o ADCReader ao chamador; um erro no worker
+                fica em error e alive vai a False
+
+    python3 sampler_thread_sim.py
+    python3 sampler_thread_sim.py --samples 500000 --seed 3
+
+Código de saída 1 se algo não conferir.
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from array import array
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+
+from adc_reader import ADCReader  # noqa: E402
+from sampler_thread import SampleRing, SamplerThread, SEQ_MASK  # noqa: E402
+
+SEQUENCE_WRAP = 1 << 19     # sequência gravada nas amostras do contador
+
+
+class CountingBackend:
+    """Backend falso: canal c da varredura k vale k * 16 + c; anota o thread"""
+
+    name = 'contador'
+    max_code = 1 << 23
+    full_scale_uv = 1 << 23     # 1 µV por código: a escala não arredonda
+    fail_after = None
+
+    def __init__(self, channels):
+        self.channel_count = channels
+        self.sequence = 0
+        self.threads = set()
+
+    def active(self, channel):
+        return True
+
+    def read(self, channel):
+        self.threads.add(threading.get_ident())
+        return self.sequence * 16 + channel
+
+    def read_block(self, mask, out):
+        self.threads.add(threading.get_ident())
+        if self.fail_after is not None and self.sequence >= self.fail_after:
+            raise OSError("conversor sem resposta")
+        for channel in range(self.channel_count):
+            out[channel] = self.sequence * 16 + channel
+        self.sequence = (self.sequence + 1) % SEQUENCE_WRAP
+        return out
+
+
+def _sample_ok(sample, channels):
+    first = sample[0]
+    return all(sample[channel] == first + channel for channel in range(channels))
+
+
+def ring_stress(samples, channels, capacity, seed, start, problems):
+    """Produtor e consumidor em threads; retorna (consumidas, descartadas)"""
+    rng = random.Random(seed)
+    ring = SampleRing(channels, capacity)
+    ring.head = ring.tail = start   # perto da volta dos contadores de sequência
+    label = f"anel {channels}x{capacity}"
+
+    def produce():
+        sample = array('i', [0] * channels)
+        for k in range(samples):
+            for channel in range(channels):
+                sample[channel] = k * 16 + channel
+            ring.push(sample, k)
+            if k % 64 == 0:
+                time.sleep(0)
+
+    producer = threading.Thread(target=produce)
+    producer.start()
+    out = array('i', [0] * channels)
+    expected = 0
+    missing = 0
+    received = 0
+    while producer.is_alive() or ring.pending():
+        ticks = ring.pop(out)
+        if ticks < 0:
+            continue
+        if not _sample_ok(out, channels) or out[0] != ticks * 16:
+            problems.append(f"{label}: varredura {ticks} rasgada: {list(out)}")
+            break
+        if ticks < expected:
+            problems.append(f"{label}: varredura {ticks} fora de ordem (esperada >= {expected})")
+            break
+        missing += ticks - expected
+        expected = ticks + 1
+        received += 1
+        # Consumidor às vezes para e deixa o anel encher
+        if rng.random() < 0.001:
+            time.sleep(rng.random() * 0.002)
+    producer.join()
+    missing += samples - expected
+    if missing != ring.dropped:
+        problems.append(f"{label}: {missing} varreduras faltando, {ring.dropped} descartes contados")
+    if received + ring.dropped != samples:
+        problems.append(f"{label}: {received} recebidas + {ring.dropped} descartadas != {samples}")
+    if ring.head != (start + received) & SEQ_MASK or ring.tail != ring.head:
+        problems.append(f"{label}: head={ring.head} tail={ring.tail} depois de {received} varreduras")
+    return received, ring.dropped
+
+
+def _spacing_p95(times, interval_ms):
+    deviations = sorted(abs(ble_sim.ticks_diff(b, a) - interval_ms) for a, b in zip(times, times[1:]))
+    return deviations[int(len(deviations) * 0.95)] if deviations else 0
+
+
+def worker_check(interval_ms, duration_s, seed, problems):
+    """SamplerThread de ponta a ponta; retorna (p95 com worker, p95 no loop) em ms"""
+    rng = random.Random(seed)
+    channels = 3
+    backend = CountingBackend(channels)
+    reader = ADCReader(backend=backend)
+    reader.filter_samples = 1
+    sampler = SamplerThread(reader, interval_ms)
+    sampler.start()
+    out = array('i', [0] * channels)
+    latest = array('i', [0] * channels)
+    times = []
+    deadline = time.monotonic() + duration_s
+    while time.monotonic() < deadline:
+        while True:
+            ticks = sampler.pop(out)
+            if ticks < 0:
+                break
+            times.append(ticks)
+            if not _sample_ok(out, channels):
+                problems.append(f"worker: varredura rasgada {list(out)}")
+        # Outros leitores no thread principal: última varredura consumida
+        if reader.read_all_uv(latest) is not latest or list(latest) != list(sampler.last_uv):
+            problems.append("worker: read_all_uv não devolveu a última varredura consumida")
+        reader.read_all_voltages()
+        # Loop principal lento (notify demorado, pausa de GC)
+        time.sleep(rng.random() * 3 * interval_ms / 1000)
+    if not sampler.stop():
+        problems.append("worker: stop() não terminou o thread")
+    if reader.sampler is not None:
+        problems.append("worker: ADCReader continua com o worker depois do stop()")
+    if threading.get_ident() in backend.threads:
+        problems.append("worker: o thread principal leu o backend com o worker ativo")
+    if len(times) < duration_s * 1000 / interval_ms / 2:
+        problems.append(f"worker: só {len(times)} varreduras em {duration_s} s")
+    with_worker = _spacing_p95(times, interval_ms)
+
+    # Mesmo consumidor amostrando no próprio loop (SAMPLER_THREAD = False)
+    inline = []
+    next_ms = ble_sim.ticks_ms()
+    deadline = time.monotonic() + duration_s
+    while time.monotonic() < deadline:
+        now = ble_sim.ticks_ms()
+        if ble_sim.ticks_diff(now, next_ms) >= 0:
+            reader.read_all_uv(out)
+            inline.append(now)
+            next_ms = ble_sim.ticks_add(now, interval_ms)
+            time.sleep(rng.random() * 3 * interval_ms / 1000)
+        else:
+            time.sleep(ble_sim.ticks_diff(next_ms, now) / 1000)
+    return with_worker, _spacing_p95(inline, interval_ms)
+
+
+def failure_check(problems):
+    """Erro no backend: o worker sai e deixa o erro em error"""
+    backend = CountingBackend(3)
+    backend.fail_after = 5
+    reader = ADCReader(backend=backend)
+    sampler = SamplerThread(reader, 1)
+    sampler.start()
+    start = time.monotonic()
+    while sampler.alive and time.monotonic() - start < 2:
+        time.sleep(0.005)
+    if sampler.alive or not isinstance(sampler.error, OSError):
+        problems.append(f"erro no worker: alive={sampler.alive}, error={sampler.error!r}")
+    sampler.stop()
+    if reader.sampler is not None:
+        problems.append("erro no worker: ADCReader não voltou ao chamador")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Anel SPSC do thread de amostragem sob estresse")
+    parser.add_argument('--samples', type=int, default=200000)
+    parser.add_argument('--interval', type=int, default=10, help="intervalo do worker (ms)")
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    problems = []
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)     # troca de thread em qualquer bytecode
+    try:
+        for channels, capacity, start in ((1, 4, 0), (3, 16, SEQ_MASK - 1000), (16, 2, SEQ_MASK - 7)):
+            received, dropped = ring_stress(args.samples, channels, capacity, args.seed, start, problems)
+            print(f"anel {channels:2d} canais x {capacity:2d}: {received:7d} varreduras conferidas, "
+                  f"{dropped:7d} descartadas")
+    finally:
+        sys.setswitchinterval(switch)
+
+    with_worker, inline = worker_check(args.interval, args.seconds, args.seed, problems)
+    print(f"Espaçamento das amostras (p95 do desvio, consumidor lento, {args.interval} ms): "
+          f"worker {with_worker} ms, no loop {inline} ms")
+    if with_worker >= inline:
+        problems.append("o worker não isolou as amostras do consumidor lento")
+    failure_check(problems)
+
+    for problem in problems[:20]:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✓ Anel do thread de amostragem conferido")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
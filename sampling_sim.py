@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Simulação da amostragem adaptativa do voltímetro (voltmeter_node/sampling.py)
+Roda o agendador do firmware com relógio simulado sobre um traço de tensões
+e compara com o laço antigo (amostra e notifica a cada 1 s, acordado o tempo
+todo): notificações enviadas, milissegundos de CPU acordada e o erro entre o
+valor que o display mostraria e a tensão real.
+
+    python3 sampling_sim.py synth                          # cenários sintéticos
+    python3 sampling_sim.py store dados/ AA:BB:CC:DD:EE:FF  # gravação do voltage_recorder
+    python3 sampling_sim.py capture trafego.cap             # captura do ble_replay
+
+O custo de cada operação vem de COSTS (estimativas para o ESP32 a 240 MHz);
+use --sample-ms/--notify-ms/--wake-ms com valores medidos na sua placa.
+"""
+
+import argparse
+import bisect
+import math
+import random
+import sys
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+import sampling  # noqa: E402
+import deadband  # noqa: E402
+
+# Custo estimado de cada operação no ESP32 (ms de CPU acordada)
+COSTS = {
+    'sample_ms': 3.0,    # 3 canais com média móvel (read_all_voltages)
+    'notify_ms': 2.0,    # gatts_write + gatts_notify
+    'wake_ms': 1.5,      # sair do lightsleep e voltar a dormir
+}
+BASELINE_INTERVAL_MS = 1000
+ADV_AWAKE_MS = 150       # janela acordada por ciclo de lightsleep (main.py)
+
+
+class Trace:
+    """Traço amostrado: valor de cada canal (mV) mantido até a próxima amostra"""
+
+    def __init__(self, name, times_ms, values):
+        self.name = name
+        self.times = times_ms
+        self.values = values
+
+    @property
+    def duration_ms(self):
+        return self.times[-1] - self.times[0] if self.times else 0
+
+    def at(self, t_ms):
+        i = bisect.bisect_right(self.times, self.times[0] + t_ms) - 1
+        return self.values[max(0, i)]
+
+
+def synthetic_traces(seconds=3600, seed=7):
+    """Cenários típicos: bancada estável, deriva lenta, degraus e rajadas"""
+    rng = random.Random(seed)
+    times = list(range(0, seconds * 1000, 100))
+
+    def noisy(level):
+        return int(level + rng.gauss(0, 3))
+
+    flat = [(noisy(1650), noisy(3300), noisy(500)) for _ in times]
+    drift = [(noisy(1000 + t / 3600), noisy(3300 - t / 7200), noisy(500)) for t in times]
+    steps = []
+    level = 1000
+    for t in times:
+        if t % 300000 == 0:
+            level = rng.choice((500, 1000, 1650, 2500, 3000))
+        steps.append((noisy(level), noisy(3300), noisy(level / 2)))
+    bursts = []
+    for t in times:
+        phase = t % 600000
+        wave = 800 * math.sin(2 * math.pi * t / 1700) if phase < 30000 else 0
+        bursts.append((noisy(1650 + wave), noisy(3300), noisy(500)))
+    return [Trace('estável', times, flat), Trace('deriva lenta', times, drift),
+            Trace('degraus (5 min)', times, steps), Trace('rajadas (30 s/10 min)', times, bursts)]
+
+
+def store_trace(root, address, start=None, end=None):
+    from timeseries_store import SeriesReader, node_directory
+    reader = SeriesReader(node_directory(root, address))
+    try:
+        span = reader.time_span()
+        if span is None:
+            raise ValueError(f"Nenhum dado gravado para {address}")
+        samples = list(reader.query(start if start is not None else span[0],
+                                    end if end is not None else span[1]))
+    finally:
+        reader.close()
+    return Trace(address, [s[0] for s in samples], [s[1:] for s in samples])
+
+
+def capture_trace(path):
+    import ble_replay
+    from voltage_recorder import parse_voltage_frame
+    times, values = [], []
+    for record in ble_replay.read_capture(path):
+        volts = parse_voltage_frame(record.payload)
+        if volts is None or not all(math.isfinite(v) for v in volts):
+            continue
+        times.append(record.t_us // 1000)
+        values.append(tuple(int(v * 1000) for v in volts))
+    if not times:
+        raise ValueError(f"{path} não tem frames de tensão")
+    return Trace(path, times, values)
+
+
+class RunResult:
+    def __init__(self, label):
+        self.label = label
+        self.samples = 0
+        self.notifications = 0
+        self.wakeups = 0
+        self.awake_ms = 0.0
+        self.errors = []
+
+    def error_stats(self):
+        if not self.errors:
+            return 0, 0
+        return max(self.errors), sum(self.errors) / len(self.errors)
+
+
+def shown_error(trace, sent_times, sent_values, result):
+    """Erro (mV) entre o último valor enviado e a tensão real, em cada ponto do traço"""
+    for t, value in zip(trace.times, trace.values):
+        i = bisect.bisect_right(sent_times, t - trace.times[0]) - 1
+        if i < 0:
+            continue
+        shown = sent_values[i]
+        result.errors.append(max(abs(value[c] - shown[c]) for c in range(3)))
+
+
+def run_baseline(trace, costs):
+    """Laço antigo: amostra e notifica a cada 1 s, acorda a cada 100 ms"""
+    result = RunResult('fixo 1 s')
+    sent_times, sent_values = [], []
+    t = 0
+    while t <= trace.duration_ms:
+        value = trace.at(t)
+        result.samples += 1
+        result.notifications += 1
+        sent_times.append(t)
+        sent_values.append(value)
+        t += BASELINE_INTERVAL_MS
+    # time.sleep(0.1) mantém a CPU ligada: acordada durante todo o traço
+    result.awake_ms = float(trace.duration_ms)
+    result.wakeups = trace.duration_ms // 100
+    shown_error(trace, sent_times, sent_values, result)
+    return result
+
+
+def run_adaptive(trace, costs, listeners=True, lightsleep=True, rate_mv_s=sampling.RATE_MV_S,
+                 deadband_mv=deadband.DEADBAND_MV, rel_permille=0,
+                 max_silent_ms=deadband.MAX_SILENT_MS):
+    """Agendador do firmware com relógio simulado
+
+    Com lightsleep a CPU só conta como acordada durante amostras, envios e
+    (sem centrais) as janelas de advertising; sem lightsleep fica acordada
+    o tempo todo, como no main.py com uma central conectada.
+    """
+    if not listeners:
+        label = 'adaptativo, sem centrais'
+    elif lightsleep:
+        label = 'adaptativo + lightsleep*'
+    else:
+        label = 'adaptativo, conectado'
+    result = RunResult(label)
+    scheduler = sampling.AdaptiveScheduler(rate_mv_s=rate_mv_s)
+    band = deadband.DeadbandFilter(deadband_mv, rel_permille, max_silent_ms)
+    sent_times, sent_values = [], []
+    now = 0
+    while now <= trace.duration_ms:
+        value = trace.at(now)
+        result.samples += 1
+        ticks = now & 0x3FFFFFFF
+        scheduler.update(ticks, value, listeners)
+        result.awake_ms += costs['sample_ms']
+        if listeners and band.check(ticks, value):
+            result.notifications += 1
+            result.awake_ms += costs['notify_ms']
+            sent_times.append(now)
+            sent_values.append(tuple(value))
+        interval = scheduler.interval_ms
+        # O laço acorda ao menos 1x/s (LED, status, métricas), como no main.py
+        wakes = max(1, -(-interval // 1000))
+        result.wakeups += wakes
+        if lightsleep:
+            result.awake_ms += wakes * (costs['wake_ms'] + (0 if listeners else ADV_AWAKE_MS))
+        now += interval
+    if not lightsleep:
+        result.awake_ms = float(trace.duration_ms)
+    shown_error(trace, sent_times, sent_values, result)
+    return result
+
+
+def report(trace, costs, options):
+    hours = trace.duration_ms / 3600000
+    print(f"\n=== {trace.name}: {len(trace.times)} pontos, {trace.duration_ms / 1000:.0f} s ===")
+    runs = [run_baseline(trace, costs),
+            run_adaptive(trace, costs, lightsleep=False, **options),
+            run_adaptive(trace, costs, lightsleep=True, **options),
+            run_adaptive(trace, costs, listeners=False, **options)]
+    base, connected, _, idle = runs
+    print(f"{'modo':26s} {'amostras':>9s} {'envios':>8s} {'envios/h':>9s} "
+          f"{'acordado ms':>12s} {'% acordado':>10s} {'erro máx':>9s} {'erro méd':>9s}")
+    for r in runs:
+        worst, mean = r.error_stats()
+        awake_pct = 100 * r.awake_ms / trace.duration_ms if trace.duration_ms else 0
+        per_hour = r.notifications / hours if hours else 0
+        errors = f"{worst:7d}mV {mean:7.1f}mV" if r.errors else f"{'-':>9s} {'-':>9s}"
+        print(f"{r.label:26s} {r.samples:9d} {r.notifications:8d} {per_hour:9.0f} "
+              f"{r.awake_ms:12.0f} {awake_pct:9.1f}% {errors}")
+    saved_tx = 100 * (1 - connected.notifications / base.notifications) if base.notifications else 0
+    saved_cpu = 100 * (1 - idle.awake_ms / base.awake_ms) if base.awake_ms else 0
+    print(f"Economia: {saved_tx:.0f}% das notificações com central conectada; "
+          f"{saved_cpu:.0f}% do tempo acordado sem centrais ({base.awake_ms - idle.awake_ms:.0f} ms)")
+    print("* lightsleep com conexão ativa exige firmware com light sleep do BT habilitado")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simula a amostragem adaptativa do voltímetro")
+    sub = parser.add_subparsers(dest='source', required=True)
+    p = sub.add_parser('synth', help="cenários sintéticos")
+    p.add_argument('--seconds', type=int, default=3600)
+    p = sub.add_parser('store', help="série gravada pelo voltage_recorder")
+    p.add_argument('root')
+    p.add_argument('address')
+    p.add_argument('--start', type=int, help="início (ms desde a época)")
+    p.add_argument('--end', type=int, help="fim (ms desde a época)")
+    p = sub.add_parser('capture', help="captura do ble_replay")
+    p.add_argument('path')
+    for p in sub.choices.values():
+        p.add_argument('--sample-ms', type=float, default=COSTS['sample_ms'])
+        p.add_argument('--notify-ms', type=float, default=COSTS['notify_ms'])
+        p.add_argument('--wake-ms', type=float, default=COSTS['wake_ms'])
+        p.add_argument('--deadband', type=int, default=deadband.DEADBAND_MV, help="faixa morta (mV)")
+        p.add_argument('--rel', type=int, default=0, help="faixa morta relativa (‰)")
+        p.add_argument('--rate', type=int, default=sampling.RATE_MV_S, help="mV/s")
+        p.add_argument('--max-silent', type=int, default=deadband.MAX_SILENT_MS, help="ms")
+    args = parser.parse_args()
+
+    costs = {'sample_ms': args.sample_ms, 'notify_ms': args.notify_ms, 'wake_ms': args.wake_ms}
+    options = {'deadband_mv': args.deadband, 'rel_permille': args.rel, 'rate_mv_s': args.rate,
+               'max_silent_ms': args.max_silent}
+    try:
+        if args.source == 'synth':
+            traces = synthetic_traces(args.seconds)
+        elif args.source == 'store':
+            traces = [store_trace(args.root, args.address, args.start, args.end)]
+        else:
+            traces = [capture_trace(args.path)]
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    for trace in traces:
+        report(trace, costs, options)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
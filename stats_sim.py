@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Confere as estatísticas por janela do voltímetro (voltmeter_node/stats.py)
+Sinais sintéticos a 1 kHz (tempo simulado, sem esperar) entram no
+WindowStats e cada blob publicado é decodificado e comparado com o cálculo
+em float64 sobre as mesmas amostras:
+
+    janela fixa       uma janela a cada STATS_WINDOW_MS
+    deslizante        a cada fatia, com as últimas STATS_SLOTS fatias
+    sinais            DC com ruído, senoide de 50 Hz, quadrada e degraus de
+                      ±5 V (desvios de 24 bits nos acumuladores inteiros)
+
+Depois monta o ADCReader com aquisição contínua e o servidor BLE no
+ble_sim: os blocos da IRQ entram nas estatísticas, publish_stats() copia o
+blob para a característica STATS (notificação inteira só para a central com
+MTU que a comporte; a outra recebe o aviso curto) e o comando "STATS:..."
+troca a janela.
+Também mede µs por amostra no computador. Código de saída 1 se algo não
+conferir.
+
+    python3 stats_sim.py
+    python3 stats_sim.py --seconds 20 --rate 2000
+"""
+
+import argparse
+import contextlib
+import io
+import math
+import random
+import sys
+import time
+from array import array
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+
+from adc_backends import SimulatedBackend, WAVE_DC, WAVE_SINE  # noqa: E402
+from adc_reader import ADCReader  # noqa: E402
+from stats import WindowStats, decode_stats  # noqa: E402
+
+CHANNELS = 4
+
+
+def _signals(rate, seed):
+    """Gerador de varreduras (µV) dos CHANNELS canais de teste"""
+    rng = random.Random(seed)
+    k = 0
+    while True:
+        t = k / rate
+        yield (1650000 + rng.randint(-2000, 2000),                              # DC com ruído
+               1000000 + int(900000 * math.sin(2 * math.pi * 50 * t)),           # senoide 50 Hz
+               3000000 if (k // 7) % 2 else 100000,                              # quadrada
+               rng.choice((-5000000, 5000000)) + rng.randint(-100, 100))         # degraus ±5 V
+        k += 1
+
+
+def _reference(values):
+    n = len(values)
+    mean = sum(values) / n
+    variance = sum((v - mean) ** 2 for v in values) / n
+    return {'samples': n, 'min_uv': min(values), 'max_uv': max(values), 'mean_uv': mean,
+            'stddev_uv': math.sqrt(variance), 'rms_uv': math.sqrt(sum(v * v for v in values) / n)}
+
+
+def _compare(label, got, expected, problems):
+    if got['samples'] != expected['samples']:
+        problems.append(f"{label}: {got['samples']} amostras, esperado {expected['samples']}")
+        return
+    for key in ('min_uv', 'max_uv'):
+        if got[key] != expected[key]:
+            problems.append(f"{label}: {key} {got[key]}, esperado {expected[key]}")
+    for key in ('mean_uv', 'stddev_uv', 'rms_uv'):
+        # Médias e M2 em float32 (array('f')), como no ESP32
+        tolerance = 2 + abs(expected[key]) * 2e-6 + (expected['stddev_uv'] * 1e-4 if key != 'mean_uv' else 0)
+        if abs(got[key] - expected[key]) > tolerance:
+            problems.append(f"{label}: {key} {got[key]}, esperado {expected[key]:.1f}")
+
+
+def check_windows(sliding, seconds, rate, window_ms, slots, seed, problems):
+    """Janela fixa ou deslizante contra float64; retorna janelas conferidas"""
+    stats = WindowStats(CHANNELS, window_ms, slots, sliding)
+    slot_ms = window_ms // slots
+    history = []        # (fatia, varredura) de cada amostra
+    signals = _signals(rate, seed)
+    checked = 0
+    start = 1000
+    for k in range(int(seconds * rate)):
+        now = start + k * 1000 // rate
+        sample = next(signals)
+        sequence = stats.sequence
+        stats.add_all(sample, now)
+        if stats.sequence != sequence:
+            # Publicado ao chegar a 1ª amostra da fatia seguinte
+            closed = (now - start) // slot_ms - 1
+            first = closed - slots + 1
+            window = [s for slot, s in history if first <= slot <= closed]
+            decoded = decode_stats(stats.latest())
+            if decoded['sliding'] != sliding or decoded['window_ms'] != window_ms:
+                problems.append(f"cabeçalho: {decoded}")
+            for channel in range(CHANNELS):
+                label = f"{'deslizante' if sliding else 'fixa'} até fatia {closed}, canal {channel + 1}"
+                _compare(label, decoded['channels'][channel], _reference([s[channel] for s in window]), problems)
+            checked += 1
+            history = [(slot, s) for slot, s in history if slot > closed - slots]
+            if len(problems) > 10:
+                break
+        history.append(((now - start) // slot_ms, sample))
+    expected = seconds * 1000 // (slot_ms if sliding else window_ms) - 1
+    if checked < expected:
+        problems.append(f"{'deslizante' if sliding else 'fixa'}: {checked} janelas publicadas, esperado ≥ {expected}")
+    return checked
+
+
+def check_reader(problems):
+    """Aquisição contínua -> estatísticas -> característica STATS e comando STATS:"""
+    levels = (250000, 1650000, 3000000)
+    backend = SimulatedBackend(3, waves=((WAVE_DC, levels[0], 0, 0, 0), (WAVE_DC, levels[1], 0, 0, 0),
+                                         (WAVE_SINE, levels[2], 500000, 50, 0)), sample_rate_hz=1000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader = ADCReader(backend=backend)
+        from ble_voltmeter_server import BLEVoltmeterServer
+        server = BLEVoltmeterServer(reader)
+    reader.enable_stats(200, 4, False)
+    reader.start_continuous(1000, 16)
+    out = array('i', [0, 0, 0])
+    deadline = time.monotonic() + 0.7
+    while time.monotonic() < deadline:
+        for _ in range(16):
+            reader.acquisition.tick()
+        reader.read_all_uv(out)
+        time.sleep(0.004)
+    reader.stop_continuous()
+    # Central 1 negociou MTU 247; a 2 ficou no padrão (23)
+    server.connections.update((1, 2))
+    server.ble.irq_event(ble_sim.IRQ_MTU_EXCHANGED, (1, 247))
+    if not server.publish_stats(notify=True):
+        problems.append("publish_stats: nenhuma janela publicada pela aquisição contínua")
+        return
+    blob = server.ble.gatts_read(server.stats_handle)
+    sent = {conn_handle: payload for conn_handle, handle, payload in server.ble.notifications
+            if handle == server.stats_handle}
+    if sent.get(1) != blob or sent.get(2) != blob[:4]:
+        problems.append(f"notificação STATS: {len(sent.get(1, b''))} / {len(sent.get(2, b''))} bytes "
+                        f"(blob de {len(blob)})")
+    decoded = decode_stats(blob)
+    for channel, expected in enumerate(levels[:2]):
+        got = decoded['channels'][channel]
+        if abs(got['mean_uv'] - expected) > 200 or got['stddev_uv'] > 200:
+            problems.append(f"STATS canal {channel + 1}: {got}")
+    sine = decoded['channels'][2]
+    if abs(sine['stddev_uv'] - 500000 / math.sqrt(2)) > 20000:
+        problems.append(f"STATS canal 3 (senoide de 0,5 V): desvio {sine['stddev_uv']} µV")
+    if server.publish_stats():
+        problems.append("publish_stats reescreveu o mesmo blob")
+
+    # Comando STATS: troca a janela e responde a configuração
+    server.ble.values[server.command_handle] = b"STATS:2000,20,sliding"
+    with contextlib.redirect_stdout(io.StringIO()):
+        server._handle_command_data(0)
+    reply = server.ble.gatts_read(server.command_handle)
+    if reply != b"STATS:2000,20,sliding" or not reader.stats.sliding or reader.stats.slots != 20:
+        problems.append(f"comando STATS: resposta {reply!r}")
+    server.ble.values[server.command_handle] = b"STATS:0"
+    with contextlib.redirect_stdout(io.StringIO()):
+        server._handle_command_data(0)
+    if reader.stats is not None or server.ble.gatts_read(server.command_handle) != b"STATS:0":
+        problems.append("comando STATS:0 não desligou as estatísticas")
+
+
+def throughput(samples):
+    stats = WindowStats(3, 1000, 10)
+    sample = array('i', [1650000, 250000, 3000000])
+    start = time.perf_counter()
+    for k in range(samples):
+        sample[0] = 1650000 + (k & 255)
+        stats.add_all(sample, k)
+    return (time.perf_counter() - start) * 1000000 / (samples * 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estatísticas por janela do voltímetro")
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--rate', type=int, default=1000, help="amostras/s por canal")
+    parser.add_argument('--window', type=int, default=1000, help="janela (ms)")
+    parser.add_argument('--slots', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    problems = []
+    for sliding in (False, True):
+        checked = check_windows(sliding, args.seconds, args.rate, args.window, args.slots, args.seed, problems)
+        print(f"Janela {'deslizante' if sliding else 'fixa':10s} de {args.window} ms: {checked:4d} blobs conferidos "
+              f"({CHANNELS} canais, {args.rate} amostras/s)")
+    check_reader(problems)
+    stats = WindowStats(3)
+    memory = sum(len(a) * a.itemsize for a in (stats.block.count, stats.slot_count, stats.slot_mean,
+                                               stats.slot_m2, stats.slot_min, stats.slot_max)) + 6 * 12
+    print(f"Memória fixa com 3 canais e {stats.slots} fatias: ~{memory + 2 * len(stats.latest())} bytes")
+    print(f"Custo por amostra no computador: {throughput(20000):.2f} µs")
+
+    for problem in problems[:20]:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✓ Estatísticas por janela conferidas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -161,6 +161,13 @@ async def connect_to_display(address):
     except Exception as e:
         print(f"Erro de conexão: {e}")
 
+def decode_voltages(data):
+    """Tensões (V) do frame inteiro em µV (tipo 0xB5 + bitmap u16 + int32 por canal) ou do '<fff' antigo"""
+    if len(data) > 3 and data[0] == 0xB5:
+        count = (len(data) - 3) // 4
+        return tuple(uv / 1e6 for uv in struct.unpack_from('<%di' % count, data, 3))
+    return struct.unpack('<fff', data[:12])
+
 async def connect_to_voltmeter(address):
     """Conecta ao nó voltímetro e lê tensões"""
     print(f"\nTentando conectar ao voltímetro em {address}...")
@@ -168,8 +175,8 @@ async def connect_to_voltmeter(address):
     def voltage_notification_handler(sender, data):
         """Handler para notificações de tensão"""
         try:
-            if len(data) >= 12:  # 3 floats * 4 bytes
-                voltages = struct.unpack('<fff', data[:12])
+            if len(data) >= 12:  # 3 floats ou tipo + 3 int32
+                voltages = decode_voltages(data)
                 print(f"📊 Tensões: Canal1={voltages[0]:.3f}V, Canal2={voltages[1]:.3f}V, Canal3={voltages[2]:.3f}V")
             else:
                 print(f"Dados de tensão inválidos (tamanho: {len(data)}): {data}")
@@ -216,7 +223,7 @@ async def connect_to_voltmeter(address):
                 print("\nTentando leitura manual...")
                 data = await client.read_gatt_char(VOLTAGE_CHAR_UUID)
                 if data and len(data) >= 12:
-                    voltages = struct.unpack('<fff', data[:12])
+                    voltages = decode_voltages(data)
                     print(f"📖 Leitura manual: Canal1={voltages[0]:.3f}V, Canal2={voltages[1]:.3f}V, Canal3={voltages[2]:.3f}V")
                 else:
                     print(f"Dados insuficientes ou inválidos: {data}")
@@ -20,7 +20,7 @@ def test_ble_error18_fix():
     print("1. Testando importação dos módulos corrigidos...")
     try:
         sys.path.append('/common')
-        from constants import *
+        from constants import BLE_NAME_DISPLAY, BLE_NAME_VOLTMETER, MAX_CONNECTIONS  # noqa: F401
         print("   ✓ constants.py importado")
         
         # Testa se os módulos corrigidos existem
@@ -88,7 +88,9 @@ def main():
         ('voltmeter_node/ble_voltmeter_server_fixed.py', 'Servidor BLE corrigido do voltímetro'),
         ('voltmeter_node/main_fixed.py', 'Main corrigido do voltímetro'),
         ('test_system_fixed.py', 'Teste do sistema corrigido'),
-        ('common/constants.py', 'Constantes do sistema'),
+        ('common/constants.py', 'Constantes compartilhadas'),
+        ('display_node/display_constants.py', 'Constantes do display'),
+        ('voltmeter_node/voltmeter_constants.py', 'Constantes do voltímetro'),
         ('common/ble_utils.py', 'Utilitários BLE'),
         ('CORRECAO_BLE_ERROR18.md', 'Documentação das correções')
     ]
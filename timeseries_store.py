@@ -0,0 +1,357 @@
+"""
+Armazenamento colunar das séries de tensão gravadas pelo voltage_recorder.py
+
+Cada nó tem um diretório com dois arquivos só de acréscimo e o layout:
+
+    data.bin    chunks codificados: por amostra, delta zigzag varint do
+                timestamp (ms) e de cada canal (int16 em milivolts)
+    index.bin   uma entrada de tamanho fixo por chunk: intervalo de tempo,
+                posição no data.bin e min/max/soma de cada canal
+    layout.bin  bitmap u16 dos canais gravados (o mesmo do frame 0xB5); sem
+                ele, o layout antigo de 3 canais a partir do 1º
+
+As consultas mapeiam os dois arquivos com mmap, localizam os chunks por busca
+binária no índice e só decodificam os chunks que cruzam as bordas do
+intervalo; agregados de chunks inteiros saem direto do índice.
+"""
+
+import mmap
+import os
+import struct
+
+CHANNELS = 3                  # layout padrão (frames '<fff' e gravações antigas)
+DEFAULT_BITMAP = 0b111
+CHUNK_SAMPLES = 1024          # amostras por chunk (antes do flush forçado)
+
+LAYOUT_FILE = 'layout.bin'
+LAYOUT_MAGIC = b'VTS1'
+LAYOUT_FORMAT = '<4sH'        # magic, bitmap dos canais
+
+MV_MIN = -32768
+MV_MAX = 32767
+
+
+def index_format(channels):
+    """t_inicio, t_fim (ms), offset, tamanho (bytes), amostras, e por canal min, max, soma"""
+    return '<qqQII' + 'hhq' * channels
+
+
+def bitmap_channels(bitmap):
+    """Canais (a partir de 0) presentes no bitmap, em ordem"""
+    return tuple(channel for channel in range(16) if bitmap >> channel & 1)
+
+
+def read_layout(directory):
+    """Bitmap dos canais gravados no diretório (DEFAULT_BITMAP sem layout.bin)"""
+    path = os.path.join(directory, LAYOUT_FILE)
+    if not os.path.exists(path):
+        return DEFAULT_BITMAP
+    with open(path, 'rb') as f:
+        magic, bitmap = struct.unpack(LAYOUT_FORMAT, f.read(struct.calcsize(LAYOUT_FORMAT)))
+    if magic != LAYOUT_MAGIC or not bitmap:
+        raise ValueError(f"{path}: layout inválido")
+    return bitmap
+
+
+def write_layout(directory, bitmap):
+    with open(os.path.join(directory, LAYOUT_FILE), 'wb') as f:
+        f.write(struct.pack(LAYOUT_FORMAT, LAYOUT_MAGIC, bitmap))
+
+
+def volts_to_mv(volts):
+    """Converte tensão em volts para int16 em milivolts (saturado)"""
+    return max(MV_MIN, min(MV_MAX, int(round(volts * 1000))))
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def encode_varint(value, out):
+    """Acrescenta value (inteiro >= 0) em varint LEB128 ao bytearray out"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def encode_chunk(samples):
+    """Codifica [(t_ms, mv1, mv2, ...), ...] em deltas zigzag varint"""
+    out = bytearray()
+    fields = len(samples[0])
+    previous = (samples[0][0],) + (0,) * (fields - 1)
+    for sample in samples:
+        for field in range(fields):
+            encode_varint(zigzag(sample[field] - previous[field]), out)
+        previous = sample
+    return bytes(out)
+
+
+def decode_chunk(data, t_start, count, channels=CHANNELS):
+    """Decodifica um chunk; retorna lista de (t_ms, mv1, mv2, ...)"""
+    samples = []
+    values = [t_start] + [0] * channels
+    position = 0
+    fields = channels + 1
+    for _ in range(count):
+        for field in range(fields):
+            shift = 0
+            raw = 0
+            while True:
+                byte = data[position]
+                position += 1
+                raw |= (byte & 0x7F) << shift
+                if byte < 0x80:
+                    break
+                shift += 7
+            values[field] += unzigzag(raw)
+        samples.append(tuple(values))
+    return samples
+
+
+class IndexEntry:
+    """Entrada do índice: um chunk do data.bin"""
+
+    __slots__ = ('t_start', 't_end', 'offset', 'length', 'count', 'mins', 'maxs', 'sums')
+
+    def __init__(self, fields):
+        self.t_start, self.t_end, self.offset, self.length, self.count = fields[:5]
+        stats = fields[5:]
+        self.mins = stats[0::3]
+        self.maxs = stats[1::3]
+        self.sums = stats[2::3]
+
+    @classmethod
+    def from_samples(cls, samples, offset, length):
+        fields = [samples[0][0], samples[-1][0], offset, length, len(samples)]
+        for channel in range(1, len(samples[0])):
+            column = [sample[channel] for sample in samples]
+            fields += [min(column), max(column), sum(column)]
+        return cls(fields)
+
+    def pack(self):
+        fields = [self.t_start, self.t_end, self.offset, self.length, self.count]
+        for channel in range(len(self.mins)):
+            fields += [self.mins[channel], self.maxs[channel], self.sums[channel]]
+        return struct.pack(index_format(len(self.mins)), *fields)
+
+
+class SeriesWriter:
+    """Acumula amostras de um nó e grava chunks nos arquivos só de acréscimo
+
+    bitmap: canais do nó (bitmap do frame 0xB5), usado só ao criar o
+    diretório; um diretório existente mantém o layout já gravado (o chamador
+    compara com self.bitmap). rollup (opcional, ex: rollups.RollupWriter)
+    recebe cada chunk gravado.
+    """
+
+    def __init__(self, directory, bitmap=DEFAULT_BITMAP, chunk_samples=CHUNK_SAMPLES, rollup=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_samples = chunk_samples
+        self.rollup = rollup
+        self.pending = []
+        self.data_path = os.path.join(directory, 'data.bin')
+        self.index_path = os.path.join(directory, 'index.bin')
+        if os.path.exists(os.path.join(directory, LAYOUT_FILE)) or os.path.exists(self.index_path):
+            bitmap = read_layout(directory)
+        else:
+            write_layout(directory, bitmap)
+        self.bitmap = bitmap
+        self.channels = len(bitmap_channels(bitmap))
+        self.index_format = index_format(self.channels)
+        self.index_size = struct.calcsize(self.index_format)
+        self._recover()
+        self.data_file = open(self.data_path, 'ab')
+        self.index_file = open(self.index_path, 'ab')
+        self.last_t = self._last_timestamp()
+
+    def _recover(self):
+        """Descarta entradas e chunks incompletos deixados por uma queda"""
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        index_size -= index_size % self.index_size
+        data_end = 0
+        if index_size:
+            with open(self.index_path, 'rb') as f:
+                f.seek(index_size - self.index_size)
+                last = IndexEntry(struct.unpack(self.index_format, f.read(self.index_size)))
+                data_end = last.offset + last.length
+        for path, size in ((self.index_path, index_size), (self.data_path, data_end)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+    def _last_timestamp(self):
+        size = os.path.getsize(self.index_path)
+        if not size:
+            return None
+        with open(self.index_path, 'rb') as f:
+            f.seek(size - self.index_size)
+            return IndexEntry(struct.unpack(self.index_format, f.read(self.index_size))).t_end
+
+    def append(self, t_ms, millivolts):
+        """Acrescenta uma amostra (timestamps fora de ordem são ajustados)
+
+        millivolts tem um valor por canal do layout, na ordem dos bits.
+        """
+        if len(millivolts) != self.channels:
+            raise ValueError(f"{len(millivolts)} canais numa série de {self.channels}")
+        if self.last_t is not None and t_ms < self.last_t:
+            # Relógio do host voltou: mantém a série monotônica para a busca binária
+            t_ms = self.last_t
+        self.last_t = t_ms
+        self.pending.append((t_ms,) + tuple(millivolts))
+        if len(self.pending) >= self.chunk_samples:
+            self.flush()
+
+    def flush(self):
+        """Grava as amostras pendentes como um chunk (dados antes do índice)"""
+        if not self.pending:
+            return
+        payload = encode_chunk(self.pending)
+        offset = self.data_file.tell()
+        self.data_file.write(payload)
+        self.data_file.flush()
+        entry = IndexEntry.from_samples(self.pending, offset, len(payload))
+        self.index_file.write(entry.pack())
+        self.index_file.flush()
+        if self.rollup:
+            self.rollup.add(self.pending)
+            self.rollup.flush()
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.data_file.close()
+        self.index_file.close()
+        if self.rollup:
+            self.rollup.close()
+
+
+class SeriesReader:
+    """Consultas por intervalo de tempo sobre os arquivos mapeados em memória"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.bitmap = read_layout(directory)
+        self.channels = len(bitmap_channels(self.bitmap))
+        self.index_format = index_format(self.channels)
+        self.index_size = struct.calcsize(self.index_format)
+        self._data_file = open(os.path.join(directory, 'data.bin'), 'rb')
+        self._index_file = open(os.path.join(directory, 'index.bin'), 'rb')
+        self.data = self._map(self._data_file)
+        self.index = self._map(self._index_file)
+        self.chunks = len(self.index) // self.index_size
+
+    @staticmethod
+    def _map(f):
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def entry(self, i):
+        return IndexEntry(struct.unpack_from(self.index_format, self.index, i * self.index_size))
+
+    def _first_chunk_ending_after(self, t_ms):
+        """Busca binária: primeiro chunk com t_fim >= t_ms"""
+        low, high = 0, self.chunks
+        while low < high:
+            middle = (low + high) // 2
+            # t_fim é o segundo campo da entrada
+            t_end = struct.unpack_from('<q', self.index, middle * self.index_size + 8)[0]
+            if t_end < t_ms:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def chunks_in_range(self, start_ms, end_ms):
+        """Entradas do índice que cruzam [start_ms, end_ms]"""
+        i = self._first_chunk_ending_after(start_ms)
+        while i < self.chunks:
+            entry = self.entry(i)
+            if entry.t_start > end_ms:
+                break
+            yield entry
+            i += 1
+
+    def decode(self, entry):
+        data = self.data[entry.offset:entry.offset + entry.length]
+        return decode_chunk(data, entry.t_start, entry.count, self.channels)
+
+    def query(self, start_ms, end_ms):
+        """Amostras (t_ms, mv1, mv2, ...) em [start_ms, end_ms]"""
+        for entry in self.chunks_in_range(start_ms, end_ms):
+            samples = self.decode(entry)
+            if entry.t_start >= start_ms and entry.t_end <= end_ms:
+                yield from samples
+            else:
+                for sample in samples:
+                    if start_ms <= sample[0] <= end_ms:
+                        yield sample
+
+    def summary(self, start_ms, end_ms):
+        """min/max/média por canal em [start_ms, end_ms]
+
+        Chunks inteiros dentro do intervalo usam só o índice; apenas os
+        chunks das bordas são decodificados.
+        """
+        count = 0
+        channels = self.channels
+        mins = [MV_MAX] * channels
+        maxs = [MV_MIN] * channels
+        sums = [0] * channels
+        for entry in self.chunks_in_range(start_ms, end_ms):
+            if entry.t_start >= start_ms and entry.t_end <= end_ms:
+                count += entry.count
+                for c in range(channels):
+                    mins[c] = min(mins[c], entry.mins[c])
+                    maxs[c] = max(maxs[c], entry.maxs[c])
+                    sums[c] += entry.sums[c]
+                continue
+            for sample in self.decode(entry):
+                if start_ms <= sample[0] <= end_ms:
+                    count += 1
+                    for c in range(channels):
+                        value = sample[c + 1]
+                        mins[c] = min(mins[c], value)
+                        maxs[c] = max(maxs[c], value)
+                        sums[c] += value
+        if not count:
+            return {'count': 0}
+        return {
+            'count': count,
+            'min_mv': mins,
+            'max_mv': maxs,
+            'mean_mv': [total / count for total in sums],
+        }
+
+    def time_span(self):
+        """(primeiro, último) timestamp gravado, ou None"""
+        if not self.chunks:
+            return None
+        return self.entry(0).t_start, self.entry(self.chunks - 1).t_end
+
+    def close(self):
+        for mapped in (self.data, self.index):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+        self._data_file.close()
+        self._index_file.close()
+
+
+def node_directory(root, address):
+    """Diretório de um nó (endereço BLE sem ':')"""
+    return os.path.join(root, address.replace(':', '').upper())
+
+
+def list_nodes(root):
+    """Nós com dados gravados em root"""
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root)
+                  if os.path.exists(os.path.join(root, name, 'index.bin')))
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Confere a captura com pré-disparo do voltímetro (voltmeter_node/trigger.py)
+Sinais sintéticos entram no TriggerCapture varredura a varredura e cada
+captura é comparada com um modelo de referência das condições (primeira
+varredura que dispara, com o pré-disparo completo):
+
+    afundamento   trilho de 3,3 V com ruído afunda para 2,9 V (falling)
+    histerese     ruído de ±5 mV em torno do nível: sem borda de verdade não
+                  dispara com histerese; sem histerese dispara à toa
+    janela        pico curto fora de [1,6 V, 1,7 V] (outside)
+    canais        condições em dois canais, dispara o primeiro (OU)
+    aleatório     passeios aleatórios com tipo, nível e pre/post sorteados
+
+Depois monta o ADCReader com um conversor que reproduz o sinal (1 µV por
+código) e o servidor BLE no ble_sim: TRIG/ARM pela característica de
+comandos, aquisição contínua a taxa cheia, blocos enviados por
+pump_capture() no tamanho do MTU de cada central (com uma notificação
+recusada no meio e uma central que já saiu) e remontados por
+decode_capture(); CAPTURE_SEND:<bloco> reenvia a partir do bloco. Código de
+saída 1 se algo não conferir.
+
+    python3 trigger_sim.py
+    python3 trigger_sim.py --cases 2000 --seed 3
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+from array import array
+
+import ble_sim
+
+ble_sim.install('voltmeter')
+
+from adc_reader import ADCReader  # noqa: E402
+from metrics import metrics, C_TRIGGERS  # noqa: E402
+from trigger import (TriggerCapture, decode_capture, chunk_values, TRIGGER_NAMES,  # noqa: E402
+                     TRIG_ABOVE, TRIG_BELOW, TRIG_RISING, TRIG_FALLING, TRIG_OUTSIDE, TRIG_INSIDE)
+
+MTUS = {1: 247, 3: 40, 4: 23}   # central -> MTU negociado (a 4 fica no padrão)
+
+
+def reference(signal, conditions, pre):
+    """Índice da varredura que dispara, ou None (modelo direto das condições)
+
+    conditions: {canal: (tipo, a, b)} em µV, b já resolvido.
+    """
+    primed = {channel: False for channel in conditions}
+    for k, sample in enumerate(signal):
+        for channel in sorted(conditions):
+            kind, a, b = conditions[channel]
+            uv = sample[channel]
+            if kind == TRIG_ABOVE:
+                hit = uv > a
+            elif kind == TRIG_BELOW:
+                hit = uv < a
+            elif kind == TRIG_RISING:
+                primed[channel] |= uv < a - b
+                hit = primed[channel] and uv >= a
+            elif kind == TRIG_FALLING:
+                primed[channel] |= uv > a + b
+                hit = primed[channel] and uv <= a
+            elif kind == TRIG_OUTSIDE:
+                hit = uv < a or uv > b
+            else:
+                hit = a <= uv <= b
+            if hit and kind in (TRIG_RISING, TRIG_FALLING):
+                primed[channel] = False
+            if hit and k >= pre:
+                return k, channel
+    return None, None
+
+
+def run_capture(signal, conditions, pre, post):
+    """Passa o sinal pelo TriggerCapture; (índice do disparo, canal, dados) ou (None, None, None)"""
+    channels = len(signal[0])
+    capture = TriggerCapture(channels, pre, post)
+    for channel, (kind, a, b) in conditions.items():
+        capture.set_trigger(channel, kind, a, b)
+    capture.arm()
+    sample = array('i', [0] * channels)
+    for k, values in enumerate(signal):
+        for channel in range(channels):
+            sample[channel] = values[channel]
+        if capture.add(sample):
+            chunks = [bytes(capture.pack_chunk(index)) for index in range(capture.chunk_count())]
+            decoded = decode_capture(chunks)
+            return k - post + 1, decoded['trigger_channel'], decoded
+    return None, None, None
+
+
+def check_case(label, signal, conditions, pre, post, problems, expect=None):
+    """Compara a captura com a referência; expect confere o índice esperado"""
+    index, channel = reference(signal, conditions, pre)
+    if index is not None and index + post > len(signal):
+        index = channel = None      # o sinal acaba antes de completar as post
+    got, got_channel, decoded = run_capture(signal, conditions, pre, post)
+    if expect is not None and index != expect:
+        problems.append(f"{label}: referência disparou em {index}, esperado {expect}")
+    if got != index or got_channel != channel:
+        problems.append(f"{label}: disparo em {got} (canal {got_channel}), referência {index} (canal {channel})")
+        return got
+    if decoded is not None:
+        expected = [list(s) for s in signal[index - pre:index + post]]
+        if decoded['samples'] != expected:
+            problems.append(f"{label}: conteúdo da captura difere do sinal em torno de {index}")
+        if decoded['trigger_uv'] != signal[index][channel] or decoded['pre'] != pre or decoded['post'] != post:
+            problems.append(f"{label}: informações {decoded['trigger_uv']} / {decoded['pre']} / {decoded['post']}")
+    return got
+
+
+def scenarios(rng, problems):
+    """Casos dirigidos; retorna linhas (rótulo, disparo)"""
+    rows = []
+    # Trilho de 3,3 V afunda para 2,9 V na varredura 700
+    rail = [(3300000 + rng.randint(-3000, 3000),) for _ in range(700)]
+    rail += [(2900000 + rng.randint(-3000, 3000),) for _ in range(100)]
+    rail += [(3300000 + rng.randint(-3000, 3000),) for _ in range(300)]
+    rows.append(('afundamento', check_case('afundamento', rail, {0: (TRIG_FALLING, 3000000, 10000)},
+                                           64, 192, problems, expect=700)))
+
+    # Ruído em torno de 1 V sem borda: a histerese segura
+    noise = [(1000000 + rng.randint(-5000, 5000),) for _ in range(2000)]
+    rows.append(('ruído com histerese', check_case('histerese', noise, {0: (TRIG_RISING, 1000000, 10000)},
+                                                   32, 32, problems, expect=None)))
+    rows.append(('ruído sem histerese', check_case('sem histerese', noise, {0: (TRIG_RISING, 1000000, 0)},
+                                                   32, 32, problems)))
+    if rows[-1][1] is None:
+        problems.append("sem histerese: o ruído deveria disparar a borda")
+
+    # Borda antes do pré-disparo completo se perde; a próxima vale
+    early = [(0,)] * 10 + [(2000000,)] * 30 + [(0,)] * 30 + [(2000000,)] * 100
+    rows.append(('borda cedo', check_case('borda cedo', early, {0: (TRIG_RISING, 1000000, 10000)},
+                                          50, 20, problems, expect=70)))
+
+    # Pico de 1 varredura fora da janela
+    window = [(1650000 + rng.randint(-20000, 20000),) for _ in range(500)]
+    window[321] = (1900000,)
+    rows.append(('janela', check_case('janela', window, {0: (TRIG_OUTSIDE, 1600000, 1700000)},
+                                      100, 50, problems, expect=321)))
+
+    # Dois canais: o 2º dispara antes
+    both = [(1000000, 500000)] * 400 + [(1000000, 100000)] * 10 + [(3000000, 100000)] * 200
+    rows.append(('canais (OU)', check_case('canais', both, {0: (TRIG_ABOVE, 2000000, 2000000),
+                                                           1: (TRIG_BELOW, 200000, 200000)},
+                                           64, 64, problems, expect=400)))
+    return rows
+
+
+def fuzz(cases, rng, problems):
+    """Passeios aleatórios contra a referência; retorna (casos, disparos)"""
+    triggered = 0
+    for case in range(cases):
+        channels = rng.randint(1, 4)
+        length = rng.randint(50, 1500)
+        values = [rng.randint(0, 3300000) for _ in range(channels)]
+        signal = []
+        for _ in range(length):
+            values = [max(-5000000, min(5000000, v + rng.randint(-40000, 40000))) for v in values]
+            signal.append(tuple(values))
+        conditions = {}
+        for channel in rng.sample(range(channels), rng.randint(1, channels)):
+            kind = rng.randint(TRIG_ABOVE, TRIG_INSIDE)
+            a = rng.randint(0, 3300000)
+            if kind in (TRIG_RISING, TRIG_FALLING):
+                b = rng.choice((0, 1000, 10000, 100000))
+            elif kind in (TRIG_OUTSIDE, TRIG_INSIDE):
+                b = a + rng.randint(0, 500000)
+            else:
+                b = a
+            conditions[channel] = (kind, a, b)
+        pre = rng.randint(0, 200)
+        post = rng.randint(1, 200)
+        label = f"aleatório {case} ({', '.join(TRIGGER_NAMES[c[0]] for c in conditions.values())})"
+        if check_case(label, signal, conditions, pre, post, problems) is not None:
+            triggered += 1
+        if len(problems) > 10:
+            break
+    return cases, triggered
+
+
+class PlaybackBackend:
+    """Conversor falso que reproduz um sinal (1 µV por código)"""
+
+    name = 'reprodução'
+    max_code = 1 << 23
+    full_scale_uv = 1 << 23
+
+    def __init__(self, signal):
+        self.signal = signal
+        self.channel_count = len(signal[0])
+        self.position = 0
+
+    def active(self, channel):
+        return True
+
+    def read(self, channel):
+        return self.signal[min(self.position, len(self.signal) - 1)][channel]
+
+    def read_block(self, mask, out):
+        sample = self.signal[min(self.position, len(self.signal) - 1)]
+        for channel in range(self.channel_count):
+            out[channel] = sample[channel]
+        self.position += 1
+        return out
+
+
+def _command(server, text):
+    server.ble.values[server.command_handle] = text.encode()
+    with contextlib.redirect_stdout(io.StringIO()):
+        server._handle_command_data(1)
+    return server.ble.gatts_read(server.command_handle).decode()
+
+
+def check_reader(rng, problems):
+    """TRIG/ARM por BLE, aquisição contínua a 1 kHz, blocos remontados no host"""
+    dip = 1500
+    signal = [(3300000 + rng.randint(-2000, 2000), 1650000 + rng.randint(-500, 500)) for _ in range(dip)]
+    signal += [(2950000 - 1000 * k, 1650000) for k in range(200)]
+    signal += [(3300000, 1650000)] * 2000
+    backend = PlaybackBackend(signal)
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader = ADCReader(backend=backend)
+        from ble_voltmeter_server import BLEVoltmeterServer
+        server = BLEVoltmeterServer(reader)
+    for conn_handle, mtu in MTUS.items():
+        server.connections.add(conn_handle)
+        if mtu != 23:
+            server.ble.irq_event(ble_sim.IRQ_MTU_EXCHANGED, (conn_handle, mtu))
+    reader.filter_samples = 1
+
+    reply = _command(server, "TRIG:1,falling,3000")
+    if not reply.startswith("TRIG:IDLE;falling/3000/10"):
+        problems.append(f"comando TRIG: resposta {reply!r}")
+    reply = _command(server, "ARM:128,256")
+    if not reply.startswith("TRIG:ARMED") or "PRE:128;POST:256" not in reply:
+        problems.append(f"comando ARM: resposta {reply!r}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        reader.start_continuous(1000, 16)
+    out = array('i', [0, 0])
+    start = metrics.counters[C_TRIGGERS]
+    for _ in range(len(signal) // 16):
+        for _ in range(16):
+            reader.acquisition.tick()
+        reader.read_all_uv(out)
+        if reader.capture.done():
+            break
+    reader.stop_continuous()
+    if not reader.capture.done() or metrics.counters[C_TRIGGERS] != start + 1:
+        problems.append(f"leitor: captura em {reader.capture.describe()}")
+        return 0, 0
+
+    # Transferência: uma notificação recusada no meio é repetida; a central 2
+    # já saiu (sem o evento de desconexão) e é removida na primeira falha
+    notify = server.ble.gatts_notify
+    calls = [0]
+
+    def flaky(conn_handle, handle, data=None):
+        if conn_handle == 2:
+            raise OSError(128)  # ENOTCONN
+        calls[0] += 1
+        if calls[0] == 5:
+            raise OSError(12)   # ENOMEM: fila do controlador cheia
+        notify(conn_handle, handle, data)
+
+    server.connections.add(2)
+    server.ble.irq_event(ble_sim.IRQ_MTU_EXCHANGED, (2, 247))
+    server.ble.gatts_notify = flaky
+    loops = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        while True:
+            server.pump_capture()
+            if not server.capture_pending():
+                break
+            loops += 1
+            if loops > 1000:
+                problems.append("transferência não terminou")
+                break
+    server.ble.gatts_notify = notify
+    if server.connections != set(MTUS):
+        problems.append(f"conexão morta não removida: {server.connections}")
+    received = {conn_handle: {} for conn_handle in MTUS}
+    for conn_handle, handle, payload in server.ble.notifications:
+        if handle == server.capture_handle:
+            if len(payload) > MTUS[conn_handle] - 3:
+                problems.append(f"bloco de {len(payload)} bytes para a central com MTU {MTUS[conn_handle]}")
+            received[conn_handle][struct_index(payload)] = payload
+    if received[4]:
+        problems.append(f"central com MTU 23 recebeu {len(received[4])} blocos")
+    chunks = list(received[1].values())
+    for conn_handle in (1, 3):
+        try:
+            decoded = decode_capture(received[conn_handle].values())
+        except ValueError as e:
+            problems.append(f"transferência (MTU {MTUS[conn_handle]}): {e}")
+            return len(chunks), loops
+        if decoded['samples'] != [list(s) for s in signal[dip - 128:dip + 256]]:
+            problems.append(f"transferência: captura não é o sinal em torno do disparo ({decoded['trigger_uv']} µV)")
+        if decoded['period_us'] != 1000 or decoded['trigger'] != 'falling' or decoded['trigger_channel'] != 0:
+            problems.append(f"transferência: informações {decoded['period_us']} µs, {decoded['trigger']}")
+    if len(received[3]) != reader.capture.chunk_count(chunk_values(MTUS[3])):
+        problems.append(f"MTU {MTUS[3]}: {len(received[3])} blocos")
+    if server.pump_capture():
+        problems.append("pump_capture continuou enviando depois do último bloco")
+
+    # Reenvio a partir de um bloco
+    server.ble.notifications.clear()
+    _command(server, "CAPTURE_SEND:3")
+    while server.pump_capture():
+        pass
+    resent = [struct_index(payload) for conn_handle, handle, payload in server.ble.notifications
+              if handle == server.capture_handle and conn_handle == 1]
+    if resent != list(range(3, reader.capture.chunk_count(chunk_values(MTUS[1])))):
+        problems.append(f"CAPTURE_SEND:3 reenviou {resent}")
+
+    # Leitura sob demanda: período medido
+    _command(server, "TRIG:2,inside,1000,1700")
+    _command(server, "ARM:4,8")
+    for _ in range(20):
+        reader.read_all_uv(out)
+    if not reader.capture.done() or reader.capture.trigger_channel != 1:
+        problems.append(f"sob demanda: {reader.capture.describe()}")
+    reply = _command(server, "DISARM")
+    if reply != "TRIG:IDLE;falling/3000/10,inside/1000/1700;PRE:4;POST:8;CAPTURES:1":
+        problems.append(f"DISARM: resposta {reply!r}")
+    return len(chunks), loops
+
+
+def struct_index(payload):
+    return int.from_bytes(payload[2:4], 'little')
+
+
+def throughput(scans):
+    capture = TriggerCapture(3, 64, 192)
+    capture.set_trigger(0, TRIG_FALLING, 1000000)
+    capture.set_trigger(2, TRIG_OUTSIDE, 1600000, 1700000)
+    capture.arm()
+    sample = array('i', [3300000, 250000, 1650000])
+    start = time.perf_counter()
+    for k in range(scans):
+        sample[0] = 3300000 - (k & 255)
+        capture.add(sample)
+    return (time.perf_counter() - start) * 1000000 / scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Captura com pré-disparo do voltímetro")
+    parser.add_argument('--cases', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    problems = []
+    for label, index in scenarios(rng, problems):
+        print(f"{label:22s} {'sem disparo' if index is None else f'disparo na varredura {index}'}")
+    cases, triggered = fuzz(args.cases, rng, problems)
+    print(f"Aleatórios: {cases} casos, {triggered} disparos conferidos com a referência")
+    chunks, loops = check_reader(rng, problems)
+    print(f"BLE: {chunks} notificações (MTU {MTUS[1]}) em {loops} voltas do loop (uma recusada e repetida)")
+    print(f"Custo por varredura armada (3 canais) no computador: {throughput(20000):.2f} µs")
+
+    for problem in problems[:20]:
+        print(f"❌ {problem}")
+    if problems:
+        return 1
+    print("✓ Captura com pré-disparo conferida")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
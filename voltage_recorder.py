@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Gravador das séries de tensão dos voltímetros ESP32
+Assina VOLTAGE_CHAR_UUID em todos os nós e grava as amostras em disco no
+formato colunar de timeseries_store.py (um diretório por nó):
+
+    python3 voltage_recorder.py record dados/                      # procura voltímetros
+    python3 voltage_recorder.py record dados/ AA:BB:CC:DD:EE:FF    # nós específicos
+    python3 voltage_recorder.py nodes dados/
+    python3 voltage_recorder.py query dados/ AA:BB:CC:DD:EE:FF 2024-05-01 2024-06-01
+    python3 voltage_recorder.py query dados/ AA:BB:CC:DD:EE:FF 2024-05-01T10:00 2024-05-01T10:05 --samples
+
+Requer: bleak library (pip install bleak) para gravar.
+"""
+
+import argparse
+import asyncio
+import re
+import struct
+import sys
+import time
+from datetime import datetime
+
+import rollups
+import timeseries_store as store
+
+VOLTAGE_CHAR_UUID = "87654321-4321-4321-4321-cba987654322"
+VOLTMETER_NAME = "ESP32_Voltmeter"
+STATUS_FRAME = b"VOLTMETER_OK"
+VOLTAGE_FRAME_UV = 0xB5     # common/constants.py: tipo + bitmap u16 + µV int32 por canal
+VOLTAGE_FRAME_HEADER = 3
+
+FLUSH_INTERVAL = 60.0       # segundos máximos com amostras só em memória
+RECONNECT_DELAY = 5.0       # espera inicial entre tentativas de reconexão
+RECONNECT_DELAY_MAX = 60.0
+
+_TEXT_FRAME = re.compile(rb'V1:([-\d.]+),V2:([-\d.]+),V3:([-\d.]+)')
+
+
+def parse_frame_channels(data):
+    """(bitmap, tensões em volts) de uma notificação, ou None se não for de tensão
+
+    Aceita o frame inteiro em µV (ble_voltmeter_server.py; um valor por
+    bit do bitmap, em ordem), o binário '<fff' das versões anteriores e o
+    texto "V1:..,V2:..,V3:.." (ble_voltmeter_server_fixed.py); esses dois
+    são sempre os canais 1 a 3 (store.DEFAULT_BITMAP).
+    """
+    data = bytes(data)
+    match = _TEXT_FRAME.match(data)
+    if match:
+        return store.DEFAULT_BITMAP, tuple(float(value) for value in match.groups())
+    if len(data) > VOLTAGE_FRAME_HEADER and data[0] == VOLTAGE_FRAME_UV:
+        bitmap = data[1] | (data[2] << 8)
+        count = bin(bitmap).count('1')
+        if count and len(data) == VOLTAGE_FRAME_HEADER + 4 * count:
+            return bitmap, tuple(uv / 1e6 for uv in struct.unpack_from('<%di' % count, data, VOLTAGE_FRAME_HEADER))
+    # "VOLTMETER_OK" (resposta ao STATUS) também tem 12 bytes
+    if len(data) == 12 and data != STATUS_FRAME:
+        return store.DEFAULT_BITMAP, struct.unpack('<fff', data)
+    return None
+
+
+def parse_voltage_frame(data):
+    """Tensões em volts de uma notificação, ou None se não for de tensão"""
+    frame = parse_frame_channels(data)
+    return frame[1] if frame else None
+
+
+def channel_labels(bitmap):
+    """Números dos canais (a partir de 1) presentes no bitmap"""
+    return [channel + 1 for channel in store.bitmap_channels(bitmap)]
+
+
+class NodeRecorder:
+    """Conexão com um voltímetro e gravação das notificações recebidas"""
+
+    def __init__(self, root, address):
+        self.address = address
+        self.directory = store.node_directory(root, address)
+        self.writer = None          # aberto no 1º frame: o layout vem do bitmap
+        self.samples = 0
+        self.ignored = 0
+        self.mismatched = 0
+
+    def _open(self, bitmap):
+        writer = store.SeriesWriter(self.directory, bitmap)
+        writer.rollup = rollups.RollupWriter(self.directory, writer.channels)
+        return writer
+
+    def handle_notification(self, sender, data):
+        frame = parse_frame_channels(data)
+        if frame is None:
+            # Respostas de status chegam pela mesma característica
+            self.ignored += 1
+            return
+        bitmap, voltages = frame
+        if self.writer is None:
+            self.writer = self._open(bitmap)
+        if bitmap != self.writer.bitmap:
+            # Canais diferentes dos já gravados (ADC_PINS/CHANNEL_BASE mudou):
+            # não mistura colunas na mesma série
+            if not self.mismatched:
+                print(f"⚠️  {self.address}: frames com os canais {channel_labels(bitmap)}, série gravada "
+                      f"com {channel_labels(self.writer.bitmap)}; ignorando (use outro diretório)")
+            self.mismatched += 1
+            return
+        t_ms = time.time_ns() // 1_000_000
+        self.writer.append(t_ms, [store.volts_to_mv(v) for v in voltages])
+        self.samples += 1
+
+    def flush(self):
+        if self.writer:
+            self.writer.flush()
+
+    async def run(self):
+        """Mantém a assinatura ativa, reconectando com espera exponencial"""
+        from bleak import BleakClient
+
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                async with BleakClient(self.address, timeout=20.0) as client:
+                    await client.start_notify(VOLTAGE_CHAR_UUID, self.handle_notification)
+                    print(f"✓ {self.address}: gravando")
+                    delay = RECONNECT_DELAY
+                    while client.is_connected:
+                        await asyncio.sleep(FLUSH_INTERVAL)
+                        self.flush()
+                print(f"⚠️  {self.address}: desconectado")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  {self.address}: {e}")
+            self.flush()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_DELAY_MAX)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+async def discover_voltmeters(timeout=10.0):
+    """Endereços dos voltímetros anunciando nas proximidades"""
+    from bleak import BleakScanner
+
+    print(f"Procurando voltímetros ({timeout:.0f}s)...")
+    devices = await BleakScanner.discover(timeout=timeout, return_adv=True)
+    addresses = []
+    for address, (device, adv_data) in devices.items():
+        name = device.name or adv_data.local_name or ""
+        if name == VOLTMETER_NAME:
+            print(f"Voltímetro encontrado: {address} - RSSI: {adv_data.rssi}")
+            addresses.append(address)
+    return addresses
+
+
+async def record(root, addresses):
+    if not addresses:
+        addresses = await discover_voltmeters()
+    if not addresses:
+        print("❌ Nenhum voltímetro encontrado")
+        return 1
+
+    recorders = [NodeRecorder(root, address) for address in addresses]
+    try:
+        await asyncio.gather(*(recorder.run() for recorder in recorders))
+    finally:
+        for recorder in recorders:
+            recorder.close()
+            skipped = f", {recorder.mismatched} com outros canais ignoradas" if recorder.mismatched else ""
+            print(f"{recorder.address}: {recorder.samples} amostras gravadas{skipped}")
+    return 0
+
+
+def parse_time(text):
+    """Timestamp em ms a partir de data ISO (hora local) ou epoch em segundos"""
+    try:
+        return int(float(text) * 1000)
+    except ValueError:
+        return int(datetime.fromisoformat(text).timestamp() * 1000)
+
+
+def format_time(t_ms):
+    return datetime.fromtimestamp(t_ms / 1000).isoformat(timespec='milliseconds')
+
+
+def query(root, address, start, end, samples):
+    reader = store.SeriesReader(store.node_directory(root, address))
+    try:
+        start_ms, end_ms = parse_time(start), parse_time(end)
+        labels = channel_labels(reader.bitmap)
+        began = time.perf_counter()
+        if samples:
+            print("Canais: " + ", ".join(str(label) for label in labels))
+            count = 0
+            for sample in reader.query(start_ms, end_ms):
+                print(f"{format_time(sample[0])}  " + "  ".join(f"{mv / 1000:.3f}V" for mv in sample[1:]))
+                count += 1
+            print(f"{count} amostras")
+        else:
+            result = reader.summary(start_ms, end_ms)
+            print(f"Amostras: {result['count']}")
+            if result['count']:
+                for c, label in enumerate(labels):
+                    print(f"Canal {label}: min={result['min_mv'][c] / 1000:.3f}V "
+                          f"max={result['max_mv'][c] / 1000:.3f}V "
+                          f"média={result['mean_mv'][c] / 1000:.3f}V")
+        print(f"Consulta em {(time.perf_counter() - began) * 1000:.1f} ms")
+    finally:
+        reader.close()
+    return 0
+
+
+def nodes(root):
+    for name in store.list_nodes(root):
+        reader = store.SeriesReader(f"{root}/{name}")
+        span = reader.time_span()
+        if span:
+            print(f"{name}: canais {channel_labels(reader.bitmap)}, {reader.chunks} chunks, "
+                  f"{format_time(span[0])} → {format_time(span[1])}")
+        reader.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gravador de séries de tensão dos voltímetros")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_record = sub.add_parser('record', help="Grava notificações de tensão")
+    p_record.add_argument('root', help="Diretório de dados")
+    p_record.add_argument('addresses', nargs='*', help="Endereços BLE (padrão: procura voltímetros)")
+
+    p_nodes = sub.add_parser('nodes', help="Lista nós gravados")
+    p_nodes.add_argument('root')
+
+    p_query = sub.add_parser('query', help="Consulta um intervalo de tempo")
+    p_query.add_argument('root')
+    p_query.add_argument('address')
+    p_query.add_argument('start', help="Início (ISO 8601 ou epoch em segundos)")
+    p_query.add_argument('end', help="Fim (ISO 8601 ou epoch em segundos)")
+    p_query.add_argument('--samples', action='store_true', help="Lista as amostras em vez do resumo")
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        try:
+            return asyncio.run(record(args.root, args.addresses))
+        except KeyboardInterrupt:
+            print("\nGravação interrompida.")
+            return 0
+    if args.command == 'nodes':
+        return nodes(args.root)
+    return query(args.root, args.address, args.start, args.end, args.samples)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+Medição AC do voltímetro: RMS verdadeiro, pico e frequência por canal
+A aquisição contínua amostra a taxa fixa (AC_SAMPLE_HZ) e cada amostra em
+µV entra aqui; a cada AC_WINDOW_SAMPLES amostras de um canal a janela fecha
+com, em µV:
+
+    DC      média da janela
+    RMS     raiz da média de (x - DC)², isto é, o RMS verdadeiro sem o DC
+    pico    maior |x - DC| na janela
+    freq.   cruzamentos por zero subindo (em torno do DC da janela anterior,
+            com histerese AC_ZC_HYSTERESIS_UV), interpolados em 1/256 de
+            amostra; em mHz, 0 com menos de dois cruzamentos
+
+Tudo em inteiros. Por amostra só inteiros pequenos: os desvios d em relação
+ao DC da janela anterior vão para square_sums.SquareSums. A cada bloco de
+SQ_BLOCK amostras as somas vão para os totais da janela (inteiros longos no
+MicroPython, uma vez por bloco) e no fim da janela
+RMS = isqrt(n·Σd² - (Σd)²) / n, exato qualquer que seja a referência. A 1ª
+janela ainda não tem o DC anterior: a frequência dela pode sair 0 (flag
+FLAG_SETTLED desligada).
+
+Resultado da característica AC (little-endian), um por janela:
+    tipo u8 (AC_FRAME) | flags u8 (bit 0: nível de cruzamento assentado) |
+    canais u8 | versão u8 | taxa_hz u16 | amostras u16 | fim (ticks_ms) u32
+    por canal: DC i32 | RMS u32 | pico u32 (µV) | frequência u32 (mHz)
+
+decode_ac() decodifica no host.
+"""
+
+import struct
+import time
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+from constants import AC_FRAME
+from voltmeter_constants import AC_SAMPLE_HZ, AC_WINDOW_SAMPLES, AC_ZC_HYSTERESIS_UV
+from square_sums import SquareSums, SQ_BLOCK
+
+AC_VERSION = const(1)
+AC_HEADER_FORMAT = '<BBBBHHI'
+AC_HEADER_SIZE = const(12)
+AC_CHANNEL_FORMAT = '<iIII'
+AC_CHANNEL_SIZE = const(16)
+FLAG_SETTLED = const(1)
+_FRAC_LIMIT = const(0x400000)   # d << 8 ainda é um inteiro pequeno abaixo disso
+
+
+def ac_blob_size(channels):
+    """Tamanho do resultado com channels canais"""
+    return AC_HEADER_SIZE + AC_CHANNEL_SIZE * channels
+
+
+def isqrt(n):
+    """Raiz quadrada inteira (piso) pelo método de Newton; n >= 0"""
+    if n < 2:
+        return n if n > 0 else 0
+    shift = 0
+    while n >> shift:
+        shift += 2
+    x = 1 << (shift >> 1)      # já maior que a raiz
+    while True:
+        y = (x + n // x) >> 1
+        if y >= x:
+            return x
+        x = y
+
+
+class ACMeter:
+    """DC, RMS, pico e frequência por canal em janelas de amostras; add() não aloca"""
+
+    def __init__(self, channels, rate_hz=AC_SAMPLE_HZ, window_samples=AC_WINDOW_SAMPLES,
+                 hysteresis_uv=AC_ZC_HYSTERESIS_UV):
+        if not 1 <= window_samples <= 65535 or not 1 <= rate_hz <= 65535:
+            raise ValueError("taxa ou janela inválida")
+        self.channels = channels
+        self.rate_hz = rate_hz
+        self.window_samples = window_samples
+        self.hysteresis_uv = hysteresis_uv
+
+        # Referência (DC da janela anterior) e bloco inteiro em andamento
+        self.has_ref = array('i', [0] * channels)
+        self.ref = array('i', [0] * channels)
+        self.block = SquareSums(channels)
+        # Totais da janela: podem passar de 2**30 (atualizados por bloco)
+        self.total_sum = [0] * channels
+        self.total_sq = [0] * channels
+        self.count = array('i', [0] * channels)
+        self.low = array('i', [0] * channels)
+        self.high = array('i', [0] * channels)
+
+        # Cruzamentos por zero: estado do Schmitt (-1, 0, 1), posições em 1/256 de amostra
+        self.state = array('i', [0] * channels)
+        self.prev_uv = array('i', [0] * channels)
+        self.candidate = array('i', [0] * channels)
+        self.crossings = array('i', [0] * channels)
+        self.first_cross = array('i', [0] * channels)
+        self.last_cross = array('i', [0] * channels)
+        self.settled = array('i', [0] * channels)
+
+        # Resultado da última janela de cada canal
+        self.dc_uv = array('i', [0] * channels)
+        self.rms_uv = array('i', [0] * channels)
+        self.peak_uv = array('i', [0] * channels)
+        self.freq_mhz = array('i', [0] * channels)
+
+        # Dois blobs: o leitor sempre vê o último completo (latest())
+        self.blobs = (bytearray(ac_blob_size(channels)), bytearray(ac_blob_size(channels)))
+        self.sequence = 0
+        self.restarts = 0
+
+    def add(self, channel, uv):
+        """Acumula uma amostra (µV) do canal; só inteiros pequenos"""
+        count = self.count[channel]
+        if not self.has_ref[channel]:
+            self.ref[channel] = uv
+            self.prev_uv[channel] = uv
+            self.has_ref[channel] = 1
+        if count == 0:
+            self.low[channel] = uv
+            self.high[channel] = uv
+        elif uv < self.low[channel]:
+            self.low[channel] = uv
+        elif uv > self.high[channel]:
+            self.high[channel] = uv
+        ref = self.ref[channel]
+        d = uv - ref
+        if self.block.add(channel, d) >= SQ_BLOCK:
+            self._flush(channel)
+
+        # Cruzamento subindo: candidato ao passar por 0, confirmado acima da histerese
+        state = self.state[channel]
+        if state < 0:
+            prev = self.prev_uv[channel] - ref
+            if d > 0 >= prev:
+                span = d - prev
+                frac = (d << 8) // span if d < _FRAC_LIMIT else d // (span >> 8)
+                self.candidate[channel] = (count << 8) - frac
+            if d > self.hysteresis_uv:
+                self.state[channel] = 1
+                position = self.candidate[channel]
+                if not self.crossings[channel]:
+                    self.first_cross[channel] = position
+                self.last_cross[channel] = position
+                self.crossings[channel] += 1
+        elif d < -self.hysteresis_uv:
+            self.state[channel] = -1
+        elif d > self.hysteresis_uv:
+            self.state[channel] = 1
+        self.prev_uv[channel] = uv
+
+        count += 1
+        self.count[channel] = count
+        if count >= self.window_samples:
+            self._close(channel)
+
+    def _flush(self, channel):
+        """Passa o bloco inteiro para os totais da janela"""
+        block = self.block
+        if not block.count[channel]:
+            return
+        self.total_sq[channel] += block.squares(channel)
+        self.total_sum[channel] += block.sum[channel]
+        block.reset(channel)
+
+    def _close(self, channel):
+        """Fecha a janela do canal; publica depois do último canal"""
+        self._flush(channel)
+        n = self.count[channel]
+        total = self.total_sum[channel]
+        dc = self.ref[channel] + (2 * total + n) // (2 * n)
+        self.dc_uv[channel] = dc
+        self.rms_uv[channel] = (isqrt(n * self.total_sq[channel] - total * total) + n // 2) // n
+        self.peak_uv[channel] = max(self.high[channel] - dc, dc - self.low[channel])
+        crossings = self.crossings[channel]
+        span = self.last_cross[channel] - self.first_cross[channel]
+        if crossings >= 2 and span > 0:
+            self.freq_mhz[channel] = (crossings - 1) * self.rate_hz * 256000 // span
+        else:
+            self.freq_mhz[channel] = 0
+
+        # A próxima janela cruza em torno deste DC
+        self.settled[channel] = self.has_ref[channel] == 2
+        self.has_ref[channel] = 2
+        self.ref[channel] = dc
+        self.candidate[channel] -= n << 8
+        if self.state[channel] < 0 and self.prev_uv[channel] > dc:
+            # Já acima do novo zero sem candidato: espera o próximo ciclo
+            self.state[channel] = 0
+        self._reset(channel)
+        if channel == self.channels - 1:
+            self._publish()
+
+    def _reset(self, channel):
+        self.total_sum[channel] = 0
+        self.total_sq[channel] = 0
+        self.count[channel] = 0
+        self.crossings[channel] = 0
+
+    def restart(self):
+        """Descarta as janelas em andamento (ex.: bloco da aquisição perdido)"""
+        for channel in range(self.channels):
+            self.block.reset(channel)
+            self.state[channel] = 0
+            self.prev_uv[channel] = self.ref[channel]
+            self._reset(channel)
+        self.restarts += 1
+
+    def _publish(self):
+        """Empacota o resultado no blob livre"""
+        blob = self.blobs[(self.sequence + 1) & 1]
+        flags = FLAG_SETTLED
+        for channel in range(self.channels):
+            if not self.settled[channel]:
+                flags = 0
+        struct.pack_into(AC_HEADER_FORMAT, blob, 0, AC_FRAME, flags, self.channels, AC_VERSION,
+                         self.rate_hz, self.window_samples, time.ticks_ms())
+        offset = AC_HEADER_SIZE
+        for channel in range(self.channels):
+            struct.pack_into(AC_CHANNEL_FORMAT, blob, offset, self.dc_uv[channel], self.rms_uv[channel],
+                             self.peak_uv[channel], self.freq_mhz[channel])
+            offset += AC_CHANNEL_SIZE
+        # O blob só vira o atual depois de completo
+        self.sequence += 1
+
+    def latest(self):
+        """Último resultado publicado (sequence 0: nenhum ainda)"""
+        return self.blobs[self.sequence & 1]
+
+    def describe(self):
+        """Configuração atual em texto (resposta do comando AC?)"""
+        return "AC:%d,%d" % (self.rate_hz, self.window_samples)
+
+
+def decode_ac(data):
+    """Decodifica o resultado da característica AC (usado no host)"""
+    kind, flags, channels, version, rate_hz, samples, end = struct.unpack_from(AC_HEADER_FORMAT, data, 0)
+    if kind != AC_FRAME or version != AC_VERSION:
+        raise ValueError("Resultado AC desconhecido: tipo 0x%02X versão %d" % (kind, version))
+    result = {'settled': bool(flags & FLAG_SETTLED), 'rate_hz': rate_hz, 'samples': samples,
+              'end_ticks_ms': end, 'channels': []}
+    for channel in range(channels):
+        dc, rms, peak, freq = struct.unpack_from(AC_CHANNEL_FORMAT, data, AC_HEADER_SIZE + AC_CHANNEL_SIZE * channel)
+        result['channels'].append({'dc_uv': dc, 'rms_uv': rms, 'peak_uv': peak, 'freq_hz': freq / 1000})
+    return result
@@ -0,0 +1,121 @@
+"""
+Aquisição contínua do voltímetro em blocos (buffer duplo)
+O MicroPython do ESP32 não expõe o modo contínuo do ADC com DMA do ESP-IDF
+(adc_continuous/I2S); a taxa fixa vem de um machine.Timer de hardware, cuja
+IRQ lê uma varredura do backend (adc_backends) e a grava no buffer em
+preenchimento. Quando o buffer enche ele é trocado pelo outro e o cheio fica
+disponível para o pipeline como memoryview, sem cópia:
+
+    buffer[k * canais + canal] = código bruto da amostra k
+
+Contrato de troca: a IRQ só escreve no buffer em preenchimento; o consumidor
+só lê o buffer entregue por take() até chamar release(). Se o buffer em
+preenchimento enche antes do release(), o bloco é descartado e reescrito
+(overrun): o consumidor nunca vê um bloco alterado durante a leitura.
+
+No ESP32 o callback do Timer é agendado (soft IRQ): GC e eventos BLE ainda
+atrasam amostras, e o atraso de cada tick em relação ao período é medido
+(H_ACQ_LATE).
+"""
+
+import time
+from array import array
+from micropython import const
+from metrics import metrics, C_ACQ_BLOCKS, C_ACQ_OVERRUNS, H_ACQ_LATE
+
+BLOCK_SAMPLES = const(64)    # com códigos de 24 bits a soma do bloco ainda é um inteiro pequeno
+ACQ_TIMER_ID = const(1)      # Timer(0) é o da multiplexação no nó display
+
+
+class ContinuousAcquisition:
+    """Varreduras a taxa fixa num par de buffers; tick() não aloca"""
+
+    def __init__(self, backend, rate_hz, block_samples=BLOCK_SAMPLES, timer_id=ACQ_TIMER_ID):
+        self.backend = backend
+        self.rate_hz = rate_hz
+        self.period_us = 1000000 // rate_hz
+        self.channels = backend.channel_count
+        self.mask = (1 << self.channels) - 1
+        self.block_samples = block_samples
+        self.block_size = self.channels * block_samples
+        self.buffers = (array('i', [0] * self.block_size), array('i', [0] * self.block_size))
+        self.views = (memoryview(self.buffers[0]), memoryview(self.buffers[1]))
+        self.sample = array('i', [0] * self.channels)
+        self.timer_id = timer_id
+        self.timer = None
+        self.reset()
+
+    def reset(self):
+        """Esvazia os buffers e zera os contadores"""
+        self.filling = 0
+        self.position = 0
+        self.ready = -1         # buffer cheio entregue ao consumidor (-1: nenhum)
+        self.blocks = 0
+        self.overruns = 0
+        self.last_tick = None
+
+    def start(self):
+        """Inicia o Timer de aquisição"""
+        from machine import Timer
+        self.reset()
+        self.timer = Timer(self.timer_id)
+        self.timer.init(freq=self.rate_hz, mode=Timer.PERIODIC, callback=self._irq)
+
+    def stop(self):
+        """Para o Timer (o bloco pronto continua disponível)"""
+        if self.timer:
+            self.timer.deinit()
+            self.timer = None
+
+    def _irq(self, timer):
+        self.tick()
+
+    def tick(self):
+        """Uma varredura no buffer em preenchimento (IRQ do Timer)"""
+        now = time.ticks_us()
+        if self.last_tick is not None:
+            late = time.ticks_diff(now, self.last_tick) - self.period_us
+            if late > 0:
+                metrics.observe(H_ACQ_LATE, late)
+        self.last_tick = now
+
+        sample = self.backend.read_block(self.mask, self.sample)
+        buffer = self.buffers[self.filling]
+        position = self.position
+        for channel in range(self.channels):
+            buffer[position + channel] = sample[channel]
+        position += self.channels
+        if position < self.block_size:
+            self.position = position
+            return
+        self.position = 0
+        if self.ready >= 0:
+            # Consumidor ainda com o outro buffer: descarta este bloco
+            self.overruns += 1
+            metrics.inc(C_ACQ_OVERRUNS)
+            return
+        self.ready = self.filling
+        self.filling ^= 1
+        self.blocks += 1
+        metrics.inc(C_ACQ_BLOCKS)
+
+    def take(self):
+        """memoryview do bloco cheio, ou None; válido até release()"""
+        if self.ready < 0:
+            return None
+        return self.views[self.ready]
+
+    def release(self):
+        """Devolve o bloco entregue por take() para a IRQ"""
+        self.ready = -1
+
+    def poll(self, handler):
+        """Chama handler(view, amostras) com o bloco cheio; False se não havia"""
+        view = self.take()
+        if view is None:
+            return False
+        try:
+            handler(view, self.block_samples)
+        finally:
+            self.release()
+        return True
@@ -0,0 +1,482 @@
+"""
+Conversores do voltímetro (backends do ADCReader)
+Todo backend expõe a mesma interface, em códigos brutos com sinal:
+
+    channel_count           canais do backend (canal i = i-ésima entrada)
+    max_code, full_scale_uv max_code códigos correspondem a full_scale_uv µV
+    active(channel)         canal disponível
+    read(channel)           uma conversão do canal
+    read_block(mask, out)   uma conversão de cada canal do bitmap em out[canal]
+
+Backends com faixas selecionáveis por canal (auto-ranging do ADCReader)
+expõem também:
+
+    ranges                  fundo de escala (µV) de cada faixa, a mais sensível primeiro
+    range_limits_uv         tensão até onde cada faixa ainda é linear
+    range_settle_reads      conversões a descartar depois de trocar de faixa
+    set_range(channel, i)   passa o canal para a faixa i
+
+    InternalADCBackend  ADC1 do ESP32 (machine.ADC, um canal por pino)
+    ADS1115Backend      16 bits, I2C: conversion-ready por canal na varredura,
+                        modo contínuo quando a varredura tem um só canal
+    ADS1256Backend      24 bits, SPI: troca o MUX durante a leitura da conversão
+                        anterior (ciclo do datasheet) e RDATAC com um só canal
+    SimulatedBackend    formas de onda e ruído sintéticos, só com inteiros
+
+create_backend() monta o backend de ADC_BACKEND (voltmeter_constants.py).
+"""
+
+import time
+import math
+import sys
+from array import array
+sys.path.append('/common')
+from micropython import const
+from voltmeter_constants import ADC_BACKEND, ADC_PINS, ADS_INPUTS, ADS_DRDY_PIN, ADS1115_ADDRESS, I2C_PINS, ADS1256_SPI_PINS, ADS1256_CS_PIN
+from ble_utils import print_debug
+
+# ADS1115: registradores e campos do config
+_ADS1115_CONVERSION = const(0)
+_ADS1115_CONFIG = const(1)
+_ADS1115_LO_THRESH = const(2)
+_ADS1115_HI_THRESH = const(3)
+_ADS1115_OS = const(0x8000)           # escrita: inicia conversão; leitura: 1 = ocioso
+_ADS1115_PGA_4V = const(0x0200)       # ±4,096 V
+_ADS1115_SINGLE = const(0x0100)
+_ADS1115_DR_860 = const(0x00E0)
+ADS1115_RATE = const(860)
+
+# ADS1256: comandos, registradores e tempos (CLKIN 7,68 MHz)
+_ADS1256_WAKEUP = const(0x00)
+_ADS1256_RDATA = const(0x01)
+_ADS1256_RDATAC = const(0x03)
+_ADS1256_SDATAC = const(0x0F)
+_ADS1256_WREG = const(0x50)
+_ADS1256_SELFCAL = const(0xF0)
+_ADS1256_SYNC = const(0xFC)
+_ADS1256_RESET = const(0xFE)
+_ADS1256_STATUS = const(0x00)
+_ADS1256_MUX = const(0x01)
+_ADS1256_ADCON = const(0x02)
+_ADS1256_DRATE = const(0x03)
+_ADS1256_AINCOM = const(0x08)
+_ADS1256_T6_US = const(7)             # 50 ciclos entre RDATA e o primeiro bit
+_ADS1256_T11_US = const(4)            # 24 ciclos entre SYNC e WAKEUP
+ADS1256_DRATE_30000 = const(0xF0)
+ADS1256_RATE = const(30000)
+
+DRDY_TIMEOUT_US = const(50000)
+
+
+class InternalADCBackend:
+    """ADC1 do ESP32: 12 bits, 0-3,3 V com ATTN_11DB
+
+    As atenuações 0, 2,5 e 6 dB são as faixas mais sensíveis do
+    auto-ranging: fundo de escala nominal de ~1,1/1,5/2,2 V, lineares até
+    ~0,95/1,25/1,75 V (faixas recomendadas do ESP-IDF). Começa em 11 dB.
+    """
+
+    name = 'internal'
+    max_code = 4095
+    full_scale_uv = 3300000
+    ranges = (1100000, 1500000, 2200000, 3300000)
+    range_limits_uv = (950000, 1250000, 1750000, 3300000)
+    range_settle_reads = 1      # a 1ª conversão depois de atten() ainda sai na faixa antiga
+
+    def __init__(self, pins=ADC_PINS):
+        from machine import Pin, ADC
+        self.pins = pins
+        self.channel_count = len(pins)
+        self.attenuations = (ADC.ATTN_0DB, ADC.ATTN_2_5DB, ADC.ATTN_6DB, ADC.ATTN_11DB)
+        self.adcs = []
+        for i, pin_num in enumerate(pins):
+            try:
+                adc = ADC(Pin(pin_num))
+                adc.atten(ADC.ATTN_11DB)  # Permite leitura até 3.3V
+                adc.width(ADC.WIDTH_12BIT)  # Resolução de 12 bits (0-4095)
+                self.adcs.append(adc)
+                print_debug(f"Canal ADC {i+1} inicializado no pino {pin_num}")
+            except Exception as e:
+                print_debug(f"Erro ao inicializar ADC no pino {pin_num}: {e}")
+                self.adcs.append(None)
+
+    def active(self, channel):
+        return 0 <= channel < self.channel_count and self.adcs[channel] is not None
+
+    def set_range(self, channel, index):
+        adc = self.adcs[channel]
+        if adc is not None:
+            adc.atten(self.attenuations[index])
+
+    def read(self, channel):
+        adc = self.adcs[channel]
+        if adc is None:
+            return 0
+        try:
+            return adc.read()
+        except Exception as e:
+            print_debug(f"Erro ao ler ADC canal {channel}: {e}")
+            return 0
+
+    def read_block(self, mask, out):
+        channel = 0
+        while mask:
+            if mask & 1:
+                out[channel] = self.read(channel)
+            mask >>= 1
+            channel += 1
+        return out
+
+
+class ADS1115Backend:
+    """ADS1115 (16 bits, até 860 amostras/s) em I2C, entradas single-ended
+
+    Com mais de um canal cada conversão é single-shot e o fim é detectado
+    pelo ALERT/RDY (drdy) ou, sem o pino, pelo bit OS do config. Com um só
+    canal o conversor fica em modo contínuo e cada leitura é uma única
+    transação I2C, espaçada de um período de conversão.
+    """
+
+    name = 'ads1115'
+    max_code = 32768
+    full_scale_uv = 4096000
+
+    def __init__(self, i2c, inputs=ADS_INPUTS, address=ADS1115_ADDRESS, drdy=None):
+        self.i2c = i2c
+        self.address = address
+        self.inputs = inputs
+        self.channel_count = len(inputs)
+        self.drdy = drdy
+        self.period_us = 1000000 // ADS1115_RATE + 1
+        self.buffer = bytearray(2)
+        self.continuous = -1      # canal em modo contínuo (-1: single-shot)
+        self.ready_at = 0
+        self.timeouts = 0
+        # ALERT/RDY como conversion-ready: Hi_thresh MSB = 1, Lo_thresh MSB = 0
+        self._write(_ADS1115_LO_THRESH, 0x0000)
+        self._write(_ADS1115_HI_THRESH, 0x8000)
+
+    def _write(self, register, value):
+        self.buffer[0] = value >> 8
+        self.buffer[1] = value & 0xFF
+        self.i2c.writeto_mem(self.address, register, self.buffer)
+
+    def _config(self, channel):
+        return ((4 + self.inputs[channel]) << 12) | _ADS1115_PGA_4V | _ADS1115_DR_860
+
+    def _conversion(self):
+        self.i2c.readfrom_mem_into(self.address, _ADS1115_CONVERSION, self.buffer)
+        value = (self.buffer[0] << 8) | self.buffer[1]
+        return value - 0x10000 if value & 0x8000 else value
+
+    def _wait_ready(self):
+        start = time.ticks_us()
+        while time.ticks_diff(time.ticks_us(), start) < DRDY_TIMEOUT_US:
+            if self.drdy is not None:
+                if not self.drdy.value():
+                    return True
+            else:
+                self.i2c.readfrom_mem_into(self.address, _ADS1115_CONFIG, self.buffer)
+                if self.buffer[0] & 0x80:
+                    return True
+        self.timeouts += 1
+        return False
+
+    def active(self, channel):
+        return 0 <= channel < self.channel_count
+
+    def read(self, channel):
+        self.continuous = -1
+        self._write(_ADS1115_CONFIG, _ADS1115_OS | _ADS1115_SINGLE | self._config(channel))
+        self._wait_ready()
+        return self._conversion()
+
+    def read_continuous(self, channel):
+        """Próxima conversão do canal em modo contínuo"""
+        if self.continuous != channel:
+            self._write(_ADS1115_CONFIG, self._config(channel))
+            self.continuous = channel
+            # A primeira conversão pode ter começado com o MUX anterior
+            self.ready_at = time.ticks_add(time.ticks_us(), 2 * self.period_us)
+        wait = time.ticks_diff(self.ready_at, time.ticks_us())
+        if wait > 0:
+            time.sleep_us(wait)
+        self.ready_at = time.ticks_add(time.ticks_us(), self.period_us)
+        return self._conversion()
+
+    def read_block(self, mask, out):
+        if mask and not mask & (mask - 1):
+            # Um só canal: modo contínuo
+            channel = 0
+            while not mask & 1:
+                mask >>= 1
+                channel += 1
+            out[channel] = self.read_continuous(channel)
+            return out
+        channel = 0
+        while mask:
+            if mask & 1:
+                out[channel] = self.read(channel)
+            mask >>= 1
+            channel += 1
+        return out
+
+
+class ADS1256Backend:
+    """ADS1256 (24 bits, até 30 k amostras/s) em SPI, entradas contra AINCOM
+
+    Na varredura o MUX do próximo canal é escrito logo após o DRDY e o
+    RDATA que segue lê a conversão do canal anterior: o conversor nunca
+    espera pelo Python entre canais. Com um só canal usa RDATAC (leitura
+    direta a cada DRDY). Os códigos são os 24 bits com sinal.
+    """
+
+    name = 'ads1256'
+    max_code = 1 << 23
+    full_scale_uv = 5000000     # ±2·VREF/PGA com VREF 2,5 V e PGA 1
+
+    def __init__(self, spi, cs, drdy, inputs=ADS_INPUTS, drate=ADS1256_DRATE_30000):
+        self.spi = spi
+        self.cs = cs
+        self.drdy = drdy
+        self.inputs = inputs
+        self.channel_count = len(inputs)
+        self.command_buffer = bytearray(1)
+        self.register_buffer = bytearray(3)
+        self.data = bytearray(3)
+        self.continuous = -1
+        self.timeouts = 0
+        self.cs.value(1)
+        self._command(_ADS1256_RESET)
+        self._wait_drdy()
+        self._write_register(_ADS1256_STATUS, 0x06)   # MSB primeiro, autocalibração, buffer ligado
+        self._write_register(_ADS1256_ADCON, 0x00)    # sem saída de clock, PGA 1
+        self._write_register(_ADS1256_DRATE, drate)
+        self._command(_ADS1256_SELFCAL)
+        self._wait_drdy()
+
+    def _command(self, command):
+        self.command_buffer[0] = command
+        self.cs.value(0)
+        self.spi.write(self.command_buffer)
+        self.cs.value(1)
+
+    def _write_register(self, register, value):
+        buffer = self.register_buffer
+        buffer[0] = _ADS1256_WREG | register
+        buffer[1] = 0           # um registrador
+        buffer[2] = value
+        self.cs.value(0)
+        self.spi.write(buffer)
+        self.cs.value(1)
+
+    def _wait_drdy(self):
+        start = time.ticks_us()
+        while self.drdy.value():
+            if time.ticks_diff(time.ticks_us(), start) > DRDY_TIMEOUT_US:
+                self.timeouts += 1
+                return False
+        return True
+
+    def _select(self, channel):
+        """MUX no canal e reinicia a conversão (SYNC + WAKEUP)"""
+        self._write_register(_ADS1256_MUX, (self.inputs[channel] << 4) | _ADS1256_AINCOM)
+        self._command(_ADS1256_SYNC)
+        time.sleep_us(_ADS1256_T11_US)
+        self._command(_ADS1256_WAKEUP)
+
+    def _read_data(self, command=True):
+        self.cs.value(0)
+        if command:
+            self.command_buffer[0] = _ADS1256_RDATA
+            self.spi.write(self.command_buffer)
+            time.sleep_us(_ADS1256_T6_US)
+        self.spi.readinto(self.data)
+        self.cs.value(1)
+        data = self.data
+        value = (data[0] << 16) | (data[1] << 8) | data[2]
+        return value - 0x1000000 if value & 0x800000 else value
+
+    def _stop_continuous(self):
+        if self.continuous >= 0:
+            self._wait_drdy()
+            self._command(_ADS1256_SDATAC)
+            self.continuous = -1
+
+    def active(self, channel):
+        return 0 <= channel < self.channel_count
+
+    def read(self, channel):
+        self._stop_continuous()
+        self._select(channel)
+        self._wait_drdy()
+        return self._read_data()
+
+    def read_continuous(self, channel):
+        """Próxima conversão do canal em RDATAC"""
+        if self.continuous != channel:
+            self._stop_continuous()
+            self._select(channel)
+            self._wait_drdy()
+            self._command(_ADS1256_RDATAC)
+            time.sleep_us(_ADS1256_T6_US)
+            self.continuous = channel
+        self._wait_drdy()
+        return self._read_data(False)
+
+    def read_block(self, mask, out):
+        if mask and not mask & (mask - 1):
+            channel = 0
+            while not mask & 1:
+                mask >>= 1
+                channel += 1
+            out[channel] = self.read_continuous(channel)
+            return out
+        self._stop_continuous()
+        previous = -1
+        channel = 0
+        while mask:
+            if mask & 1:
+                if previous < 0:
+                    self._select(channel)
+                else:
+                    # Conversão do canal anterior pronta: troca o MUX e lê a anterior
+                    self._wait_drdy()
+                    self._select(channel)
+                    out[previous] = self._read_data()
+                previous = channel
+            mask >>= 1
+            channel += 1
+        if previous >= 0:
+            self._wait_drdy()
+            out[previous] = self._read_data()
+        return out
+
+
+# Formas de onda do SimulatedBackend
+WAVE_DC = const(0)
+WAVE_SINE = const(1)
+WAVE_SQUARE = const(2)
+WAVE_TRIANGLE = const(3)
+_TABLE_SIZE = const(256)
+_TABLE_PEAK = const(1024)
+
+# (forma, offset µV, amplitude µV, frequência Hz, ruído µV pico) por canal;
+# com mais canais a lista se repete
+SIM_DEFAULT_WAVES = (
+    (WAVE_DC, 1650000, 0, 0, 2000),
+    (WAVE_SINE, 0, 1000000, 50, 5000),
+    (WAVE_SQUARE, 1000000, 500000, 1, 0),
+)
+
+
+class SimulatedBackend:
+    """Sinais sintéticos com a escala do ADS1115 (125 µV/código, com sinal)
+
+    Sem sample_rate_hz o tempo é o relógio real (ticks_us); com ele cada
+    read_block avança o relógio de 1/sample_rate_hz, o que torna a saída
+    determinística. read() lê no instante atual, sem avançar. Só inteiros
+    pequenos depois do __init__: serve para medir o pipeline na placa.
+    """
+
+    name = 'sim'
+    max_code = 32768
+    full_scale_uv = 4096000
+
+    def __init__(self, channels=len(ADC_PINS), waves=SIM_DEFAULT_WAVES, sample_rate_hz=0, seed=1):
+        self.channel_count = channels
+        self.uv_per_code = self.full_scale_uv // self.max_code
+        self.table = array('h', [int(math.sin(2 * math.pi * i / _TABLE_SIZE) * _TABLE_PEAK)
+                                 for i in range(_TABLE_SIZE)])
+        self.kind = bytearray(channels)
+        self.offset = array('i', [0] * channels)      # códigos
+        self.amplitude = array('i', [0] * channels)   # códigos
+        self.noise = array('i', [0] * channels)       # códigos
+        self.period_us = array('i', [0] * channels)
+        self.elapsed_us = array('i', [0] * channels)  # posição no período
+        for i in range(channels):
+            self.set_wave(i, *waves[i % len(waves)])
+        self.step_us = 1000000 // sample_rate_hz if sample_rate_hz else 0
+        self.last_us = time.ticks_us()
+        self.seed = seed & 0xFFFF
+
+    def set_wave(self, channel, kind, offset_uv, amplitude_uv, freq_hz, noise_uv=0):
+        """Troca a forma de onda de um canal"""
+        self.kind[channel] = kind
+        self.offset[channel] = offset_uv // self.uv_per_code
+        self.amplitude[channel] = amplitude_uv // self.uv_per_code
+        self.noise[channel] = noise_uv // self.uv_per_code
+        self.period_us[channel] = 1000000 // freq_hz if freq_hz else 0
+        self.elapsed_us[channel] = 0
+
+    def _advance(self):
+        if self.step_us:
+            dt = self.step_us
+        else:
+            now = time.ticks_us()
+            dt = time.ticks_diff(now, self.last_us)
+            self.last_us = now
+        for i in range(self.channel_count):
+            period = self.period_us[i]
+            if period:
+                self.elapsed_us[i] = (self.elapsed_us[i] + dt) % period
+
+    def active(self, channel):
+        return 0 <= channel < self.channel_count
+
+    def read(self, channel):
+        code = self.offset[channel]
+        kind = self.kind[channel]
+        period = self.period_us[channel]
+        if kind != WAVE_DC and period:
+            # Fase em 1/256 de período; elapsed < period <= 1 s cabe num inteiro pequeno
+            index = self.elapsed_us[channel] * _TABLE_SIZE // period
+            amplitude = self.amplitude[channel]
+            if kind == WAVE_SINE:
+                code += amplitude * self.table[index] // _TABLE_PEAK
+            elif kind == WAVE_SQUARE:
+                code += amplitude if index < _TABLE_SIZE // 2 else -amplitude
+            else:
+                ramp = index if index < _TABLE_SIZE // 2 else _TABLE_SIZE - index
+                code += amplitude * (4 * ramp - _TABLE_SIZE) // _TABLE_SIZE
+        noise = self.noise[channel]
+        if noise:
+            # LCG de 16 bits: ruído uniforme em ±noise
+            self.seed = (self.seed * 25173 + 13849) & 0xFFFF
+            code += ((self.seed & 0xFFF) - 2048) * noise // 2048
+        if code >= self.max_code:
+            return self.max_code - 1
+        if code < -self.max_code:
+            return -self.max_code
+        return code
+
+    def read_block(self, mask, out):
+        self._advance()
+        channel = 0
+        while mask:
+            if mask & 1:
+                out[channel] = self.read(channel)
+            mask >>= 1
+            channel += 1
+        return out
+
+
+def create_backend(name=ADC_BACKEND, pins=ADC_PINS):
+    """Backend configurado em ADC_BACKEND ('internal', 'ads1115', 'ads1256', 'sim')"""
+    if name == 'internal':
+        return InternalADCBackend(pins)
+    if name == 'sim':
+        return SimulatedBackend(len(pins))
+    from machine import Pin
+    drdy = Pin(ADS_DRDY_PIN, Pin.IN) if ADS_DRDY_PIN is not None else None
+    if name == 'ads1115':
+        from machine import I2C
+        i2c = I2C(0, scl=Pin(I2C_PINS[0]), sda=Pin(I2C_PINS[1]), freq=400000)
+        return ADS1115Backend(i2c, drdy=drdy)
+    if name == 'ads1256':
+        from machine import SPI
+        sck, mosi, miso = ADS1256_SPI_PINS
+        # SCLK até CLKIN/4 (1,92 MHz); dados amostrados na borda de descida
+        spi = SPI(1, baudrate=1920000, polarity=0, phase=1, sck=Pin(sck), mosi=Pin(mosi), miso=Pin(miso))
+        return ADS1256Backend(spi, Pin(ADS1256_CS_PIN, Pin.OUT), drdy)
+    raise ValueError('ADC_BACKEND desconhecido: %s' % name)
@@ -1,110 +1,474 @@
-from machine import Pin, ADC
 import time
 import sys
+from array import array
 sys.path.append('/common')
-from constants import ADC_PINS
+from voltmeter_constants import ADC_PINS, ADC_AUTO_RANGE, AUTO_RANGE_DOWN_PERCENT, AUTO_RANGE_HOLD, STATS_WINDOW_MS, STATS_SLOTS, STATS_SLIDING, TRIGGER_PRE_SAMPLES, TRIGGER_POST_SAMPLES, ADC_CONTINUOUS_HZ, AC_SAMPLE_HZ, AC_WINDOW_SAMPLES
 from ble_utils import print_debug
+from metrics import metrics, C_SAMPLES, C_RANGE_SWITCHES, C_TRIGGERS, H_RANGE_SETTLE
+from adc_backends import InternalADCBackend
+
+SMALL_INT_LIMIT = 1 << 30   # acima disso o MicroPython aloca um inteiro longo
+SPLIT_BITS = 12             # códigos maiores que 12 bits são escalados em duas partes
+SPLIT_CODE = 1 << SPLIT_BITS
 
 class ADCReader:
-    def __init__(self):
-        """Inicializa o leitor de ADC para 3 canais"""
-        self.adc_channels = []
-        self.voltage_readings = [0.0, 0.0, 0.0]
-        self.calibration_factors = [1.0, 1.0, 1.0]  # Fatores de calibração
-        
-        # Inicializa os canais ADC
-        for i, pin_num in enumerate(ADC_PINS):
-            try:
-                adc = ADC(Pin(pin_num))
-                adc.atten(ADC.ATTN_11DB)  # Permite leitura até 3.3V
-                adc.width(ADC.WIDTH_12BIT)  # Resolução de 12 bits (0-4095)
-                self.adc_channels.append(adc)
-                print_debug(f"Canal ADC {i+1} inicializado no pino {pin_num}")
-            except Exception as e:
-                print_debug(f"Erro ao inicializar ADC no pino {pin_num}: {e}")
-                self.adc_channels.append(None)
-        
-        # Configurações de filtragem
+    def __init__(self, pins=ADC_PINS, backend=None):
+        """Inicializa o leitor de ADC
+        
+        backend é um conversor de adc_backends (padrão: ADC interno do
+        ESP32, um canal por pino de pins).
+        """
+        self.backend = backend if backend is not None else InternalADCBackend(pins)
+        self.pins = pins
+        self.channel_count = count = self.backend.channel_count
+        self.channel_mask = (1 << count) - 1
+        self.raw_block = array('i', [0] * count)
+        
+        # Faixas do conversor (atenuações do ADC interno); sem faixas
+        # selecionáveis, uma só com o fundo de escala do backend
+        self.ranges = getattr(self.backend, 'ranges', None) or (self.backend.full_scale_uv,)
+        top = len(self.ranges) - 1
+        self.range_index = array('i', [top] * count)   # começa na faixa menos sensível
+        self.range_hold = array('i', [0] * count)      # amostras seguidas abaixo do limite de descida
+        self.auto_range = False
+        # Uma tabela de calibração por faixa; calibration_factors é a da faixa padrão
+        self.calibration_tables = [[1.0] * count for _ in self.ranges]
+        self.calibration_factors = self.calibration_tables[top]  # Fatores de calibração
+        
+        # Caminho inteiro (µV): escala de cada canal em ponto fixo,
+        # uv = (raw * uv_scale) >> uv_shift, já com o fator de calibração;
+        # range_scale/range_shift guardam a escala de cada (faixa, canal)
+        self.uv_scale = array('i', [0] * count)
+        self.uv_shift = array('i', [0] * count)
+        self.range_scale = array('i', [0] * (count * len(self.ranges)))
+        self.range_shift = array('i', [0] * (count * len(self.ranges)))
+        for index in range(len(self.ranges)):
+            for i in range(count):
+                self._update_scale(i, index)
+        self._range_thresholds()
+        self.uv_readings = array('i', [0] * self.channel_count)
+        
+        # Configurações de filtragem: média móvel em anel de inteiros (µV)
         self.filter_samples = 10  # Número de amostras para média móvel
-        self.sample_history = [[] for _ in range(3)]  # Histórico de amostras
+        self.history_uv = [array('i', [0] * self.filter_samples) for _ in range(self.channel_count)]
+        self.history_sum = array('i', [0] * self.channel_count)
+        self.history_count = array('i', [0] * self.channel_count)
+        self.history_next = array('i', [0] * self.channel_count)
         
-        print_debug(f"ADCReader inicializado com {len([c for c in self.adc_channels if c is not None])} canais ativos")
+        # Aquisição contínua em blocos (start_continuous); None = leitura sob demanda
+        self.acquisition = None
+        # Thread de amostragem dono do backend (sampler_thread.py); None = chamador
+        self.sampler = None
+        # Estatísticas por janela de cada amostra, antes da média móvel (stats.py)
+        self.stats = None
+        if STATS_WINDOW_MS:
+            self.enable_stats()
+        # Captura com pré-disparo (trigger.py), criada no primeiro TRIG/ARM
+        self.capture = None
+        self.capture_scan = array('i', [0] * count)    # varredura sem a média móvel
+        # Modo AC (ac_meter.py): amostras da aquisição contínua em janelas fixas
+        self.ac = None
+        self.ac_overruns = 0    # overruns da aquisição já vistos pelo modo AC
+        
+        if ADC_AUTO_RANGE:
+            self.set_auto_range(True)
+        
+        active = len([i for i in range(self.channel_count) if self.backend.active(i)])
+        print_debug(f"ADCReader inicializado com {active} canais ativos ({self.backend.name})")
     
-    def read_raw_value(self, channel):
-        """Lê valor bruto do ADC (0-4095)"""
-        if channel < 0 or channel >= len(self.adc_channels):
-            return 0
+    def _update_scale(self, channel, index=None):
+        """Recalcula a escala inteira do canal numa faixa (padrão: a atual)
+        
+        Fora do caminho quente: a troca de faixa só copia a escala pronta.
+        """
+        if index is None:
+            index = self.range_index[channel]
+        backend = self.backend
+        uv_per_code = self.ranges[index] * self.calibration_tables[index][channel] / backend.max_code
+        # Parte de raw multiplicada de cada vez: o código inteiro ou, acima de
+        # 12 bits, os 12 bits baixos e o resto em separado (ver _to_uv)
+        part = min(backend.max_code, SPLIT_CODE - 1)
+        if backend.max_code >= SPLIT_CODE:
+            part = max(part, backend.max_code >> SPLIT_BITS)
+        shift = 24
+        # Maior precisão em que cada produto ainda é um inteiro pequeno
+        while shift and part * int(uv_per_code * (1 << shift) + 0.5) >= SMALL_INT_LIMIT:
+            shift -= 1
+        slot = index * self.channel_count + channel
+        self.range_scale[slot] = int(uv_per_code * (1 << shift) + 0.5)
+        self.range_shift[slot] = shift
+        if index == self.range_index[channel]:
+            self.uv_scale[channel] = self.range_scale[slot]
+            self.uv_shift[channel] = shift
+    
+    def _range_thresholds(self):
+        """Limites de troca de faixa em códigos de cada faixa (com histerese)
+        
+        range_up[i]: código a partir do qual a faixa i sai da parte linear;
+        range_down[i * faixas + j]: abaixo dele uma leitura da faixa i cabe
+        com folga (AUTO_RANGE_DOWN_PERCENT) na faixa j < i.
+        """
+        backend = self.backend
+        limits = getattr(backend, 'range_limits_uv', None) or self.ranges
+        count = len(self.ranges)
+        self.range_up = array('i', [0] * count)
+        self.range_down = array('i', [0] * (count * count))
+        for i in range(count):
+            self.range_up[i] = min(backend.max_code, int(limits[i] * backend.max_code / self.ranges[i]))
+            for j in range(i):
+                self.range_down[i * count + j] = int(limits[j] * AUTO_RANGE_DOWN_PERCENT / 100
+                                                     * backend.max_code / self.ranges[i])
+    
+    def set_auto_range(self, enabled):
+        """Liga/desliga o auto-ranging; desligado, todos os canais voltam à faixa padrão
+        
+        Só na leitura sob demanda (scan_uv): com a aquisição contínua as
+        faixas ficam como estão, para os blocos não misturarem escalas.
+        """
+        if enabled and len(self.ranges) < 2:
+            print_debug(f"Auto-ranging indisponível: {self.backend.name} tem uma só faixa")
+            enabled = False
+        self.auto_range = enabled
+        if not enabled:
+            for channel in range(self.channel_count):
+                self.select_range(channel, len(self.ranges) - 1)
+    
+    def select_range(self, channel, index):
+        """Passa o canal para a faixa index e descarta as conversões da troca
         
-        if self.adc_channels[channel] is None:
+        Retorna o custo da troca em µs (H_RANGE_SETTLE).
+        """
+        if index == self.range_index[channel] or not self.backend.active(channel):
             return 0
+        start = time.ticks_us()
+        backend = self.backend
+        backend.set_range(channel, index)
+        for _ in range(getattr(backend, 'range_settle_reads', 0)):
+            backend.read(channel)
+        self.range_index[channel] = index
+        self.range_hold[channel] = 0
+        slot = index * self.channel_count + channel
+        self.uv_scale[channel] = self.range_scale[slot]
+        self.uv_shift[channel] = self.range_shift[slot]
+        metrics.inc(C_RANGE_SWITCHES)
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        metrics.observe(H_RANGE_SETTLE, elapsed)
+        return elapsed
+    
+    def _auto_range(self, channel, raw_value):
+        """Troca de faixa se raw_value pede; retorna o código a usar, já na faixa nova
         
-        try:
-            return self.adc_channels[channel].read()
-        except Exception as e:
-            print_debug(f"Erro ao ler ADC canal {channel}: {e}")
+        Sobe na hora (a leitura saturou ou saiu da parte linear) e
+        desce só depois de AUTO_RANGE_HOLD leituras seguidas abaixo do limite
+        de descida. Depois da troca converte de novo: a amostra sai na
+        faixa certa, ao custo medido em H_RANGE_SETTLE.
+        """
+        index = self.range_index[channel]
+        top = len(self.ranges) - 1
+        if raw_value >= self.range_up[index] and index < top:
+            # Sobe uma faixa por vez até a leitura voltar à parte linear
+            while True:
+                index += 1
+                self.select_range(channel, index)
+                raw_value = self.backend.read(channel)
+                if index == top or raw_value < self.range_up[index]:
+                    return raw_value
+        row = index * len(self.ranges)
+        if index and raw_value < self.range_down[row + index - 1]:
+            hold = self.range_hold[channel] + 1
+            if hold < AUTO_RANGE_HOLD:
+                self.range_hold[channel] = hold
+                return raw_value
+            # Desce direto para a faixa mais sensível em que a leitura cabe com folga
+            target = 0
+            while raw_value >= self.range_down[row + target]:
+                target += 1
+            self.select_range(channel, target)
+            return self.backend.read(channel)
+        self.range_hold[channel] = 0
+        return raw_value
+    
+    def _to_uv(self, channel, raw_value):
+        """Código bruto -> µV com a escala do canal, sem inteiros longos"""
+        scale = self.uv_scale[channel]
+        shift = self.uv_shift[channel]
+        if -SPLIT_CODE < raw_value < SPLIT_CODE:
+            return (raw_value * scale) >> shift
+        # Conversores de 16/24 bits: 12 bits baixos + parte alta deslocada
+        high = (raw_value >> SPLIT_BITS) * scale
+        if shift >= SPLIT_BITS:
+            high >>= shift - SPLIT_BITS
+        else:
+            high <<= SPLIT_BITS - shift
+        return high + (((raw_value & (SPLIT_CODE - 1)) * scale) >> shift)
+    
+    def read_raw_value(self, channel):
+        """Lê o código bruto do conversor (ADC interno: 0-4095)"""
+        if not self.backend.active(channel):
             return 0
+        return self.backend.read(channel)
     
-    def raw_to_voltage(self, raw_value):
-        """Converte valor bruto para tensão (0-3.3V)"""
-        # ADC de 12 bits: 0-4095 corresponde a 0-3.3V
-        return (raw_value / 4095.0) * 3.3
+    def raw_to_voltage(self, raw_value, channel=None):
+        """Converte código bruto para tensão (V), sem calibração (na faixa atual do canal)"""
+        full_scale = self.backend.full_scale_uv if channel is None else self.ranges[self.range_index[channel]]
+        return raw_value * full_scale / self.backend.max_code / 1000000
     
-    def read_voltage(self, channel, filtered=True):
-        """Lê tensão de um canal específico"""
+    def read_uv(self, channel, filtered=True):
+        """Lê a tensão calibrada de um canal em µV, só com inteiros pequenos"""
+        if self.acquisition or self.sampler:
+            # O backend pertence à IRQ de aquisição ou ao worker: último valor
+            return self.uv_readings[channel]
         raw_value = self.read_raw_value(channel)
-        voltage = self.raw_to_voltage(raw_value)
+        if self.auto_range and self.backend.active(channel):
+            raw_value = self._auto_range(channel, raw_value)
+        return self._filter_uv(channel, self._to_uv(channel, raw_value), filtered)
+    
+    def _filter_uv(self, channel, uv, filtered):
+        if filtered:
+            # Média móvel: substitui a amostra mais antiga do anel
+            ring = self.history_uv[channel]
+            slot = self.history_next[channel]
+            count = self.history_count[channel]
+            if count < self.filter_samples:
+                count += 1
+                self.history_count[channel] = count
+            else:
+                self.history_sum[channel] -= ring[slot]
+            ring[slot] = uv
+            self.history_sum[channel] += uv
+            slot += 1
+            self.history_next[channel] = 0 if slot >= self.filter_samples else slot
+            uv = self.history_sum[channel] // count
         
-        # Aplica fator de calibração
-        voltage *= self.calibration_factors[channel]
+        return uv
+    
+    def read_voltage(self, channel, filtered=True):
+        """Lê tensão de um canal específico (V; usa o caminho inteiro)"""
+        return self.read_uv(channel, filtered) / 1000000
+    
+    def read_all_uv(self, out, filtered=True):
+        """Lê todos os canais em µV no array('i') out; não aloca
         
-        if filtered and channel < len(self.sample_history):
-            # Adiciona à média móvel
-            self.sample_history[channel].append(voltage)
-            if len(self.sample_history[channel]) > self.filter_samples:
-                self.sample_history[channel].pop(0)
-            
-            # Retorna média das amostras
-            if self.sample_history[channel]:
-                voltage = sum(self.sample_history[channel]) / len(self.sample_history[channel])
+        Uma varredura do conversor (read_block) e depois a escala e a
+        média móvel de cada canal. Na aquisição contínua o backend pertence
+        à IRQ: retorna a média do bloco pronto ou, sem bloco novo, a última.
+        Com o thread de amostragem ativo o backend pertence ao worker:
+        retorna a última varredura consumida do anel.
+        """
+        if self.sampler:
+            return self.sampler.latest_uv(out)
+        return self.scan_uv(out, filtered)
+    
+    def scan_uv(self, out, filtered=True):
+        """Varredura de fato (read_all_uv); só no thread dono do backend"""
+        if self.acquisition:
+            if not self.read_block_uv(out):
+                for i in range(self.channel_count):
+                    out[i] = self.uv_readings[i]
+            return out
+        raw = self.backend.read_block(self.channel_mask, self.raw_block)
+        auto_range = self.auto_range
+        stats = self.stats
+        if stats:
+            stats.roll(time.ticks_ms())
+        capture = self.capture
+        scan = self.capture_scan
+        # Caminho quente: arrays em variáveis locais (no MicroPython cada
+        # self.x é uma busca por nome); a escala de 12 bits de _to_uv e a
+        # média móvel de _filter_uv em linha
+        readings = self.uv_readings
+        scales = self.uv_scale
+        shifts = self.uv_shift
+        history = self.history_uv
+        sums = self.history_sum
+        counts = self.history_count
+        slots = self.history_next
+        depth = self.filter_samples
+        for i in range(self.channel_count):
+            raw_value = self._auto_range(i, raw[i]) if auto_range else raw[i]
+            if -SPLIT_CODE < raw_value < SPLIT_CODE:
+                uv = (raw_value * scales[i]) >> shifts[i]
+            else:
+                uv = self._to_uv(i, raw_value)
+            if stats:
+                stats.add(i, uv)
+            scan[i] = uv
+            if filtered:
+                ring = history[i]
+                slot = slots[i]
+                count = counts[i]
+                total = sums[i] + uv
+                if count < depth:
+                    count += 1
+                    counts[i] = count
+                else:
+                    total -= ring[slot]
+                ring[slot] = uv
+                sums[i] = total
+                slot += 1
+                slots[i] = 0 if slot >= depth else slot
+                uv = total // count
+            out[i] = uv
+            readings[i] = uv
+        if capture:
+            capture.sample_period_us = 0    # sem taxa fixa: medido no disparo
+            if capture.add(scan):
+                metrics.inc(C_TRIGGERS)
+        metrics.inc(C_SAMPLES)
+        return out
+    
+    def start_continuous(self, rate_hz, block_samples=None):
+        """Passa a amostrar a rate_hz varreduras/s em blocos (acquisition.py)"""
+        from acquisition import ContinuousAcquisition, BLOCK_SAMPLES
+        self.stop_continuous()
+        self.acquisition = ContinuousAcquisition(self.backend, rate_hz, block_samples or BLOCK_SAMPLES)
+        self.acquisition.start()
+        print_debug(f"Aquisição contínua: {rate_hz} varreduras/s, blocos de {self.acquisition.block_samples}")
+    
+    def stop_continuous(self):
+        """Volta à leitura sob demanda"""
+        if self.acquisition:
+            self.acquisition.stop()
+            self.acquisition = None
+    
+    def read_block_uv(self, out):
+        """Média de cada canal no bloco contínuo pronto, em µV, em out
         
-        return voltage
+        Retorna o número de amostras do bloco, ou 0 se nenhum bloco
+        encheu desde a última chamada (out não muda). A média do bloco
+        substitui a média móvel; não aloca. Com estatísticas ligadas cada
+        amostra do bloco também entra nelas (escala por amostra), assim
+        como no modo AC; com uma captura armada cada varredura do bloco
+        entra no pré-disparo.
+        """
+        acquisition = self.acquisition
+        view = acquisition.take() if acquisition else None
+        if view is None:
+            return 0
+        samples = acquisition.block_samples
+        size = acquisition.block_size
+        count = self.channel_count
+        stats = self.stats
+        if stats:
+            stats.roll(time.ticks_ms())
+        ac = self.ac
+        if ac and acquisition.overruns != self.ac_overruns:
+            # Bloco perdido: as janelas AC precisam de amostras seguidas
+            self.ac_overruns = acquisition.overruns
+            ac.restart()
+        for channel in range(count):
+            total = 0
+            for k in range(channel, size, count):
+                total += view[k]
+                if stats or ac:
+                    uv = self._to_uv(channel, view[k])
+                    if stats:
+                        stats.add(channel, uv)
+                    if ac:
+                        ac.add(channel, uv)
+            uv = self._to_uv(channel, total // samples)
+            out[channel] = uv
+            self.uv_readings[channel] = uv
+        capture = self.capture
+        if capture and capture.collecting():
+            # Captura na taxa cheia: varredura a varredura, na ordem do bloco
+            capture.sample_period_us = acquisition.period_us
+            scan = self.capture_scan
+            for base in range(0, size, count):
+                for channel in range(count):
+                    scan[channel] = self._to_uv(channel, view[base + channel])
+                if capture.add(scan):
+                    metrics.inc(C_TRIGGERS)
+                    break
+        acquisition.release()
+        metrics.inc(C_SAMPLES, samples)
+        return samples
     
-    def read_all_voltages(self, filtered=True):
-        """Lê tensões de todos os canais"""
-        voltages = []
-        for i in range(3):
-            voltage = self.read_voltage(i, filtered)
-            voltages.append(voltage)
-            self.voltage_readings[i] = voltage
+    def enable_stats(self, window_ms=STATS_WINDOW_MS, slots=STATS_SLOTS, sliding=STATS_SLIDING):
+        """Estatísticas por canal em janelas de window_ms (0 desliga)"""
+        from stats import WindowStats
+        # Troca o objeto inteiro: o thread de amostragem nunca vê um pela metade
+        self.stats = WindowStats(self.channel_count, window_ms, slots, sliding) if window_ms else None
+        return self.stats
+    
+    def enable_ac(self, rate_hz=AC_SAMPLE_HZ, window_samples=AC_WINDOW_SAMPLES):
+        """Modo AC a rate_hz em janelas de window_samples (rate_hz 0 desliga)
         
-        return voltages
+        Liga a aquisição contínua na taxa do modo AC; ao desligar ela volta
+        a ADC_CONTINUOUS_HZ (ou à leitura sob demanda).
+        """
+        if not rate_hz:
+            self.ac = None
+            if ADC_CONTINUOUS_HZ:
+                self.start_continuous(ADC_CONTINUOUS_HZ)
+            else:
+                self.stop_continuous()
+            return None
+        from ac_meter import ACMeter
+        ac = ACMeter(self.channel_count, rate_hz, window_samples)
+        if not self.acquisition or self.acquisition.rate_hz != rate_hz:
+            self.start_continuous(rate_hz)
+        self.ac_overruns = self.acquisition.overruns
+        self.ac = ac
+        return ac
+    
+    def enable_capture(self, pre=TRIGGER_PRE_SAMPLES, post=TRIGGER_POST_SAMPLES):
+        """Captura com pré-disparo de pre + post varreduras (mantém as condições)"""
+        from trigger import TriggerCapture
+        previous = self.capture
+        capture = TriggerCapture(self.channel_count, pre, post)
+        if previous:
+            previous.disarm()
+            capture.copy_conditions(previous)
+        self.capture = capture
+        return capture
+    
+    def read_all_voltages(self, filtered=True):
+        """Lê tensões de todos os canais (V)"""
+        if not self.sampler:    # com o worker ativo uv_readings é escrito só por ele
+            self.read_all_uv(self.uv_readings, filtered)
+        return self.get_last_readings()
     
     def get_last_readings(self):
-        """Retorna as últimas leituras"""
-        return self.voltage_readings.copy()
+        """Retorna as últimas leituras (V)"""
+        return [uv / 1000000 for uv in self.uv_readings]
     
-    def set_calibration(self, channel, factor):
-        """Define fator de calibração para um canal"""
-        if 0 <= channel < len(self.calibration_factors):
-            self.calibration_factors[channel] = factor
-            print_debug(f"Calibração canal {channel+1}: fator = {factor}")
+    def set_calibration(self, channel, factor, range_index=None):
+        """Define fator de calibração para um canal (padrão: na faixa atual)"""
+        if 0 <= channel < self.channel_count:
+            if range_index is None:
+                range_index = self.range_index[channel]
+            self.calibration_tables[range_index][channel] = factor
+            self._update_scale(channel, range_index)
+            print_debug(f"Calibração canal {channel+1} (faixa {range_index}): fator = {factor}")
     
     def auto_calibrate(self, channel, known_voltage):
         """Auto-calibração baseada em tensão conhecida"""
-        if 0 <= channel < len(self.adc_channels):
-            # Lê valor atual sem calibração
-            current_factor = self.calibration_factors[channel]
-            self.calibration_factors[channel] = 1.0
+        if self.sampler:
+            print_debug("Auto-calibração indisponível com o thread de amostragem ativo")
+            return
+        if 0 <= channel < self.channel_count:
+            # Lê valor atual sem calibração, na tabela da faixa atual
+            # (a faixa não muda no meio da calibração)
+            auto_range = self.auto_range
+            self.auto_range = False
+            factors = self.calibration_tables[self.range_index[channel]]
+            current_factor = factors[channel]
+            factors[channel] = 1.0
+            self._update_scale(channel)
             
             measured_voltage = self.read_voltage(channel, filtered=True)
             
             if measured_voltage > 0:
                 new_factor = known_voltage / measured_voltage
-                self.calibration_factors[channel] = new_factor
+                factors[channel] = new_factor
+                self._update_scale(channel)
                 print_debug(f"Auto-calibração canal {channel+1}: medido={measured_voltage:.3f}V, conhecido={known_voltage:.3f}V, fator={new_factor:.3f}")
             else:
-                self.calibration_factors[channel] = current_factor
+                factors[channel] = current_factor
+                self._update_scale(channel)
                 print_debug(f"Erro na auto-calibração canal {channel+1}: tensão medida = 0")
+            self.auto_range = auto_range
     
     def continuous_read(self, interval_ms=100):
         """Leitura contínua das tensões"""
@@ -113,7 +477,7 @@ class ADCReader:
         try:
             while True:
                 voltages = self.read_all_voltages()
-                print_debug(f"Tensões: Canal1={voltages[0]:.3f}V, Canal2={voltages[1]:.3f}V, Canal3={voltages[2]:.3f}V")
+                print_debug("Tensões: " + ", ".join(f"Canal{i+1}={v:.3f}V" for i, v in enumerate(voltages)))
                 time.sleep_ms(interval_ms)
         except KeyboardInterrupt:
             print_debug("Leitura contínua interrompida")
@@ -121,11 +485,14 @@ class ADCReader:
     def test_channels(self):
         """Testa todos os canais ADC"""
         print_debug("Testando canais ADC...")
+        if self.acquisition or self.sampler:
+            print_debug("Teste indisponível: backend em uso pela aquisição")
+            return
         
-        for i in range(3):
-            print_debug(f"\nTeste do Canal {i+1} (Pino {ADC_PINS[i]}):")
+        for i in range(self.channel_count):
+            print_debug(f"\nTeste do Canal {i+1} ({self.backend.name}):")
             
-            if self.adc_channels[i] is None:
+            if not self.backend.active(i):
                 print_debug("  Canal não disponível")
                 continue
             
@@ -133,7 +500,7 @@ class ADCReader:
             samples = []
             for _ in range(20):
                 raw = self.read_raw_value(i)
-                voltage = self.raw_to_voltage(raw)
+                voltage = self.raw_to_voltage(raw, i)
                 samples.append((raw, voltage))
                 time.sleep_ms(50)
             
@@ -149,11 +516,14 @@ class ADCReader:
     def get_channel_info(self):
         """Retorna informações dos canais"""
         info = {
-            'channels': len(self.adc_channels),
-            'active_channels': len([c for c in self.adc_channels if c is not None]),
-            'pins': ADC_PINS,
+            'channels': self.channel_count,
+            'active_channels': len([i for i in range(self.channel_count) if self.backend.active(i)]),
+            'backend': self.backend.name,
+            'pins': self.pins,
             'calibration_factors': self.calibration_factors,
+            'auto_range': self.auto_range,
+            'ranges_uv': [self.ranges[i] for i in self.range_index],
             'filter_samples': self.filter_samples,
-            'last_readings': self.voltage_readings
+            'last_readings': self.get_last_readings()
         }
         return info
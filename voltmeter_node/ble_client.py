@@ -1,9 +1,42 @@
 import bluetooth
+import struct
 import time
 import sys
+from array import array
 sys.path.append('/common')
-from constants import *
-from ble_utils import BLEUtils, print_debug, _IRQ_PERIPHERAL_CONNECT, _IRQ_PERIPHERAL_DISCONNECT, _IRQ_GATTC_SERVICE_RESULT, _IRQ_GATTC_SERVICE_DONE, _IRQ_GATTC_CHARACTERISTIC_RESULT, _IRQ_GATTC_CHARACTERISTIC_DONE, _IRQ_GATTC_WRITE_DONE, _IRQ_SCAN_RESULT, _IRQ_SCAN_DONE, _IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT
+from micropython import const
+from constants import DISPLAY_SERVICE_UUID, VOLTMETER_SERVICE_UUID, VOLTAGE_CHAR_UUID, COMMAND_CHAR_UUID, BLE_NAME_DISPLAY, BLE_NAME_VOLTMETER
+from voltmeter_constants import VOLTMETER_CHANNELS, CHANNEL_BASE
+from ble_utils import BLEUtils, print_debug
+from deadband import DeadbandFilter
+from metrics import metrics, C_NOTIFY_SUPPRESSED, C_FRAMES_SENT
+from logger import log, DEBUG, INFO, WARNING, MSG_WRITE_DONE, MSG_SCAN_MATCH, MSG_SEND_FAIL, MSG_CONNECT, MSG_DISCONNECT, MSG_RECONNECT
+
+_IRQ_CENTRAL_CONNECT = const(1)
+_IRQ_CENTRAL_DISCONNECT = const(2)
+_IRQ_SCAN_RESULT = const(5)
+_IRQ_SCAN_DONE = const(6)
+_IRQ_PERIPHERAL_CONNECT = const(7)
+_IRQ_PERIPHERAL_DISCONNECT = const(8)
+_IRQ_GATTC_SERVICE_RESULT = const(9)
+_IRQ_GATTC_SERVICE_DONE = const(10)
+_IRQ_GATTC_CHARACTERISTIC_RESULT = const(11)
+_IRQ_GATTC_CHARACTERISTIC_DONE = const(12)
+_IRQ_GATTC_WRITE_DONE = const(17)
+_IRQ_MTU_EXCHANGED = const(21)
+
+# Tipos AD: nome completo/abreviado e listas de UUIDs de 128 bits
+_NAME_AD_TYPES = (0x08, 0x09)
+_UUID128_AD_TYPES = (0x06, 0x07)
+
+_MAX_PEERS = const(8)          # displays distintos guardados durante o scan
+
+# Cache do último display na flash: tipo e endereço, faixa do serviço,
+# handle da característica de tensão e MTU negociado
+PEER_CACHE_FILE = '/peer_cache.bin'
+_PEER_CACHE_FORMAT = '<B6sHHHH'
+_DEFAULT_MTU = const(23)
+_MAX_DIRECT_ATTEMPTS = const(3)  # conexões diretas antes de voltar ao scan
 
 class BLEVoltmeterClient:
     def __init__(self, adc_reader):
@@ -17,24 +50,54 @@ class BLEVoltmeterClient:
         self.connected = False
         self.conn_handle = None
         self.display_service_handle = None
+        self.display_service_end = None
         self.voltage_char_handle = None
+        self.mtu = _DEFAULT_MTU
         
-        # Estado do scan
+        # Reconexão rápida: display conhecido e medição do tempo de restauração
+        self.peer_cache = self._load_peer_cache()
+        self.peer_cache_dirty = False   # gravação pendente (feita no loop principal)
+        self.using_cache = False
+        self.validating = False
+        self.direct_attempts = 0
+        self.dropped_at = None
+        self.last_restore_ms = None
+        self.last_restore_cached = False
+        
+        # Estado do scan: padrões pré-calculados para o casamento na IRQ e
+        # tabela limitada de displays vistos (endereço -> [tipo, rssi])
         self.scanning = False
-        self.scan_results = []
+        self.connecting = False
+        self.auto_connect = True
+        self.name_pattern = BLE_NAME_DISPLAY.encode()
+        self.service_pattern = bytes(DISPLAY_SERVICE_UUID)
+        self.peers = {}
+        self.adverts_seen = 0
         
-        # Buffer para envio de dados
+        # Buffer para envio de dados (só frames fora da faixa morta)
+        self.channel_count = adc_reader.channel_count if adc_reader else VOLTMETER_CHANNELS
+        self.deadband = DeadbandFilter(channels=self.channel_count)
+        self.tx_mv = array('i', [0] * self.channel_count)
+        self.tx_uv = array('i', [0] * self.channel_count)
+        self.tx_buffer = bytearray(BLEUtils.voltage_frame_size(self.channel_count))
         self.pending_data = None
         self.last_send_time = 0
         self.send_interval = 1.0  # Envia dados a cada 1 segundo
         
         print_debug("Cliente BLE do Voltímetro inicializado")
     
-    def start_scan(self, duration_ms=10000):
-        """Inicia scan para encontrar o nó display"""
+    def start_scan(self, duration_ms=10000, auto_connect=True):
+        """Inicia scan para encontrar o nó display
+
+        Com auto_connect a conexão começa no primeiro anúncio que casar,
+        sem esperar o fim do scan.
+        """
         print_debug("Iniciando scan BLE...")
         self.scanning = True
-        self.scan_results = []
+        self.connecting = False
+        self.auto_connect = auto_connect
+        self.peers = {}
+        self.adverts_seen = 0
         
         # Inicia o scan
         self.ble.gap_scan(duration_ms, 30000, 30000)
@@ -46,6 +109,63 @@ class BLEVoltmeterClient:
             self.scanning = False
             print_debug("Scan BLE parado")
     
+    def _load_peer_cache(self):
+        """Lê o display conhecido da flash (ou None)"""
+        try:
+            with open(PEER_CACHE_FILE, 'rb') as f:
+                return struct.unpack(_PEER_CACHE_FORMAT, f.read())
+        except (OSError, ValueError):
+            return None
+    
+    def _update_peer_cache(self, addr_type, addr):
+        """Guarda o display atual e os handles descobertos (chamado na IRQ)
+
+        Só atualiza a memória e marca a gravação pendente: escrever na flash
+        dentro da IRQ do BLE segura a pilha pelo tempo de um apagamento de
+        setor. save_peer_cache() grava a partir do loop principal.
+        """
+        self.peer_cache = (addr_type, bytes(addr), self.display_service_handle,
+                           self.display_service_end, self.voltage_char_handle, self.mtu)
+        self.peer_cache_dirty = True
+    
+    def save_peer_cache(self):
+        """Grava o display conhecido na flash se houver mudança pendente (loop principal)"""
+        if not self.peer_cache_dirty:
+            return False
+        self.peer_cache_dirty = False
+        cache = self.peer_cache
+        if cache is None:
+            return False
+        try:
+            with open(PEER_CACHE_FILE, 'wb') as f:
+                f.write(struct.pack(_PEER_CACHE_FORMAT, *cache))
+            return True
+        except OSError as e:
+            print_debug(f"Erro ao gravar cache do display: {e}")
+            return False
+    
+    def forget_peer(self):
+        """Descarta o display conhecido (a próxima conexão faz scan e descoberta)"""
+        self.peer_cache = None
+        self.peer_cache_dirty = False
+        try:
+            import os
+            os.remove(PEER_CACHE_FILE)
+        except OSError:
+            pass
+    
+    def reconnect(self):
+        """Conexão direta ao display conhecido, sem scan"""
+        if self.peer_cache is None or self.connecting or self.connected:
+            return False
+        self.direct_attempts += 1
+        self.using_cache = True
+        self.connecting = True
+        if not self.connect_to_display(self.peer_cache[0], self.peer_cache[1]):
+            self.connecting = False
+            return False
+        return True
+    
     def connect_to_display(self, addr_type=None, addr=None):
         """Conecta ao nó display"""
         if addr_type is not None and addr is not None:
@@ -57,44 +177,46 @@ class BLEVoltmeterClient:
                 print_debug(f"Erro ao conectar: {e}")
                 return False
         else:
-            # Procura por displays nos resultados do scan
-            for addr_type, addr, adv_type, rssi, adv_data in self.scan_results:
-                if self._is_display_device(adv_data):
-                    print_debug(f"Encontrado display, conectando... RSSI: {rssi}")
-                    return self.connect_to_display(addr_type, addr)
+            # Display com melhor sinal entre os vistos no scan
+            best = None
+            for addr, peer in self.peers.items():
+                if best is None or peer[1] > self.peers[best][1]:
+                    best = addr
+            if best is not None:
+                print_debug(f"Encontrado display, conectando... RSSI: {self.peers[best][1]}")
+                return self.connect_to_display(self.peers[best][0], best)
+            
+            if self.peer_cache is not None:
+                print_debug("Nenhum display no scan, tentando o display conhecido")
+                return self.reconnect()
             
             print_debug("Nenhum display encontrado nos resultados do scan")
             return False
     
     def _is_display_device(self, adv_data):
-        """Verifica se o dispositivo é um nó display"""
-        try:
-            # Procura pelo nome do dispositivo nos dados de advertising
-            name = self._extract_name_from_adv_data(adv_data)
-            return name == BLE_NAME_DISPLAY
-        except:
-            return False
+        """Verifica se o dispositivo é um nó display (nome ou UUID do serviço)"""
+        return (BLEUtils.adv_match(adv_data, _NAME_AD_TYPES, self.name_pattern) or
+                BLEUtils.adv_match(adv_data, _UUID128_AD_TYPES, self.service_pattern))
     
-    def _extract_name_from_adv_data(self, adv_data):
-        """Extrai o nome do dispositivo dos dados de advertising"""
-        try:
-            i = 0
-            while i < len(adv_data):
-                length = adv_data[i]
-                if length == 0:
-                    break
-                
-                ad_type = adv_data[i + 1]
-                ad_data = adv_data[i + 2:i + 1 + length]
-                
-                # Tipo 0x09 = Complete Local Name
-                if ad_type == 0x09:
-                    return ad_data.decode('utf-8')
-                
-                i += 1 + length
-        except:
-            pass
-        return None
+    def _remember_peer(self, addr_type, addr, rssi):
+        """Guarda um display na tabela limitada (sem duplicar por endereço)"""
+        # addr é um memoryview do buffer da pilha BLE: copia só quando casa
+        key = bytes(addr)
+        peer = self.peers.get(key)
+        if peer is not None:
+            peer[1] = rssi
+            return key
+        if len(self.peers) >= _MAX_PEERS:
+            # Tabela cheia: substitui o display de sinal mais fraco
+            weakest = None
+            for other, entry in self.peers.items():
+                if weakest is None or entry[1] < self.peers[weakest][1]:
+                    weakest = other
+            if self.peers[weakest][1] >= rssi:
+                return None
+            del self.peers[weakest]
+        self.peers[key] = [addr_type, rssi]
+        return key
     
     def disconnect(self):
         """Desconecta do display"""
@@ -108,42 +230,83 @@ class BLEVoltmeterClient:
         """Manipula eventos BLE"""
         if event == _IRQ_SCAN_RESULT:
             addr_type, addr, adv_type, rssi, adv_data = data
-            self.scan_results.append((addr_type, addr, adv_type, rssi, adv_data))
-            
-            # Verifica se é um display
-            if self._is_display_device(adv_data):
-                print_debug(f"Display encontrado! RSSI: {rssi}")
+            self.adverts_seen += 1
+            # Anúncios de outros dispositivos são descartados sem alocar
+            if not self._is_display_device(adv_data):
+                return
+            key = self._remember_peer(addr_type, addr, rssi)
+            if key is None:
+                return
+            log.log(INFO, MSG_SCAN_MATCH, rssi)
+            if self.auto_connect and not self.connecting and not self.connected:
+                # Conecta já no primeiro display, sem esperar _IRQ_SCAN_DONE
+                self.connecting = True
+                self.stop_scan()
+                if not self.connect_to_display(addr_type, key):
+                    self.connecting = False
         
         elif event == _IRQ_SCAN_DONE:
             self.scanning = False
-            print_debug(f"Scan concluído. Dispositivos encontrados: {len(self.scan_results)}")
+            print_debug(f"Scan concluído. {self.adverts_seen} anúncios, {len(self.peers)} displays")
         
         elif event == _IRQ_PERIPHERAL_CONNECT:
             conn_handle, addr_type, addr = data
             self.conn_handle = conn_handle
+            self.connecting = False
+            self.peer_addr = (addr_type, bytes(addr))
             print_debug(f"Conectado ao display: {conn_handle}")
             
-            # Descobrir serviços
-            self.ble.gattc_discover_services(conn_handle)
+            cache = self.peer_cache
+            if cache is not None and cache[0] == addr_type and cache[1] == bytes(addr):
+                # Display conhecido: usa os handles do cache sem descoberta GATT.
+                # A primeira escrita é com resposta e valida os handles; só
+                # com ela aceita a conexão conta como restaurada
+                _, _, self.display_service_handle, self.display_service_end, \
+                    self.voltage_char_handle, mtu = cache
+                self.validating = True
+                self._connection_open()
+                self._request_mtu(conn_handle, mtu)
+            else:
+                # Descobrir serviços
+                self.ble.gattc_discover_services(conn_handle)
         
         elif event == _IRQ_PERIPHERAL_DISCONNECT:
             conn_handle, addr_type, addr = data
+            # Conexão com cache ainda não validado não conta como estabelecida
+            if self.connected and not self.validating and self.dropped_at is None:
+                self.dropped_at = time.ticks_ms()
             self.connected = False
+            self.connecting = False
+            self.validating = False
             self.conn_handle = None
             self.display_service_handle = None
+            self.display_service_end = None
             self.voltage_char_handle = None
+            self.mtu = _DEFAULT_MTU
             print_debug("Desconectado do display")
+            
+            # Queda (ou conexão direta que expirou ou não validou): tenta de
+            # novo o display conhecido; depois de algumas tentativas volta ao
+            # scan, também no boot (sem queda registrada)
+            if self.peer_cache is not None and self.direct_attempts < _MAX_DIRECT_ATTEMPTS and \
+                    self.reconnect():
+                pass
+            elif not self.scanning:
+                self.direct_attempts = 0
+                self.start_scan()
         
         elif event == _IRQ_GATTC_SERVICE_RESULT:
             conn_handle, start_handle, end_handle, uuid = data
             if uuid == DISPLAY_SERVICE_UUID:
                 self.display_service_handle = start_handle
+                self.display_service_end = end_handle
                 print_debug(f"Serviço do display encontrado: {start_handle}")
         
         elif event == _IRQ_GATTC_SERVICE_DONE:
             if self.display_service_handle:
                 # Descobrir características
-                self.ble.gattc_discover_characteristics(self.conn_handle, self.display_service_handle)
+                self.ble.gattc_discover_characteristics(self.conn_handle, self.display_service_handle,
+                                                        self.display_service_end)
         
         elif event == _IRQ_GATTC_CHARACTERISTIC_RESULT:
             conn_handle, def_handle, value_handle, properties, uuid = data
@@ -153,42 +316,108 @@ class BLEVoltmeterClient:
         
         elif event == _IRQ_GATTC_CHARACTERISTIC_DONE:
             if self.voltage_char_handle:
-                self.connected = True
+                self._update_peer_cache(*self.peer_addr)
+                self._connection_open()
+                self._connection_ready(False)
+                self._request_mtu(self.conn_handle)
                 print_debug("Conexão estabelecida com sucesso!")
         
         elif event == _IRQ_GATTC_WRITE_DONE:
             conn_handle, value_handle, status = data
-            if status == 0:
-                print_debug("Dados enviados com sucesso")
-            else:
-                print_debug(f"Erro ao enviar dados: {status}")
+            log.log(DEBUG if status == 0 else WARNING, MSG_WRITE_DONE, status)
+            if self.validating:
+                self.validating = False
+                if status == 0:
+                    self._connection_ready(True)
+                else:
+                    # Handles do cache não valem mais (firmware do display mudou)
+                    print_debug("Cache do display inválido, refazendo descoberta")
+                    self.connected = False
+                    self.using_cache = False
+                    self.voltage_char_handle = None
+                    self.display_service_handle = None
+                    self.ble.gattc_discover_services(conn_handle)
+        
+        elif event == _IRQ_MTU_EXCHANGED:
+            conn_handle, mtu = data
+            self.mtu = mtu
+            if self.peer_cache is not None and self.peer_cache[5] != mtu and \
+                    self.voltage_char_handle and not self.validating:
+                self._update_peer_cache(*self.peer_addr)
+    
+    def _request_mtu(self, conn_handle, mtu=_DEFAULT_MTU):
+        """Negocia o MTU quando o frame de tensões (ou o do cache) não cabe em 20 bytes"""
+        mtu = max(mtu, len(self.tx_buffer) + 3)
+        if mtu <= _DEFAULT_MTU:
+            return
+        try:
+            self.ble.config(mtu=mtu)
+            self.ble.gattc_exchange_mtu(conn_handle)
+        except Exception:
+            pass
+    
+    def _connection_open(self):
+        """Libera o envio de frames (com cache: a primeira escrita valida)"""
+        self.connected = True
+        self.deadband.reset()
+    
+    def _connection_ready(self, cached):
+        """Conexão confirmada: registra o tempo de restauração desde a queda"""
+        if self.dropped_at is not None:
+            self.last_restore_ms = time.ticks_diff(time.ticks_ms(), self.dropped_at)
+            self.last_restore_cached = cached
+            log.log(INFO, MSG_RECONNECT, self.last_restore_ms, 1 if cached else 0,
+                    self.direct_attempts)
+            self.dropped_at = None
+        self.direct_attempts = 0
     
     def send_voltage_data(self, voltages):
-        """Envia dados de tensão para o display"""
+        """Envia dados de tensão (V) para o display (ver send_voltage_uv)"""
+        for i in range(self.channel_count):
+            self.tx_uv[i] = int(voltages[i] * 1000000)
+        return self.send_voltage_uv(self.tx_uv)
+    
+    def send_voltage_uv(self, microvolts):
+        """Envia dados de tensão (µV) para o display no frame inteiro
+        
+        Frames dentro da faixa morta não são enviados (e não contam como
+        falha); a primeira escrita de validação do cache sempre sai.
+        """
         if not self.connected or not self.voltage_char_handle:
             return False
         
+        mv = self.tx_mv
+        for i in range(self.channel_count):
+            mv[i] = (microvolts[i] + 500) // 1000
+        if self.validating:
+            self.deadband.reset()
+        if not self.deadband.check(time.ticks_ms(), mv):
+            metrics.inc(C_NOTIFY_SUPPRESSED)
+            return True
+        metrics.inc(C_FRAMES_SENT)
+        
         try:
-            data = BLEUtils.encode_voltage_data(voltages)
-            self.ble.gattc_write(self.conn_handle, self.voltage_char_handle, data)
+            data = BLEUtils.pack_voltage_uv(self.tx_buffer, microvolts, self.channel_count, CHANNEL_BASE)
+            # Com handles do cache ainda não validados, escreve com resposta
+            mode = 1 if self.validating else 0
+            self.ble.gattc_write(self.conn_handle, self.voltage_char_handle, data, mode)
             return True
         except Exception as e:
             print_debug(f"Erro ao enviar dados de tensão: {e}")
             return False
     
     def auto_send_voltages(self):
-        """Envia automaticamente as tensões lidas"""
+        """Envia automaticamente as tensões lidas (chamado no loop principal)"""
+        self.save_peer_cache()
         current_time = time.time()
         
         if current_time - self.last_send_time >= self.send_interval:
             if self.connected:
-                voltages = self.adc_reader.read_all_voltages()
-                success = self.send_voltage_data(voltages)
+                microvolts = self.adc_reader.read_all_uv(self.tx_uv)
+                success = self.send_voltage_uv(microvolts)
                 
-                if success:
-                    print_debug(f"Tensões enviadas: {voltages}")
-                else:
-                    print_debug("Falha ao enviar tensões")
+                if not success:
+                    log.log(WARNING, MSG_SEND_FAIL)
                 
                 self.last_send_time = current_time
     
@@ -207,7 +436,11 @@ class BLEVoltmeterClient:
             'connected': self.connected,
             'conn_handle': self.conn_handle,
             'scanning': self.scanning,
-            'scan_results': len(self.scan_results),
+            'scan_results': len(self.peers),
+            'adverts_seen': self.adverts_seen,
+            'known_peer': self.peer_cache is not None,
+            'last_restore_ms': self.last_restore_ms,
+            'last_restore_cached': self.last_restore_cached,
             'send_interval': self.send_interval,
             'last_send_time': self.last_send_time
         }
@@ -268,12 +501,12 @@ class BLEVoltmeterServer:
         if event == _IRQ_CENTRAL_CONNECT:
             conn_handle, addr_type, addr = data
             self.connections.add(conn_handle)
-            print_debug(f"Cliente conectado ao servidor voltímetro: {conn_handle}")
+            log.log(INFO, MSG_CONNECT, conn_handle, len(self.connections))
         
         elif event == _IRQ_CENTRAL_DISCONNECT:
             conn_handle, addr_type, addr = data
             self.connections.discard(conn_handle)
-            print_debug(f"Cliente desconectado do servidor voltímetro: {conn_handle}")
+            log.log(INFO, MSG_DISCONNECT, conn_handle, len(self.connections))
     
     def _setup_services(self):
         """Configura os serviços BLE"""
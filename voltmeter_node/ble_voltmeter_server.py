@@ -1,9 +1,32 @@
 import bluetooth
 import time
 import sys
+from array import array
 sys.path.append('/common')
-from constants import *
-from ble_utils import BLEUtils, print_debug, _IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_GATTS_WRITE
+from errno import ENOMEM
+from micropython import const
+from constants import VOLTMETER_SERVICE_UUID, VOLTAGE_CHAR_UUID, COMMAND_CHAR_UUID, LOG_CHAR_UUID, DIAG_CHAR_UUID, STATS_CHAR_UUID, CAPTURE_CHAR_UUID, AC_CHAR_UUID, BLE_NAME_VOLTMETER, MAX_CONNECTIONS
+from voltmeter_constants import VOLTMETER_CHANNELS, CHANNEL_BASE, STATS_SLOTS, TRIGGER_REARM, AC_WINDOW_SAMPLES
+from ble_utils import BLEUtils, print_debug
+from logger import log, DEBUG, INFO, WARNING, MSG_NOTIFY_SENT, MSG_NOTIFY_FAIL, MSG_CONNECT, MSG_DISCONNECT, MSG_IRQ, MSG_COMMAND, MSG_COMMAND_UNKNOWN
+from metrics import metrics, IRQ_SLOTS, BLOB_SIZE, C_NOTIFY_SENT, C_NOTIFY_FAIL, C_NOTIFY_SUPPRESSED, C_FRAMES_SENT, G_CONNECTIONS
+from memory import memory
+from deadband import DeadbandFilter
+from stats import stats_blob_size
+from trigger import CAPTURE_CHUNK_SIZE, chunk_values
+from ac_meter import ac_blob_size
+
+_IRQ_CENTRAL_CONNECT = const(1)
+_IRQ_CENTRAL_DISCONNECT = const(2)
+_IRQ_GATTS_WRITE = const(3)
+_IRQ_MTU_EXCHANGED = const(21)
+_DEFAULT_MTU = const(23)
+_CAPTURE_BURST = const(4)   # blocos da captura enviados por volta do loop principal
+_CHANGED_SIZE = const(4)    # aviso curto: tipo, flags, canais e versão do blob
+_CAPTURE_STALLS = const(200)  # voltas seguidas com a fila cheia antes de desistir da transferência
+
+# Frame de tensões (µV) reutilizado a cada notificação (pré-alocado em memory.init())
+memory.reserve('voltage_tx', BLEUtils.voltage_frame_size(VOLTMETER_CHANNELS))
 
 class BLEVoltmeterServer:
     """Servidor BLE para o voltímetro - permite conexões de PCs para monitoramento"""
@@ -12,8 +35,37 @@ class BLEVoltmeterServer:
         """Inicializa o servidor BLE para o nó voltímetro"""
         self.adc_reader = adc_reader
         self.connections = set()
+        self.mtus = {}              # MTU negociado por conexão (ausente: _DEFAULT_MTU)
         self.voltage_handle = None
         self.command_handle = None
+        self.log_handle = None
+        self.diag_handle = None
+        self.stats_handle = None
+        self.stats_sequence = 0     # último blob de estatísticas publicado
+        self.capture_handle = None
+        self.capture_announced = 0  # última captura cuja transferência começou
+        self.capture_next = {}      # próximo bloco da captura por conexão (transferências em andamento)
+        self.capture_stalls = 0     # voltas seguidas com a fila do controlador cheia
+        self.ac_handle = None
+        self.ac_sequence = 0        # último resultado AC publicado
+        self.ac_request = None      # (taxa_hz, amostras) à espera do loop principal (thread de amostragem ativo)
+        self.channel_count = adc_reader.channel_count if adc_reader else VOLTMETER_CHANNELS
+        frame_size = BLEUtils.voltage_frame_size(self.channel_count)
+        self.tx_buffer = memory.buffer('voltage_tx', frame_size)
+        if len(self.tx_buffer) != frame_size:
+            self.tx_buffer = bytearray(frame_size)
+        
+        # Só envia frames que saíram da faixa morta (ver deadband.py)
+        self.deadband = DeadbandFilter(channels=self.channel_count)
+        # Mínimo de 3 posições: o log grava os três primeiros canais
+        self.tx_mv = array('i', [0] * max(3, self.channel_count))
+        self.tx_uv = array('i', [0] * self.channel_count)
+        
+        # Falhas de notificação repetidas são gravadas no máximo 1x/s
+        log.set_rate_limit(MSG_NOTIFY_FAIL, 1000)
+        # Eventos IRQ e comandos chegam em rajadas: no máximo 1 registro a cada 100 ms
+        log.set_rate_limit(MSG_IRQ, 100)
+        log.set_rate_limit(MSG_COMMAND, 100)
         
         try:
             # Inicializa BLE
@@ -46,11 +98,43 @@ class BLEVoltmeterServer:
                 (VOLTAGE_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
                 # Característica para receber comandos
                 (COMMAND_CHAR_UUID, bluetooth.FLAG_WRITE | bluetooth.FLAG_READ),
+                # Característica para drenar o log binário (comando "LOG")
+                (LOG_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
+                # Característica de diagnóstico: blob de métricas (common/metrics.py); só leitura:
+                # o blob passa do MTU, e a leitura longa o devolve inteiro
+                (DIAG_CHAR_UUID, bluetooth.FLAG_READ),
+                # Estatísticas por janela de cada canal (voltmeter_node/stats.py)
+                (STATS_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
+                # Blocos da captura com pré-disparo (voltmeter_node/trigger.py)
+                (CAPTURE_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
+                # Resultado do modo AC, um por janela (voltmeter_node/ac_meter.py)
+                (AC_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
             ),
         )
         
         # Registra os serviços
-        ((self.voltage_handle, self.command_handle),) = self.ble.gatts_register_services((VOLTMETER_SERVICE,))
+        ((self.voltage_handle, self.command_handle, self.log_handle, self.diag_handle, self.stats_handle,
+          self.capture_handle, self.ac_handle),) = self.ble.gatts_register_services((VOLTMETER_SERVICE,))
+        
+        # O buffer padrão de uma característica tem 20 bytes; os blobs de métricas e estatísticas são maiores
+        self.ble.gatts_set_buffer(self.diag_handle, BLOB_SIZE)
+        self.ble.gatts_set_buffer(self.stats_handle, stats_blob_size(self.channel_count))
+        self.ble.gatts_set_buffer(self.capture_handle, CAPTURE_CHUNK_SIZE)
+        self.ble.gatts_set_buffer(self.ac_handle, ac_blob_size(self.channel_count))
+        # Comandos e a resposta de DEADBAND? (configuração atual) também
+        self.ble.gatts_set_buffer(self.command_handle, 96)
+        # Frame de tensões: 3 + 4 bytes por canal; acima de 20 bytes o PC
+        # precisa negociar um MTU maior para receber a notificação inteira.
+        # Este é só o máximo local: o MTU de cada conexão chega em
+        # _IRQ_MTU_EXCHANGED (os blocos da captura seguem o dela)
+        frame_size = len(self.tx_buffer)
+        self.ble.gatts_set_buffer(self.voltage_handle, frame_size)
+        mtu = max(frame_size, CAPTURE_CHUNK_SIZE) + 3
+        if mtu > _DEFAULT_MTU:
+            try:
+                self.ble.config(mtu=mtu)
+            except Exception as e:
+                print_debug(f"MTU {mtu} não suportado: {e}")
         
         print_debug("Serviços BLE do voltímetro registrados")
     
@@ -66,10 +150,17 @@ class BLEVoltmeterServer:
     
     def _irq_handler(self, event, data):
         """Manipula eventos BLE"""
+        metrics.irq(event)
+        memory.activity()
+        # Registro binário no anel (sem print no IRQ): evento e total desse evento
+        log.log(DEBUG, MSG_IRQ, event, metrics.irq_events[event] if 0 <= event < IRQ_SLOTS else 0)
         if event == _IRQ_CENTRAL_CONNECT:
             conn_handle, addr_type, addr = data
             self.connections.add(conn_handle)
-            print_debug(f"PC conectado: {conn_handle}, Total conexões: {len(self.connections)}")
+            metrics.connected()
+            log.log(INFO, MSG_CONNECT, conn_handle, len(self.connections))
+            # Central nova recebe o valor atual sem esperar variação
+            self.deadband.reset()
             
             # Se ainda há espaço para mais conexões, continua advertising
             if len(self.connections) < MAX_CONNECTIONS:
@@ -78,7 +169,9 @@ class BLEVoltmeterServer:
         elif event == _IRQ_CENTRAL_DISCONNECT:
             conn_handle, addr_type, addr = data
             self.connections.discard(conn_handle)
-            print_debug(f"PC desconectado: {conn_handle}, Total conexões: {len(self.connections)}")
+            self.mtus.pop(conn_handle, None)
+            self.capture_next.pop(conn_handle, None)
+            log.log(INFO, MSG_DISCONNECT, conn_handle, len(self.connections))
             
             # Reinicia advertising se há espaço
             if len(self.connections) < MAX_CONNECTIONS:
@@ -89,6 +182,10 @@ class BLEVoltmeterServer:
             
             if value_handle == self.command_handle:
                 self._handle_command_data(conn_handle)
+        
+        elif event == _IRQ_MTU_EXCHANGED:
+            conn_handle, mtu = data
+            self.mtus[conn_handle] = mtu
     
     def _handle_command_data(self, conn_handle):
         """Processa comandos recebidos de PCs"""
@@ -96,12 +193,12 @@ class BLEVoltmeterServer:
             data = self.ble.gatts_read(self.command_handle)
             command = data.decode('utf-8').strip()
             
-            print_debug(f"Comando recebido de PC: '{command}'")
+            log.log(DEBUG, MSG_COMMAND, len(data))
             
             if command == "GET_VOLTAGES":
                 # Comando para ler tensões atuais
-                voltages = self.adc_reader.read_all_voltages() if self.adc_reader else [0, 0, 0]
-                self.update_voltage_data(voltages)
+                voltages = self.adc_reader.read_all_voltages() if self.adc_reader else [0] * self.channel_count
+                self.update_voltage_data(voltages, force=True)
                 print_debug(f"Tensões enviadas para PC: {voltages}")
             
             elif command == "TEST_ADC":
@@ -110,16 +207,160 @@ class BLEVoltmeterServer:
                     self.adc_reader.test_channels()
                     print_debug("Teste ADC executado")
             
+            elif command == "LOG":
+                # Drena o anel de log pela característica de log
+                sent = log.drain(lambda record: self.ble.gatts_notify(conn_handle, self.log_handle, record))
+                print_debug(f"Log drenado: {sent} registros, {log.pending()} pendentes")
+            
+            elif command.startswith("LOG_LEVEL:"):
+                # Nível mínimo gravado no anel: "LOG_LEVEL:10" (DEBUG) ... "LOG_LEVEL:40" (ERROR)
+                try:
+                    log.level = int(command[10:])
+                    print_debug(f"Nível de log: {log.level}")
+                except ValueError:
+                    print_debug("Nível de log inválido")
+            
+            elif command.startswith("DEADBAND") or command.startswith("MAX_SILENT:"):
+                # "DEADBAND:<canal>,<mV>[,<‰>]", "MAX_SILENT:<ms>" ou "DEADBAND?";
+                # a configuração resultante fica legível na característica de comandos
+                try:
+                    self.deadband.command(command)
+                except (ValueError, IndexError):
+                    print_debug("Parâmetros de faixa morta inválidos")
+                reply = self.deadband.describe()
+                self.ble.gatts_write(self.command_handle, reply.encode())
+                print_debug(reply)
+            
+            elif command.startswith("STATS"):
+                # "STATS:<janela_ms>[,<fatias>[,sliding|tumbling]]", "STATS:0" (desliga) ou "STATS?"
+                if command.startswith("STATS:") and self.adc_reader:
+                    try:
+                        self._configure_stats(command[6:].split(','))
+                    except (ValueError, IndexError):
+                        print_debug("Parâmetros de estatísticas inválidos")
+                stats = self.adc_reader.stats if self.adc_reader else None
+                reply = stats.describe() if stats else "STATS:0"
+                self.ble.gatts_write(self.command_handle, reply.encode())
+                print_debug(reply)
+            
+            elif command.startswith("AC"):
+                # "AC:<taxa_hz>[,<amostras>]", "AC:0" (desliga) ou "AC?"
+                reply = None
+                if command.startswith("AC:") and self.adc_reader:
+                    try:
+                        fields = command[3:].split(',')
+                        window = int(fields[1]) if len(fields) > 1 else AC_WINDOW_SAMPLES
+                        rate_hz = int(fields[0])
+                        if self.adc_reader.sampler:
+                            # O worker é dono do leitor: o loop principal para o
+                            # thread antes de trocar o modo (apply_ac_request())
+                            self.ac_request = (rate_hz, window)
+                            reply = "AC:%d,%d" % (rate_hz, window) if rate_hz else "AC:0"
+                        else:
+                            self._enable_ac(rate_hz, window)
+                    except (ValueError, IndexError):
+                        print_debug("Parâmetros do modo AC inválidos")
+                if reply is None:
+                    ac = self.adc_reader.ac if self.adc_reader else None
+                    reply = ac.describe() if ac else "AC:0"
+                self.ble.gatts_write(self.command_handle, reply.encode())
+                print_debug(reply)
+            
+            elif command.startswith("TRIG") or command.startswith("ARM") or command == "DISARM":
+                # "TRIG:<canal>,<tipo>[,<mV>[,<mV>]]", "ARM[:<pre>,<post>]", "DISARM" ou "TRIG?"
+                if self.adc_reader:
+                    try:
+                        self._trigger_command(command)
+                    except (ValueError, IndexError):
+                        print_debug("Parâmetros de disparo inválidos")
+                    capture = self.adc_reader.capture
+                    reply = capture.describe() if capture else "TRIG:IDLE"
+                    self.ble.gatts_write(self.command_handle, reply.encode())
+                    print_debug(reply)
+            
+            elif command.startswith("CAPTURE_SEND"):
+                # "CAPTURE_SEND[:<bloco>]": reenvia a captura congelada a partir do bloco
+                capture = self.adc_reader.capture if self.adc_reader else None
+                if capture and capture.done():
+                    self.capture_next[conn_handle] = int(command[13:]) if command.startswith("CAPTURE_SEND:") else 0
+                    self.capture_stalls = 0
+                else:
+                    print_debug("Nenhuma captura congelada")
+            
             else:
-                print_debug(f"Comando desconhecido de PC: {command}")
+                log.log(WARNING, MSG_COMMAND_UNKNOWN, len(command))
                 
         except Exception as e:
             print_debug(f"Erro ao processar comando de PC: {e}")
     
-    def update_voltage_data(self, voltages):
-        """Atualiza dados de tensão e notifica clientes"""
+    def _enable_ac(self, rate_hz, window):
+        """Liga (rate_hz > 0) ou desliga o modo AC no ADCReader"""
+        self.adc_reader.enable_ac(rate_hz, window)
+        self.ac_sequence = 0
+    
+    def apply_ac_request(self):
+        """Aplica o comando AC: adiado (loop principal, com o thread de amostragem já parado)"""
+        request = self.ac_request
+        if request is None:
+            return False
+        self.ac_request = None
+        self._enable_ac(*request)
+        return True
+    
+    def _configure_stats(self, fields):
+        """Troca a janela das estatísticas a partir dos campos do comando STATS:"""
+        current = self.adc_reader.stats
+        window_ms = int(fields[0])
+        slots = int(fields[1]) if len(fields) > 1 else (current.slots if current else STATS_SLOTS)
+        if len(fields) > 2:
+            sliding = fields[2].strip().lower() == 'sliding'
+        else:
+            sliding = current.sliding if current else False
+        if window_ms and not 1 <= slots <= window_ms:
+            raise ValueError(slots)
+        self.adc_reader.enable_stats(window_ms, slots, sliding)
+        self.stats_sequence = 0
+    
+    def _trigger_command(self, command):
+        """Configura, arma ou desarma a captura com pré-disparo (trigger.py)"""
+        reader = self.adc_reader
+        if command == "TRIG?":
+            return
+        capture = reader.capture or reader.enable_capture()
+        if command.startswith("ARM:"):
+            # Novo tamanho do anel: troca o objeto, com as mesmas condições
+            pre, post = [int(field) for field in command[4:].split(',')]
+            capture = reader.enable_capture(pre, post)
+            command = "ARM"
+        if not capture.command(command):
+            raise ValueError(command)
+        # Captura anterior descartada: interrompe a transferência dela
+        self.capture_next.clear()
+    
+    def update_voltage_data(self, voltages, force=False):
+        """Atualiza dados de tensão (V) e notifica clientes (ver update_voltage_uv)"""
+        for i in range(self.channel_count):
+            self.tx_uv[i] = int(voltages[i] * 1000000)
+        return self.update_voltage_uv(self.tx_uv, force)
+    
+    def update_voltage_uv(self, microvolts, force=False):
+        """Atualiza dados de tensão (µV) e notifica clientes; não aloca
+        
+        Frames dentro da faixa morta são descartados antes de codificar;
+        force envia mesmo assim. Retorna True se o frame foi enviado.
+        """
         try:
-            data = BLEUtils.encode_voltage_data(voltages)
+            mv = self.tx_mv
+            for i in range(self.channel_count):
+                mv[i] = (microvolts[i] + 500) // 1000
+            if force:
+                self.deadband.reset()
+            if not self.deadband.check(time.ticks_ms(), mv):
+                metrics.inc(C_NOTIFY_SUPPRESSED)
+                return False
+            metrics.inc(C_FRAMES_SENT)
+            
+            data = BLEUtils.pack_voltage_uv(self.tx_buffer, microvolts, self.channel_count, CHANNEL_BASE)
             
             # Atualiza a característica
             self.ble.gatts_write(self.voltage_handle, data)
@@ -128,12 +369,165 @@ class BLEVoltmeterServer:
             for conn_handle in list(self.connections):
                 try:
                     self.ble.gatts_notify(conn_handle, self.voltage_handle)
+                    metrics.inc(C_NOTIFY_SENT)
                 except:
-                    # Remove conexões inválidas
-                    self.connections.discard(conn_handle)
+                    self._drop_connection(conn_handle)
+            
+            if self.connections:
+                log.log(DEBUG, MSG_NOTIFY_SENT, mv[0], mv[1], mv[2])
+            return True
                     
         except Exception as e:
             print_debug(f"Erro ao atualizar dados de tensão: {e}")
+            return False
+    
+    def _drop_connection(self, conn_handle):
+        """Remove uma conexão cuja notificação falhou (central que já saiu)"""
+        metrics.inc(C_NOTIFY_FAIL)
+        log.log(WARNING, MSG_NOTIFY_FAIL, conn_handle)
+        self.connections.discard(conn_handle)
+        self.mtus.pop(conn_handle, None)
+        self.capture_next.pop(conn_handle, None)
+    
+    def mtu(self, conn_handle):
+        """MTU negociado com a conexão (_DEFAULT_MTU até a troca de MTU)"""
+        return self.mtus.get(conn_handle, _DEFAULT_MTU)
+    
+    def publish_metrics(self):
+        """Atualiza a característica de diagnóstico com o snapshot das métricas
+        
+        Chamado periodicamente pelo loop principal (fora de IRQ). A
+        característica é só de leitura: o blob passa do MTU e o painel
+        (metrics_dashboard.py) o lê inteiro periodicamente.
+        """
+        metrics.set_gauge(G_CONNECTIONS, len(self.connections))
+        metrics.update_heap()
+        self.ble.gatts_write(self.diag_handle, metrics.snapshot())
+    
+    def _notify_blob(self, value_handle, blob):
+        """Notifica um blob já escrito na característica, conexão a conexão
+        
+        Só vai inteiro para a conexão cujo MTU negociado o comporta; as
+        outras recebem os _CHANGED_SIZE primeiros bytes (tipo, flags,
+        canais, versão) como aviso de que mudou e leem o blob inteiro
+        (leitura longa). Falha que não seja fila cheia remove a conexão.
+        """
+        size = len(blob)
+        for conn_handle in list(self.connections):
+            try:
+                if self.mtu(conn_handle) - 3 >= size:
+                    self.ble.gatts_notify(conn_handle, value_handle)
+                else:
+                    self.ble.gatts_notify(conn_handle, value_handle, blob[:_CHANGED_SIZE])
+            except Exception as e:
+                if not (isinstance(e, OSError) and e.args and e.args[0] == ENOMEM):
+                    self._drop_connection(conn_handle)
+    
+    def publish_stats(self, notify=False):
+        """Copia o último blob de estatísticas para a característica STATS
+        
+        Chamado a cada volta do loop principal; só escreve quando o
+        ADCReader fechou uma janela nova. A leitura devolve o blob inteiro;
+        com notify, a notificação segue _notify_blob() (o blob inteiro só
+        com MTU que o comporte).
+        """
+        stats = self.adc_reader.stats if self.adc_reader else None
+        if not stats or stats.sequence == self.stats_sequence:
+            return False
+        self.stats_sequence = stats.sequence
+        blob = stats.latest()
+        self.ble.gatts_write(self.stats_handle, blob)
+        if notify:
+            self._notify_blob(self.stats_handle, blob)
+        return True
+    
+    def publish_ac(self, notify=True):
+        """Copia o último resultado do modo AC para a característica AC
+        
+        Chamado pelo loop principal no modo AC; só escreve (e notifica)
+        quando uma janela nova fechou. Retorna True nesse caso. Como em
+        publish_stats(), o resultado inteiro só é notificado com MTU que o
+        comporte (_notify_blob()); a leitura sempre o devolve inteiro.
+        """
+        ac = self.adc_reader.ac if self.adc_reader else None
+        if not ac or ac.sequence == self.ac_sequence:
+            return False
+        self.ac_sequence = ac.sequence
+        blob = ac.latest()
+        self.ble.gatts_write(self.ac_handle, blob)
+        if notify:
+            self._notify_blob(self.ac_handle, blob)
+        return True
+    
+    def pump_capture(self):
+        """Envia os próximos blocos da captura congelada (até _CAPTURE_BURST por central)
+        
+        Chamado a cada volta do loop principal. Uma captura nova começa a
+        ser enviada sozinha para as centrais conectadas, em blocos do
+        tamanho que cabe no MTU de cada uma (trigger.chunk_values()); uma
+        central com MTU menor que CAPTURE_MIN_MTU fica de fora. Um bloco
+        recusado com a fila do controlador cheia (ENOMEM) é repetido na
+        volta seguinte, até _CAPTURE_STALLS voltas seguidas; qualquer outra
+        falha remove a conexão, como em update_voltage_uv(). Com
+        TRIGGER_REARM a captura é armada de novo quando a última
+        transferência termina.
+        """
+        capture = self.adc_reader.capture if self.adc_reader else None
+        if not capture or not capture.done():
+            return False
+        if capture.captures != self.capture_announced:
+            if not self.connections:
+                return False
+            self.capture_announced = capture.captures
+            self.capture_stalls = 0
+            for conn_handle in self.connections:
+                self.capture_next[conn_handle] = 0
+        if not self.capture_next:
+            return False
+        full = finished = False
+        for conn_handle in list(self.capture_next):
+            per_chunk = chunk_values(self.mtu(conn_handle))
+            if not per_chunk:
+                print_debug(f"MTU {self.mtu(conn_handle)} da conexão {conn_handle} não comporta a captura")
+                del self.capture_next[conn_handle]
+                continue
+            count = capture.chunk_count(per_chunk)
+            index = self.capture_next[conn_handle]
+            for _ in range(_CAPTURE_BURST):
+                if index >= count:
+                    break
+                try:
+                    self.ble.gatts_notify(conn_handle, self.capture_handle, capture.pack_chunk(index, per_chunk))
+                except Exception as e:
+                    if isinstance(e, OSError) and e.args and e.args[0] == ENOMEM:
+                        # Repete o bloco na próxima volta
+                        full = True
+                    else:
+                        self._drop_connection(conn_handle)
+                    break
+                index += 1
+            if conn_handle not in self.capture_next:
+                continue
+            if index >= count:
+                del self.capture_next[conn_handle]
+                finished = True
+            else:
+                self.capture_next[conn_handle] = index
+        if full:
+            self.capture_stalls += 1
+            if self.capture_stalls >= _CAPTURE_STALLS:
+                print_debug("Fila BLE cheia: transferência da captura parada")
+                self.capture_next.clear()
+                return True
+        else:
+            self.capture_stalls = 0
+        if finished and not self.capture_next and TRIGGER_REARM:
+            capture.arm()
+        return True
+    
+    def capture_pending(self):
+        """True enquanto há blocos da captura a enviar para centrais conectadas"""
+        return len(self.capture_next) > 0
     
     def get_connection_count(self):
         """Retorna o número de conexões ativas"""
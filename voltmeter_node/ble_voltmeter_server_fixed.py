@@ -8,8 +8,16 @@ import time
 import gc
 import sys
 sys.path.append('/common')
-from constants import *
-from ble_utils import BLEUtils, print_debug, _IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_GATTS_WRITE
+from micropython import const
+from constants import VOLTMETER_SERVICE_UUID, VOLTAGE_CHAR_UUID, COMMAND_CHAR_UUID, LOG_CHAR_UUID, DIAG_CHAR_UUID, BLE_NAME_VOLTMETER, MAX_CONNECTIONS
+from ble_utils import BLEUtils, print_debug
+from metrics import metrics, BLOB_SIZE, C_NOTIFY_SENT, C_NOTIFY_FAIL, G_CONNECTIONS
+from memory import memory
+from logger import log, DEBUG, INFO, WARNING, MSG_NOTIFY_SENT, MSG_NOTIFY_FAIL, MSG_CONNECT, MSG_DISCONNECT
+
+_IRQ_CENTRAL_CONNECT = const(1)
+_IRQ_CENTRAL_DISCONNECT = const(2)
+_IRQ_GATTS_WRITE = const(3)
 
 class FixedBLEVoltmeterServer:
     """Servidor BLE corrigido para o voltímetro - resolve erro -18"""
@@ -20,8 +28,13 @@ class FixedBLEVoltmeterServer:
         self.connections = set()
         self.voltage_handle = None
         self.command_handle = None
+        self.log_handle = None
+        self.diag_handle = None
         self.ble = None
         
+        # Falhas de notificação repetidas são gravadas no máximo 1x/s
+        log.set_rate_limit(MSG_NOTIFY_FAIL, 1000)
+        
         # Inicializa BLE com estratégias múltiplas
         if self._initialize_ble_robust():
             print_debug("Servidor BLE do Voltímetro inicializado com sucesso")
@@ -238,11 +251,17 @@ class FixedBLEVoltmeterServer:
                     (VOLTAGE_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
                     # Característica para receber comandos
                     (COMMAND_CHAR_UUID, bluetooth.FLAG_WRITE | bluetooth.FLAG_READ),
+                    # Característica para drenar o log binário (comando "LOG")
+                    (LOG_CHAR_UUID, bluetooth.FLAG_READ | bluetooth.FLAG_NOTIFY),
+                    # Característica de diagnóstico: blob de métricas (common/metrics.py); só leitura:
+                    # o blob passa do MTU, e a leitura longa o devolve inteiro
+                    (DIAG_CHAR_UUID, bluetooth.FLAG_READ),
                 ),
             )
             
             # Registra os serviços
-            ((self.voltage_handle, self.command_handle),) = self.ble.gatts_register_services((VOLTMETER_SERVICE,))
+            ((self.voltage_handle, self.command_handle, self.log_handle, self.diag_handle),) = self.ble.gatts_register_services((VOLTMETER_SERVICE,))
+            self.ble.gatts_set_buffer(self.diag_handle, BLOB_SIZE)
             
             print_debug("Serviços BLE do Voltímetro registrados")
             
@@ -267,11 +286,14 @@ class FixedBLEVoltmeterServer:
     
     def _irq_handler(self, event, data):
         """Manipula eventos BLE"""
+        metrics.irq(event)
+        memory.activity()
         try:
             if event == _IRQ_CENTRAL_CONNECT:
                 conn_handle, addr_type, addr = data
                 self.connections.add(conn_handle)
-                print_debug(f"Cliente conectado ao Voltímetro: {conn_handle}")
+                metrics.connected()
+                log.log(INFO, MSG_CONNECT, conn_handle, len(self.connections))
                 
                 # Continua advertising para mais conexões se há espaço
                 if len(self.connections) < MAX_CONNECTIONS:
@@ -280,7 +302,7 @@ class FixedBLEVoltmeterServer:
             elif event == _IRQ_CENTRAL_DISCONNECT:
                 conn_handle, addr_type, addr = data
                 self.connections.discard(conn_handle)
-                print_debug(f"Cliente desconectado do Voltímetro: {conn_handle}")
+                log.log(INFO, MSG_DISCONNECT, conn_handle, len(self.connections))
                 
                 # Reinicia advertising se há espaço
                 if len(self.connections) < MAX_CONNECTIONS:
@@ -310,6 +332,8 @@ class FixedBLEVoltmeterServer:
                 print_debug("Monitoramento parado")
             elif command == "STATUS":
                 self._send_status()
+            elif command == "LOG":
+                self._drain_log()
                 
         except Exception as e:
             print_debug(f"Erro ao processar comando: {e}")
@@ -325,12 +349,14 @@ class FixedBLEVoltmeterServer:
                 for conn_handle in self.connections.copy():
                     try:
                         self.ble.gatts_notify(conn_handle, self.voltage_handle, voltage_str.encode())
+                        metrics.inc(C_NOTIFY_SENT)
                     except Exception as e:
-                        print_debug(f"Erro ao enviar para {conn_handle}: {e}")
+                        metrics.inc(C_NOTIFY_FAIL)
+                        log.log(WARNING, MSG_NOTIFY_FAIL, conn_handle)
                         # Remove conexão problemática
                         self.connections.discard(conn_handle)
                 
-                print_debug(f"Dados enviados: {voltage_str}")
+                log.log(DEBUG, MSG_NOTIFY_SENT, int(v1 * 1000), int(v2 * 1000), int(v3 * 1000))
                 
         except Exception as e:
             print_debug(f"Erro ao enviar dados de tensão: {e}")
@@ -358,6 +384,23 @@ class FixedBLEVoltmeterServer:
         except Exception as e:
             print_debug(f"Erro ao enviar status: {e}")
     
+    def _drain_log(self):
+        """Envia os registros pendentes do log pela característica de log"""
+        if self.connections and self.log_handle:
+            conn_handle = list(self.connections)[0]
+            sent = log.drain(lambda record: self.ble.gatts_notify(conn_handle, self.log_handle, record))
+            print_debug(f"Log drenado: {sent} registros, {log.pending()} pendentes")
+    
+    def publish_metrics(self):
+        """Atualiza a característica de diagnóstico com o snapshot das métricas"""
+        try:
+            if self.ble and self.diag_handle:
+                metrics.set_gauge(G_CONNECTIONS, len(self.connections))
+                metrics.update_heap()
+                self.ble.gatts_write(self.diag_handle, metrics.snapshot())
+        except Exception as e:
+            print_debug(f"Erro ao publicar métricas: {e}")
+    
     def stop(self):
         """Para o servidor BLE"""
         try:
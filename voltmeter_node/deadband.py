@@ -0,0 +1,96 @@
+"""
+Filtro de envio por variação (faixa morta) do voltímetro
+Um frame só é enviado quando algum canal saiu da sua faixa morta desde o
+último envio, ou quando passou max_silent_ms sem envio. A faixa de cada
+canal é o maior entre um valor absoluto (mV) e um relativo ao último valor
+enviado (em milésimos, ‰).
+
+Configurável em tempo de execução pela característica de comandos:
+    DEADBAND:<canal>,<mV>[,<‰>]   canal 1-N, ou 0 para todos
+    MAX_SILENT:<ms>               0 desliga o envio periódico
+"""
+
+import time
+from array import array
+from voltmeter_constants import VOLTMETER_CHANNELS
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+DEADBAND_MV = const(10)       # acima do ruído do ADC com a média móvel
+MAX_SILENT_MS = const(10000)  # envio mesmo sem variação (prova de vida)
+
+
+class DeadbandFilter:
+    """Decide se um frame de tensões deve ser enviado; não aloca por frame"""
+
+    def __init__(self, abs_mv=DEADBAND_MV, rel_permille=0, max_silent_ms=MAX_SILENT_MS,
+                 channels=VOLTMETER_CHANNELS):
+        self.channels = channels
+        self.abs_mv = array('i', [abs_mv] * channels)
+        self.rel_permille = array('i', [rel_permille] * channels)
+        self.max_silent_ms = max_silent_ms
+        self.sent_mv = array('i', [0] * channels)
+        self.sent_ms = None
+        self.sent = 0
+        self.suppressed = 0
+
+    def configure(self, channel, abs_mv, rel_permille=None):
+        """Ajusta a faixa de um canal (0..channel_count-1) ou de todos (channel=None)"""
+        channels = range(self.channels) if channel is None else (channel,)
+        for i in channels:
+            self.abs_mv[i] = max(0, abs_mv)
+            if rel_permille is not None:
+                self.rel_permille[i] = max(0, rel_permille)
+        self.reset()
+
+    def reset(self):
+        """Força o envio do próximo frame (nova central, configuração nova)"""
+        self.sent_ms = None
+
+    def check(self, now, millivolts):
+        """True se o frame deve ser enviado (e passa a ser a referência)"""
+        send = self.sent_ms is None or (
+            self.max_silent_ms and time.ticks_diff(now, self.sent_ms) >= self.max_silent_ms)
+        if not send:
+            for i in range(self.channels):
+                reference = self.sent_mv[i]
+                limit = self.abs_mv[i]
+                relative = abs(reference) * self.rel_permille[i] // 1000
+                if relative > limit:
+                    limit = relative
+                if abs(millivolts[i] - reference) > limit:
+                    send = True
+                    break
+        if send:
+            for i in range(self.channels):
+                self.sent_mv[i] = millivolts[i]
+            self.sent_ms = now
+            self.sent += 1
+        else:
+            self.suppressed += 1
+        return send
+
+    def describe(self):
+        """Configuração atual em texto (resposta aos comandos)"""
+        bands = ','.join('%d/%d' % (self.abs_mv[i], self.rel_permille[i]) for i in range(self.channels))
+        return 'DEADBAND:%s;MAX_SILENT:%d;SENT:%d;SUPPRESSED:%d' % (
+            bands, self.max_silent_ms, self.sent, self.suppressed)
+
+    def command(self, text):
+        """Aplica um comando DEADBAND:/MAX_SILENT:; retorna False se não reconhecido"""
+        if text.startswith('DEADBAND:'):
+            fields = [int(f) for f in text[9:].split(',')]
+            channel = fields[0] - 1 if fields[0] else None
+            if channel is not None and not 0 <= channel < self.channels:
+                raise ValueError('canal inválido')
+            self.configure(channel, fields[1], fields[2] if len(fields) > 2 else None)
+            return True
+        if text.startswith('MAX_SILENT:'):
+            self.max_silent_ms = max(0, int(text[11:]))
+            return True
+        return False
@@ -1,31 +1,52 @@
 """
-Nó Voltímetro - ESP32 com leitura de 3 canais ADC
+Nó Voltímetro - ESP32 com leitura de N canais ADC (ADC_PINS)
 Envia dados via BLE para o nó Display
 """
 
 import time
 import sys
-import gc
-from machine import Pin
+from array import array
+from machine import Pin, lightsleep
 
 # Adiciona o diretório comum ao path
 sys.path.append('/common')
 
 # Importações locais
 from adc_reader import ADCReader
+from adc_backends import create_backend
 from ble_voltmeter_server import BLEVoltmeterServer
 from ble_utils import print_debug
+from voltmeter_constants import VOLTMETER_CHANNELS, ADC_CONTINUOUS_HZ, SAMPLER_THREAD, AC_MODE
+from memory import memory
+from metrics import metrics, C_SLEEP_MS, G_SAMPLE_INTERVAL
+from sampling import AdaptiveScheduler
+
+LIGHTSLEEP_MIN_MS = 20    # esperas menores não compensam o custo de acordar
+LOOP_MAX_SLEEP_MS = 1000  # acorda ao menos 1x/s para LED, status e métricas
+ADV_AWAKE_MS = 150        # acordado a cada ciclo para o advertising sair
+CAPTURE_PUMP_MS = 5       # espera entre lotes de blocos da captura
 
 class VoltmeterNode:
     def __init__(self):
         """Inicializa o nó voltímetro"""
         print_debug("Inicializando nó Voltímetro...")
         
+        # Pré-aloca buffers de vida longa e agenda o GC antes de criar os objetos do nó
+        memory.init()
+        
         # Estado do nó
         self.running = False
         self.last_measurement = time.time()
         self.last_heartbeat = time.time()
         self.ble_server = None
+        self.sampler = None  # SamplerThread quando SAMPLER_THREAD
+        self.sampler_wanted = SAMPLER_THREAD  # False depois de uma falha do thread
+        
+        # Amostragem adaptativa: intervalo e envios decididos pelo agendador
+        self.scheduler = AdaptiveScheduler(channels=VOLTMETER_CHANNELS)
+        self.millivolts = array('i', [0] * VOLTMETER_CHANNELS)
+        self.microvolts = array('i', [0] * VOLTMETER_CHANNELS)
+        self.low_power = True  # lightsleep entre amostras sem centrais conectadas
         
         # LED indicador de status
         self.status_led = Pin(2, Pin.OUT)
@@ -33,7 +54,15 @@ class VoltmeterNode:
         
         # Inicializa o leitor ADC
         try:
-            self.adc_reader = ADCReader()
+            self.adc_reader = ADCReader(backend=create_backend())
+            if ADC_CONTINUOUS_HZ:
+                # O Timer de aquisição para durante o lightsleep
+                self.adc_reader.start_continuous(ADC_CONTINUOUS_HZ)
+                self.low_power = False
+            if AC_MODE:
+                # Taxa fixa do modo AC (também na aquisição contínua)
+                self.adc_reader.enable_ac()
+                self.low_power = False
             print_debug("Leitor ADC inicializado")
             self.status_led.value(1)  # LED aceso = ADC OK
         except Exception as e:
@@ -90,7 +119,7 @@ class VoltmeterNode:
     def status_info(self):
         """Exibe informações de status periodicamente"""
         try:
-            voltages = self.adc_reader.read_all_voltages() if self.adc_reader else [0, 0, 0]
+            voltages = self.adc_reader.read_all_voltages() if self.adc_reader else [0] * VOLTMETER_CHANNELS
             server_connections = len(self.ble_server.connections) if self.ble_server else 0
             
             print_debug(f"Status - Tensões: {voltages}")
@@ -99,12 +128,46 @@ class VoltmeterNode:
         except Exception as e:
             print_debug(f"Erro ao obter status: {e}")
     
+    def start_sampler(self):
+        """Passa a amostragem a um _thread (sampler_thread.py)"""
+        from sampler_thread import SamplerThread
+        try:
+            self.sampler = SamplerThread(self.adc_reader, self.scheduler.interval_ms)
+            self.sampler.start()
+            # O lightsleep pararia o worker junto com o loop principal
+            self.low_power = False
+            print_debug("Thread de amostragem iniciado")
+        except Exception as e:
+            print_debug(f"Thread de amostragem indisponível ({e}); amostrando no loop principal")
+            self.adc_reader.sampler = None
+            self.sampler = None
+            self.sampler_wanted = False
+    
+    def switch_sampler(self):
+        """Para o thread de amostragem no modo AC e o religa quando o modo AC sai
+        
+        O comando AC: chega na IRQ do BLE; com o worker ativo ele fica
+        pendente no servidor até o thread parar aqui, para que o worker não
+        consuma os blocos da aquisição do modo AC.
+        """
+        if self.ble_server and self.ble_server.ac_request:
+            if self.sampler:
+                # A taxa fixa vem do Timer da aquisição; o worker só atrasaria os blocos
+                self.sampler.stop()
+                self.sampler = None
+                print_debug("Modo AC: thread de amostragem parado")
+            self.ble_server.apply_ac_request()
+        if self.sampler_wanted and not self.sampler and not self.adc_reader.ac:
+            # Fora do modo AC (no início ou depois de AC:0) o worker volta
+            self.start_sampler()
+    
     def run(self):
         """Loop principal do nó"""
         print_debug("Iniciando loop principal...")
         
         last_status_time = time.time()
-        measurement_interval = 1.0  # Intervalo de medição em segundos
+        last_metrics_time = time.time()
+        listeners = 0
         
         try:
             while self.running:
@@ -113,22 +176,49 @@ class VoltmeterNode:
                 # Heartbeat
                 self.heartbeat()
                 
-                # Medições e envio de dados
-                if current_time - self.last_measurement >= measurement_interval:
-                    self.measure_and_send()
+                # Nova central conectada: amostra e envia sem esperar o batimento
+                connections = self.ble_server.get_connection_count() if self.ble_server else 0
+                if connections > listeners:
+                    self.scheduler.listeners_changed()
+                    if self.sampler:
+                        self.sampler.request()
+                listeners = connections
+                
+                # Thread de amostragem só fora do modo AC (comando AC: pendente aplicado aqui)
+                if self.adc_reader:
+                    self.switch_sampler()
+                
+                # Medições e envio de dados no intervalo decidido pelo agendador
+                now = time.ticks_ms()
+                if self.adc_reader and self.adc_reader.ac:
+                    self.poll_ac(connections > 0)
+                elif self.sampler:
+                    self.drain_samples(connections > 0)
+                elif self.scheduler.due(now):
+                    self.measure_and_send(now, connections > 0)
                     self.last_measurement = current_time
                 
+                # Estatísticas da última janela fechada na característica STATS
+                if self.ble_server:
+                    self.ble_server.publish_stats()
+                    # Blocos da captura com pré-disparo congelada (trigger.py)
+                    self.ble_server.pump_capture()
+                
                 # Status info a cada 15 segundos
                 if current_time - last_status_time >= 15:
                     self.status_info()
                     last_status_time = current_time
                 
-                # Limpa memória periodicamente
-                if current_time % 30 < 0.1:  # A cada 30 segundos
-                    gc.collect()
+                # Publica métricas na característica de diagnóstico
+                if self.ble_server and current_time - last_metrics_time >= 5:
+                    self.ble_server.publish_metrics()
+                    last_metrics_time = current_time
                 
-                # Small delay para não sobrecarregar o CPU
-                time.sleep(0.1)
+                # Coleta de lixo só em janela ociosa (sem atividade BLE recente)
+                memory.idle_window()
+                
+                # Dorme até a próxima amostra
+                self.sleep_until_next(connections)
                 
         except KeyboardInterrupt:
             print_debug("Interrupção pelo usuário")
@@ -137,22 +227,93 @@ class VoltmeterNode:
             print_debug(f"Erro no loop principal: {e}")
             self.shutdown()
     
-    def measure_and_send(self):
-        """Faz medições e atualiza dados do servidor BLE"""
+    def measure_and_send(self, now, listeners):
+        """Faz medições e notifica (o servidor filtra pela faixa morta)"""
+        if not self.adc_reader:
+            return
         try:
-            if not self.adc_reader:
-                return
-                
-            # Lê as tensões
-            voltages = self.adc_reader.read_all_voltages()
+            # Lê as tensões em µV (caminho inteiro, sem floats)
+            microvolts = self.adc_reader.read_all_uv(self.microvolts)
+        except Exception as e:
+            print_debug(f"Erro ao medir: {e}")
+            return
+        self.send_sample(now, microvolts, listeners)
+    
+    def drain_samples(self, listeners):
+        """Consome as varreduras publicadas pelo thread de amostragem"""
+        sampler = self.sampler
+        if not sampler.alive:
+            print_debug(f"Thread de amostragem parou: {sampler.error}; amostrando no loop principal")
+            sampler.stop()
+            self.sampler = None
+            self.sampler_wanted = False
+            return
+        while True:
+            sampled = sampler.pop(self.microvolts)
+            if sampled < 0:
+                break
+            self.send_sample(sampled, self.microvolts, listeners)
+        # O worker segue o intervalo decidido pelo agendador
+        sampler.interval_ms = self.scheduler.interval_ms
+    
+    def poll_ac(self, listeners):
+        """Modo AC: consome o bloco da aquisição e envia um resultado por janela"""
+        reader = self.adc_reader
+        try:
+            reader.read_block_uv(self.microvolts)
+        except Exception as e:
+            print_debug(f"Erro ao medir: {e}")
+            return
+        if self.ble_server and self.ble_server.publish_ac(notify=listeners):
+            # O frame de tensões leva o RMS verdadeiro (display e gravador)
+            if listeners and self.ble_server.update_voltage_uv(reader.ac.rms_uv):
+                memory.after_burst()
+    
+    def send_sample(self, now, microvolts, listeners):
+        """Agenda e notifica uma varredura em µV (now: ticks_ms da amostra)"""
+        try:
+            for i in range(VOLTMETER_CHANNELS):
+                self.millivolts[i] = (microvolts[i] + 500) // 1000
+            
+            self.scheduler.update(now, self.millivolts, listeners)
+            metrics.set_gauge(G_SAMPLE_INTERVAL, self.scheduler.interval_ms)
             
             # Atualiza os dados no servidor BLE para clientes conectados
-            if self.ble_server:
-                self.ble_server.update_voltage_data(voltages)
+            if listeners and self.ble_server and self.ble_server.update_voltage_uv(microvolts):
+                # Rádio acabou de esvaziar: janela para coletar sem atrasar eventos BLE
+                memory.after_burst()
                     
         except Exception as e:
             print_debug(f"Erro ao medir e atualizar: {e}")
     
+    def sleep_until_next(self, connections):
+        """Espera até a próxima amostra (no máximo LOOP_MAX_SLEEP_MS)
+        
+        Sem centrais conectadas usa machine.lightsleep: no MicroPython do
+        ESP32 o controlador BLE para durante o lightsleep, então com conexão
+        ativa a espera é time.sleep_ms (o rádio continua atendendo). Cada
+        ciclo de lightsleep deixa ADV_AWAKE_MS acordado para que o nó
+        continue anunciando e possa ser descoberto.
+        """
+        acquisition = self.adc_reader.acquisition if self.adc_reader else None
+        if acquisition and self.adc_reader.ac:
+            # Modo AC (sem agendador): nenhum bloco pode ser perdido, acorda duas vezes por bloco
+            wait = max(1, acquisition.block_samples * 500 // acquisition.rate_hz)
+        else:
+            source = self.sampler or self.scheduler
+            wait = min(source.until_next(time.ticks_ms()), LOOP_MAX_SLEEP_MS)
+        if self.ble_server and self.ble_server.capture_pending():
+            # Transferência de captura em andamento: volta logo para o próximo lote
+            wait = min(wait, CAPTURE_PUMP_MS)
+        if wait <= 0:
+            return
+        sleep_ms = wait - ADV_AWAKE_MS
+        if self.low_power and not acquisition and not connections and sleep_ms >= LIGHTSLEEP_MIN_MS:
+            lightsleep(sleep_ms)
+            metrics.inc(C_SLEEP_MS, sleep_ms)
+            wait = ADV_AWAKE_MS
+        time.sleep_ms(wait)
+    
     def shutdown(self):
         """Desliga o nó graciosamente"""
         print_debug("Desligando nó Voltímetro...")
@@ -167,6 +328,13 @@ class VoltmeterNode:
         except Exception as e:
             print_debug(f"Erro ao parar servidor BLE: {e}")
         
+        # Para o thread de amostragem e a aquisição contínua
+        if self.sampler:
+            self.sampler.stop()
+            self.sampler = None
+        if getattr(self, 'adc_reader', None):
+            self.adc_reader.stop_continuous()
+        
         # Apaga LED de status
         try:
             self.status_led.value(0)
@@ -8,9 +8,9 @@ import sys
 import gc
 sys.path.append('/common')
 
-from constants import *
 from adc_reader import ADCReader
 from ble_voltmeter_server_fixed import FixedBLEVoltmeterServer
+from memory import memory
 
 def main():
     """Função principal do nó voltímetro com tratamento robusto de erros"""
@@ -20,8 +20,8 @@ def main():
     ble_server = None
     
     try:
-        # Força limpeza inicial de memória
-        gc.collect()
+        # Limpeza inicial, buffers pré-alocados e gc.threshold
+        memory.init()
         
         # Inicializa leitor ADC
         print("Inicializando leitor ADC...")
@@ -41,9 +41,9 @@ def main():
         print("✓ Nó Voltímetro pronto para conexões")
         
         # Loop principal
-        loop_count = 0
         last_reading_time = 0
         last_status_time = 0
+        last_metrics_time = 0
         reading_interval = 0.5  # Leituras a cada 500ms
         status_interval = 30    # Status a cada 30 segundos
         
@@ -60,6 +60,7 @@ def main():
                         # Envia via BLE se há conexões
                         if ble_server and ble_server.connections:
                             ble_server.send_voltage_data(v1, v2, v3)
+                            memory.after_burst()
                         
                         last_reading_time = current_time
                         
@@ -72,11 +73,13 @@ def main():
                     print(f"Status: {num_connections} conexões, últimas leituras: V1={v1:.2f}V, V2={v2:.2f}V, V3={v3:.2f}V")
                     last_status_time = current_time
                 
-                # Garbage collection periódico
-                loop_count += 1
-                if loop_count % 2000 == 0:
-                    gc.collect()
-                    loop_count = 0
+                # Métricas na característica de diagnóstico
+                if ble_server and current_time - last_metrics_time >= 5:
+                    ble_server.publish_metrics()
+                    last_metrics_time = current_time
+                
+                # Coleta de lixo só em janela ociosa (sem atividade BLE recente)
+                memory.idle_window()
                 
                 # Delay pequeno
                 time.sleep(0.01)
@@ -13,7 +13,6 @@ sys.path.append('/common')
 sys.path.append('/voltmeter_node')
 
 # Imports do projeto
-from constants import *
 from adc_reader import ADCReader
 from ble_client import BLEClient
 
@@ -0,0 +1,177 @@
+"""
+Thread de amostragem do voltímetro (SAMPLER_THREAD)
+Um _thread é o dono do ADCReader: amostra no seu próprio prazo e publica
+cada varredura num anel de um produtor e um consumidor (SampleRing). O
+thread principal fica com o BLE, o LED e o status e só consome o anel, então
+um gatts_notify lento ou uma pausa de GC no loop principal não desloca o
+instante da amostra.
+
+Contrato de troca:
+
+    - só o worker escreve head, o conteúdo dos slots livres e os dados do
+      ADCReader (backend, média móvel, uv_readings)
+    - só o thread principal escreve tail, interval_ms, requests e running
+    - um slot é escrito antes de head avançar e lido antes de tail avançar:
+      nenhum dos lados vê um slot pela metade e não há lock no caminho quente
+    - anel cheio: a amostra nova é descartada e contada (dropped, C_RING_DROPS);
+      a sequência de quem chega ao consumidor continua em ordem
+
+head e tail são contadores de sequência (mod 2**30, inteiros pequenos); a
+diferença entre eles é a ocupação. No ESP32 os threads do MicroPython
+rodam num só núcleo sob o GIL: o ganho é desacoplar o prazo da amostra do
+resto do loop, não paralelismo. As escritas de atributo são atômicas sob
+o GIL, no MicroPython e no CPython (sampler_thread_sim.py).
+"""
+
+import time
+from array import array
+from micropython import const
+from voltmeter_constants import SAMPLER_RING_SIZE
+from metrics import metrics, C_RING_DROPS, H_SAMPLER_LATE
+
+SEQ_MASK = const(0x3FFFFFFF)    # contadores de sequência continuam inteiros pequenos
+SAMPLER_MAX_SLEEP_MS = const(20)  # o worker reavalia prazo, pedidos e parada ao menos nesse passo
+HANDOFF_MS = const(2)           # folga para o consumidor acordar depois da amostra
+
+
+class SampleRing:
+    """Anel SPSC de varreduras em µV com o ticks_ms de cada uma; não aloca"""
+
+    def __init__(self, channels, capacity=SAMPLER_RING_SIZE):
+        if capacity & (capacity - 1):
+            raise ValueError("Capacidade do anel deve ser potência de 2")
+        self.channels = channels
+        self.capacity = capacity
+        self.index_mask = capacity - 1
+        self.data = array('i', [0] * (channels * capacity))
+        self.times = array('i', [0] * capacity)
+        self.head = 0       # próxima sequência a publicar (produtor)
+        self.tail = 0       # próxima sequência a consumir (consumidor)
+        self.dropped = 0    # amostras descartadas com o anel cheio (produtor)
+
+    def pending(self):
+        """Amostras publicadas e ainda não consumidas"""
+        return (self.head - self.tail) & SEQ_MASK
+
+    def push(self, sample, ticks):
+        """Publica uma varredura (produtor); False se o anel estava cheio"""
+        head = self.head
+        if ((head - self.tail) & SEQ_MASK) >= self.capacity:
+            self.dropped += 1
+            return False
+        slot = head & self.index_mask
+        base = slot * self.channels
+        data = self.data
+        for channel in range(self.channels):
+            data[base + channel] = sample[channel]
+        self.times[slot] = ticks
+        self.head = (head + 1) & SEQ_MASK   # publica só com o slot completo
+        return True
+
+    def pop(self, out):
+        """Copia a varredura mais antiga em out (consumidor); ticks_ms dela ou -1"""
+        tail = self.tail
+        if tail == self.head:
+            return -1
+        slot = tail & self.index_mask
+        base = slot * self.channels
+        data = self.data
+        for channel in range(self.channels):
+            out[channel] = data[base + channel]
+        ticks = self.times[slot]
+        self.tail = (tail + 1) & SEQ_MASK   # devolve o slot só depois da cópia
+        return ticks
+
+
+class SamplerThread:
+    """Worker _thread dono do ADCReader; publica em SampleRing"""
+
+    def __init__(self, adc_reader, interval_ms, ring_size=SAMPLER_RING_SIZE):
+        self.adc_reader = adc_reader
+        self.channels = adc_reader.channel_count
+        self.ring = SampleRing(self.channels, ring_size)
+        self.sample = array('i', [0] * self.channels)   # varredura do worker
+        self.last_uv = array('i', [0] * self.channels)  # último pop (thread principal)
+        self.interval_ms = interval_ms  # escrito pelo thread principal (agendador)
+        self.requests = 0       # pedidos de amostra imediata (thread principal)
+        self.served = 0         # ... já atendidos (worker)
+        self.next_ticks = time.ticks_ms()   # prazo da próxima amostra (worker)
+        self.running = False
+        self.alive = False
+        self.error = None
+
+    def start(self):
+        """Entrega o ADCReader ao worker e inicia o thread"""
+        import _thread
+        self.running = True
+        self.alive = True
+        self.error = None
+        self.adc_reader.sampler = self
+        _thread.start_new_thread(self._run, ())
+
+    def stop(self, timeout_ms=1000):
+        """Pede a parada e espera o worker sair; o ADCReader volta ao chamador"""
+        self.running = False
+        start = time.ticks_ms()
+        while self.alive and time.ticks_diff(time.ticks_ms(), start) < timeout_ms:
+            time.sleep_ms(5)
+        self.adc_reader.sampler = None
+        return not self.alive
+
+    def request(self):
+        """Pede uma amostra sem esperar o prazo (ex.: nova central conectada)"""
+        self.requests = (self.requests + 1) & SEQ_MASK
+
+    def pop(self, out):
+        """Próxima varredura do anel em out; ticks_ms dela ou -1 (thread principal)"""
+        ticks = self.ring.pop(out)
+        if ticks >= 0:
+            last = self.last_uv
+            for channel in range(self.channels):
+                last[channel] = out[channel]
+        return ticks
+
+    def latest_uv(self, out):
+        """Última varredura consumida, para outros leitores do thread principal"""
+        last = self.last_uv
+        for channel in range(self.channels):
+            out[channel] = last[channel]
+        return out
+
+    def until_next(self, now):
+        """ms até valer a pena drenar o anel de novo"""
+        if self.ring.pending():
+            return 0
+        return max(0, time.ticks_diff(self.next_ticks, now)) + HANDOFF_MS
+
+    def _run(self):
+        reader = self.adc_reader
+        ring = self.ring
+        sample = self.sample
+        deadline = time.ticks_us()
+        try:
+            while self.running:
+                late = time.ticks_diff(time.ticks_us(), deadline)
+                requested = self.requests != self.served
+                if late < 0 and not requested:
+                    time.sleep_ms(min(-late // 1000 + 1, SAMPLER_MAX_SLEEP_MS))
+                    continue
+                if requested:
+                    self.served = self.requests
+                elif late > 0:
+                    metrics.observe(H_SAMPLER_LATE, late)
+                now = time.ticks_ms()
+                reader.scan_uv(sample)
+                if not ring.push(sample, now):
+                    metrics.inc(C_RING_DROPS)
+                if late >= 0:
+                    # Prazo fixo (sem deriva); atrasado mais de um período, ressincroniza
+                    period_us = self.interval_ms * 1000
+                    deadline = time.ticks_add(deadline, period_us)
+                    if time.ticks_diff(time.ticks_us(), deadline) >= 0:
+                        deadline = time.ticks_add(time.ticks_us(), period_us)
+                wait_ms = time.ticks_diff(deadline, time.ticks_us()) // 1000
+                self.next_ticks = time.ticks_add(time.ticks_ms(), wait_ms)
+        except Exception as e:
+            self.error = e
+        self.alive = False
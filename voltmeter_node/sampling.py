@@ -0,0 +1,92 @@
+"""
+Agendamento adaptativo da amostragem do voltímetro
+Acelera a amostragem quando as tensões mudam rápido e desacelera até um
+batimento lento quando estão estáveis (ou sem ninguém conectado). Quais
+amostras viram notificação é decidido depois, por deadband.DeadbandFilter.
+
+O agendador não lê o relógio: recebe `now` (ticks_ms) em cada chamada,
+o que permite simulá-lo no computador (sampling_sim.py).
+"""
+
+import time
+from array import array
+from voltmeter_constants import VOLTMETER_CHANNELS
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+FAST_MS = const(100)          # intervalo enquanto as tensões mudam
+NORMAL_MS = const(1000)       # intervalo inicial (o antigo intervalo fixo)
+SLOW_MS = const(5000)         # batimento lento com tensões estáveis
+RATE_MV_S = const(200)        # variação (mV/s) que acelera a amostragem
+NOISE_MV = const(10)          # variações menores são ruído e não aceleram
+CALM_SAMPLES = const(4)       # amostras estáveis antes de dobrar o intervalo
+
+
+class AdaptiveScheduler:
+    """Decide quando amostrar; não aloca por amostra"""
+
+    def __init__(self, fast_ms=FAST_MS, slow_ms=SLOW_MS, rate_mv_s=RATE_MV_S,
+                 noise_mv=NOISE_MV, channels=VOLTMETER_CHANNELS):
+        self.channels = channels
+        self.fast_ms = fast_ms
+        self.slow_ms = slow_ms
+        self.rate_mv_s = rate_mv_s
+        self.noise_mv = noise_mv
+        self.interval_ms = NORMAL_MS
+        self.next_ms = None
+        self.last_ms = None
+        self.calm = 0
+        self.last_mv = array('i', [0] * channels)
+        self.samples = 0
+
+    def due(self, now):
+        """Hora de amostrar?"""
+        return self.next_ms is None or time.ticks_diff(now, self.next_ms) >= 0
+
+    def until_next(self, now):
+        """Milissegundos até a próxima amostra (0 se já passou)"""
+        if self.next_ms is None:
+            return 0
+        return max(0, time.ticks_diff(self.next_ms, now))
+
+    def update(self, now, millivolts, listeners=True):
+        """Registra uma amostra (mV por canal) e agenda a próxima"""
+        change = 0
+        if self.last_ms is not None:
+            for i in range(self.channels):
+                delta = abs(millivolts[i] - self.last_mv[i])
+                if delta > change:
+                    change = delta
+            elapsed = time.ticks_diff(now, self.last_ms)
+        else:
+            elapsed = 0
+        for i in range(self.channels):
+            self.last_mv[i] = millivolts[i]
+        self.last_ms = now
+        self.samples += 1
+
+        if not listeners:
+            # Ninguém para notificar: só o batimento lento
+            self.interval_ms = self.slow_ms
+            self.calm = 0
+        elif change > self.noise_mv and elapsed > 0 and \
+                change * 1000 >= self.rate_mv_s * elapsed:
+            self.interval_ms = self.fast_ms
+            self.calm = 0
+        else:
+            self.calm += 1
+            if self.calm >= CALM_SAMPLES:
+                self.calm = 0
+                self.interval_ms = min(self.interval_ms * 2, self.slow_ms)
+        self.next_ms = time.ticks_add(now, self.interval_ms)
+
+    def listeners_changed(self):
+        """Nova central conectada: amostra já, sem esperar o batimento"""
+        self.next_ms = None
+        self.interval_ms = NORMAL_MS
+        self.calm = 0
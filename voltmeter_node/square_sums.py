@@ -0,0 +1,71 @@
+"""
+Soma de desvios e de quadrados em inteiros pequenos, por canal
+Usada por stats.py e ac_meter.py no caminho por amostra. O desvio d em
+relação a uma referência escolhida pelo chamador é partido em
+d = a * 4096 + b (0 <= b < 4096) e d² = a²·2**24 + 2·a·b·2**12 + b² fica
+em três acumuladores (a², a·b, b²).
+
+Limites com |d| < 2**23 µV (|a| <= 2048) em SQ_BLOCK = 64 amostras:
+
+    Σb²   <= 4095² · 64 < 2**30
+    Σa²   <= 2048² · 64 = 2**28
+    |Σa·b| < 2048 · 4096 · 64 = 2**29
+    |Σd|   < 2**23 · 64 = 2**29
+
+Tudo abaixo de 2**30, o limite dos inteiros pequenos do MicroPython: add()
+não aloca. O chamador esvazia o bloco (squares()/squares_float() e reset())
+ao chegar a SQ_BLOCK amostras.
+"""
+
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+SQ_BLOCK = const(64)            # amostras por bloco (limite dos acumuladores)
+SQ_MAX_DEVIATION = const(0x7FFFFF)  # |d| máximo (µV)
+_SPLIT = const(12)
+_LOW = const(4095)
+
+
+class SquareSums:
+    """Σd e Σd² do bloco em andamento de cada canal; memória fixa"""
+
+    def __init__(self, channels):
+        self.count = array('i', [0] * channels)
+        self.sum = array('i', [0] * channels)
+        self.hi = array('i', [0] * channels)     # soma de a²
+        self.mid = array('i', [0] * channels)    # soma de a·b
+        self.lo = array('i', [0] * channels)     # soma de b²
+
+    def add(self, channel, d):
+        """Acumula o desvio d (|d| <= SQ_MAX_DEVIATION); retorna as amostras do bloco"""
+        a = d >> _SPLIT
+        b = d & _LOW
+        self.sum[channel] += d
+        self.hi[channel] += a * a
+        self.mid[channel] += a * b
+        self.lo[channel] += b * b
+        n = self.count[channel] + 1
+        self.count[channel] = n
+        return n
+
+    def squares(self, channel):
+        """Σd² exato do bloco (inteiro longo no MicroPython: uma vez por bloco)"""
+        return (self.hi[channel] << 24) + (self.mid[channel] << 13) + self.lo[channel]
+
+    def squares_float(self, channel):
+        """Σd² do bloco em float, sem passar por inteiro longo"""
+        return self.hi[channel] * 16777216.0 + self.mid[channel] * 8192.0 + self.lo[channel]
+
+    def reset(self, channel):
+        """Esvazia o bloco do canal"""
+        self.count[channel] = 0
+        self.sum[channel] = 0
+        self.hi[channel] = 0
+        self.mid[channel] = 0
+        self.lo[channel] = 0
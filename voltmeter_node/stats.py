@@ -0,0 +1,240 @@
+"""
+Estatísticas por canal em janelas de tempo (min/max/média/desvio/RMS)
+Cada amostra em µV entra num acumulador inteiro por canal; a cada
+SQ_BLOCK amostras (ou no fim da fatia) o bloco é fundido, pela fórmula
+de Welford para grupos (Chan), no resumo da fatia atual: contagem, média,
+M2 (soma dos quadrados dos desvios), mínimo e máximo. Uma janela tem
+`slots` fatias num anel de tamanho fixo:
+
+    fixa (tumbling)   publica quando a última fatia da janela fecha
+    deslizante        publica a cada fatia, com as `slots` fatias mais recentes
+
+O caminho por amostra só usa inteiros pequenos: os desvios em relação à
+1ª amostra do bloco vão para square_sums.SquareSums (blocos de SQ_BLOCK
+amostras). Os floats só aparecem ao fundir blocos e ao publicar.
+
+Blob da característica STATS (little-endian):
+    tipo u8 (STATS_FRAME) | flags u8 (bit 0: deslizante) | canais u8 |
+    versão u8 | janela_ms u32 | fim da janela (ticks_ms) u32
+    por canal: amostras u32 | mín i32 | máx i32 | média i32 | desvio u32 | RMS u32 (µV)
+
+decode_stats() decodifica o blob no host (metrics_dashboard.py --stats).
+"""
+
+import math
+import struct
+import time
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+from constants import STATS_FRAME
+from voltmeter_constants import STATS_WINDOW_MS, STATS_SLOTS, STATS_SLIDING
+from square_sums import SquareSums, SQ_BLOCK
+
+STATS_VERSION = const(1)
+STATS_HEADER_FORMAT = '<BBBBII'
+STATS_HEADER_SIZE = const(12)
+STATS_CHANNEL_FORMAT = '<IiiiII'
+STATS_CHANNEL_SIZE = const(24)
+FLAG_SLIDING = const(1)
+
+
+def stats_blob_size(channels):
+    """Tamanho do blob com channels canais"""
+    return STATS_HEADER_SIZE + STATS_CHANNEL_SIZE * channels
+
+
+class WindowStats:
+    """Estatísticas por canal em janelas fixas ou deslizantes; memória fixa"""
+
+    def __init__(self, channels, window_ms=STATS_WINDOW_MS, slots=STATS_SLOTS, sliding=STATS_SLIDING):
+        self.channels = channels
+        self.window_ms = window_ms
+        self.slots = slots
+        self.slot_ms = max(1, window_ms // slots)
+        self.sliding = sliding
+
+        # Bloco inteiro em andamento, por canal
+        self.block = SquareSums(channels)
+        self.block_ref = array('i', [0] * channels)
+        self.block_min = array('i', [0] * channels)
+        self.block_max = array('i', [0] * channels)
+
+        # Resumo de cada fatia do anel: índice fatia * canais + canal
+        size = slots * channels
+        self.slot_count = array('i', [0] * size)
+        self.slot_mean = array('f', [0.0] * size)
+        self.slot_m2 = array('f', [0.0] * size)
+        self.slot_min = array('i', [0] * size)
+        self.slot_max = array('i', [0] * size)
+        self.current = 0
+        self.slot_start = None
+
+        # Dois blobs: o leitor sempre vê o último completo (latest())
+        self.blobs = (bytearray(stats_blob_size(channels)), bytearray(stats_blob_size(channels)))
+        self.sequence = 0
+        self.results = 0
+
+    def roll(self, now):
+        """Fecha as fatias vencidas até now (ticks_ms); True se publicou"""
+        if self.slot_start is None:
+            self.slot_start = now
+            return False
+        published = False
+        elapsed = time.ticks_diff(now, self.slot_start)
+        if elapsed >= self.window_ms + self.slot_ms:
+            # Parado por mais de uma janela: publica o que havia e recomeça em now
+            published = self._close_slot(now, True)
+            self.clear()
+            self.slot_start = now
+            return published
+        while elapsed >= self.slot_ms:
+            self.slot_start = time.ticks_add(self.slot_start, self.slot_ms)
+            elapsed -= self.slot_ms
+            if self._close_slot(self.slot_start):
+                published = True
+        return published
+
+    def add(self, channel, uv):
+        """Acumula uma amostra (µV) do canal; só inteiros pequenos, não aloca"""
+        if self.block.count[channel] == 0:
+            self.block_ref[channel] = uv
+            self.block_min[channel] = uv
+            self.block_max[channel] = uv
+        elif uv < self.block_min[channel]:
+            self.block_min[channel] = uv
+        elif uv > self.block_max[channel]:
+            self.block_max[channel] = uv
+        if self.block.add(channel, uv - self.block_ref[channel]) >= SQ_BLOCK:
+            self._flush(channel)
+
+    def add_all(self, microvolts, now):
+        """Uma varredura de todos os canais em now (ticks_ms)"""
+        self.roll(now)
+        for channel in range(self.channels):
+            self.add(channel, microvolts[channel])
+
+    def _flush(self, channel):
+        """Funde o bloco inteiro do canal na fatia atual (Chan/Welford)"""
+        block = self.block
+        n = block.count[channel]
+        if not n:
+            return
+        total = block.sum[channel]
+        squares = block.squares_float(channel)
+        mean_d = total / n
+        block_m2 = squares - total * mean_d
+        block_mean = self.block_ref[channel] + mean_d
+        self._merge(self.current * self.channels + channel, n, block_mean, block_m2,
+                    self.block_min[channel], self.block_max[channel])
+        block.reset(channel)
+
+    def _merge(self, slot, n, mean, m2, low, high):
+        count = self.slot_count[slot]
+        if not count:
+            self.slot_count[slot] = n
+            self.slot_mean[slot] = mean
+            self.slot_m2[slot] = m2
+            self.slot_min[slot] = low
+            self.slot_max[slot] = high
+            return
+        total = count + n
+        delta = mean - self.slot_mean[slot]
+        self.slot_mean[slot] += delta * n / total
+        self.slot_m2[slot] += m2 + delta * delta * count * n / total
+        self.slot_count[slot] = total
+        if low < self.slot_min[slot]:
+            self.slot_min[slot] = low
+        if high > self.slot_max[slot]:
+            self.slot_max[slot] = high
+
+    def clear(self):
+        """Descarta o bloco e as fatias acumulados (não mexe no último blob)"""
+        for channel in range(self.channels):
+            self.block.reset(channel)
+        for slot in range(self.slots * self.channels):
+            self.slot_count[slot] = 0
+        self.current = 0
+
+    def _close_slot(self, end, force=False):
+        """Fecha a fatia atual; publica se a janela ficou pronta (ou force)"""
+        for channel in range(self.channels):
+            self._flush(channel)
+        last = self.current == self.slots - 1
+        publish = self.sliding or last or force
+        if publish:
+            self._publish(end)
+        self.current = 0 if last else self.current + 1
+        base = self.current * self.channels
+        for channel in range(self.channels):
+            self.slot_count[base + channel] = 0
+        return publish
+
+    def _publish(self, end):
+        """Funde as fatias da janela e empacota o blob livre"""
+        blob = self.blobs[(self.sequence + 1) & 1]
+        struct.pack_into(STATS_HEADER_FORMAT, blob, 0, STATS_FRAME, FLAG_SLIDING if self.sliding else 0,
+                         self.channels, STATS_VERSION, self.window_ms, end)
+        offset = STATS_HEADER_SIZE
+        # Na janela fixa as fatias depois da atual ainda são da janela anterior
+        slots = self.slots if self.sliding else self.current + 1
+        for channel in range(self.channels):
+            count = 0
+            mean = 0.0
+            m2 = 0.0
+            low = high = 0
+            for index in range(slots):
+                slot = index * self.channels + channel
+                n = self.slot_count[slot]
+                if not n:
+                    continue
+                if not count:
+                    mean = self.slot_mean[slot]
+                    m2 = self.slot_m2[slot]
+                    low = self.slot_min[slot]
+                    high = self.slot_max[slot]
+                    count = n
+                    continue
+                total = count + n
+                delta = self.slot_mean[slot] - mean
+                mean += delta * n / total
+                m2 += self.slot_m2[slot] + delta * delta * count * n / total
+                count = total
+                low = min(low, self.slot_min[slot])
+                high = max(high, self.slot_max[slot])
+            variance = max(0.0, m2 / count) if count else 0.0
+            struct.pack_into(STATS_CHANNEL_FORMAT, blob, offset, count, low, high, int(round(mean)),
+                             int(math.sqrt(variance) + 0.5), int(math.sqrt(mean * mean + variance) + 0.5))
+            offset += STATS_CHANNEL_SIZE
+        # O blob só vira o atual depois de completo
+        self.sequence += 1
+        self.results += 1
+
+    def latest(self):
+        """Último blob publicado (sequence 0: nenhum ainda)"""
+        return self.blobs[self.sequence & 1]
+
+    def describe(self):
+        """Configuração atual em texto (resposta do comando STATS?)"""
+        mode = 'sliding' if self.sliding else 'tumbling'
+        return "STATS:%d,%d,%s" % (self.window_ms, self.slots, mode)
+
+
+def decode_stats(data):
+    """Decodifica o blob da característica STATS (usado no host)"""
+    kind, flags, channels, version, window_ms, end = struct.unpack_from(STATS_HEADER_FORMAT, data, 0)
+    if kind != STATS_FRAME or version != STATS_VERSION:
+        raise ValueError("Blob de estatísticas desconhecido: tipo 0x%02X versão %d" % (kind, version))
+    result = {'sliding': bool(flags & FLAG_SLIDING), 'window_ms': window_ms, 'end_ticks_ms': end, 'channels': []}
+    for channel in range(channels):
+        count, low, high, mean, stddev, rms = struct.unpack_from(STATS_CHANNEL_FORMAT, data,
+                                                                 STATS_HEADER_SIZE + STATS_CHANNEL_SIZE * channel)
+        result['channels'].append({'samples': count, 'min_uv': low, 'max_uv': high,
+                                   'mean_uv': mean, 'stddev_uv': stddev, 'rms_uv': rms})
+    return result
@@ -0,0 +1,327 @@
+"""
+Captura com pré-disparo do voltímetro (modo osciloscópio)
+Depois do ARM cada varredura (µV, antes da média móvel) entra num anel de
+pre + post varreduras. As condições de disparo são por canal; a primeira
+que valer dispara (OU entre os canais):
+
+    above / below       nível: uv > a / uv < a
+    rising / falling    borda: cruza a subindo / descendo, depois de ter
+                        passado de a - b / a + b (b: histerese)
+    outside / inside    janela: fora de [a, b] / dentro de [a, b]
+
+O disparo só vale com pre varreduras já no anel; a varredura do disparo é a
+1ª das post. Completadas as post a captura congela (DONE): o anel guarda
+exatamente pre + post varreduras e ninguém mais escreve nele até o próximo
+ARM. O caminho por varredura só usa inteiros pequenos e não aloca.
+
+Transferência em blocos na característica CAPTURE (little-endian):
+    tipo u8 (CAPTURE_FRAME) | captura u8 | bloco u16 | blocos u16
+    bloco 0:   canais u8 | canal do disparo u8 | tipo u8 | versão u8 |
+               pre u16 | post u16 | período_us u32 | ticks_ms do disparo u32 |
+               µV do disparo i32
+    blocos 1+: até CAPTURE_CHUNK_VALUES int32 (µV) em ordem de tempo,
+               varredura a varredura (canal 0, canal 1, ...)
+
+Cada bloco sai numa notificação, que não passa do MTU negociado menos 3:
+chunk_values() dá quantos valores cabem por bloco no MTU de cada central
+(o número de blocos muda junto); abaixo de CAPTURE_MIN_MTU nem o bloco 0
+cabe.
+
+decode_capture() remonta a captura no host.
+"""
+
+import struct
+import time
+from array import array
+
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+from constants import CAPTURE_FRAME
+from voltmeter_constants import TRIGGER_PRE_SAMPLES, TRIGGER_POST_SAMPLES, TRIGGER_HYSTERESIS_UV
+
+TRIG_OFF = const(0)
+TRIG_ABOVE = const(1)
+TRIG_BELOW = const(2)
+TRIG_RISING = const(3)
+TRIG_FALLING = const(4)
+TRIG_OUTSIDE = const(5)
+TRIG_INSIDE = const(6)
+TRIGGER_NAMES = ('off', 'above', 'below', 'rising', 'falling', 'outside', 'inside')
+
+STATE_IDLE = const(0)       # desarmado: add() não faz nada
+STATE_ARMED = const(1)      # enchendo o pré-disparo e avaliando as condições
+STATE_TRIGGERED = const(2)  # gravando as varreduras depois do disparo
+STATE_DONE = const(3)       # congelado, pronto para transferir
+STATE_NAMES = ('IDLE', 'ARMED', 'TRIGGERED', 'DONE')
+
+CAPTURE_VERSION = const(1)
+CAPTURE_CHUNK_VALUES = const(60)    # int32 por bloco: 246 bytes com o cabeçalho
+CAPTURE_HEADER_FORMAT = '<BBHH'
+CAPTURE_HEADER_SIZE = const(6)
+CAPTURE_INFO_FORMAT = '<BBBBHHIIi'
+CAPTURE_INFO_SIZE = const(20)
+CAPTURE_CHUNK_SIZE = CAPTURE_HEADER_SIZE + 4 * CAPTURE_CHUNK_VALUES
+CAPTURE_MIN_MTU = const(29)         # 3 (ATT) + cabeçalho + informações do bloco 0
+CAPTURE_MAX_SAMPLES = const(4096)   # pre + post (memória: 4 bytes por canal)
+
+
+def chunk_values(mtu):
+    """Valores por bloco numa notificação com esse MTU (0: o bloco 0 não cabe)"""
+    if mtu < CAPTURE_MIN_MTU:
+        return 0
+    return min(CAPTURE_CHUNK_VALUES, (mtu - 3 - CAPTURE_HEADER_SIZE) // 4)
+
+
+class TriggerCapture:
+    """Anel de pré-disparo com condições por canal; add() não aloca"""
+
+    def __init__(self, channels, pre=TRIGGER_PRE_SAMPLES, post=TRIGGER_POST_SAMPLES):
+        if pre < 0 or post < 1 or pre + post > CAPTURE_MAX_SAMPLES:
+            raise ValueError("pre/post inválidos")
+        self.channels = channels
+        self.pre = pre
+        self.post = post
+        self.depth = pre + post
+        self.data = array('i', [0] * (self.depth * channels))
+
+        # Condição de cada canal: tipo, limites a e b (µV), borda preparada
+        self.kind = array('i', [TRIG_OFF] * channels)
+        self.level_a = array('i', [0] * channels)
+        self.level_b = array('i', [0] * channels)
+        self.primed = array('i', [0] * channels)
+
+        self.state = STATE_IDLE
+        self.write = 0          # próxima varredura do anel a escrever
+        self.filled = 0         # varreduras no anel desde o ARM (até depth)
+        self.remaining = 0      # varreduras que faltam depois do disparo
+        self.trigger_channel = 0
+        self.trigger_kind = TRIG_OFF
+        self.trigger_uv = 0
+        self.trigger_ticks = 0
+        self.trigger_us = 0
+        self.sample_period_us = 0   # escrito pelo ADCReader: taxa da aquisição contínua ou 0
+        self.period_us = 0      # período da captura congelada
+        self.captures = 0
+        self.chunk = bytearray(CAPTURE_CHUNK_SIZE)
+
+    def set_trigger(self, channel, kind, a=0, b=None):
+        """Condição do canal (0..N-1) em µV; b padrão: TRIGGER_HYSTERESIS_UV nas bordas
+
+        Desarma: a condição nova vale a partir do próximo ARM.
+        """
+        if not 0 <= channel < self.channels or not TRIG_OFF <= kind <= TRIG_INSIDE:
+            raise ValueError("canal ou tipo de disparo inválido")
+        if b is None:
+            b = TRIGGER_HYSTERESIS_UV if kind in (TRIG_RISING, TRIG_FALLING) else a
+        if kind >= TRIG_OUTSIDE and b < a:
+            a, b = b, a
+        self.state = STATE_IDLE
+        self.kind[channel] = kind
+        self.level_a[channel] = a
+        self.level_b[channel] = b
+
+    def copy_conditions(self, other):
+        """Copia as condições de outra captura (troca de tamanho)"""
+        for channel in range(min(self.channels, other.channels)):
+            self.kind[channel] = other.kind[channel]
+            self.level_a[channel] = other.level_a[channel]
+            self.level_b[channel] = other.level_b[channel]
+
+    def arm(self):
+        """Esvazia o anel e passa a avaliar as condições"""
+        if not any(self.kind):
+            raise ValueError("nenhuma condição de disparo")
+        self.state = STATE_IDLE
+        for channel in range(self.channels):
+            self.primed[channel] = 0
+        self.write = 0
+        self.filled = 0
+        self.state = STATE_ARMED
+
+    def disarm(self):
+        self.state = STATE_IDLE
+
+    def add(self, sample):
+        """Uma varredura em µV (thread dono do backend); True ao congelar"""
+        state = self.state
+        if state != STATE_ARMED and state != STATE_TRIGGERED:
+            return False
+        channels = self.channels
+        data = self.data
+        base = self.write * channels
+        for channel in range(channels):
+            data[base + channel] = sample[channel]
+        write = self.write + 1
+        self.write = 0 if write >= self.depth else write
+
+        if state == STATE_TRIGGERED:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                return self._freeze()
+            return False
+
+        filled = self.filled + 1
+        if filled <= self.depth:
+            self.filled = filled
+        # Avalia sempre (as bordas precisam ver o lado oposto antes), mas só
+        # dispara com o pré-disparo completo; uma borda antes disso se perde
+        kinds = self.kind
+        for channel in range(channels):
+            kind = kinds[channel]
+            if not kind:
+                continue
+            uv = sample[channel]
+            a = self.level_a[channel]
+            if kind == TRIG_ABOVE:
+                hit = uv > a
+            elif kind == TRIG_BELOW:
+                hit = uv < a
+            elif kind == TRIG_RISING:
+                if uv < a - self.level_b[channel]:
+                    self.primed[channel] = 1
+                hit = self.primed[channel] and uv >= a
+                if hit:
+                    self.primed[channel] = 0    # cada borda dispara uma vez
+            elif kind == TRIG_FALLING:
+                if uv > a + self.level_b[channel]:
+                    self.primed[channel] = 1
+                hit = self.primed[channel] and uv <= a
+                if hit:
+                    self.primed[channel] = 0    # cada borda dispara uma vez
+            elif kind == TRIG_OUTSIDE:
+                hit = uv < a or uv > self.level_b[channel]
+            else:
+                hit = a <= uv <= self.level_b[channel]
+            if hit and filled > self.pre:
+                self.trigger_channel = channel
+                self.trigger_kind = kind
+                self.trigger_uv = uv
+                self.trigger_ticks = time.ticks_ms()
+                self.trigger_us = time.ticks_us()
+                self.remaining = self.post - 1
+                self.state = STATE_TRIGGERED
+                if self.remaining <= 0:
+                    return self._freeze()
+                return False
+        return False
+
+    def _freeze(self):
+        period = self.sample_period_us
+        if not period and self.post > 1:
+            # Leitura sob demanda: período médio entre o disparo e a última
+            period = time.ticks_diff(time.ticks_us(), self.trigger_us) // (self.post - 1)
+        self.period_us = period
+        self.captures += 1
+        self.state = STATE_DONE
+        return True
+
+    def collecting(self):
+        """True enquanto add() grava (armada ou depois do disparo)"""
+        return self.state == STATE_ARMED or self.state == STATE_TRIGGERED
+
+    def done(self):
+        return self.state == STATE_DONE
+
+    def chunk_count(self, per_chunk=CAPTURE_CHUNK_VALUES):
+        """Blocos da captura com per_chunk valores por bloco (bloco 0 = informações)"""
+        values = self.depth * self.channels
+        return 1 + (values + per_chunk - 1) // per_chunk
+
+    def pack_chunk(self, index, per_chunk=CAPTURE_CHUNK_VALUES):
+        """memoryview do bloco index da captura congelada (fora do caminho quente)"""
+        if self.state != STATE_DONE:
+            raise ValueError("nenhuma captura congelada")
+        count = self.chunk_count(per_chunk)
+        chunk = self.chunk
+        struct.pack_into(CAPTURE_HEADER_FORMAT, chunk, 0, CAPTURE_FRAME, self.captures & 0xFF, index, count)
+        if index == 0:
+            struct.pack_into(CAPTURE_INFO_FORMAT, chunk, CAPTURE_HEADER_SIZE, self.channels,
+                             self.trigger_channel, self.trigger_kind, CAPTURE_VERSION, self.pre, self.post,
+                             self.period_us, self.trigger_ticks, self.trigger_uv)
+            return memoryview(chunk)[:CAPTURE_HEADER_SIZE + CAPTURE_INFO_SIZE]
+        total = self.depth * self.channels
+        first = (index - 1) * per_chunk
+        values = min(per_chunk, total - first)
+        # Congelada, a varredura mais antiga é a próxima que seria escrita
+        position = (self.write * self.channels + first) % total
+        data = self.data
+        offset = CAPTURE_HEADER_SIZE
+        for _ in range(values):
+            struct.pack_into('<i', chunk, offset, data[position])
+            offset += 4
+            position += 1
+            if position >= total:
+                position = 0
+        return memoryview(chunk)[:offset]
+
+    def describe(self):
+        """Estado e condições em texto (resposta do comando TRIG?)"""
+        conditions = ','.join('%s/%d/%d' % (TRIGGER_NAMES[self.kind[c]], self.level_a[c] // 1000,
+                                            self.level_b[c] // 1000) for c in range(self.channels))
+        return 'TRIG:%s;%s;PRE:%d;POST:%d;CAPTURES:%d' % (
+            STATE_NAMES[self.state], conditions, self.pre, self.post, self.captures)
+
+    def command(self, text):
+        """Aplica TRIG:<canal>,<tipo>[,<mV>[,<mV>]] / ARM / DISARM; False se não reconhecido
+
+        canal 1-N ou 0 para todos; tipo pelo nome (TRIGGER_NAMES).
+        """
+        if text.startswith('TRIG:'):
+            fields = text[5:].split(',')
+            kind = TRIGGER_NAMES.index(fields[1].strip().lower())
+            a = int(fields[2]) * 1000 if len(fields) > 2 else 0
+            b = int(fields[3]) * 1000 if len(fields) > 3 else None
+            channel = int(fields[0])
+            channels = range(self.channels) if channel == 0 else (channel - 1,)
+            for c in channels:
+                self.set_trigger(c, kind, a, b)
+            return True
+        if text == 'ARM':
+            self.arm()
+            return True
+        if text == 'DISARM':
+            self.disarm()
+            return True
+        return False
+
+
+def decode_capture(chunks):
+    """Remonta a captura a partir dos blocos (bytes) recebidos; usado no host
+
+    Retorna um dict com as informações do bloco 0 e 'samples', uma lista de
+    varreduras (µV por canal) em ordem de tempo; o disparo é a de índice pre.
+    """
+    parts = {}
+    sequence = count = None
+    for data in chunks:
+        kind, capture, index, total = struct.unpack_from(CAPTURE_HEADER_FORMAT, data, 0)
+        if kind != CAPTURE_FRAME:
+            raise ValueError("Bloco de captura desconhecido: tipo 0x%02X" % kind)
+        if sequence is None:
+            sequence, count = capture, total
+        elif capture != sequence:
+            raise ValueError("Blocos de capturas diferentes: %d e %d" % (sequence, capture))
+        parts[index] = bytes(data)
+    missing = [index for index in range(count or 1) if index not in parts]
+    if missing:
+        raise ValueError("Blocos faltando: %s" % missing)
+    (channels, trigger_channel, kind, version, pre, post, period_us, ticks,
+     trigger_uv) = struct.unpack_from(CAPTURE_INFO_FORMAT, parts[0], CAPTURE_HEADER_SIZE)
+    if version != CAPTURE_VERSION:
+        raise ValueError("Versão de captura desconhecida: %d" % version)
+    values = []
+    for index in range(1, count):
+        data = parts[index]
+        values.extend(struct.unpack_from('<%di' % ((len(data) - CAPTURE_HEADER_SIZE) // 4), data,
+                                         CAPTURE_HEADER_SIZE))
+    samples = [values[k:k + channels] for k in range(0, len(values), channels)]
+    if len(samples) != pre + post:
+        raise ValueError("Captura com %d varreduras, esperado %d" % (len(samples), pre + post))
+    return {'capture': sequence, 'channels': channels, 'trigger_channel': trigger_channel,
+            'trigger': TRIGGER_NAMES[kind], 'pre': pre, 'post': post, 'period_us': period_us,
+            'trigger_ticks_ms': ticks, 'trigger_uv': trigger_uv, 'samples': samples}
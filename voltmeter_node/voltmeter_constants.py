@@ -0,0 +1,66 @@
+# Constantes do nó voltímetro (conversor, aquisição, estatísticas, captura,
+# modo AC e thread de amostragem); as compartilhadas ficam em constants.py
+try:
+    from micropython import const
+except ImportError:
+    # Para ambiente de desenvolvimento
+    def const(value):
+        return value
+
+# Configurações do voltímetro (pinos ADC)
+# O número de canais é o número de pinos; com o BLE ativo só o ADC1 funciona
+# (pinos 32-39, até 8 canais)
+ADC_PINS = (36, 39, 34)  # VP, VN, GPIO34
+
+# Conversor do voltímetro (voltmeter_node/adc_backends.py): 'internal' usa
+# ADC_PINS; 'ads1115' (I2C) e 'ads1256' (SPI) usam as entradas ADS_INPUTS;
+# 'sim' gera sinais sintéticos com um canal por entrada de ADC_PINS
+ADC_BACKEND = 'internal'
+ADS_INPUTS = (0, 1, 2)          # AINx de cada canal nos conversores externos
+ADS_DRDY_PIN = 4                # ALERT/RDY (ADS1115) ou DRDY (ADS1256); None = sem pino
+ADS1115_ADDRESS = const(0x48)   # ADDR ligado ao GND
+I2C_PINS = (22, 21)             # SCL, SDA
+ADS1256_SPI_PINS = (18, 23, 19)  # SCLK, DIN (MOSI), DOUT (MISO)
+ADS1256_CS_PIN = 5
+# Aquisição contínua (voltmeter_node/acquisition.py): varreduras/s num Timer,
+# entregues em blocos com a média de cada canal; 0 = leitura sob demanda
+ADC_CONTINUOUS_HZ = const(0)
+# Auto-ranging (ADC interno): cada canal usa a atenuação mais sensível que
+# não satura. Sobe de faixa ao passar do limite linear da atual; desce só
+# depois de AUTO_RANGE_HOLD amostras abaixo de AUTO_RANGE_DOWN_PERCENT % do
+# limite da faixa de baixo (histerese)
+ADC_AUTO_RANGE = False
+AUTO_RANGE_DOWN_PERCENT = const(85)
+AUTO_RANGE_HOLD = const(8)
+# Estatísticas por canal (voltmeter_node/stats.py) na característica STATS:
+# janelas de STATS_WINDOW_MS em STATS_SLOTS fatias; deslizante publica a
+# cada fatia, fixa (tumbling) a cada janela. STATS_WINDOW_MS = 0 desliga
+STATS_WINDOW_MS = const(1000)
+STATS_SLOTS = const(10)
+STATS_SLIDING = False
+# Captura com pré-disparo (voltmeter_node/trigger.py): depois do ARM as
+# varreduras entram num anel de TRIGGER_PRE_SAMPLES + TRIGGER_POST_SAMPLES;
+# o disparo (nível, borda ou janela por canal) guarda as anteriores e mais
+# TRIGGER_POST_SAMPLES, congela e envia em blocos na característica CAPTURE.
+# Na taxa cheia com ADC_CONTINUOUS_HZ; bordas com TRIGGER_HYSTERESIS_UV
+TRIGGER_PRE_SAMPLES = const(64)
+TRIGGER_POST_SAMPLES = const(192)
+TRIGGER_HYSTERESIS_UV = const(10000)
+TRIGGER_REARM = False           # True: arma de novo depois de enviar a captura
+# Modo AC (voltmeter_node/ac_meter.py): aquisição contínua a AC_SAMPLE_HZ e,
+# a cada AC_WINDOW_SAMPLES varreduras, DC, RMS verdadeiro sem o DC, pico e
+# frequência (cruzamentos por zero com histerese) de cada canal numa
+# notificação da característica AC; o frame de tensões passa a levar o RMS
+AC_MODE = False
+AC_SAMPLE_HZ = const(2000)
+AC_WINDOW_SAMPLES = const(2000)     # até 65535
+AC_ZC_HYSTERESIS_UV = const(20000)
+# Thread de amostragem (voltmeter_node/sampler_thread.py): um _thread lê o ADC
+# e publica num anel; o loop principal só cuida do BLE. False = um só thread
+SAMPLER_THREAD = False
+SAMPLER_RING_SIZE = const(16)   # potência de 2
+
+VOLTMETER_CHANNELS = len(ADS_INPUTS) if ADC_BACKEND in ('ads1115', 'ads1256') else len(ADC_PINS)
+# Posição do primeiro canal deste voltímetro no painel (bitmap do frame):
+# com dois voltímetros de 4 canais, o segundo usa CHANNEL_BASE = 4
+CHANNEL_BASE = const(0)